@@ -0,0 +1,148 @@
+"""
+benchmarks/bench_describe.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+# Benchmark of finding the nearest tag and the number of commits since it
+# (versionfinder.gitgraph.describe) in a 100,000 commit repository, with and
+# without a commit-graph, against running ``git describe --tags``. Requires
+# ``git``. With versionfinder importable (i.e. ``pip install -e .``), run:
+#     python benchmarks/bench_describe.py
+
+import os
+import shutil
+import tempfile
+import subprocess
+import time
+
+from versionfinder.gitgraph import describe
+
+COMMITS = 100000
+# a side branch of 3 commits is merged every MERGE_EVERY commits
+MERGE_EVERY = 50
+# the main line is tagged every TAG_EVERY commits, up to UNTAGGED commits
+# before HEAD
+TAG_EVERY = 1000
+UNTAGGED = 5000
+NUMBER = 5
+
+
+def fast_import_stream(path):
+    """
+    Write a ``git fast-import`` stream of the benchmark history to ``path``.
+    """
+    with open(path, 'w') as fh:
+        mark = 0
+        when = 1500000000
+        main = None
+        n = 0
+        while n < COMMITS:
+            parents = [main] if main is not None else []
+            if n and n % MERGE_EVERY == 0:
+                side = main
+                for _ in range(3):
+                    mark += 1
+                    when += 1
+                    fh.write('commit refs/heads/side\nmark :%d\n'
+                             'committer B <b@b> %d +0000\ndata 4\nside\n'
+                             'from :%d\n\n' % (mark, when, side))
+                    side = mark
+                    n += 1
+                parents.append(side)
+            mark += 1
+            when += 1
+            fh.write('commit refs/heads/master\nmark :%d\n'
+                     'committer B <b@b> %d +0000\ndata 4\nmain\n'
+                     % (mark, when))
+            if parents:
+                fh.write('from :%d\n' % parents[0])
+            for p in parents[1:]:
+                fh.write('merge :%d\n' % p)
+            fh.write('\n')
+            main = mark
+            n += 1
+            if n % TAG_EVERY == 0 and n <= COMMITS - UNTAGGED:
+                fh.write('reset refs/tags/v%d\nfrom :%d\n\n' % (n, mark))
+
+
+def make_repo(path):
+    subprocess.check_call(['git', 'init', '-q', path])
+    stream = os.path.join(path, 'stream')
+    fast_import_stream(stream)
+    with open(stream) as fh:
+        subprocess.check_call(['git', '-C', path, 'fast-import', '--quiet'],
+                              stdin=fh)
+    os.unlink(stream)
+    subprocess.check_call(['git', '-C', path, 'symbolic-ref', 'HEAD',
+                           'refs/heads/master'])
+    return subprocess.check_output(
+        ['git', '-C', path, 'rev-parse', 'HEAD']
+    ).decode().strip()
+
+
+def measure(name, func, number=NUMBER):
+    start = time.perf_counter()
+    for _ in range(number):
+        res = func()
+    elapsed = time.perf_counter() - start
+    print('%-32s %9.1f ms/call  %s' % (name, elapsed / number * 1000, res))
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    try:
+        head = make_repo(tmp)
+        gitdir = os.path.join(tmp, '.git')
+
+        def git_describe():
+            return subprocess.check_output(
+                ['git', '-C', tmp, 'describe', '--tags', head]
+            ).decode().strip()
+
+        measure('native, no commit-graph', lambda: describe(gitdir, head),
+                number=1)
+        measure('git describe, no commit-graph', git_describe)
+        subprocess.check_call(['git', '-C', tmp, 'commit-graph', 'write',
+                               '--reachable'])
+        measure('native, commit-graph', lambda: describe(gitdir, head))
+        measure('git describe, commit-graph', git_describe)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+benchmarks/bench_dirty.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+# Benchmark of checking whether a working tree of 50,000 files is dirty
+# without running git (versionfinder.gitindex.is_dirty), against running
+# ``git status --porcelain`` and (if it is installed) GitPython's
+# ``Repo.is_dirty``: when the tree is clean, after touching 1,000 files
+# (which must then be hashed), and with one untracked file. Requires
+# ``git``. With versionfinder importable (i.e. ``pip install -e .``), run:
+#     python benchmarks/bench_dirty.py
+
+import os
+import shutil
+import tempfile
+import subprocess
+import time
+
+from versionfinder.gitindex import is_dirty
+
+try:
+    from git import Repo
+except ImportError:
+    Repo = None
+
+DIRS = 500
+FILES_PER_DIR = 100
+TOUCHED = 1000
+NUMBER = 5
+
+
+def make_repo(path):
+    subprocess.check_call(['git', 'init', '-q', path])
+    old = time.time() - 60
+    for d in range(DIRS):
+        dirpath = os.path.join(path, 'dir%d' % d, 'sub')
+        os.makedirs(dirpath)
+        for f in range(FILES_PER_DIR):
+            fpath = os.path.join(dirpath, 'file%d.txt' % f)
+            with open(fpath, 'w') as fh:
+                fh.write('%d %d\n' % (d, f) * 20)
+            os.utime(fpath, (old, old))
+    with open(os.path.join(path, '.gitignore'), 'w') as fh:
+        fh.write('*.pyc\nbuild/\n')
+    subprocess.check_call(['git', '-C', path, 'add', '-A'])
+    subprocess.check_call(['git', '-C', path, '-c', 'user.name=B', '-c',
+                           'user.email=b@b', '-c', 'gc.auto=0', 'commit',
+                           '-q', '-m', 'files'])
+
+
+def measure(name, func, number=NUMBER):
+    start = time.perf_counter()
+    for _ in range(number):
+        res = func()
+    elapsed = time.perf_counter() - start
+    print('%-36s %9.1f ms/call  %s' % (name, elapsed / number * 1000, res))
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    try:
+        make_repo(tmp)
+        gitdir = os.path.join(tmp, '.git')
+        env = dict(os.environ)
+        # keep git status from refreshing the index, like is_dirty
+        env['GIT_OPTIONAL_LOCKS'] = '0'
+
+        def git_status():
+            return subprocess.check_output(
+                ['git', '-C', tmp, 'status', '--porcelain',
+                 '--untracked-files=normal'], env=env
+            ) != b''
+
+        funcs = [('native', lambda: is_dirty(gitdir)),
+                 ('git status', git_status)]
+        if Repo is not None:
+            repo = Repo(tmp)
+            funcs.append(('GitPython',
+                          lambda: repo.is_dirty(untracked_files=True)))
+
+        for name, func in funcs:
+            measure('%s, clean' % name, func)
+        for d in range(TOUCHED // FILES_PER_DIR):
+            for f in range(FILES_PER_DIR):
+                os.utime(os.path.join(tmp, 'dir%d' % d, 'sub',
+                                      'file%d.txt' % f))
+        for name, func in funcs:
+            measure('%s, %d files touched' % (name, TOUCHED), func)
+        with open(os.path.join(tmp, 'dir%d' % (DIRS - 1), 'new.txt'),
+                  'w') as fh:
+            fh.write('new\n')
+        for name, func in funcs:
+            measure('%s, untracked file' % name, func)
+        if Repo is not None:
+            repo.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+benchmarks/bench_git.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+# Benchmark of the git backends used by VersionFinder._find_git_info():
+# GitPython (with a fresh Repo, and with one reused from the pool) against
+# the batched ``git`` command line backend, counting the git processes each
+# spawns. Requires ``git``. With versionfinder importable (i.e.
+# ``pip install -e .``), run:
+#     python benchmarks/bench_git.py
+
+import os
+import shutil
+import tempfile
+import subprocess
+import time
+
+import git.cmd
+
+from versionfinder import gitrepo
+from versionfinder.versionfinder import VersionFinder
+
+NUMBER = 20
+TAGS = 200
+
+
+class SpawnCounter(object):
+    """Wraps a Popen class, counting the processes it starts."""
+
+    def __init__(self, popen):
+        self.popen = popen
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+        return self.popen(*args, **kwargs)
+
+
+def make_repo(path):
+    def run(*args):
+        subprocess.check_call(
+            ['git', '-C', path, '-c', 'user.name=B', '-c', 'user.email=b@b',
+             '-c', 'commit.gpgsign=false'] + list(args),
+            stdout=subprocess.DEVNULL
+        )
+
+    run('init', '-q')
+    run('remote', 'add', 'origin', 'https://example.com/foo.git')
+    for i in range(TAGS):
+        with open(os.path.join(path, 'f.txt'), 'w') as fh:
+            fh.write('%d\n' % i)
+        run('add', 'f.txt')
+        run('commit', '-q', '-m', str(i))
+        run('tag', 'v%d' % i)
+    run('gc', '-q')
+
+
+# the name GitPython starts its processes through (newer versions wrap
+# Popen as safer_popen)
+GIT_POPEN = 'safer_popen' if hasattr(git.cmd, 'safer_popen') else 'Popen'
+
+
+def measure(name, func):
+    counters = (
+        SpawnCounter(subprocess.Popen),
+        SpawnCounter(getattr(git.cmd, GIT_POPEN))
+    )
+    subprocess.Popen = counters[0]
+    setattr(git.cmd, GIT_POPEN, counters[1])
+    try:
+        start = time.perf_counter()
+        for _ in range(NUMBER):
+            res = func()
+        elapsed = time.perf_counter() - start
+    finally:
+        subprocess.Popen = counters[0].popen
+        setattr(git.cmd, GIT_POPEN, counters[1].popen)
+    spawns = counters[0].count + counters[1].count
+    print('%-22s %8.1f ms/call %6.1f spawns/call  tag=%s' % (
+        name, elapsed / NUMBER * 1000, spawns / NUMBER, res['tag']))
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    try:
+        make_repo(tmp)
+        gitdir = os.path.join(tmp, '.git')
+        finder = VersionFinder('foo', package_file=os.path.join(tmp, 'x.py'))
+
+        def gitpython_fresh():
+            gitrepo.close_pool()
+            return finder._find_git_info(gitdir)
+
+        measure('GitPython, new Repo', gitpython_fresh)
+        measure('GitPython, pooled', lambda: finder._find_git_info(gitdir))
+        gitrepo.close_pool()
+        measure('git CLI (batched)', lambda: gitrepo.git_cli_info(gitdir))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+benchmarks/bench_logging.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+# Benchmark of the per-record cost of adding version attributes to log
+# records, against a bare logger and against calling find_version() in a
+# formatter. With versionfinder importable (i.e. ``pip install -e .``), run:
+#     python benchmarks/bench_logging.py
+
+import logging
+import timeit
+
+from versionfinder import find_version
+from versionfinder.logfilter import VersionFilter, install_record_factory
+
+NUMBER = 20000
+FMT = '%(levelname)s %(name)s %(app_version)s %(app_commit)s %(message)s'
+
+
+class NullStreamHandler(logging.Handler):
+    """Handler that formats each record and discards the result."""
+
+    def emit(self, record):
+        self.format(record)
+
+
+class FindVersionFormatter(logging.Formatter):
+    """The anti-pattern: call find_version() for every record."""
+
+    def format(self, record):
+        info = find_version('versionfinder')
+        record.app_version = info.version
+        record.app_commit = info.git_commit
+        return super(FindVersionFormatter, self).format(record)
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def per_call_us(logger, number=NUMBER):
+    """Return the best-of-5 cost of one ``logger.info()`` in microseconds."""
+    t = min(timeit.repeat(
+        lambda: logger.info('hello %s', 'world'), number=number, repeat=5
+    ))
+    return t / number * 1e6
+
+
+def main():
+    vfilter = VersionFilter('versionfinder', background=False)
+
+    h = NullStreamHandler()
+    h.setFormatter(logging.Formatter('%(levelname)s %(name)s %(message)s'))
+    bare = per_call_us(make_logger('bench.bare', h))
+    print('bare logger:              %8.2f us/record' % bare)
+
+    h = NullStreamHandler()
+    h.setFormatter(logging.Formatter(FMT))
+    h.addFilter(vfilter)
+    res = per_call_us(make_logger('bench.filter', h))
+    print('VersionFilter:            %8.2f us/record (+%.2f)' % (
+        res, res - bare))
+
+    old = logging.getLogRecordFactory()
+    install_record_factory('versionfinder', background=False)
+    h = NullStreamHandler()
+    h.setFormatter(logging.Formatter(FMT))
+    res = per_call_us(make_logger('bench.factory', h))
+    logging.setLogRecordFactory(old)
+    print('install_record_factory(): %8.2f us/record (+%.2f)' % (
+        res, res - bare))
+
+    h = NullStreamHandler()
+    h.setFormatter(FindVersionFormatter(FMT))
+    res = per_call_us(make_logger('bench.find_version', h), number=20)
+    print('find_version() per record: %7.0f us/record' % res)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+benchmarks/bench_serialization.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+# Encode/decode throughput of the VersionInfo serialization formats over
+# 100,000 objects.
+# With versionfinder importable (i.e. ``pip install -e .``), run:
+#     python benchmarks/bench_serialization.py
+
+import time
+import pickle
+
+from versionfinder.versioninfo import VersionInfo
+
+COUNT = 100000
+
+
+def make_objects():
+    objs = []
+    for i in range(COUNT):
+        objs.append(VersionInfo(
+            pip_version='1.%d.0' % (i % 50),
+            pip_url='https://github.com/someone/pkg%d' % (i % 1000),
+            pip_requirement='pkg%d==1.%d.0' % (i % 1000, i % 50),
+            pkg_resources_version='1.%d.0' % (i % 50),
+            pkg_resources_url='https://github.com/someone/pkg%d' % (i % 1000),
+            git_commit='%040x' % i if i % 3 == 0 else None,
+            git_remotes={
+                'origin': 'https://github.com/someone/pkg%d.git' % (i % 1000)
+            } if i % 3 == 0 else None,
+            git_is_dirty=(i % 2 == 0) if i % 3 == 0 else None
+        ))
+    return objs
+
+
+def timed(label, func, arg):
+    start = time.perf_counter()
+    res = func(arg)
+    elapsed = time.perf_counter() - start
+    print('  %-8s %8.3f s  %10.0f objects/s' % (
+        label, elapsed, COUNT / elapsed))
+    return res
+
+
+def main():
+    objs = make_objects()
+    formats = [
+        ('json', lambda o: o.to_json(), VersionInfo.from_json),
+        ('bytes', lambda o: o.to_bytes(), VersionInfo.from_bytes),
+        ('pickle', lambda o: pickle.dumps(o, pickle.HIGHEST_PROTOCOL),
+         pickle.loads),
+    ]
+    for name, enc, dec in formats:
+        print('%s:' % name)
+        encoded = timed('encode', lambda l: [enc(o) for o in l], objs)
+        decoded = timed('decode', lambda l: [dec(e) for e in l], encoded)
+        assert decoded == objs
+        print('  %-8s %8.1f bytes/object' % (
+            'size', sum(len(e) for e in encoded) / float(COUNT)))
+    print('pickle (one list of all objects):')
+    data = timed('encode', lambda l: pickle.dumps(l, pickle.HIGHEST_PROTOCOL),
+                 objs)
+    timed('decode', pickle.loads, data)
+    print('  %-8s %8.1f bytes/object' % ('size', len(data) / float(COUNT)))
+
+
+if __name__ == '__main__':
+    main()
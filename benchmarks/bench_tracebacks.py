@@ -0,0 +1,91 @@
+"""
+benchmarks/bench_tracebacks.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+# Benchmark of annotating a deep traceback with the distribution owning each
+# frame (frames repeated by the recursion are collapsed by the traceback
+# module, so only distinct frames are counted). With versionfinder
+# importable (i.e. ``pip install -e .``), run:
+#     python benchmarks/bench_tracebacks.py
+
+import sys
+import time
+import timeit
+import traceback
+
+from versionfinder.environment import Environment
+from versionfinder.tracebacks import TracebackAnnotator
+
+NUMBER = 1000
+DEPTH = 100
+
+
+def main():
+    import json
+
+    def recurse(n):
+        if n == 0:
+            json.loads('{')
+        return recurse(n - 1)
+
+    try:
+        recurse(DEPTH)
+    except ValueError:
+        ei = sys.exc_info()
+    lines = traceback.format_exception(*ei)
+    frames = sum(1 for line in lines if line.startswith('  File "'))
+
+    env = Environment()
+    start = time.perf_counter()
+    env.file_index()
+    print('file index build: %.1f ms (%d files)' % (
+        (time.perf_counter() - start) * 1000, len(env.file_index())))
+
+    annotator = TracebackAnnotator(env)
+    start = time.perf_counter()
+    list(annotator.annotate(lines))
+    print('first annotation: %.1f us/frame' % (
+        (time.perf_counter() - start) / frames * 1e6))
+    t = min(timeit.repeat(lambda: list(annotator.annotate(lines)),
+                          number=NUMBER, repeat=5))
+    print('cached annotation: %.2f us/frame (%d frames)' % (
+        t / NUMBER / frames * 1e6, frames))
+
+
+if __name__ == '__main__':
+    main()
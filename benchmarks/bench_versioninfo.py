@@ -0,0 +1,91 @@
+"""
+benchmarks/bench_versioninfo.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+# Micro-benchmark of VersionInfo derived-string access, equality and hashing.
+# With versionfinder importable (i.e. ``pip install -e .``), run:
+#     python benchmarks/bench_versioninfo.py
+
+import timeit
+
+from versionfinder.versioninfo import VersionInfo
+
+NUMBER = 100000
+
+KWARGS = {
+    'pip_version': '1.2.3',
+    'pip_url': 'https://github.com/someone/foo',
+    'pip_requirement': 'foo==1.2.3',
+    'pkg_resources_version': '1.2.3',
+    'pkg_resources_url': 'https://github.com/someone/foo',
+    'git_tag': None,
+    'git_commit': '76c7e51f6e83350c72a1d3e8122ee03e589bbfde',
+    'git_remotes': {
+        'upstream': 'https://github.com/someone/foo.git',
+        'fork': 'git@github.com:me/foo.git',
+    },
+    'git_is_dirty': True
+}
+
+
+def per_call_ns(stmt, ns):
+    """Return the best-of-5 cost of ``stmt`` in nanoseconds."""
+    t = min(timeit.repeat(stmt, globals=ns, number=NUMBER, repeat=5))
+    return t / NUMBER * 1e9
+
+
+def main():
+    v = VersionInfo(**KWARGS)
+    ns = {'v': v, 'w': VersionInfo(**KWARGS), 'VersionInfo': VersionInfo,
+          'kw': KWARGS}
+    construct = per_call_ns('VersionInfo(**kw)', ns)
+    print('VersionInfo construction: %.1f ns' % construct)
+    print('%-12s %12s %14s' % ('attribute', 'cached (ns)', 'first (ns)'))
+    for attr in ['git_remote', 'git_str', 'short_str', 'long_str',
+                 'long_bytes']:
+        # first access on a fresh object computes the value; subtract the
+        # cost of constructing that object
+        first = per_call_ns('VersionInfo(**kw).%s' % attr, ns) - construct
+        print('%-12s %12.1f %14.1f' % (
+            attr, per_call_ns('v.%s' % attr, ns), first))
+    print('v == w (equal values): %.1f ns' % per_call_ns('v == w', ns))
+    print('hash(v): %.1f ns' % per_call_ns('hash(v)', ns))
+
+
+if __name__ == '__main__':
+    main()
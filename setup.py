@@ -64,6 +64,14 @@ setup(
                 'whether installed via pip, setuptools or git.',
     long_description=long_description,
     install_requires=['GitPython~=3.1'],
+    extras_require={
+        'prometheus': ['prometheus_client'],
+    },
+    entry_points={
+        'console_scripts': [
+            'versionfinder = versionfinder.cli:main',
+        ],
+    },
     keywords="version git pip pkg_resources setuptools",
     classifiers=classifiers
 )
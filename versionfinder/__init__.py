@@ -35,8 +35,12 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ##################################################################################
 """
 
+import os
 import inspect
-from .versionfinder import VersionFinder
+from .versionfinder import VersionFinder, _select_fields
+from .versioninfo import VersionInfo
+from .environment import Environment
+from .manifest import find_manifest_version
 
 
 def find_version(*args, **kwargs):
@@ -46,7 +50,8 @@ def find_version(*args, **kwargs):
     kwargs to VersionFinder constructor, return the value of its
     ``find_package_version`` method.
 
-    :param package_name: name of the package to find information about
+    :param package_name: name of the package to find information about; if
+      not specified, the distribution that owns ``package_file`` is used
     :type package_name: str
     :param package_file: absolute path to a Python source file in the
       package to find information about; if not specified, the file calling
@@ -57,9 +62,94 @@ def find_version(*args, **kwargs):
       log output. If set to True, you will see a LOT of debug-level log
       output, for debugging the internals of versionfinder.
     :type log: bool
+    :param manifest: path to a manifest written by
+      :py:func:`~versionfinder.manifest.write_manifest`; if the package is
+      found in it, the recorded information is returned without inspecting
+      the environment, reduced to ``fields`` if given; ``lazy_git``,
+      ``concurrent`` and ``timeout`` have no effect then. Defaults to the
+      value of the ``VERSIONFINDER_MANIFEST`` environment variable, if set.
+    :type manifest: str
+    :param fields: names of the VersionInfo attributes the caller needs (i.e.
+      ``{'version'}``); stages that cannot contribute to them are skipped.
+      See :py:meth:`~.VersionFinder.find_package_version`.
+    :type fields: iterable
+    :param lazy_git: if True, return a
+      :py:class:`~versionfinder.versioninfo.LazyVersionInfo` whose git fields
+      are found on first access instead of now.
+    :type lazy_git: bool
+    :param concurrent: if True, run the pip, pkg_resources and git lookups
+      concurrently; see :py:meth:`~.VersionFinder.find_package_version`.
+    :type concurrent: bool
+    :param timeout: if not None, return after at most this many seconds
+      with whatever was found by then; see
+      :py:meth:`~.VersionFinder.find_package_version`.
+    :type timeout: float
     :returns: information about the installed version of the package
     :rtype: :py:class:`~versionfinder.versioninfo.VersionInfo`
     """
+    manifest = kwargs.pop('manifest', os.environ.get('VERSIONFINDER_MANIFEST'))
+    options = {}
+    for k in ('fields', 'lazy_git', 'concurrent', 'timeout'):
+        if k in kwargs:
+            options[k] = kwargs.pop(k)
+    name = args[0] if args else kwargs.get('package_name')
+    if manifest and name is not None:
+        res = find_manifest_version(manifest, name)
+        if res is not None:
+            return _select_fields(res, options.get('fields'))
     if 'caller_frame' not in kwargs:
         kwargs['caller_frame'] = inspect.stack()[1][0]
-    return VersionFinder(*args, **kwargs).find_package_version()
+    return VersionFinder(*args, **kwargs).find_package_version(**options)
+
+
+def iter_versions(path=None, git=False, log=False, metadata=True):
+    """
+    Lazily find version information for every distribution installed on
+    ``path`` (by default ``sys.path``), yielding each result as soon as it is
+    found. Path entries are listed one at a time with :py:func:`os.scandir`,
+    and nothing is retained for distributions already yielded, so the first
+    result is available immediately and memory use does not grow with the
+    size of the environment.
+
+    Versions and Home-page URLs are read directly from each distribution's
+    metadata (as pkg_resources does), and are returned as the
+    ``pkg_resources_version`` and ``pkg_resources_url`` of the result; pip is
+    not used.
+
+    :param path: list of directories to scan, in order of precedence;
+      defaults to ``sys.path``
+    :type path: list
+    :param git: if True, also find git information for each distribution
+      whose code is in a git clone (i.e. develop or editable installs);
+      each clone is inspected once, however many distributions are in it
+    :type git: bool
+    :param log: passed through to :py:class:`~.VersionFinder` when finding
+      git information
+    :type log: bool
+    :param metadata: if False, do not open any metadata files: distribution
+      names are returned in PEP 503 normalized form, versions are taken from
+      the names of the ``.dist-info``/``.egg-info`` directories (falling back
+      to the metadata only for develop installs, whose directory names carry
+      no version), and no URLs are returned. This lists the whole environment
+      with one :py:func:`os.scandir` per path entry.
+    :type metadata: bool
+    :returns: generator of ``(distribution name, VersionInfo)`` 2-tuples
+    :rtype: generator
+    """
+    env = Environment(path=path)
+    for dist in env.iter_distributions(record=False):
+        if not metadata:
+            res = {'pkg_resources_version': dist.version}
+            name = dist.key
+        else:
+            res = {
+                'pkg_resources_version': dist.version,
+                'pkg_resources_url': dist.home_page
+            }
+            name = dist.name
+        if git:
+            res.update(VersionFinder(
+                name, package_file=dist.metadata_file, log=log,
+                environment=env, distribution=dist
+            )._git_version_info())
+        yield name, VersionInfo(**res)
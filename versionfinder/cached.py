@@ -0,0 +1,157 @@
+"""
+versionfinder/cached.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import inspect
+import logging
+import threading
+
+from .versionfinder import VersionFinder
+from .versioninfo import VersionInfo
+
+logger = logging.getLogger(__name__)
+
+
+class CachedVersion(object):
+    """
+    Version information for a package, found once (by default in a
+    background thread) and then kept for the life of the process. This is the
+    building block for the middleware, metrics and logging integrations,
+    which need the result on hot paths but must never call
+    :py:func:`versionfinder.find_version` there.
+    """
+
+    def __init__(self, package_name, background=True, **kwargs):
+        """
+        Start finding version information for the named package.
+
+        :param package_name: name of the package to find information about
+        :type package_name: str
+        :param background: if True, find the version information in a daemon
+          thread and return immediately; otherwise find it before returning
+        :type background: bool
+        :param kwargs: other keyword arguments for
+          :py:class:`~versionfinder.versionfinder.VersionFinder`. If neither
+          ``package_file`` nor ``caller_frame`` is given, the file that
+          constructed this object is used.
+        """
+        if 'package_file' not in kwargs and 'caller_frame' not in kwargs:
+            kwargs['caller_frame'] = inspect.stack()[1][0]
+        self.package_name = package_name
+        self._kwargs = kwargs
+        self._info = None
+        self._callbacks = []
+        # held while calling callbacks, so they see results in order
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(
+                target=self.refresh, name='versionfinder-%s' % package_name
+            )
+            self._thread.daemon = True
+            self._thread.start()
+        else:
+            self.refresh()
+
+    def refresh(self):
+        """
+        Find the version information (again) and store it. If the result
+        differs from the stored one, callbacks registered with
+        :py:meth:`~.add_callback` are called with the new result. This never
+        raises; if finding the version fails, an empty
+        :py:class:`~versionfinder.versioninfo.VersionInfo` is stored.
+
+        :return: the new version information
+        :rtype: :py:class:`~versionfinder.versioninfo.VersionInfo`
+        """
+        try:
+            info = VersionFinder(
+                self.package_name, **self._kwargs
+            ).find_package_version()
+        except Exception:
+            logger.debug('Exception finding version of %s',
+                         self.package_name, exc_info=True)
+            info = VersionInfo()
+        with self._lock:
+            if info != self._info:
+                self._info = info
+                for cb in self._callbacks:
+                    cb(info)
+        self._ready.set()
+        return info
+
+    @property
+    def ready(self):
+        """
+        Whether version information has been found yet.
+
+        :rtype: bool
+        """
+        return self._ready.is_set()
+
+    def get(self, timeout=None):
+        """
+        Return the version information, waiting up to ``timeout`` seconds for
+        it to be found if it has not been yet.
+
+        :param timeout: seconds to wait; None to wait indefinitely, 0 to not
+          wait at all
+        :type timeout: float
+        :return: version information, or None if it was not found in time
+        :rtype: :py:class:`~versionfinder.versioninfo.VersionInfo` or
+          :py:data:`None`
+        """
+        if self._info is None:
+            self._ready.wait(timeout)
+        return self._info
+
+    def add_callback(self, func):
+        """
+        Call ``func`` with the version information whenever a new (changed)
+        result is found. If a result has already been found, ``func`` is
+        called with it immediately.
+
+        :param func: callable taking one
+          :py:class:`~versionfinder.versioninfo.VersionInfo` argument
+        :type func: callable
+        """
+        with self._lock:
+            self._callbacks.append(func)
+            if self._info is not None:
+                func(self._info)
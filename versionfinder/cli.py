@@ -0,0 +1,159 @@
+"""
+versionfinder/cli.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+
+from .environment import Environment, normalize_name
+from .manifest import find_manifest_version, write_manifest
+from .versionfinder import VersionFinder
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv):
+    """
+    Parse command line arguments.
+
+    :param argv: command line arguments, not including the program name
+    :type argv: list
+    :return: parsed arguments
+    :rtype: :py:class:`argparse.Namespace`
+    """
+    p = argparse.ArgumentParser(
+        prog='versionfinder',
+        description='Find the version and source of installed Python '
+                    'distributions. One JSON object is written to STDOUT per '
+                    'distribution, as each is resolved.'
+    )
+    p.add_argument('names', nargs='*', metavar='NAME',
+                   help='name of a distribution to find')
+    p.add_argument('-a', '--all', dest='all', action='store_true',
+                   default=False,
+                   help='find every distribution installed in the '
+                        'environment')
+    p.add_argument('-m', '--manifest', dest='manifest', action='store',
+                   default=os.environ.get('VERSIONFINDER_MANIFEST'),
+                   help='answer from this versionfinder manifest when '
+                        'possible (default: $VERSIONFINDER_MANIFEST)')
+    p.add_argument('-w', '--write-manifest', dest='write_manifest',
+                   action='store', metavar='PATH',
+                   help='also write the results to a manifest at PATH')
+    p.add_argument('-v', '--verbose', dest='verbose', action='store_true',
+                   default=False,
+                   help='log the internals of versionfinder to STDERR')
+    args = p.parse_args(argv)
+    if len(args.names) == 0 and not args.all:
+        p.error('specify one or more NAMEs, or --all')
+    return args
+
+
+def resolve(names, environment, manifest=None, log=False):
+    """
+    Find version information for each of ``names``, using one shared
+    :py:class:`~versionfinder.environment.Environment` scan.
+
+    :param names: distribution names to find
+    :type names: iterable
+    :param environment: shared environment scan
+    :type environment: :py:class:`~versionfinder.environment.Environment`
+    :param manifest: path to a versionfinder manifest to check first
+    :type manifest: str
+    :param log: passed through to :py:class:`~versionfinder.VersionFinder`
+    :type log: bool
+    :return: generator of ``(name, VersionInfo)`` 2-tuples; the VersionInfo
+      is None for distributions that are not installed
+    :rtype: generator
+    """
+    for name in names:
+        if manifest:
+            info = find_manifest_version(manifest, name)
+            if info is not None:
+                yield name, info
+                continue
+        dist = environment.get_distribution(name)
+        if dist is None:
+            logger.debug('Distribution not found: %s', name)
+            yield name, None
+            continue
+        finder = VersionFinder(dist.name, package_file=dist.metadata_file,
+                               log=log, environment=environment)
+        yield name, finder.find_package_version()
+
+
+def main(argv=None):
+    """
+    Entry point for the ``versionfinder`` command.
+
+    :param argv: command line arguments, not including the program name;
+      defaults to ``sys.argv[1:]``
+    :type argv: list
+    :return: exit code; 1 if any distribution was not found, otherwise 0
+    :rtype: int
+    """
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.verbose:
+        logging.basicConfig(
+            level=logging.DEBUG, stream=sys.stderr,
+            format='%(asctime)s %(levelname)s:%(name)s:%(message)s'
+        )
+    env = Environment()
+    if args.all:
+        names = (d.name for d in env.iter_distributions())
+    else:
+        names = args.names
+    results = {}
+    missing = False
+    for name, info in resolve(names, env, manifest=args.manifest,
+                              log=args.verbose):
+        sys.stdout.write(json.dumps(
+            {'name': name, 'info': None if info is None else info.as_dict},
+            sort_keys=True
+        ) + '\n')
+        sys.stdout.flush()
+        if info is None:
+            missing = True
+        else:
+            results[normalize_name(name)] = (name, info)
+    if args.write_manifest:
+        write_manifest(args.write_manifest, results.values())
+    return 1 if missing else 0
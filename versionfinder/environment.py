@@ -0,0 +1,704 @@
+"""
+versionfinder/environment.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import re
+import sys
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def normalize_name(name):
+    """
+    Return the normalized form of a distribution name, per PEP 503 (runs of
+    ``-``, ``_`` and ``.`` collapsed to a single ``-``, and lower-cased).
+
+    :param name: distribution or package name
+    :type name: str
+    :return: normalized name
+    :rtype: str
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def default_environment():
+    """
+    Return the process-wide :py:class:`~.Environment` of ``sys.path``, used
+    wherever an Environment is needed but none was given. It is created on
+    first use, and the scans and indexes it builds are kept for the life of
+    the process.
+
+    :rtype: :py:class:`~.Environment`
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Environment()
+        return _default
+
+
+def _read_metadata_headers(path):
+    """
+    Read the headers (but not the long description body) of a ``METADATA`` or
+    ``PKG-INFO`` file. Header names are lower-cased; for headers that appear
+    more than once, only the first value is kept.
+
+    :param path: path to the metadata file
+    :type path: str
+    :return: header name to value
+    :rtype: dict
+    """
+    headers = {}
+    with open(path, encoding='utf-8', errors='replace') as fh:
+        for line in fh:
+            line = line.rstrip('\r\n')
+            if line == '':
+                break
+            if ':' not in line or line[0] in ' \t':
+                continue
+            k, v = line.split(':', 1)
+            k = k.lower()
+            if k not in headers:
+                headers[k] = v.strip()
+    return headers
+
+
+class Distribution(object):
+    """
+    An installed distribution, as found on disk by :py:class:`~.Environment`.
+    Metadata files are only read when an attribute that needs them is
+    accessed.
+    """
+
+    def __init__(self, key, location, metadata_path, metadata_file,
+                 package_dir=None):
+        """
+        :param key: normalized distribution name, as derived from the name of
+          the metadata directory
+        :type key: str
+        :param location: the ``sys.path`` entry the distribution was found in
+        :type location: str
+        :param metadata_path: path to the ``.dist-info`` or ``.egg-info``
+          directory (or file) for the distribution
+        :type metadata_path: str
+        :param metadata_file: path to the ``METADATA`` or ``PKG-INFO`` file
+        :type metadata_file: str
+        :param package_dir: for develop/editable installs, the source
+          directory the distribution is installed from
+        :type package_dir: str
+        """
+        self.key = key
+        self.location = location
+        self.metadata_path = metadata_path
+        self.metadata_file = metadata_file
+        self._develop = package_dir is not None
+        self._package_dir = package_dir
+        self._headers = None
+        self._direct_url = None
+
+    def __repr__(self):
+        return 'Distribution(%s, %s)' % (self.key, self.metadata_path)
+
+    @property
+    def headers(self):
+        """
+        Return the (lower-cased) headers of the distribution's metadata file,
+        or an empty dict if it cannot be read.
+
+        :rtype: dict
+        """
+        if self._headers is None:
+            try:
+                self._headers = _read_metadata_headers(self.metadata_file)
+            except Exception:
+                logger.debug('Unable to read metadata from %s',
+                             self.metadata_file, exc_info=True)
+                self._headers = {}
+        return self._headers
+
+    @property
+    def name(self):
+        """
+        Return the distribution's project name from its metadata, or the
+        normalized key if the metadata has no name.
+
+        :rtype: str
+        """
+        return self.headers.get('name', self.key)
+
+    @property
+    def version(self):
+        """
+        Return the distribution's version. For ``.dist-info`` and versioned
+        ``.egg-info`` metadata this is taken from the directory name (i.e.
+        ``foo_bar-1.2.3.dist-info``) without opening any file; otherwise it is
+        read from the metadata. Returns None if it cannot be found.
+
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        ver = self.dir_version
+        if ver is not None:
+            return ver
+        return self.headers.get('version')
+
+    @property
+    def dir_version(self):
+        """
+        Return the version encoded in the name of the distribution's
+        ``.dist-info`` or ``.egg-info`` metadata directory, or None if the
+        name does not include one (i.e. develop installs).
+
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        name = os.path.basename(self.metadata_path)
+        if name.endswith('.dist-info'):
+            parts = name[:-10].split('-')
+            if len(parts) == 2 and parts[1]:
+                return parts[1]
+        elif name.endswith('.egg-info'):
+            parts = name[:-9].split('-')
+            if len(parts) >= 2 and parts[1]:
+                return parts[1]
+        return None
+
+    @property
+    def home_page(self):
+        """
+        Return the distribution's "Home-page" metadata value, or None.
+
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        return self.headers.get('home-page')
+
+    @property
+    def package_dir(self):
+        """
+        Return the directory the distribution's code lives in: the source
+        directory for develop (``.egg-link``) and editable (``direct_url.json``)
+        installs, or otherwise the ``sys.path`` entry it was found in.
+
+        :rtype: str
+        """
+        if self._package_dir is None:
+            self._package_dir = self._editable_dir() or self.location
+        return self._package_dir
+
+    @property
+    def direct_url(self):
+        """
+        Return the parsed PEP 610 ``direct_url.json`` of the distribution, or
+        an empty dict if it has none.
+
+        :rtype: dict
+        """
+        if self._direct_url is None:
+            path = os.path.join(self.metadata_path, 'direct_url.json')
+            try:
+                with open(path, encoding='utf-8') as fh:
+                    self._direct_url = json.load(fh)
+            except (OSError, ValueError):
+                self._direct_url = {}
+        return self._direct_url
+
+    @property
+    def commit(self):
+        """
+        Return the VCS commit the distribution was installed from, as recorded
+        in ``direct_url.json``, or None.
+
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        return self.direct_url.get('vcs_info', {}).get('commit_id')
+
+    @property
+    def editable(self):
+        """
+        Whether the distribution's code is used in place from a source
+        directory (a develop install via ``.egg-link``, a PEP 660 editable
+        install, or an ``.egg``) rather than installed into its location.
+
+        :rtype: bool
+        """
+        return self._develop or self._editable_dir() is not None
+
+    def _editable_dir(self):
+        """
+        Return the source directory recorded in a PEP 610 ``direct_url.json``
+        for an editable install, or None.
+
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        data = self.direct_url
+        url = data.get('url', '')
+        if not data.get('dir_info', {}).get('editable') or \
+                not url.startswith('file://'):
+            return None
+        from urllib.request import url2pathname
+        from urllib.parse import urlparse
+        return url2pathname(urlparse(url).path)
+
+    def _installed_paths(self):
+        """
+        Return the absolute, normalized (but not case-normalized) paths of
+        the files listed in the distribution's ``RECORD`` or
+        ``installed-files.txt``, omitting compiled ``.pyc`` files.
+
+        :rtype: list
+        """
+        is_record = self.metadata_path.endswith('.dist-info')
+        if is_record:
+            path = os.path.join(self.metadata_path, 'RECORD')
+            base = self.location
+        else:
+            path = os.path.join(self.metadata_path, 'installed-files.txt')
+            base = self.metadata_path
+        try:
+            with open(path, encoding='utf-8', errors='replace') as fh:
+                lines = fh.read().splitlines()
+        except OSError:
+            return []
+        res = []
+        for line in lines:
+            if is_record:
+                # RECORD is CSV; paths containing commas are quoted
+                if line.startswith('"'):
+                    line = line[1:line.find('"', 1)]
+                else:
+                    line = line.split(',', 1)[0]
+            if line == '' or line.endswith('.pyc'):
+                continue
+            res.append(os.path.normpath(os.path.join(base, line)))
+        return res
+
+    def files(self):
+        """
+        Return the absolute, normalized paths of the files installed by the
+        distribution, from the ``RECORD`` file of a ``.dist-info`` directory
+        or the ``installed-files.txt`` of an ``.egg-info`` directory.
+        Compiled ``.pyc`` files are omitted. Returns an empty list if the
+        distribution has no list of installed files.
+
+        :rtype: list
+        """
+        return [os.path.normcase(p) for p in self._installed_paths()]
+
+    def top_level(self):
+        """
+        Return the top-level import names listed in the distribution's
+        ``top_level.txt``, or an empty list.
+
+        :rtype: list
+        """
+        path = os.path.join(self.metadata_path, 'top_level.txt')
+        try:
+            with open(path, encoding='utf-8', errors='replace') as fh:
+                lines = fh.read().splitlines()
+        except OSError:
+            return []
+        return [
+            x.strip().replace('/', '.') for x in lines if x.strip() != ''
+        ]
+
+    def import_names(self):
+        """
+        Return the set of dotted names of the packages and modules the
+        distribution installs, including every parent package (so a
+        distribution installing ``google/cloud/storage/blob.py`` into a
+        namespace package provides ``google``, ``google.cloud``,
+        ``google.cloud.storage`` and ``google.cloud.storage.blob``). Names
+        are derived from the installed files under the distribution's
+        location, plus those listed in ``top_level.txt``.
+
+        :rtype: set
+        """
+        names = set(self.top_level())
+        prefix = os.path.join(os.path.normpath(self.location), '')
+        for path in self._installed_paths():
+            if not path.startswith(prefix):
+                continue
+            parts = path[len(prefix):].split(os.sep)
+            fname = parts.pop()
+            if fname.endswith('.py'):
+                if fname != '__init__.py':
+                    parts.append(fname[:-3])
+            elif fname.endswith(('.so', '.pyd')):
+                parts.append(fname.split('.', 1)[0])
+            else:
+                continue
+            if not parts or not all(x.isidentifier() for x in parts):
+                continue
+            for i in range(1, len(parts) + 1):
+                names.add('.'.join(parts[:i]))
+        return names
+
+
+class Environment(object):
+    """
+    A lazily-built, shared scan of the distributions installed on a list of
+    paths (by default ``sys.path``), found by listing each path entry with
+    :py:func:`os.scandir`. Used to resolve many packages at once without
+    rescanning the environment for each one.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: list of directories to scan for distributions, in order
+          of precedence; defaults to ``sys.path``
+        :type path: list
+        """
+        self.path = list(sys.path if path is None else path)
+        self._dists = {}
+        #: distributions found so far, in path order
+        self._order = []
+        self._scan = None
+        self._scanned = False
+        self._memo = {}
+        self._memo_locks = {}
+        self._files = {}
+        self._prefixes = {}
+        self._lock = threading.RLock()
+
+    def _scan_entry(self, entry):
+        """
+        Yield a :py:class:`~.Distribution` for each distribution installed in
+        one path entry.
+
+        :param entry: ``sys.path`` entry
+        :type entry: str
+        """
+        entry = entry or os.curdir
+        if entry.endswith('.egg'):
+            info = os.path.join(entry, 'EGG-INFO')
+            if os.path.isdir(info):
+                key = normalize_name(os.path.basename(entry).split('-')[0])
+                yield Distribution(key, entry, info,
+                                   os.path.join(info, 'PKG-INFO'),
+                                   package_dir=entry)
+            return
+        try:
+            entries = sorted(
+                (e.name, e.path, e.is_dir()) for e in os.scandir(entry)
+                if e.name.endswith(('.dist-info', '.egg-info', '.egg-link'))
+            )
+        except OSError:
+            return
+        for name, path, is_dir in entries:
+            if name.endswith('.dist-info') and is_dir:
+                yield Distribution(
+                    normalize_name(name[:-10].split('-')[0]), entry, path,
+                    os.path.join(path, 'METADATA')
+                )
+            elif name.endswith('.egg-info'):
+                yield Distribution(
+                    normalize_name(name[:-9].split('-')[0]), entry, path,
+                    os.path.join(path, 'PKG-INFO') if is_dir else path
+                )
+            elif name.endswith('.egg-link'):
+                dist = self._egg_link(entry, path, normalize_name(name[:-9]))
+                if dist is not None:
+                    yield dist
+
+    def _egg_link(self, entry, path, key):
+        """
+        Return a :py:class:`~.Distribution` for a develop install's
+        ``.egg-link`` file, which points to the source directory containing
+        the ``.egg-info`` metadata.
+
+        :param entry: ``sys.path`` entry containing the link
+        :type entry: str
+        :param path: path to the ``.egg-link`` file
+        :type path: str
+        :param key: normalized distribution name
+        :type key: str
+        :rtype: :py:class:`~.Distribution` or :py:data:`None`
+        """
+        try:
+            with open(path, encoding='utf-8') as fh:
+                src = os.path.normpath(
+                    os.path.join(entry, fh.readline().strip())
+                )
+            infos = sorted(
+                e.path for e in os.scandir(src)
+                if e.name.endswith('.egg-info') and
+                normalize_name(e.name[:-9].split('-')[0]) == key
+            )
+        except OSError:
+            logger.debug('Unable to read egg-link %s', path, exc_info=True)
+            return None
+        if len(infos) == 0:
+            return None
+        return Distribution(key, src, infos[0],
+                            os.path.join(infos[0], 'PKG-INFO'),
+                            package_dir=src)
+
+    def _scan_all(self):
+        """
+        Generate every distribution in every path entry, in path order,
+        including those shadowed by an earlier path entry.
+        """
+        for entry in self.path:
+            for dist in self._scan_entry(entry):
+                yield dist
+
+    def _scan_next(self):
+        """
+        Advance the shared, recorded scan of the environment to the next
+        distinct distribution, record it, and return it. Path entries are
+        only listed as the scan reaches them.
+
+        :return: the next distribution, or None if the scan is complete
+        :rtype: :py:class:`~.Distribution` or :py:data:`None`
+        """
+        with self._lock:
+            if self._scanned:
+                return None
+            if self._scan is None:
+                self._scan = self._scan_all()
+            for dist in self._scan:
+                if dist.key not in self._dists:
+                    self._dists[dist.key] = dist
+                    self._order.append(dist)
+                    return dist
+            self._scanned = True
+            return None
+
+    def iter_distributions(self, record=True):
+        """
+        Lazily yield each distinct installed distribution, scanning one path
+        entry at a time. If a distribution is installed in more than one path
+        entry, only the first (the one that would be imported) is yielded.
+
+        :param record: if True, distributions found are recorded for later
+          :py:meth:`~.get_distribution` calls, and the scan is shared with
+          them (each path entry is listed once, however many iterators and
+          lookups use it). If False, only their names are kept (to skip
+          shadowed duplicates), so memory use stays small no matter how many
+          distributions are installed.
+        :type record: bool
+        :return: generator of distributions
+        :rtype: generator of :py:class:`~.Distribution`
+        """
+        if not record:
+            seen = set()
+            for dist in self._scan_all():
+                if dist.key in seen:
+                    continue
+                seen.add(dist.key)
+                yield dist
+            return
+        i = 0
+        while True:
+            if i < len(self._order):
+                yield self._order[i]
+                i += 1
+            elif self._scan_next() is None:
+                return
+
+    def get_distribution(self, name):
+        """
+        Return the installed distribution with the given name. The shared scan
+        of the environment only continues until the distribution is found;
+        only looking up a name that is not installed lists every path entry.
+
+        :param name: distribution name; compared after PEP 503 normalization
+        :type name: str
+        :rtype: :py:class:`~.Distribution` or :py:data:`None`
+        """
+        key = normalize_name(name)
+        while key not in self._dists:
+            if self._scan_next() is None:
+                break
+        return self._dists.get(key)
+
+    def memoize(self, key, func):
+        """
+        Return the result of calling ``func``, computing it only once for the
+        life of this Environment. This is used to share expensive results
+        that cover the whole environment (such as pip's list of installed
+        distributions) between everything using the Environment.
+
+        Concurrent callers for the same key wait for the first one to compute
+        the value; callers for other keys are not blocked by it.
+
+        :param key: cache key
+        :type key: str
+        :param func: zero-argument callable to compute the value
+        :type func: callable
+        :return: the (possibly cached) return value of ``func``
+        """
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+            lock = self._memo_locks.setdefault(key, threading.Lock())
+        with lock:
+            with self._lock:
+                if key in self._memo:
+                    return self._memo[key]
+            value = func()
+            with self._lock:
+                self._memo[key] = value
+                self._memo_locks.pop(key, None)
+            return value
+
+    def file_index(self):
+        """
+        Return a dict of the absolute, normalized path of every file
+        installed by a distribution in the environment (per
+        :py:meth:`Distribution.files`) to the :py:class:`~.Distribution` that
+        installed it. The index is built on first use, by a full scan, and
+        kept for the life of the Environment. If more than one distribution
+        claims a file, the first on the path wins.
+
+        The source directories of editable distributions (whose files are not
+        recorded) are indexed separately, and are matched by
+        :py:meth:`~.distribution_for_file` for any file beneath them.
+
+        :rtype: dict
+        """
+        return self.memoize('file_index', self._build_file_index)
+
+    def _build_file_index(self):
+        index = {}
+        prefixes = {}
+        for dist in self.iter_distributions():
+            for path in dist.files():
+                index.setdefault(path, dist)
+            if dist.editable:
+                prefixes.setdefault(
+                    os.path.normcase(os.path.normpath(dist.package_dir)), dist
+                )
+        self._prefixes = prefixes
+        return index
+
+    def _prefix_distribution(self, path):
+        """
+        Return the editable distribution whose source directory contains
+        ``path``, or None.
+
+        :param path: absolute, normalized path
+        :type path: str
+        :rtype: :py:class:`~.Distribution` or :py:data:`None`
+        """
+        if not self._prefixes:
+            return None
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+            if path in self._prefixes:
+                return self._prefixes[path]
+
+    def distribution_for_file(self, path):
+        """
+        Return the installed distribution that owns a file (such as a module's
+        ``__file__`` or a traceback frame's filename), or None. Files are
+        looked up in :py:meth:`~.file_index`, then (by their parent
+        directories) in the source directories of editable distributions.
+        Results, including misses, are cached per path, so repeated lookups
+        are a single dict lookup.
+
+        :param path: path to the file
+        :type path: str
+        :rtype: :py:class:`~.Distribution` or :py:data:`None`
+        """
+        try:
+            return self._files[path]
+        except KeyError:
+            pass
+        index = self.file_index()
+        norm = real = os.path.normcase(os.path.abspath(path))
+        dist = index.get(norm)
+        if dist is None:
+            real = os.path.normcase(os.path.realpath(norm))
+            dist = index.get(real)
+        if dist is None:
+            dist = self._prefix_distribution(norm)
+        if dist is None and real != norm:
+            dist = self._prefix_distribution(real)
+        self._files[path] = dist
+        return dist
+
+    def import_map(self):
+        """
+        Return a dict of every importable dotted package or module name
+        provided by an installed distribution (per
+        :py:meth:`Distribution.import_names`) to the list of
+        :py:class:`~.Distribution` objects providing it, in path order. A name
+        maps to more than one distribution when they share a namespace
+        package (i.e. ``google``) or a top-level name. The map is built on
+        first use, by a full scan, and kept for the life of the Environment.
+
+        :rtype: dict
+        """
+        return self.memoize('import_map', self._build_import_map)
+
+    def _build_import_map(self):
+        res = {}
+        for dist in self.iter_distributions():
+            for name in dist.import_names():
+                res.setdefault(name, []).append(dist)
+        return res
+
+    def distributions_for_import(self, name):
+        """
+        Return the distributions providing an import name, such as
+        ``__name__`` of a module (``yaml``, ``PIL.Image`` or
+        ``google.cloud.storage.blob``). If the full dotted name is not known,
+        its longest known parent package is used.
+
+        :param name: dotted import name
+        :type name: str
+        :return: list of distributions, in path order; empty if none provide
+          the name
+        :rtype: list
+        """
+        imap = self.import_map()
+        while True:
+            if name in imap:
+                return list(imap[name])
+            if '.' not in name:
+                return []
+            name = name.rsplit('.', 1)[0]
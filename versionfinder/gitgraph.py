@@ -0,0 +1,871 @@
+"""
+versionfinder/gitgraph.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import heapq
+import struct
+import logging
+import binascii
+
+from .gitobjects import (
+    ObjectStore, common_dir, parse_commit, peeled_tags, _mmap_file, _SHA_LEN
+)
+
+logger = logging.getLogger(__name__)
+
+#: generation number of commits that are not in the commit-graph; walks
+#: visit them before any commit that is
+GENERATION_INFINITY = 0xffffffff
+
+_GRAPH_SIGNATURE = b'CGPH'
+# signature, version, hash version, number of chunks, number of base graphs
+_GRAPH_HEADER = struct.Struct('>4sBBBB')
+_CHUNK_ENTRY = struct.Struct('>4sQ')
+# commit data entry after the tree name: first parent, second parent, and
+# 64 bits of topological level (30 bits) and commit time (34 bits)
+_COMMIT_DATA = struct.Struct('>IIII')
+_UINT32 = struct.Struct('>I')
+_NO_PARENT = 0x70000000
+_EXTRA_EDGES = 0x80000000
+
+#: how many tagged commits :py:func:`~.describe` considers, as for
+#: ``git describe --candidates``
+MAX_CANDIDATES = 10
+
+
+class _GraphFile(object):
+    """
+    One memory-mapped commit-graph file: either the whole commit-graph or
+    one layer of a commit-graph chain.
+    """
+
+    def __init__(self, path, start):
+        """
+        :param path: path to the file
+        :type path: str
+        :param start: position of this file's first commit in the chain
+        :type start: int
+        :raises: ValueError if the file is not a supported commit-graph
+        """
+        self.path = path
+        self.start = start
+        self._mm = mm = _mmap_file(path)
+        try:
+            sig, ver, hash_ver, chunks, _ = _GRAPH_HEADER.unpack_from(mm, 0)
+            if sig != _GRAPH_SIGNATURE or ver != 1 or hash_ver != 1:
+                raise ValueError('Unsupported commit-graph: %s' % path)
+            offsets = {}
+            pos = _GRAPH_HEADER.size
+            for _ in range(chunks):
+                cid, off = _CHUNK_ENTRY.unpack_from(mm, pos)
+                offsets[cid] = off
+                pos += _CHUNK_ENTRY.size
+            for cid in (b'OIDF', b'OIDL', b'CDAT'):
+                if cid not in offsets:
+                    raise ValueError('commit-graph %s has no %s chunk'
+                                     % (path, cid.decode('ascii')))
+        except (struct.error, ValueError):
+            mm.close()
+            raise ValueError('Unsupported commit-graph: %s' % path)
+        self._fanout = offsets[b'OIDF']
+        self._names = offsets[b'OIDL']
+        self._data = offsets[b'CDAT']
+        self._edges = offsets.get(b'EDGE')
+        self.count = _UINT32.unpack_from(mm, self._fanout + 255 * 4)[0]
+
+    def find(self, sha):
+        """
+        Return the index in this file of the commit with binary name ``sha``,
+        or None.
+        """
+        mm = self._mm
+        first = sha[0]
+        lo = _UINT32.unpack_from(mm, self._fanout + (first - 1) * 4)[0] \
+            if first else 0
+        hi = _UINT32.unpack_from(mm, self._fanout + first * 4)[0]
+        names = self._names
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = names + mid * _SHA_LEN
+            name = mm[pos:pos + _SHA_LEN]
+            if name < sha:
+                lo = mid + 1
+            elif name > sha:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def name(self, i):
+        pos = self._names + i * _SHA_LEN
+        return self._mm[pos:pos + _SHA_LEN]
+
+    def commit(self, i):
+        """
+        Return the first parent, second parent (either of which may be
+        ``_NO_PARENT``, and the second may point into the extra edges) and
+        the generation and time word of entry ``i``.
+        """
+        return _COMMIT_DATA.unpack_from(
+            self._mm, self._data + i * (_SHA_LEN + 16) + _SHA_LEN
+        )
+
+    def extra_parents(self, i):
+        """
+        Return the parents listed in the extra edges chunk from index ``i``.
+        """
+        res = []
+        if self._edges is None:
+            return res
+        while True:
+            v = _UINT32.unpack_from(self._mm, self._edges + i * 4)[0]
+            res.append(v & 0x7fffffff)
+            if v & _EXTRA_EDGES:
+                return res
+            i += 1
+
+    def close(self):
+        self._mm.close()
+
+
+class CommitGraph(object):
+    """
+    A repository's commit-graph (``objects/info/commit-graph``, or the chain
+    of files listed in ``objects/info/commit-graphs/commit-graph-chain``),
+    which git writes during ``git gc`` and (with
+    ``fetch.writeCommitGraph``) ``git fetch``. It holds the parents, commit
+    time and generation number (the length of the longest path to a root
+    commit) of every commit it covers, indexed by position, so that history
+    can be walked without reading or decompressing any commit objects.
+
+    Commits are identified by their position in the graph (an int).
+    """
+
+    def __init__(self, paths):
+        """
+        :param paths: paths of the commit-graph files, base first
+        :type paths: list
+        :raises: ValueError if any file is not a supported commit-graph, or
+          OSError if one cannot be read
+        """
+        self._files = []
+        start = 0
+        try:
+            for path in paths:
+                f = _GraphFile(path, start)
+                self._files.append(f)
+                start += f.count
+        except (OSError, ValueError):
+            self.close()
+            raise
+        #: number of commits in the graph
+        self.count = start
+
+    def _file(self, pos):
+        for f in reversed(self._files):
+            if pos >= f.start:
+                return f
+        raise IndexError(pos)
+
+    def find(self, sha):
+        """
+        Return the position of the commit with binary name ``sha``, or None
+        if it is not in the graph.
+
+        :param sha: binary commit name
+        :type sha: bytes
+        :rtype: int
+        """
+        for f in self._files:
+            i = f.find(sha)
+            if i is not None:
+                return f.start + i
+        return None
+
+    def hexsha(self, pos):
+        """
+        Return the hex name of the commit at ``pos``.
+
+        :param pos: commit position
+        :type pos: int
+        :rtype: str
+        """
+        f = self._file(pos)
+        return binascii.hexlify(f.name(pos - f.start)).decode('ascii')
+
+    def commit(self, pos):
+        """
+        Return the generation number, commit time and parent positions of
+        the commit at ``pos``. Graphs written by git before 2.18 have no
+        generation numbers; for those it is :py:data:`~.GENERATION_INFINITY`.
+
+        :param pos: commit position
+        :type pos: int
+        :returns: 3-tuple of (generation, commit time, list of parent
+          positions)
+        :rtype: tuple
+        """
+        f = self._file(pos)
+        p1, p2, hi, lo = f.commit(pos - f.start)
+        generation = hi >> 2
+        if generation == 0:
+            generation = GENERATION_INFINITY
+        parents = []
+        if p1 != _NO_PARENT:
+            parents.append(p1)
+            if p2 & _EXTRA_EDGES:
+                parents.extend(f.extra_parents(p2 & 0x7fffffff))
+            elif p2 != _NO_PARENT:
+                parents.append(p2)
+        return generation, ((hi & 3) << 32) | lo, parents
+
+    def close(self):
+        """
+        Close the memory-mapped files.
+        """
+        for f in self._files:
+            f.close()
+        self._files = []
+
+
+def load_commit_graph(gitdir):
+    """
+    Open the commit-graph of a repository, if it has one. As git does, a
+    single ``commit-graph`` file is used in preference to a chain.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :returns: the commit-graph, or None if the repository has none or it
+      cannot be read
+    :rtype: :py:class:`~.CommitGraph`
+    """
+    info = os.path.join(common_dir(gitdir), 'objects', 'info')
+    single = os.path.join(info, 'commit-graph')
+    if os.path.isfile(single):
+        paths = [single]
+    else:
+        graphs = os.path.join(info, 'commit-graphs')
+        try:
+            with open(os.path.join(graphs, 'commit-graph-chain')) as fh:
+                hashes = [line.strip() for line in fh if line.strip()]
+        except (OSError, UnicodeDecodeError):
+            return None
+        paths = [os.path.join(graphs, 'graph-%s.graph' % h) for h in hashes]
+    try:
+        return CommitGraph(paths)
+    except (OSError, ValueError):
+        logger.debug('Cannot read commit-graph in %s', info, exc_info=True)
+        return None
+
+
+class CommitIndex(object):
+    """
+    Parents, generation numbers and commit times of a repository's commits,
+    for walking its history. Commits in the
+    :py:class:`~.CommitGraph` are read from it, and identified by their
+    position (an int); commits that are not (i.e. made since the graph was
+    last written, or every commit if there is no graph) are read from the
+    object store, and identified by their hex name.
+    """
+
+    def __init__(self, gitdir, store=None):
+        """
+        :param gitdir: git directory
+        :type gitdir: str
+        :param store: object store to read commits from; created if needed
+        :type store: :py:class:`~versionfinder.gitobjects.ObjectStore`
+        """
+        self.gitdir = gitdir
+        self.store = store if store is not None else ObjectStore(gitdir)
+        self.graph = load_commit_graph(gitdir)
+        self._loose = {}
+
+    def key(self, hexsha):
+        """
+        Return the key identifying a commit: its commit-graph position if it
+        is in the graph, or else ``hexsha``.
+
+        :param hexsha: hex commit name
+        :type hexsha: str
+        """
+        if self.graph is not None:
+            pos = self.graph.find(binascii.unhexlify(hexsha))
+            if pos is not None:
+                return pos
+        return hexsha
+
+    def hexsha(self, key):
+        """
+        Return the hex name of the commit identified by ``key``.
+
+        :rtype: str
+        """
+        if isinstance(key, int):
+            return self.graph.hexsha(key)
+        return key
+
+    def commit(self, key):
+        """
+        Return the generation number, commit time and parent keys of a
+        commit.
+
+        :param key: commit key, from :py:meth:`~.key`
+        :returns: 3-tuple of (generation, commit time, list of parent keys)
+        :rtype: tuple
+        :raises: KeyError if the commit does not exist (i.e. beyond the
+          boundary of a shallow clone)
+        """
+        if isinstance(key, int):
+            return self.graph.commit(key)
+        res = self._loose.get(key)
+        if res is None:
+            typ, data = self.store.read(key)
+            if typ != 'commit':
+                raise KeyError(key)
+            c = parse_commit(data)
+            res = (
+                GENERATION_INFINITY, c['commit_time'] or 0,
+                [self.key(p) for p in c['parents']]
+            )
+            self._loose[key] = res
+        return res
+
+    def close(self):
+        """
+        Close the commit-graph.
+        """
+        if self.graph is not None:
+            self.graph.close()
+            self.graph = None
+
+
+class _Walk(object):
+    """
+    Queue of commits to visit, newest first: by generation number, then
+    commit time. When generation numbers are known, every commit is visited
+    after all of its descendants that are in the walk; otherwise (as for
+    git itself) commit times are trusted to order them.
+    """
+
+    def __init__(self, commits):
+        self.commits = commits
+        self._heap = []
+        self._seq = 0
+        #: False once a commit without a generation number has been
+        #: visited, after which commits may not have been visited after all
+        #: of their descendants
+        self.ordered = True
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, key):
+        """
+        Queue a commit, returning False if it does not exist.
+        """
+        try:
+            generation, when, parents = self.commits.commit(key)
+        except KeyError:
+            logger.debug('Commit %s not found (shallow clone?)', key)
+            return False
+        self._seq += 1
+        heapq.heappush(
+            self._heap, (-generation, -when, self._seq, key, parents)
+        )
+        return True
+
+    def pop(self):
+        """
+        Return the key and parent keys of the next commit.
+
+        :rtype: tuple
+        """
+        item = heapq.heappop(self._heap)
+        if item[0] == -GENERATION_INFINITY:
+            self.ordered = False
+        return item[3], item[4]
+
+
+def describe(gitdir, hexsha, store=None, max_candidates=MAX_CANDIDATES):
+    """
+    Find the nearest tag (lightweight or annotated) reachable from a commit
+    and the number of commits since it, for a ``git describe --tags`` style
+    description: history is walked from ``hexsha`` until ``max_candidates``
+    tagged commits have been found, and the tag chosen is the one with the
+    fewest commits reachable from ``hexsha`` but not from the tag (the
+    earliest found, if several have as few). If there are several tags on
+    that commit, the greatest name is used, as for the ``git_tag`` field.
+
+    The number of commits is always the one
+    ``git rev-list --count <tag>..<hexsha>`` gives. ``git describe`` itself
+    counts while walking history in commit time order, so where committers'
+    clocks were skewed it can report a different count, and so choose a
+    different tag.
+
+    With a commit-graph, the walk visits commits in generation-number order,
+    which makes the counts exact, and stops as soon as no tag that has not
+    been found yet could be nearer than the nearest one found so far.
+    Without one (or for commits made since it was written), commits are
+    visited in commit time order, which is wrong where the committers'
+    clocks were skewed, so each tag found is counted again by walking
+    history as ``git rev-list`` does.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param hexsha: hex commit name
+    :type hexsha: str
+    :param store: object store; created if needed
+    :type store: :py:class:`~versionfinder.gitobjects.ObjectStore`
+    :param max_candidates: how many tagged commits to consider
+    :type max_candidates: int
+    :returns: 2-tuple of (tag name, number of commits since the tag), or
+      None if no tag is reachable
+    :rtype: tuple
+    :raises: ValueError if ``gitdir`` is not a git directory
+    """
+    commits = CommitIndex(gitdir, store)
+    try:
+        return _describe(commits, hexsha, max_candidates)
+    finally:
+        commits.close()
+
+
+def _describe(commits, hexsha, max_candidates):
+    """
+    Implementation of :py:func:`~.describe`.
+    """
+    tags = {}
+    for commit, names in peeled_tags(commits.gitdir, commits.store).items():
+        tags[commits.key(commit)] = names[-1]
+    if not tags:
+        return None
+    start = commits.key(hexsha)
+    if start in tags:
+        return tags[start], 0
+    walk = _Walk(commits)
+    if not walk.push(start):
+        return None
+    # bit i of a commit's flags is set if it is reachable from candidate i
+    flags = {start: 0}
+    queued = set([start])
+    # candidates as [tag name, flag bit, commits since the tag, tag commit]
+    candidates = []
+    all_bits = 0
+    # number of queued commits not reachable from every candidate, which
+    # could still add to a candidate's count
+    incomplete = 0
+    seen = 0
+    while walk:
+        key, parents = walk.pop()
+        queued.discard(key)
+        f = flags[key]
+        if f != all_bits:
+            incomplete -= 1
+        for c in candidates:
+            if not f & c[1]:
+                c[2] += 1
+        if key in tags and len(candidates) < max_candidates:
+            bit = 1 << len(candidates)
+            # every commit visited so far is a descendant of, or unrelated
+            # to, this one
+            candidates.append([tags[key], bit, seen, key])
+            all_bits |= bit
+            f |= bit
+            incomplete = len(walk)
+        seen += 1
+        for p in parents:
+            if p in flags:
+                old = flags[p]
+                new = flags[p] = old | f
+                if p in queued and old != all_bits and new == all_bits:
+                    incomplete -= 1
+            elif walk.push(p):
+                flags[p] = f
+                queued.add(p)
+                if f != all_bits:
+                    incomplete += 1
+        if candidates and incomplete == 0:
+            # the counts are final, and a tag found from here on would be at
+            # least ``seen`` commits away
+            if len(candidates) == max_candidates or \
+                    seen >= min(c[2] for c in candidates):
+                break
+    if not candidates:
+        return None
+    if not walk.ordered:
+        # commits may have been counted before all of their descendants
+        # were visited, while their flags were incomplete
+        for c in candidates:
+            c[2] = _rev_list_count(commits, [start], [c[3]])[1]
+    best = min(candidates, key=lambda c: c[2])
+    return best[0], best[2]
+
+
+def ahead_behind(gitdir, local, upstream, store=None):
+    """
+    Count the commits reachable from ``local`` but not ``upstream`` (ahead)
+    and from ``upstream`` but not ``local`` (behind), as
+    ``git rev-list --left-right --count local...upstream`` does.
+
+    When both commits are in the commit-graph, history is walked from both
+    at once in generation-number order, marking each commit with which of
+    the two it is reachable from, so each is visited after all of its
+    descendants and the walk stops at the merge bases, once every queued
+    commit is reachable from both. Otherwise commits can only be ordered by
+    commit time, which is wrong where the committers' clocks were skewed, so
+    git is followed step by step instead: the merge bases are found as by
+    git's ``paint_down_to_common()``, and the commits counted as by its
+    ``limit_list()``, which gives up :py:data:`~.SLOP` commits after the
+    last one that could still be counted. The counts are then the same as
+    git's, even where git's are wrong.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param local: hex name of the local commit
+    :type local: str
+    :param upstream: hex name of the upstream commit
+    :type upstream: str
+    :param store: object store; created if needed
+    :type store: :py:class:`~versionfinder.gitobjects.ObjectStore`
+    :returns: 2-tuple of (ahead, behind)
+    :rtype: tuple
+    :raises: KeyError if either commit does not exist
+    """
+    commits = CommitIndex(gitdir, store)
+    try:
+        return _ahead_behind(commits, local, upstream)
+    finally:
+        commits.close()
+
+
+#: number of commits git's ``limit_list()`` (and so
+#: :py:func:`~.ahead_behind` and :py:func:`~.describe`, without generation
+#: numbers) walks after the last commit that could still be counted, as for
+#: git's ``SLOP``
+SLOP = 5
+
+# _ahead_behind() flags
+_LOCAL = 1
+_UPSTREAM = 2
+_BOTH = _LOCAL | _UPSTREAM
+
+
+def _ahead_behind(commits, local, upstream):
+    """
+    Implementation of :py:func:`~.ahead_behind`.
+    """
+    if local == upstream:
+        return 0, 0
+    keys = []
+    in_graph = True
+    for sha in (local, upstream):
+        key = commits.key(sha)
+        try:
+            generation = commits.commit(key)[0]
+        except KeyError:
+            raise KeyError(sha)
+        keys.append(key)
+        in_graph = in_graph and generation != GENERATION_INFINITY
+    if not in_graph:
+        bases, parsed = _merge_bases(commits, keys[0], keys[1])
+        return _rev_list_count(
+            commits, keys, bases, left=keys[0], parsed=parsed
+        )
+    walk = _Walk(commits)
+    flags = {}
+    # number of queued commits not reachable from both
+    interesting = 0
+    for key, flag in zip(keys, (_LOCAL, _UPSTREAM)):
+        walk.push(key)
+        flags[key] = flag
+        interesting += 1
+    while interesting:
+        key, parents = walk.pop()
+        f = flags[key]
+        if f != _BOTH:
+            interesting -= 1
+        for p in parents:
+            # every parent seen before is still queued, as it has a lower
+            # generation number than this commit
+            old = flags.get(p)
+            if old is None:
+                if walk.push(p):
+                    flags[p] = f
+                    if f != _BOTH:
+                        interesting += 1
+                continue
+            flags[p] = old | f
+            if old != _BOTH and flags[p] == _BOTH:
+                interesting -= 1
+    ahead = behind = 0
+    for f in flags.values():
+        if f == _LOCAL:
+            ahead += 1
+        elif f == _UPSTREAM:
+            behind += 1
+    return ahead, behind
+
+
+# _paint_down_to_common() flags
+_PARENT1 = 1
+_PARENT2 = 2
+_STALE = 4
+
+
+def _paint_down_to_common(commits, one, twos):
+    """
+    Follow git's ``paint_down_to_common()``: walk history from ``one`` and
+    ``twos``, newest first, marking each commit with which side it is
+    reachable from, and marking the ancestors of commits reachable from both
+    as stale, until every queued commit is stale.
+
+    :param one: commit key
+    :param twos: list of commit keys
+    :returns: 2-tuple of the flags of every commit reached, and the keys of
+      the commits found to be reachable from both sides
+    :rtype: tuple
+    """
+    flags = {}
+    heap = []
+    # number of queue entries (a commit can be queued more than once) per
+    # commit, and of those for commits that are not stale
+    entries = {}
+    nonstale = [0]
+    seq = [0]
+
+    def push(key, f):
+        try:
+            generation, when = commits.commit(key)[:2]
+        except KeyError:
+            logger.debug('Commit %s not found (shallow clone?)', key)
+            return
+        old = flags.get(key, 0)
+        flags[key] = old | f
+        if not old & _STALE and f & _STALE:
+            nonstale[0] -= entries.get(key, 0)
+        entries[key] = entries.get(key, 0) + 1
+        if not flags[key] & _STALE:
+            nonstale[0] += 1
+        seq[0] += 1
+        heapq.heappush(heap, (-generation, -when, seq[0], key))
+
+    push(one, _PARENT1)
+    for key in twos:
+        push(key, _PARENT2)
+    result = []
+    while nonstale[0]:
+        key = heapq.heappop(heap)[3]
+        entries[key] -= 1
+        f = flags[key]
+        if not f & _STALE:
+            nonstale[0] -= 1
+        if f == _PARENT1 | _PARENT2:
+            if key not in result:
+                result.append(key)
+            f |= _STALE
+        for p in commits.commit(key)[2]:
+            if flags.get(p, 0) & f != f:
+                push(p, f)
+    return flags, result
+
+
+def _merge_bases(commits, one, two):
+    """
+    Find the merge bases of two commits as git's ``get_merge_bases()`` does.
+
+    :returns: 2-tuple of the list of the keys of the merge bases, and the
+      set of the keys of every commit read to find them
+    :rtype: tuple
+    """
+    flags, result = _paint_down_to_common(commits, one, [two])
+    parsed = set(flags)
+    bases = [key for key in result if not flags[key] & _STALE]
+    # git's remove_redundant(): drop bases reachable from another
+    redundant = set()
+    for key in bases if len(bases) > 1 else ():
+        if key in redundant:
+            continue
+        others = [k for k in bases if k != key and k not in redundant]
+        flags = _paint_down_to_common(commits, key, others)[0]
+        parsed.update(flags)
+        if flags[key] & _PARENT2:
+            redundant.add(key)
+        redundant.update(k for k in others if flags[k] & _PARENT1)
+    return [key for key in bases if key not in redundant], parsed
+
+
+def _rev_list_count(commits, include, exclude, left=None, parsed=()):
+    """
+    Count the commits reachable from any of ``include`` but none of
+    ``exclude`` as ``git rev-list --left-right --count`` does. As in git's
+    ``limit_list()``, history is walked in commit time order (generation
+    numbers are not used), the ancestors of ``exclude`` are marked as they
+    are found, and the walk stops once every queued commit is one of them
+    and older than the last commit counted, and :py:data:`~.SLOP` commits
+    after that. Where committers' clocks were skewed, this can count commits
+    that are reachable from ``exclude``, just as git does.
+
+    :param include: keys of the commits to count from
+    :type include: list
+    :param exclude: keys of the commits whose ancestors are not counted
+    :type exclude: list
+    :param left: key of one of ``include`` whose commits are counted
+      separately, as the left side of a symmetric difference
+    :param parsed: keys of commits that git would already have read (i.e.
+      to find the merge bases), whose parents it marks along with them
+    :returns: 2-tuple of (number of commits reachable from ``left``, number
+      of other commits)
+    :rtype: tuple
+    """
+    # key -> (commit time, parent keys) of the commits parsed so far
+    parsed = dict((key, commits.commit(key)[1:]) for key in parsed)
+
+    def parse(key):
+        if key not in parsed:
+            try:
+                parsed[key] = commits.commit(key)[1:]
+            except KeyError:
+                # beyond the boundary of a shallow clone
+                return False
+        return True
+
+    heap = []
+    seen = set()
+    queued = set()
+    uninteresting = set()
+    # number of queued commits not in uninteresting
+    interesting = [0]
+
+    def push(key):
+        seen.add(key)
+        queued.add(key)
+        if key not in uninteresting:
+            interesting[0] += 1
+        heapq.heappush(heap, (-parsed[key][0], len(seen), key))
+
+    def mark(key):
+        if key in queued and key not in uninteresting:
+            interesting[0] -= 1
+        uninteresting.add(key)
+
+    def mark_parents(key):
+        # git's mark_parents_uninteresting(): parents of commits that have
+        # been parsed are marked in turn
+        stack = list(parsed[key][1])
+        while stack:
+            p = stack.pop()
+            if p in uninteresting:
+                continue
+            mark(p)
+            if p in parsed:
+                stack.extend(parsed[p][1])
+
+    for key in exclude:
+        if not parse(key):
+            raise KeyError(key)
+        mark(key)
+        mark_parents(key)
+        if key not in seen:
+            push(key)
+    for key in include:
+        if not parse(key):
+            raise KeyError(key)
+        if key not in seen:
+            push(key)
+    lefts = set([left])
+    counted = []
+    # commit time of the last commit counted
+    date = None
+    slop = SLOP
+    while heap:
+        key = heapq.heappop(heap)[2]
+        queued.discard(key)
+        parents = parsed[key][1]
+        if key not in uninteresting:
+            interesting[0] -= 1
+            for p in parents:
+                if not parse(p):
+                    continue
+                if key in lefts:
+                    lefts.add(p)
+                if p not in seen:
+                    push(p)
+            date = parsed[key][0]
+            counted.append(key)
+            continue
+        for p in parents:
+            if p not in uninteresting:
+                mark(p)
+            if not parse(p):
+                continue
+            mark_parents(p)
+            if p not in seen:
+                push(p)
+        if not heap:
+            break
+        if (date is not None and -heap[0][0] >= date) or interesting[0]:
+            slop = SLOP
+            continue
+        slop -= 1
+        if not slop:
+            break
+    res = [0, 0]
+    for key in counted:
+        if key not in uninteresting:
+            res[key not in lefts] += 1
+    return tuple(res)
+
+
+def describe_string(tag, distance, hexsha):
+    """
+    Format the result of :py:func:`~.describe` as ``git describe --tags``
+    does: the tag name alone if the commit is tagged, or else
+    ``<tag>-<distance>-g<abbreviated commit>``.
+
+    :param tag: tag name
+    :type tag: str
+    :param distance: number of commits since the tag
+    :type distance: int
+    :param hexsha: hex commit name
+    :type hexsha: str
+    :rtype: str
+    """
+    if distance == 0:
+        return tag
+    return '%s-%d-g%s' % (tag, distance, hexsha[:7])
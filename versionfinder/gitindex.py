@@ -0,0 +1,1345 @@
+"""
+versionfinder/gitindex.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import re
+import stat
+import struct
+import hashlib
+import logging
+import binascii
+from operator import itemgetter
+
+from .gitobjects import (
+    ObjectStore, common_dir, parse_commit, read_config, read_config_file,
+    resolve_ref
+)
+
+logger = logging.getLogger(__name__)
+
+_INDEX_MAGIC = b'DIRC'
+_HEADER = struct.Struct('>4sII')
+# ctime, ctime nanoseconds, mtime, mtime nanoseconds, device, inode, mode,
+# uid, gid, size, object name and flags
+_ENTRY = struct.Struct('>10I20sH')
+_UINT16 = struct.Struct('>H')
+_UINT32 = struct.Struct('>I')
+_EWAH_HEADER = struct.Struct('>II')
+_SHA_LEN = 20
+_NO_SHA = b'\0' * _SHA_LEN
+
+# entry flags
+_FLAG_ASSUME_VALID = 0x8000
+_FLAG_EXTENDED = 0x4000
+_FLAG_STAGE = 0x3000
+_NAME_MASK = 0xfff
+# extended entry flags, in index version 3 and later
+_XFLAG_SKIP_WORKTREE = 0x4000
+_XFLAG_INTENT_TO_ADD = 0x2000
+
+# entry modes
+S_IFGITLINK = 0o160000
+_S_IFSYMLINK = 0o120000
+_S_IFDIR = 0o040000
+_S_IFREG = 0o100000
+_S_IFMT = 0o170000
+
+# extensions; those that do not start with an upper case letter must be
+# understood to read the index correctly
+_EXT_TREE = b'TREE'
+_EXT_LINK = b'link'
+_EXT_SPARSE = b'sdir'
+
+# 32-bit truncation of the stat data in index entries
+_MASK32 = 0xffffffff
+_NS = 1000000000
+
+# files are hashed in chunks of this size
+_CHUNK = 1 << 20
+
+# default number of threads to lstat() and hash tracked files in
+_MAX_WORKERS = 8
+
+# tracked files are lstat()ed in chunks of this many, in a thread pool when
+# there is more than one chunk
+_STAT_CHUNK = 256
+
+# attributes that can make the content git stores differ from the file in
+# the working tree
+_CONVERT_RE = re.compile(
+    br'\b(?:text|eol|crlf|filter|ident|working-tree-encoding)\b'
+)
+
+# POSIX character classes in ignore patterns
+_CHAR_CLASSES = {
+    b'alnum': b'a-zA-Z0-9', b'alpha': b'a-zA-Z', b'blank': b' \\t',
+    b'digit': b'0-9', b'lower': b'a-z', b'upper': b'A-Z',
+    b'space': b' \\t\\n\\r\\f\\v', b'xdigit': b'0-9a-fA-F',
+    b'punct': b'!-/:-@\\[-`{-~'
+}
+
+# positions of the IndexEntry fields
+_E_PATH = 0
+_E_XFLAGS = 1
+_E_CTIME = 2
+_E_CTIME_NS = 3
+_E_MTIME = 4
+_E_MTIME_NS = 5
+_E_INO = 7
+_E_MODE = 8
+_E_UID = 9
+_E_GID = 10
+_E_SIZE = 11
+_E_SHA = 12
+_E_FLAGS = 13
+
+# results of comparing an index entry to the working tree
+_CLEAN = 0
+_CHANGED = 1
+_CHECK = 2
+_UNKNOWN = 3
+
+
+class IndexEntry(tuple):
+    """
+    An entry of a git index: a tracked path, the object name of its staged
+    content, and the stat data of its file when git last found the file to
+    match that content.
+
+    Entries are tuples of the path, the extended flags and then the fields
+    of the on-disk entry (ctime seconds and nanoseconds, mtime seconds and
+    nanoseconds, device, inode, mode, uid, gid, size, object name and
+    flags), which makes reading an index of many thousands of entries
+    cheaper than with a class of named attributes.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, path, mode, sha, flags=0, xflags=0, stat=None):
+        """
+        :param path: path relative to the top of the working tree
+        :type path: bytes
+        :param mode: file mode; ``0o100644`` or ``0o100755`` for a file,
+          ``0o120000`` for a symlink or ``0o160000`` for a submodule
+        :type mode: int
+        :param sha: binary object name
+        :type sha: bytes
+        :param flags: entry flags (including the merge stage)
+        :type flags: int
+        :param xflags: extended entry flags
+        :type xflags: int
+        :param stat: ctime seconds and nanoseconds, mtime seconds and
+          nanoseconds, device, inode, uid, gid and size, each truncated to 32
+          bits
+        :type stat: tuple
+        """
+        if stat is None:
+            stat = (0,) * 9
+        return tuple.__new__(cls, (path, xflags) + tuple(stat[:6]) + (
+            mode,) + tuple(stat[6:]) + (sha, flags))
+
+    path = property(itemgetter(_E_PATH), doc='path relative to the top of '
+                    'the working tree (bytes)')
+    xflags = property(itemgetter(_E_XFLAGS), doc='extended entry flags')
+    mode = property(itemgetter(_E_MODE), doc='file mode')
+    sha = property(itemgetter(_E_SHA), doc='binary object name')
+    flags = property(itemgetter(_E_FLAGS), doc='entry flags')
+
+    @property
+    def stat(self):
+        """
+        Stat data: ctime seconds and nanoseconds, mtime seconds and
+        nanoseconds, device, inode, uid, gid and size, each truncated to 32
+        bits.
+
+        :rtype: tuple
+        """
+        return self[_E_CTIME:_E_MODE] + self[_E_UID:_E_SHA]
+
+    @property
+    def stage(self):
+        """
+        Merge stage: 0 for a normal entry, or 1 to 3 for the base, ours and
+        theirs versions of a conflicted path.
+
+        :rtype: int
+        """
+        return (self.flags & _FLAG_STAGE) >> 12
+
+    @property
+    def assume_valid(self):
+        """
+        Whether the path is marked with ``git update-index
+        --assume-unchanged``.
+
+        :rtype: bool
+        """
+        return bool(self.flags & _FLAG_ASSUME_VALID)
+
+    @property
+    def skip_worktree(self):
+        """
+        Whether the path is outside of a sparse checkout (or marked with
+        ``git update-index --skip-worktree``).
+
+        :rtype: bool
+        """
+        return bool(self.xflags & _XFLAG_SKIP_WORKTREE)
+
+    @property
+    def intent_to_add(self):
+        """
+        Whether the path was added with ``git add --intent-to-add``.
+
+        :rtype: bool
+        """
+        return bool(self.xflags & _XFLAG_INTENT_TO_ADD)
+
+    @property
+    def hexsha(self):
+        """
+        Hex object name.
+
+        :rtype: str
+        """
+        return binascii.hexlify(self.sha).decode('ascii')
+
+    def __repr__(self):
+        return '<IndexEntry %r %o %s %d>' % (
+            self.path, self.mode, self.hexsha, self.stage
+        )
+
+
+class Index(object):
+    """
+    The contents of a git index (``.git/index``) file.
+    """
+
+    def __init__(self, version, entries, extensions=None, timestamp=None):
+        """
+        :param version: index format version (2, 3 or 4)
+        :type version: int
+        :param entries: the :py:class:`~.IndexEntry` objects, sorted by path
+          and stage
+        :type entries: list
+        :param extensions: raw data of the extensions, by signature
+        :type extensions: dict
+        :param timestamp: modification time of the index file, as a 2-tuple
+          of seconds and nanoseconds, or None if unknown
+        :type timestamp: tuple
+        """
+        self.version = version
+        self.entries = entries
+        self.extensions = extensions or {}
+        self.timestamp = timestamp
+
+    def cache_tree(self):
+        """
+        Parse the cache tree (``TREE``) extension, which records the tree
+        object names of the index's directories as of when they were last
+        written.
+
+        :returns: dict of directory path (``b''`` for the top directory) to
+          its binary tree object name, or None if it changed since
+        :rtype: dict
+        :raises: ValueError if the extension is corrupt
+        """
+        data = self.extensions.get(_EXT_TREE)
+        res = {}
+        if data is None:
+            return res
+        # directories still expecting subtrees, as [path, remaining]
+        stack = []
+        pos = 0
+        try:
+            while pos < len(data):
+                nul = data.index(b'\0', pos)
+                name = data[pos:nul]
+                nl = data.index(b'\n', nul)
+                count, subtrees = data[nul + 1:nl].split(b' ')
+                pos = nl + 1
+                sha = None
+                if int(count) >= 0:
+                    sha = data[pos:pos + _SHA_LEN]
+                    pos += _SHA_LEN
+                if stack:
+                    parent = stack[-1]
+                    parent[1] -= 1
+                    path = parent[0] + b'/' + name if parent[0] else name
+                else:
+                    path = name
+                res[path] = sha
+                stack.append([path, int(subtrees)])
+                while stack and stack[-1][1] <= 0:
+                    stack.pop()
+        except ValueError:
+            raise ValueError('Corrupt cache tree extension')
+        return res
+
+
+def _varint(data, pos):
+    """
+    Decode an index version 4 path prefix length (the same encoding as a
+    pack's delta base offset).
+
+    :returns: 2-tuple of the value and the position after it
+    :rtype: tuple
+    """
+    c = data[pos]
+    pos += 1
+    value = c & 0x7f
+    while c & 0x80:
+        c = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7f)
+    return value, pos
+
+
+def parse_index(data):
+    """
+    Parse the contents of an index file, of version 2, 3 or 4. A split
+    index's shared entries are not merged in; see :py:func:`~.read_index`.
+
+    :param data: contents of the file
+    :type data: bytes
+    :rtype: :py:class:`~.Index`
+    :raises: ValueError if the data is not a valid index, or uses an
+      extension that is required but not supported
+    """
+    if len(data) < _HEADER.size + _SHA_LEN:
+        raise ValueError('Index file is truncated')
+    magic, version, count = _HEADER.unpack_from(data, 0)
+    if magic != _INDEX_MAGIC:
+        raise ValueError('Not an index file')
+    if version not in (2, 3, 4):
+        raise ValueError('Unsupported index version %d' % version)
+    trailer = data[-_SHA_LEN:]
+    # index.skipHash leaves the trailer zeroed
+    if trailer != _NO_SHA and \
+            hashlib.sha1(data[:-_SHA_LEN]).digest() != trailer:
+        raise ValueError('Index checksum mismatch')
+    end = len(data) - _SHA_LEN
+    entries = []
+    append = entries.append
+    unpack = _ENTRY.unpack_from
+    new = tuple.__new__
+    find = data.index
+    pos = _HEADER.size
+    prev = b''
+    try:
+        for _ in range(count):
+            start = pos
+            fields = unpack(data, pos)
+            flags = fields[11]
+            pos += 62
+            xflags = 0
+            if flags & _FLAG_EXTENDED:
+                if version < 3:
+                    raise ValueError('Extended flags in index version 2')
+                xflags = _UINT16.unpack_from(data, pos)[0]
+                pos += 2
+            if version >= 4:
+                strip, pos = _varint(data, pos)
+                if strip > len(prev):
+                    raise ValueError('Corrupt path in index')
+                nul = find(b'\0', pos, end)
+                path = prev[:len(prev) - strip] + data[pos:nul]
+                pos = nul + 1
+                prev = path
+            else:
+                namelen = flags & _NAME_MASK
+                if namelen == _NAME_MASK:
+                    namelen = find(b'\0', pos, end) - pos
+                path = data[pos:pos + namelen]
+                # entries are padded with 1 to 8 NULs to a multiple of 8
+                pos = start + ((pos - start + namelen + 8) & ~7)
+            append(new(IndexEntry, (path, xflags) + fields))
+    except (struct.error, IndexError):
+        raise ValueError('Index file is truncated')
+    if pos > end:
+        raise ValueError('Index file is truncated')
+    extensions = {}
+    while pos + 8 <= end:
+        sig = data[pos:pos + 4]
+        size = _UINT32.unpack_from(data, pos + 4)[0]
+        pos += 8
+        if pos + size > end:
+            raise ValueError('Index extension is truncated')
+        if not b'A' <= sig[:1] <= b'Z' and \
+                sig not in (_EXT_LINK, _EXT_SPARSE):
+            raise ValueError('Unsupported index extension %r' % sig)
+        extensions[sig] = data[pos:pos + size]
+        pos += size
+    return Index(version, entries, extensions)
+
+
+def _read_ewah(data, pos):
+    """
+    Decode an EWAH compressed bitmap, as used by the split index ``link``
+    extension.
+
+    :param data: data containing the bitmap
+    :type data: bytes
+    :param pos: position of the bitmap in ``data``
+    :type pos: int
+    :returns: 2-tuple of the list of set bit positions (ascending) and the
+      position after the bitmap
+    :rtype: tuple
+    """
+    bit_size, nwords = _EWAH_HEADER.unpack_from(data, pos)
+    pos += _EWAH_HEADER.size
+    words = struct.unpack_from('>%dQ' % nwords, data, pos)
+    # the words are followed by the position of the last run length word
+    pos += nwords * 8 + 4
+    bits = []
+    base = 0
+    i = 0
+    while i < nwords:
+        rlw = words[i]
+        i += 1
+        run = (rlw >> 1) & _MASK32
+        literals = rlw >> 33
+        if rlw & 1:
+            bits.extend(range(base, base + run * 64))
+        base += run * 64
+        for word in words[i:i + literals]:
+            while word:
+                low = word & -word
+                bits.append(base + low.bit_length() - 1)
+                word ^= low
+            base += 64
+        i += literals
+    return [b for b in bits if b < bit_size], pos
+
+
+def _merge_split(shared, front, delete, replace):
+    """
+    Merge the entries of a split index with those of its shared index.
+
+    :param shared: shared index entries
+    :type shared: list
+    :param front: split index entries: first the replacements for the shared
+      entries marked in ``replace`` (with empty paths), then new entries
+    :type front: list
+    :param delete: positions of the shared entries that were removed
+    :type delete: list
+    :param replace: positions of the shared entries that were replaced
+    :type replace: list
+    :returns: merged entries, sorted by path and stage
+    :rtype: list
+    """
+    entries = list(shared)
+    if len(replace) > len(front):
+        raise ValueError('Corrupt split index')
+    for n, i in enumerate(replace):
+        src = front[n]
+        if i >= len(entries) or src.path:
+            raise ValueError('Corrupt split index')
+        entries[i] = tuple.__new__(IndexEntry, (entries[i].path,) + src[1:])
+    removed = set(delete)
+    merged = {}
+    for i, e in enumerate(entries):
+        if i not in removed:
+            merged[(e.path, e.stage)] = e
+    for e in front[len(replace):]:
+        merged[(e.path, e.stage)] = e
+    return [merged[k] for k in sorted(merged)]
+
+
+def _read_index_file(path):
+    """
+    Read and parse an index file, recording its modification time.
+
+    :rtype: :py:class:`~.Index`
+    """
+    with open(path, 'rb') as fh:
+        st = os.fstat(fh.fileno())
+        index = parse_index(fh.read())
+    index.timestamp = divmod(st.st_mtime_ns, _NS)
+    return index
+
+
+def read_index(gitdir):
+    """
+    Read a repository's index, merging in the shared index if it is split
+    (``core.splitIndex``).
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :returns: the index; empty if there is no index file yet
+    :rtype: :py:class:`~.Index`
+    :raises: ValueError if the index is corrupt or unsupported, or OSError
+      if it cannot be read
+    """
+    try:
+        index = _read_index_file(os.path.join(gitdir, 'index'))
+    except FileNotFoundError:
+        return Index(2, [])
+    link = index.extensions.get(_EXT_LINK)
+    if link is None:
+        return index
+    if len(link) < _SHA_LEN:
+        raise ValueError('Corrupt split index')
+    if link[:_SHA_LEN] == _NO_SHA:
+        return index
+    delete = replace = []
+    if len(link) > _SHA_LEN:
+        delete, pos = _read_ewah(link, _SHA_LEN)
+        replace, pos = _read_ewah(link, pos)
+    name = 'sharedindex.%s' % binascii.hexlify(
+        link[:_SHA_LEN]).decode('ascii')
+    path = os.path.join(gitdir, name)
+    if not os.path.exists(path):
+        path = os.path.join(common_dir(gitdir), name)
+    shared = _read_index_file(path)
+    index.entries = _merge_split(shared.entries, index.entries, delete,
+                                 replace)
+    return index
+
+
+def parse_tree(data):
+    """
+    Parse a tree object.
+
+    :param data: object data
+    :type data: bytes
+    :return: generator of 3-tuples of mode (int), name (bytes) and binary
+      object name
+    :rtype: generator
+    """
+    pos = 0
+    while pos < len(data):
+        sp = data.index(b' ', pos)
+        nul = data.index(b'\0', sp)
+        yield int(data[pos:sp], 8), data[sp + 1:nul], \
+            data[nul + 1:nul + 1 + _SHA_LEN]
+        pos = nul + 1 + _SHA_LEN
+
+
+def _hash_blob(path, symlink):
+    """
+    Return the binary object name that the file (or symlink) at ``path``
+    would have if added as is, or None if it cannot be read.
+
+    :param path: path to the file
+    :type path: bytes
+    :param symlink: whether to hash the target of a symlink
+    :type symlink: bool
+    :rtype: bytes
+    """
+    try:
+        if symlink:
+            data = os.readlink(path)
+            return hashlib.sha1(b'blob %d\0' % len(data) + data).digest()
+        with open(path, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            h = hashlib.sha1(b'blob %d\0' % size)
+            while size:
+                chunk = fh.read(min(size, _CHUNK))
+                if not chunk:
+                    return None
+                h.update(chunk)
+                size -= len(chunk)
+            if fh.read(1):
+                return None
+        return h.digest()
+    except OSError:
+        return None
+
+
+def _lstat_all(paths):
+    """
+    Return the ``os.lstat`` results for a list of paths, with None for
+    those that do not exist.
+
+    :type paths: list
+    :rtype: list
+    """
+    res = []
+    append = res.append
+    lstat = os.lstat
+    for path in paths:
+        try:
+            append(lstat(path))
+        except OSError:
+            append(None)
+    return res
+
+
+def _cpu_count():
+    """
+    Return the number of CPUs this process can run on.
+
+    :rtype: int
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _config_last(config, section, name):
+    values = config.get((section, None, name))
+    return values[-1] if values else None
+
+
+def _config_bool(config, section, name, default):
+    """
+    Return the value of a boolean config variable.
+
+    :rtype: bool
+    """
+    values = config.get((section, None, name))
+    if not values:
+        return default
+    if values[-1] is None:
+        return True
+    value = values[-1].lower()
+    if value in ('true', 'yes', 'on', '1'):
+        return True
+    if value in ('false', 'no', 'off', '0', ''):
+        return False
+    return default
+
+
+def _xdg_config_path(name):
+    """
+    Return the path of a file in the user's git configuration directory
+    (``$XDG_CONFIG_HOME/git``, or ``~/.config/git``).
+
+    :rtype: str
+    """
+    base = os.environ.get('XDG_CONFIG_HOME') or os.path.join(
+        os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'git', name)
+
+
+def _load_config(gitdir):
+    """
+    Read the system, global and repository config, merged in that order.
+    ``include`` directives are not followed.
+
+    :rtype: dict
+    """
+    paths = []
+    if not os.environ.get('GIT_CONFIG_NOSYSTEM'):
+        paths.append('/etc/gitconfig')
+    if os.environ.get('GIT_CONFIG_GLOBAL'):
+        paths.append(os.environ['GIT_CONFIG_GLOBAL'])
+    else:
+        paths.extend([_xdg_config_path('config'),
+                      os.path.join(os.path.expanduser('~'), '.gitconfig')])
+    res = {}
+    for config in [read_config_file(p) for p in paths] + [
+            read_config(gitdir)]:
+        for key, values in config.items():
+            res.setdefault(key, []).extend(values)
+    return res
+
+
+def _work_tree(gitdir, config):
+    """
+    Return the working tree of the repository with git directory
+    ``gitdir``, or None if it is bare.
+
+    :rtype: str
+    """
+    path = _config_last(config, 'core', 'worktree')
+    if path:
+        return os.path.normpath(os.path.join(gitdir, path))
+    if os.path.isfile(os.path.join(gitdir, 'commondir')):
+        # a linked worktree; "gitdir" names its .git file
+        with open(os.path.join(gitdir, 'gitdir')) as fh:
+            return os.path.dirname(os.path.normpath(
+                os.path.join(gitdir, fh.readline().strip())))
+    if _config_bool(config, 'core', 'bare', False):
+        return None
+    return os.path.dirname(os.path.normpath(gitdir))
+
+
+def _submodule_gitdir(path):
+    """
+    Return the git directory of the submodule checked out at ``path``, or
+    None if it is not checked out.
+
+    :type path: str
+    :rtype: str
+    """
+    dotgit = os.path.join(path, '.git')
+    if os.path.isdir(dotgit):
+        return dotgit
+    try:
+        with open(dotgit) as fh:
+            line = fh.readline().strip()
+    except (OSError, UnicodeDecodeError):
+        return None
+    if not line.startswith('gitdir:'):
+        return None
+    return os.path.normpath(os.path.join(path, line[7:].strip()))
+
+
+def _glob_regex(pattern):
+    """
+    Translate an ignore file pattern (without any leading ``!`` or
+    trailing ``/``) to a compiled regular expression, following git's
+    wildmatch rules: ``*``, ``?`` and bracket expressions do not match
+    ``/``, while ``**/``, ``/**/`` and ``/**`` match any number of
+    directories.
+
+    :type pattern: bytes
+    :rtype: re.Pattern
+    """
+    res = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i:i + 1]
+        if c == b'*':
+            if pattern[i:i + 2] == b'**' and \
+                    (i == 0 or pattern[i - 1:i] == b'/') and \
+                    (i + 2 == n or pattern[i + 2:i + 3] == b'/'):
+                if i + 2 == n:
+                    res.append(b'.*')
+                else:
+                    res.append(b'(?:.*/)?')
+                i += 3
+                continue
+            res.append(b'[^/]*')
+        elif c == b'?':
+            res.append(b'[^/]')
+        elif c == b'[':
+            j = i + 1
+            if pattern[j:j + 1] in (b'!', b'^'):
+                j += 1
+            if pattern[j:j + 1] == b']':
+                j += 1
+            while j < n and pattern[j:j + 1] != b']':
+                if pattern[j:j + 2] == b'[:':
+                    k = pattern.find(b':]', j + 2)
+                    j = n if k == -1 else k + 2
+                else:
+                    j += 1
+            if j >= n:
+                res.append(b'\\[')
+            else:
+                res.append(_bracket_regex(pattern[i + 1:j]))
+                i = j
+        elif c == b'\\' and i + 1 < n:
+            i += 1
+            res.append(re.escape(pattern[i:i + 1]))
+        else:
+            res.append(re.escape(c))
+        i += 1
+    return re.compile(b''.join(res) + b'\\Z', re.S)
+
+
+def _bracket_regex(body):
+    """
+    Translate the inside of a wildmatch bracket expression to a regular
+    expression character set.
+
+    :type body: bytes
+    :rtype: bytes
+    """
+    negate = body[:1] in (b'!', b'^')
+    if negate:
+        body = body[1:]
+    res = []
+    i = 0
+    while i < len(body):
+        if body[i:i + 2] == b'[:':
+            k = body.find(b':]', i + 2)
+            cls = _CHAR_CLASSES.get(body[i + 2:k])
+            if cls is None:
+                raise ValueError('Unsupported character class')
+            res.append(cls)
+            i = k + 2
+            continue
+        c = body[i:i + 1]
+        if c == b'\\' and i + 1 < len(body):
+            i += 1
+            c = body[i:i + 1]
+        res.append(c if c == b'-' or c.isalnum() else b'\\' + c)
+        i += 1
+    if negate:
+        return b'[^/' + b''.join(res) + b']'
+    return b'[' + b''.join(res) + b']'
+
+
+class _Pattern(object):
+    """
+    A pattern from an ignore file.
+    """
+
+    __slots__ = ('regex', 'base', 'negate', 'dir_only', 'anchored')
+
+    def __init__(self, regex, base, negate, dir_only, anchored):
+        self.regex = regex
+        self.base = base
+        self.negate = negate
+        self.dir_only = dir_only
+        self.anchored = anchored
+
+
+def parse_ignore(data, base=b''):
+    """
+    Parse the patterns of a ``.gitignore`` (or ``info/exclude``) file.
+
+    :param data: contents of the file
+    :type data: bytes
+    :param base: path of the directory containing the file, relative to the
+      top of the working tree and ending with ``/``, or ``b''`` for the top
+    :type base: bytes
+    :returns: list of patterns, in file order
+    :rtype: list
+    """
+    res = []
+    for line in data.splitlines():
+        if not line or line[:1] == b'#':
+            continue
+        # trailing spaces are removed unless escaped with a backslash
+        end = len(line)
+        while end and line[end - 1:end] == b' ' and \
+                line[end - 2:end - 1] != b'\\':
+            end -= 1
+        line = line[:end]
+        negate = line[:1] == b'!'
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith(b'/')
+        if dir_only:
+            line = line[:-1]
+        anchored = b'/' in line
+        if line[:1] == b'/':
+            line = line[1:]
+        if not line:
+            continue
+        try:
+            regex = _glob_regex(line)
+        except (ValueError, re.error):
+            logger.debug('Ignoring unsupported ignore pattern %r', line)
+            continue
+        res.append(_Pattern(regex, base, negate, dir_only, anchored))
+    return res
+
+
+def _read_file(path):
+    """
+    Return the contents of the file at ``path``, or None if it cannot be
+    read.
+
+    :rtype: bytes
+    """
+    try:
+        with open(path, 'rb') as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+class _StatusCheck(object):
+    """
+    The state of one :py:func:`~.is_dirty` call.
+    """
+
+    def __init__(self, gitdir, work_tree, index, config, max_workers):
+        self.gitdir = gitdir
+        self.work_tree = work_tree
+        self.root = os.fsencode(work_tree)
+        self.index = index
+        self.config = config
+        self.max_workers = max_workers
+        self.filemode = _config_bool(config, 'core', 'filemode', True)
+        self.trustctime = _config_bool(config, 'core', 'trustctime', True)
+        self.symlinks = _config_bool(config, 'core', 'symlinks', True)
+        # the file type, and the executable bit if core.fileMode is set
+        self.mode_mask = _S_IFMT | 0o100 if self.filemode else _S_IFMT
+        self.patterns = []
+        self._pool = None
+
+    def dirty(self):
+        """
+        :returns: True or False, or None if it cannot be determined
+        :rtype: bool
+        """
+        unknown = False
+        try:
+            for check in (self.unmerged, self.staged, self.modified,
+                          self.untracked):
+                res = check()
+                if res:
+                    return True
+                if res is None:
+                    unknown = True
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+        return None if unknown else False
+
+    def pool(self):
+        """
+        Return the thread pool to lstat and hash files in, starting it on
+        first use.
+
+        :rtype: concurrent.futures.ThreadPoolExecutor
+        """
+        if self._pool is None:
+            # concurrent.futures is slow to import, and most checks finish
+            # without needing threads
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers or _MAX_WORKERS)
+        return self._pool
+
+    def unmerged(self):
+        """
+        Whether there are conflicts or intent-to-add entries, or None for a
+        sparse index (whose directory entries are not supported).
+        """
+        for e in self.index.entries:
+            if e[_E_FLAGS] & _FLAG_STAGE or \
+                    e[_E_XFLAGS] & _XFLAG_INTENT_TO_ADD:
+                return True
+            if e[_E_MODE] == _S_IFDIR:
+                return None
+        return False
+
+    def staged(self):
+        """
+        Whether the index differs from the HEAD commit's tree, skipping the
+        directories whose cache tree entries match HEAD.
+        """
+        head = resolve_ref(self.gitdir)
+        if head is None:
+            return len(self.index.entries) > 0
+        store = ObjectStore(self.gitdir)
+        try:
+            typ, data = store.read(head)
+            if typ != 'commit':
+                raise ValueError('HEAD is not a commit')
+            tree = binascii.unhexlify(parse_commit(data)['tree'])
+            cached = self.index.cache_tree()
+            head_entries = {}
+            same = set()
+            stack = [(b'', tree)]
+            while stack:
+                prefix, sha = stack.pop()
+                if cached.get(prefix) == sha:
+                    same.add(prefix)
+                    continue
+                typ, data = store.read(binascii.hexlify(sha).decode('ascii'))
+                if typ != 'tree':
+                    raise ValueError('Not a tree: %s' % typ)
+                for mode, name, sha in parse_tree(data):
+                    path = prefix + b'/' + name if prefix else name
+                    if mode == _S_IFDIR:
+                        stack.append((path, sha))
+                    else:
+                        head_entries[path] = (mode, sha)
+        finally:
+            store.close()
+        if b'' in same:
+            return False
+        for e in self.index.entries:
+            if same and self._in_dirs(e.path, same):
+                continue
+            if head_entries.pop(e.path, None) != (e.mode, e.sha):
+                return True
+        return len(head_entries) > 0
+
+    @staticmethod
+    def _in_dirs(path, dirs):
+        i = path.find(b'/')
+        while i != -1:
+            if path[:i] in dirs:
+                return True
+            i = path.find(b'/', i + 1)
+        return False
+
+    def modified(self):
+        """
+        Whether any tracked file in the working tree differs from the index.
+        Files whose stat data matches the index are taken to be unchanged;
+        the others are hashed, in a thread pool if there are several.
+        """
+        suspects = []
+        unknown = False
+        racy = float('inf')
+        if self.index.timestamp is not None:
+            racy = self.index.timestamp[0]
+        entries = [
+            e for e in self.index.entries
+            if not (e[_E_XFLAGS] & _XFLAG_SKIP_WORKTREE or
+                    e[_E_FLAGS] & _FLAG_ASSUME_VALID)
+        ]
+        prefix = os.path.join(self.root, b'')
+        paths = [prefix + e[_E_PATH] for e in entries]
+        stats = self.lstat(paths)
+        try:
+            for e, path, st in zip(entries, paths, stats):
+                if e[_E_MODE] == S_IFGITLINK:
+                    res = self.submodule(e, path)
+                    if res:
+                        return True
+                    unknown = unknown or res is None
+                    continue
+                if st is None:
+                    return True
+                res = self.compare(e, st)
+                if res == _CLEAN:
+                    if racy <= e[_E_MTIME]:
+                        # modified in the same second the index was
+                        # written, so the stat data cannot be trusted
+                        suspects.append((e, path))
+                elif res == _CHANGED:
+                    return True
+                elif res == _UNKNOWN:
+                    unknown = True
+                else:
+                    suspects.append((e, path))
+        finally:
+            stats.close()
+        res = self.hash_suspects(suspects)
+        if res or res is None:
+            return res
+        return None if unknown else False
+
+    def lstat(self, paths):
+        """
+        lstat() files, in chunks in the thread pool if there are many of
+        them and more than one CPU (the system calls release the GIL).
+
+        :param paths: paths to the files
+        :type paths: list
+        :returns: generator of ``os.lstat`` results, or None for paths that
+          do not exist, in order
+        :rtype: generator
+        """
+        if len(paths) <= _STAT_CHUNK or self.max_workers == 1 or \
+                _cpu_count() == 1:
+            # threads would only contend for the GIL
+            lstat = os.lstat
+            for path in paths:
+                try:
+                    yield lstat(path)
+                except OSError:
+                    yield None
+            return
+        futures = [
+            self.pool().submit(_lstat_all, paths[i:i + _STAT_CHUNK])
+            for i in range(0, len(paths), _STAT_CHUNK)
+        ]
+        try:
+            for f in futures:
+                yield from f.result()
+        finally:
+            for f in futures:
+                f.cancel()
+
+    def compare(self, e, st):
+        """
+        Compare an index entry with the stat data of its file.
+
+        :returns: ``_CLEAN``, ``_CHANGED``, ``_CHECK`` if the content must be
+          hashed, or ``_UNKNOWN``
+        :rtype: int
+        """
+        mask = self.mode_mask
+        # the usual case, checked first: nothing changed
+        if st.st_mtime_ns == e[_E_MTIME] * _NS + e[_E_MTIME_NS] and \
+                st.st_size & _MASK32 == e[_E_SIZE] and \
+                st.st_mode & mask == e[_E_MODE] & mask and \
+                st.st_ino & _MASK32 == e[_E_INO] and \
+                st.st_uid & _MASK32 == e[_E_UID] and \
+                st.st_gid & _MASK32 == e[_E_GID] and \
+                (not self.trustctime or
+                 st.st_ctime_ns == e[_E_CTIME] * _NS + e[_E_CTIME_NS]):
+            return _CLEAN
+        mode = e[_E_MODE]
+        if stat.S_ISREG(st.st_mode):
+            if mode & _S_IFMT != _S_IFREG:
+                # without core.symlinks, symlinks are checked out as files
+                if mode == _S_IFSYMLINK and not self.symlinks:
+                    return _UNKNOWN
+                return _CHANGED
+            if self.filemode and (mode ^ st.st_mode) & 0o100:
+                return _CHANGED
+        elif stat.S_ISLNK(st.st_mode):
+            if mode != _S_IFSYMLINK:
+                return _CHANGED
+        else:
+            return _CHANGED
+        if e[_E_SIZE] != st.st_size & _MASK32:
+            # an entry whose size is 0 may have been "smudged" by git as
+            # racily clean, and must be hashed
+            return _CHANGED if e[_E_SIZE] else _CHECK
+        # the times, inode, uid or gid changed
+        return _CHECK
+
+    def hash_suspects(self, suspects):
+        """
+        Hash the files whose stat data does not match their index entries.
+
+        :param suspects: list of (entry, path) tuples
+        :type suspects: list
+        :returns: whether any of them differs from its entry, or None if one
+          does but attributes or config may make that expected
+        :rtype: bool
+        """
+        if not suspects:
+            return False
+        symlink = [e.mode == _S_IFSYMLINK for e, _ in suspects]
+        if len(suspects) == 1:
+            shas = [_hash_blob(suspects[0][1], symlink[0])]
+            return self._changed(suspects, shas)
+        futures = [self.pool().submit(_hash_blob, path, link)
+                   for (_, path), link in zip(suspects, symlink)]
+        try:
+            return self._changed(suspects, (f.result() for f in futures))
+        finally:
+            for f in futures:
+                f.cancel()
+
+    def _changed(self, suspects, shas):
+        for (e, _), sha in zip(suspects, shas):
+            if sha is None:
+                return True
+            if sha != e.sha:
+                if e.mode != _S_IFSYMLINK and self.may_convert():
+                    return None
+                return True
+        return False
+
+    def may_convert(self):
+        """
+        Whether git may convert file content when adding it (line endings,
+        filters, ``ident`` or encodings), so that a file whose hash differs
+        from its index entry can still be unmodified.
+
+        :rtype: bool
+        """
+        autocrlf = self.config.get(('core', None, 'autocrlf'))
+        if autocrlf and (autocrlf[-1] is None or autocrlf[-1].lower() not in
+                         ('false', 'no', 'off', '0', '')):
+            return True
+        paths = [
+            os.path.join(common_dir(self.gitdir), 'info', 'attributes'),
+            os.path.expanduser(
+                _config_last(self.config, 'core', 'attributesfile') or
+                _xdg_config_path('attributes'))
+        ]
+        paths.extend(
+            os.path.join(self.root, e.path) for e in self.index.entries
+            if os.path.basename(e.path) == b'.gitattributes'
+        )
+        for path in paths:
+            data = _read_file(path)
+            if data and _CONVERT_RE.search(data):
+                return True
+        return False
+
+    def submodule(self, e, path):
+        """
+        Whether the submodule at ``path`` has a different commit checked out
+        than its index entry, or is itself dirty.
+
+        :rtype: bool
+        """
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return True
+        if not stat.S_ISDIR(st.st_mode):
+            return True
+        path = os.fsdecode(path)
+        gitdir = _submodule_gitdir(path)
+        if gitdir is None:
+            # not initialized
+            return False
+        head = resolve_ref(gitdir)
+        if head != e.hexsha:
+            res = True
+        else:
+            res = is_dirty(gitdir, path, self.max_workers)
+        if res and self.ignores_submodules():
+            return None
+        return res
+
+    def ignores_submodules(self):
+        """
+        Whether ``submodule.<name>.ignore`` or ``diff.ignoreSubmodules`` may
+        be set, in which case ``git status`` may not report a submodule's
+        changes.
+
+        :rtype: bool
+        """
+        if ('diff', None, 'ignoresubmodules') in self.config or any(
+                k[0] == 'submodule' and k[2] == 'ignore'
+                for k in self.config):
+            return True
+        data = _read_file(os.path.join(self.root, b'.gitmodules'))
+        return data is not None and b'ignore' in data.lower()
+
+    def untracked(self):
+        """
+        Whether there are untracked files that are not ignored, as ``git
+        status --untracked-files=normal`` would list them.
+        """
+        self.tracked = set(e[_E_PATH] for e in self.index.entries)
+        self.tracked_dirs = set()
+        last = None
+        for e in self.index.entries:
+            d = e[_E_PATH].rpartition(b'/')[0]
+            if d == last:
+                continue
+            last = d
+            while d and d not in self.tracked_dirs:
+                self.tracked_dirs.add(d)
+                d = d.rpartition(b'/')[0]
+        excludes = _config_last(self.config, 'core', 'excludesfile')
+        for path in (
+            os.path.expanduser(excludes or _xdg_config_path('ignore')),
+            os.path.join(common_dir(self.gitdir), 'info', 'exclude')
+        ):
+            data = _read_file(path)
+            if data:
+                self.patterns.extend(parse_ignore(data))
+        return self._untracked_in(b'')
+
+    def _untracked_in(self, rel):
+        """
+        Whether the directory ``rel`` (relative to the top of the working
+        tree, and ending with ``/`` unless it is the top) has any untracked,
+        not ignored files.
+        """
+        path = os.path.join(self.root, rel)
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return False
+        npatterns = len(self.patterns)
+        data = _read_file(path + b'.gitignore')
+        if data:
+            self.patterns.extend(parse_ignore(data, rel))
+        tracked = self.tracked
+        try:
+            for name in names:
+                relpath = rel + name
+                # tracked files need no stat
+                if relpath in tracked or name == b'.git':
+                    continue
+                is_dir = relpath in self.tracked_dirs
+                if not is_dir:
+                    try:
+                        is_dir = stat.S_ISDIR(os.lstat(path + name).st_mode)
+                    except OSError:
+                        continue
+                if self.ignored(relpath, name, is_dir):
+                    continue
+                if not is_dir:
+                    return True
+                if relpath not in self.tracked_dirs and os.path.lexists(
+                        path + name + b'/.git'):
+                    # a nested repository
+                    return True
+                if self._untracked_in(relpath + b'/'):
+                    return True
+        finally:
+            del self.patterns[npatterns:]
+        return False
+
+    def ignored(self, relpath, name, is_dir):
+        """
+        Whether a path is ignored: the last pattern matching it is not
+        negated.
+        """
+        for p in reversed(self.patterns):
+            if p.dir_only and not is_dir:
+                continue
+            if p.anchored:
+                if not relpath.startswith(p.base) or \
+                        not p.regex.match(relpath, len(p.base)):
+                    continue
+            elif not p.regex.match(name):
+                continue
+            return not p.negate
+        return False
+
+
+def is_dirty(gitdir, work_tree=None, max_workers=None):
+    """
+    Return whether a git clone has uncommitted changes or untracked files
+    (that are not ignored), as ``git status`` would report them, without
+    running git.
+
+    Staged changes are found by comparing the index to the HEAD commit's
+    tree, skipping directories whose cache tree entry matches. Tracked files
+    are compared to the stat data in the index, and only the files whose
+    stat data differs (or that were modified in the same second as the
+    index was written) are hashed, in a thread pool. Then the working tree
+    is searched for untracked files, honoring ``.gitignore`` files,
+    ``info/exclude`` and ``core.excludesFile``. Submodules are checked
+    recursively.
+
+    When a file's content differs from the index but git could convert
+    content (``core.autocrlf``, or ``text``, ``eol``, ``filter`` or
+    ``ident`` attributes), or the repository uses a sparse index, the
+    result is None: use ``git status`` instead.
+
+    :param gitdir: git directory, as returned by
+      :py:func:`~versionfinder.gitrepo.find_git_dir`
+    :type gitdir: str
+    :param work_tree: working tree; found from ``gitdir`` if not given
+    :type work_tree: str
+    :param max_workers: maximum number of threads to hash files in
+    :type max_workers: int
+    :returns: True or False, or None if git is needed to tell
+    :rtype: bool
+    :raises: ValueError if ``gitdir`` is not a git directory, or its index
+      is corrupt or unsupported
+    """
+    if not os.path.isfile(os.path.join(gitdir, 'HEAD')):
+        raise ValueError('Not a git directory: %s' % gitdir)
+    config = _load_config(gitdir)
+    if work_tree is None:
+        work_tree = _work_tree(gitdir, config)
+        if work_tree is None:
+            return None
+    index = read_index(gitdir)
+    return _StatusCheck(gitdir, work_tree, index, config, max_workers).dirty()
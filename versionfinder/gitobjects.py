@@ -0,0 +1,1094 @@
+"""
+versionfinder/gitobjects.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import re
+import mmap
+import zlib
+import struct
+import logging
+import binascii
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# pack object types
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+
+_TYPE_NAMES = {
+    OBJ_COMMIT: 'commit', OBJ_TREE: 'tree', OBJ_BLOB: 'blob', OBJ_TAG: 'tag'
+}
+
+# first four bytes of a version 2 (or later) pack index
+_IDX_MAGIC = b'\xfftOc'
+_UINT32 = struct.Struct('>I')
+_UINT64 = struct.Struct('>Q')
+
+# length of a (SHA-1) object name, in bytes
+_SHA_LEN = 20
+
+# valid git config variable name
+_CONFIG_NAME_RE = re.compile(r'^[a-z][a-z0-9-]*$')
+
+# how many resolved packed objects ObjectStore keeps, for delta bases and
+# repeatedly read commits
+_CACHE_SIZE = 256
+
+
+def common_dir(gitdir):
+    """
+    Return the directory holding the objects and (most of the) refs of the
+    repository with git directory ``gitdir``: for a linked worktree, the
+    main repository's git directory named by its ``commondir`` file, and
+    otherwise ``gitdir`` itself.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :rtype: str
+    """
+    try:
+        with open(os.path.join(gitdir, 'commondir')) as fh:
+            path = fh.readline().strip()
+    except (OSError, UnicodeDecodeError):
+        return gitdir
+    if not path:
+        return gitdir
+    return os.path.normpath(os.path.join(gitdir, path))
+
+
+def _mmap_file(path):
+    """
+    Return a read-only memory map of the file at ``path``.
+
+    :param path: path to the file
+    :type path: str
+    :rtype: mmap.mmap
+    """
+    with open(path, 'rb') as fh:
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PackIndex(object):
+    """
+    A memory-mapped pack index (``.idx``) file, version 1 or 2. Objects are
+    found with the 256-entry fan-out table, which gives the range of
+    entries whose names start with each byte, and a binary search of that
+    range.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path to the ``.idx`` file
+        :type path: str
+        :raises: ValueError if the file is not a supported pack index
+        """
+        self.path = path
+        self._mm = mm = _mmap_file(path)
+        if mm[:4] == _IDX_MAGIC:
+            version = _UINT32.unpack_from(mm, 4)[0]
+            if version != 2:
+                mm.close()
+                raise ValueError('Unsupported pack index version %d: %s'
+                                 % (version, path))
+            self.version = 2
+            self._fanout = 8
+            self.count = self._fanout_entry(255)
+            # table of names, then CRC32s, then 32-bit offsets, then 64-bit
+            # offsets for those with the high bit set
+            self._names = self._fanout + 256 * 4
+            self._stride = _SHA_LEN
+            self._offsets = self._names + self.count * (_SHA_LEN + 4)
+            self._large = self._offsets + self.count * 4
+        else:
+            self.version = 1
+            self._fanout = 0
+            self.count = self._fanout_entry(255)
+            # entries of a 32-bit offset followed by the name
+            self._names = 256 * 4 + 4
+            self._stride = _SHA_LEN + 4
+        #: path to the pack file that this indexes
+        self.pack_path = path[:-len('.idx')] + '.pack'
+
+    def _fanout_entry(self, i):
+        return _UINT32.unpack_from(self._mm, self._fanout + i * 4)[0]
+
+    def find(self, sha):
+        """
+        Return the offset in the pack file of the object with binary name
+        ``sha``, or None if it is not in this pack.
+
+        :param sha: binary object name
+        :type sha: bytes
+        :rtype: int
+        """
+        mm = self._mm
+        first = sha[0]
+        lo = self._fanout_entry(first - 1) if first else 0
+        hi = self._fanout_entry(first)
+        names = self._names
+        stride = self._stride
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = names + mid * stride
+            name = mm[pos:pos + _SHA_LEN]
+            if name < sha:
+                lo = mid + 1
+            elif name > sha:
+                hi = mid
+            else:
+                return self._offset(mid)
+        return None
+
+    def _offset(self, i):
+        if self.version == 1:
+            return _UINT32.unpack_from(
+                self._mm, self._names + i * self._stride - 4
+            )[0]
+        off = _UINT32.unpack_from(self._mm, self._offsets + i * 4)[0]
+        if off & 0x80000000:
+            off = _UINT64.unpack_from(
+                self._mm, self._large + (off & 0x7fffffff) * 8
+            )[0]
+        return off
+
+    @property
+    def closed(self):
+        return self._mm.closed
+
+    def close(self):
+        self._mm.close()
+
+
+class Pack(object):
+    """
+    A memory-mapped pack file. Objects are read at the offsets given by its
+    :py:class:`~.PackIndex`; only the bytes of the requested objects (and
+    their delta bases) are decompressed.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path to the ``.pack`` file
+        :type path: str
+        :raises: ValueError if the file is not a pack
+        """
+        self.path = path
+        self._mm = _mmap_file(path)
+        if self._mm[:4] != b'PACK':
+            self._mm.close()
+            raise ValueError('Not a pack file: %s' % path)
+
+    def header(self, offset):
+        """
+        Read the header of the object at ``offset``.
+
+        :param offset: offset of the object
+        :type offset: int
+        :returns: 4-tuple of type, inflated size, offset of the data (for
+          REF_DELTA objects, of the base's name), and the offset of the
+          delta base for OFS_DELTA objects (else None)
+        :rtype: tuple
+        """
+        mm = self._mm
+        pos = offset
+        c = mm[pos]
+        pos += 1
+        typ = (c >> 4) & 7
+        size = c & 0x0f
+        shift = 4
+        while c & 0x80:
+            c = mm[pos]
+            pos += 1
+            size |= (c & 0x7f) << shift
+            shift += 7
+        base = None
+        if typ == OBJ_OFS_DELTA:
+            c = mm[pos]
+            pos += 1
+            rel = c & 0x7f
+            while c & 0x80:
+                c = mm[pos]
+                pos += 1
+                rel = ((rel + 1) << 7) | (c & 0x7f)
+            base = offset - rel
+        return typ, size, pos, base
+
+    def base_name(self, pos):
+        """
+        Return the binary name of a REF_DELTA object's base, which is at
+        ``pos``.
+
+        :rtype: bytes
+        """
+        return self._mm[pos:pos + _SHA_LEN]
+
+    def inflate(self, pos, size):
+        """
+        Decompress the zlib stream at ``pos``, which inflates to ``size``
+        bytes.
+
+        :param pos: offset of the zlib stream
+        :type pos: int
+        :param size: inflated size
+        :type size: int
+        :rtype: bytes
+        :raises: ValueError if the data is truncated or of the wrong size
+        """
+        d = zlib.decompressobj()
+        out = []
+        # compressed data is rarely much larger than its inflated size
+        chunk = size + 64
+        while not d.eof:
+            data = self._mm[pos:pos + chunk]
+            if not data:
+                raise ValueError('Truncated object in %s' % self.path)
+            pos += len(data)
+            out.append(d.decompress(data))
+            chunk = 65536
+        res = b''.join(out)
+        if len(res) != size:
+            raise ValueError('Object size mismatch in %s' % self.path)
+        return res
+
+    @property
+    def closed(self):
+        return self._mm.closed
+
+    def close(self):
+        self._mm.close()
+
+
+def apply_delta(base, delta):
+    """
+    Apply a git delta to ``base``.
+
+    :param base: base object data
+    :type base: bytes
+    :param delta: delta data
+    :type delta: bytes
+    :returns: the resulting object data
+    :rtype: bytes
+    :raises: ValueError if the delta is invalid or does not match ``base``
+    """
+    src_size, pos = _delta_size(delta, 0)
+    if src_size != len(base):
+        raise ValueError('Delta base size mismatch')
+    dst_size, pos = _delta_size(delta, pos)
+    out = bytearray()
+    end = len(delta)
+    while pos < end:
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            # copy from base; the low 7 bits say which offset and size
+            # bytes follow
+            off = 0
+            size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    off |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    size |= delta[pos] << (8 * i)
+                    pos += 1
+            if size == 0:
+                size = 0x10000
+            out += base[off:off + size]
+        elif op:
+            # insert the next op bytes
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise ValueError('Invalid delta opcode 0')
+    if len(out) != dst_size:
+        raise ValueError('Delta result size mismatch')
+    return bytes(out)
+
+
+def _delta_size(delta, pos):
+    """
+    Read a size from a delta header.
+
+    :returns: 2-tuple of the size and the offset after it
+    :rtype: tuple
+    """
+    size = 0
+    shift = 0
+    while True:
+        c = delta[pos]
+        pos += 1
+        size |= (c & 0x7f) << shift
+        shift += 7
+        if not c & 0x80:
+            return size, pos
+
+
+class ObjectStore(object):
+    """
+    Read-only access to the objects of a git repository, loose or packed,
+    without GitPython or the ``git`` binary. Pack files and their indexes
+    are memory-mapped when first needed; reading an object decompresses
+    only that object and, if it is stored as a delta, its chain of bases.
+    Alternate object directories (``objects/info/alternates``) are
+    searched too.
+
+    Only SHA-1 repositories are supported. ObjectStores may be used from
+    several threads.
+    """
+
+    def __init__(self, gitdir):
+        """
+        :param gitdir: git directory of the repository
+        :type gitdir: str
+        """
+        self.gitdir = gitdir
+        self.object_dirs = _object_dirs(
+            os.path.join(common_dir(gitdir), 'objects')
+        )
+        self._packs = None
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _indexes(self, reload=False):
+        """
+        Return the list of :py:class:`~.PackIndex` and (lazily opened)
+        :py:class:`~.Pack` pairs, as 2-item lists.
+        """
+        with self._lock:
+            if self._packs is not None and not reload:
+                return self._packs
+            known = {}
+            for p in (self._packs or []):
+                known[p[0].path] = p
+            packs = []
+            for d in self.object_dirs:
+                pack_dir = os.path.join(d, 'pack')
+                try:
+                    names = sorted(os.listdir(pack_dir))
+                except OSError:
+                    continue
+                for name in names:
+                    if not name.endswith('.idx'):
+                        continue
+                    path = os.path.join(pack_dir, name)
+                    if path in known:
+                        packs.append(known[path])
+                        continue
+                    try:
+                        packs.append([PackIndex(path), None])
+                    except (OSError, ValueError):
+                        logger.debug('Cannot read pack index %s', path,
+                                     exc_info=True)
+            # close the packs that a repack or gc removed; a read using one
+            # in another thread fails on the closed map and is retried
+            for path in set(known) - set(p[0].path for p in packs):
+                idx, pack = known[path]
+                idx.close()
+                if pack is not None:
+                    pack.close()
+            self._packs = packs
+            return packs
+
+    def _find_packed(self, sha):
+        """
+        Return the ``[PackIndex, Pack]`` pair containing the binary object
+        name ``sha`` and the object's offset, or (None, None).
+        """
+        for reload in (False, True):
+            # a repack may have replaced the packs since they were listed
+            for entry in self._indexes(reload):
+                try:
+                    off = entry[0].find(sha)
+                except ValueError:
+                    if entry[0].closed:
+                        # dropped by a reload in another thread
+                        continue
+                    raise
+                if off is not None:
+                    with self._lock:
+                        if entry[0].closed:
+                            continue
+                        if entry[1] is None:
+                            entry[1] = Pack(entry[0].pack_path)
+                    return entry[1], off
+        return None, None
+
+    def _with_pack(self, hexsha, func):
+        """
+        Return ``func(pack, offset)`` for the pack containing an object,
+        finding it again if another thread closes the pack meanwhile (when
+        a reload finds that it was removed by a repack).
+
+        :raises: KeyError if the object is not packed
+        """
+        sha = binascii.unhexlify(hexsha)
+        while True:
+            pack, off = self._find_packed(sha)
+            if pack is None:
+                raise KeyError(hexsha)
+            try:
+                return func(pack, off)
+            except ValueError:
+                if not pack.closed:
+                    raise
+
+    def _loose_path(self, hexsha):
+        for d in self.object_dirs:
+            path = os.path.join(d, hexsha[:2], hexsha[2:])
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def read(self, hexsha):
+        """
+        Read an object.
+
+        :param hexsha: hex object name
+        :type hexsha: str
+        :returns: 2-tuple of the object type (``commit``, ``tree``, ``blob``
+          or ``tag``) and its data
+        :rtype: tuple
+        :raises: KeyError if the object does not exist, or ValueError if it
+          is corrupt
+        """
+        path = self._loose_path(hexsha)
+        if path is not None:
+            with open(path, 'rb') as fh:
+                raw = zlib.decompress(fh.read())
+            header, _, data = raw.partition(b'\0')
+            typ, size = header.split(b' ')
+            if int(size) != len(data):
+                raise ValueError('Object size mismatch: %s' % hexsha)
+            return typ.decode('ascii'), data
+        return self._with_pack(hexsha, self._read_packed)
+
+    def read_type(self, hexsha):
+        """
+        Return the type of an object, decompressing as little as possible.
+
+        :param hexsha: hex object name
+        :type hexsha: str
+        :rtype: str
+        :raises: KeyError if the object does not exist
+        """
+        path = self._loose_path(hexsha)
+        if path is not None:
+            with open(path, 'rb') as fh:
+                header = zlib.decompressobj().decompress(fh.read(512), 32)
+            return header.split(b' ', 1)[0].decode('ascii')
+        return self._with_pack(hexsha, self._read_packed_type)
+
+    def _read_packed_type(self, pack, offset):
+        """
+        Return the type name of the object at ``offset`` in ``pack``.
+
+        :rtype: str
+        """
+        while True:
+            typ, _, pos, base = pack.header(offset)
+            if typ == OBJ_OFS_DELTA:
+                offset = base
+            elif typ == OBJ_REF_DELTA:
+                return self.read_type(
+                    binascii.hexlify(pack.base_name(pos)).decode('ascii')
+                )
+            else:
+                return _TYPE_NAMES[typ]
+
+    def _read_packed(self, pack, offset):
+        """
+        Read the object at ``offset`` in ``pack``, resolving deltas.
+
+        :returns: 2-tuple of type name and data
+        :rtype: tuple
+        """
+        chain = []
+        while True:
+            key = (pack.path, offset)
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    result = cached
+                    break
+            typ, size, pos, base = pack.header(offset)
+            if typ == OBJ_OFS_DELTA:
+                chain.append((key, pos, size))
+                offset = base
+                continue
+            if typ == OBJ_REF_DELTA:
+                chain.append((key, pos + _SHA_LEN, size))
+                result = self.read(
+                    binascii.hexlify(pack.base_name(pos)).decode('ascii')
+                )
+                break
+            if typ not in _TYPE_NAMES:
+                raise ValueError('Invalid object type %d in %s'
+                                 % (typ, pack.path))
+            result = (_TYPE_NAMES[typ], pack.inflate(pos, size))
+            self._remember(key, result)
+            break
+        for key, pos, size in reversed(chain):
+            result = (
+                result[0], apply_delta(result[1], pack.inflate(pos, size))
+            )
+            self._remember(key, result)
+        return result
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def peel(self, hexsha):
+        """
+        Follow annotated tags from ``hexsha`` to the object they tag.
+
+        :param hexsha: hex object name
+        :type hexsha: str
+        :returns: hex name of the first object that is not a tag
+        :rtype: str
+        """
+        for _ in range(32):
+            if self.read_type(hexsha) != 'tag':
+                return hexsha
+            hexsha = parse_tag(self.read(hexsha)[1])['object']
+        raise ValueError('Tag chain too long at %s' % hexsha)
+
+    def close(self):
+        """
+        Close the memory-mapped files.
+        """
+        with self._lock:
+            for idx, pack in (self._packs or []):
+                idx.close()
+                if pack is not None:
+                    pack.close()
+            self._packs = None
+            self._cache.clear()
+
+
+def _object_dirs(objects):
+    """
+    Return ``objects`` and the alternate object directories it lists in
+    ``info/alternates`` (recursively).
+
+    :param objects: path to an objects directory
+    :type objects: str
+    :rtype: list
+    """
+    dirs = [objects]
+    i = 0
+    while i < len(dirs) and len(dirs) < 16:
+        try:
+            with open(os.path.join(dirs[i], 'info', 'alternates')) as fh:
+                lines = fh.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            lines = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = os.path.normpath(os.path.join(dirs[i], line))
+            if path not in dirs:
+                dirs.append(path)
+        i += 1
+    return dirs
+
+
+def _parse_headers(data):
+    """
+    Parse the header lines of a commit or tag object, up to the first blank
+    line, joining continuation lines (which start with a space).
+
+    :returns: 2-tuple of a list of (key, value) pairs and the message
+    :rtype: tuple
+    """
+    text = data.decode('utf-8', 'replace')
+    head, _, message = text.partition('\n\n')
+    headers = []
+    for line in head.split('\n'):
+        if line.startswith(' ') and headers:
+            headers[-1] = (headers[-1][0], headers[-1][1] + '\n' + line[1:])
+            continue
+        key, _, value = line.partition(' ')
+        headers.append((key, value))
+    return headers, message
+
+
+def _signature_time(value):
+    """
+    Return the timestamp from an ``author``/``committer``/``tagger`` value
+    (``Name <email> 1234567890 +0000``), or None.
+
+    :rtype: int
+    """
+    parts = value.rsplit(' ', 2)
+    try:
+        return int(parts[-2])
+    except (IndexError, ValueError):
+        return None
+
+
+def parse_commit(data):
+    """
+    Parse a commit object.
+
+    :param data: object data
+    :type data: bytes
+    :returns: dict with keys ``tree``, ``parents`` (list), ``author``,
+      ``committer``, ``commit_time`` (committer timestamp, or None) and
+      ``message``
+    :rtype: dict
+    """
+    headers, message = _parse_headers(data)
+    res = {
+        'tree': None, 'parents': [], 'author': None, 'committer': None,
+        'commit_time': None, 'message': message
+    }
+    for key, value in headers:
+        if key == 'parent':
+            res['parents'].append(value)
+        elif key in ('tree', 'author') and res[key] is None:
+            res[key] = value
+        elif key == 'committer' and res['committer'] is None:
+            res['committer'] = value
+            res['commit_time'] = _signature_time(value)
+    return res
+
+
+def parse_tag(data):
+    """
+    Parse an annotated tag object.
+
+    :param data: object data
+    :type data: bytes
+    :returns: dict with keys ``object`` (hex name of the tagged object),
+      ``type`` (its type), ``tag`` (tag name), ``tagger`` and ``message``
+    :rtype: dict
+    """
+    headers, message = _parse_headers(data)
+    res = {
+        'object': None, 'type': None, 'tag': None, 'tagger': None,
+        'message': message
+    }
+    for key, value in headers:
+        if key in res and res[key] is None:
+            res[key] = value
+    return res
+
+
+def read_packed_refs(gitdir):
+    """
+    Parse the ``packed-refs`` file of a repository.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :returns: dict of ref name to a 2-tuple of (hex object name, hex name of
+      the peeled object). The peeled name is that of the object an
+      annotated tag points to, the object's own name if the file records
+      that it is not an annotated tag, or None if not known.
+    :rtype: dict
+    """
+    refs = {}
+    try:
+        with open(os.path.join(common_dir(gitdir), 'packed-refs'),
+                  'rb') as fh:
+            content = fh.read().decode('utf-8', 'replace')
+    except OSError:
+        return refs
+    # which refs have a "^" line after them if they are annotated tags
+    peeled_prefix = None
+    last = None
+    for line in content.splitlines():
+        if line.startswith('#'):
+            traits = line.split(':', 1)[-1].split()
+            if 'fully-peeled' in traits:
+                peeled_prefix = 'refs/'
+            elif 'peeled' in traits:
+                peeled_prefix = 'refs/tags/'
+            continue
+        if line.startswith('^'):
+            if last is not None:
+                refs[last] = (refs[last][0], line[1:].strip())
+            continue
+        parts = line.split(' ', 1)
+        if len(parts) != 2:
+            continue
+        last = parts[1].strip()
+        refs[last] = (parts[0], None)
+    if peeled_prefix is not None:
+        for name, (sha, peeled) in refs.items():
+            if peeled is None and name.startswith(peeled_prefix):
+                refs[name] = (sha, sha)
+    return refs
+
+
+def resolve_ref(gitdir, name='HEAD'):
+    """
+    Return the hex object name a ref points to, following symbolic refs,
+    from the loose ref files and ``packed-refs``.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param name: full ref name, i.e. ``HEAD`` or ``refs/heads/master``
+    :type name: str
+    :returns: hex object name, or None if the ref does not exist (i.e. an
+      unborn branch)
+    :rtype: str
+    """
+    common = common_dir(gitdir)
+    packed = None
+    for _ in range(8):
+        # HEAD is per-worktree, other refs are shared
+        base = gitdir if '/' not in name else common
+        try:
+            with open(os.path.join(base, name), 'rb') as fh:
+                value = fh.read().decode('utf-8', 'replace').strip()
+        except OSError:
+            value = None
+        if value is None:
+            if packed is None:
+                packed = read_packed_refs(gitdir)
+            if name not in packed:
+                return None
+            return packed[name][0]
+        if value.startswith('ref:'):
+            name = value[4:].strip()
+            continue
+        return value
+    raise ValueError('Symbolic ref loop at %s' % name)
+
+
+def symbolic_ref(gitdir, name='HEAD'):
+    """
+    Return the ref that a symbolic ref (i.e. ``HEAD``) points to, or None if
+    it is not symbolic (i.e. a detached HEAD).
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param name: ref name
+    :type name: str
+    :rtype: str
+    """
+    try:
+        with open(os.path.join(gitdir, name), 'rb') as fh:
+            value = fh.read().decode('utf-8', 'replace').strip()
+    except OSError:
+        return None
+    if value.startswith('ref:'):
+        return value[4:].strip()
+    return None
+
+
+def iter_refs(gitdir, prefix='refs/tags/'):
+    """
+    Return every ref under ``prefix``, loose or packed; loose refs take
+    precedence over packed ones of the same name.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param prefix: ref name prefix, ending in ``/``
+    :type prefix: str
+    :returns: dict of ref name to 2-tuple of (hex object name, hex name of
+      the peeled object or None), as for :py:func:`~.read_packed_refs`
+    :rtype: dict
+    """
+    refs = {}
+    for name, value in read_packed_refs(gitdir).items():
+        if name.startswith(prefix):
+            refs[name] = value
+    top = os.path.join(common_dir(gitdir), *prefix.rstrip('/').split('/'))
+    for dirpath, _, filenames in os.walk(top):
+        for fn in filenames:
+            path = os.path.join(dirpath, fn)
+            try:
+                with open(path, 'rb') as fh:
+                    value = fh.read().decode('utf-8', 'replace').strip()
+            except OSError:
+                continue
+            if len(value) != _SHA_LEN * 2:
+                # i.e. a symbolic ref
+                continue
+            rel = os.path.relpath(path, top).replace(os.sep, '/')
+            refs[prefix + rel] = (value, None)
+    return refs
+
+
+def tags_at(gitdir, hexsha, store=None):
+    """
+    Return the names of the tags (lightweight or annotated) pointing at the
+    commit ``hexsha``, sorted. Annotated tags are peeled using the peeled
+    names recorded in ``packed-refs`` when available, or else by reading
+    the tag objects with ``store``.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param hexsha: hex object name of the commit
+    :type hexsha: str
+    :param store: object store to peel tags with; created if needed
+    :type store: :py:class:`~.ObjectStore`
+    :rtype: list
+    :raises: ValueError if ``gitdir`` is not a git directory
+    """
+    if not os.path.isdir(os.path.join(common_dir(gitdir), 'refs')):
+        raise ValueError('Not a git directory: %s' % gitdir)
+    names = []
+    for name, (sha, peeled) in iter_refs(gitdir, 'refs/tags/').items():
+        if peeled is None:
+            if sha == hexsha:
+                # a tag object cannot have the same name as a commit
+                names.append(name)
+                continue
+            if store is None:
+                store = ObjectStore(gitdir)
+            try:
+                peeled = store.peel(sha)
+            except (KeyError, ValueError):
+                logger.debug('Cannot peel %s', name, exc_info=True)
+                continue
+        if peeled == hexsha:
+            names.append(name)
+    return sorted(n[len('refs/tags/'):] for n in names)
+
+
+def peeled_tags(gitdir, store=None):
+    """
+    Return the commits (or other objects) that the repository's tags point
+    to, with annotated tags peeled.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param store: object store to peel tags with; created if needed
+    :type store: :py:class:`~.ObjectStore`
+    :returns: dict of hex object name to the sorted list of the names of
+      the tags pointing to it
+    :rtype: dict
+    :raises: ValueError if ``gitdir`` is not a git directory
+    """
+    if not os.path.isdir(os.path.join(common_dir(gitdir), 'refs')):
+        raise ValueError('Not a git directory: %s' % gitdir)
+    res = {}
+    for name, (sha, peeled) in iter_refs(gitdir, 'refs/tags/').items():
+        if peeled is None:
+            if store is None:
+                store = ObjectStore(gitdir)
+            try:
+                peeled = store.peel(sha)
+            except (KeyError, ValueError):
+                logger.debug('Cannot peel %s', name, exc_info=True)
+                continue
+        res.setdefault(peeled, []).append(name[len('refs/tags/'):])
+    for names in res.values():
+        names.sort()
+    return res
+
+
+def _config_value(text):
+    """
+    Decode the value part of a git config line: strip unquoted whitespace
+    and comments, remove double quotes and process escapes.
+
+    :returns: 2-tuple of the value and whether the line is continued by a
+      trailing backslash
+    :rtype: tuple
+    """
+    res = []
+    quoted = False
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == '\\':
+            if i + 1 == n:
+                return ''.join(res).strip(), True
+            nxt = text[i + 1]
+            res.append({'n': '\n', 't': '\t', 'b': '\b'}.get(nxt, nxt))
+            i += 2
+            continue
+        if c == '"':
+            quoted = not quoted
+        elif c in '#;' and not quoted:
+            break
+        else:
+            res.append(c)
+        i += 1
+    return ''.join(res).strip(), False
+
+
+def read_config(gitdir):
+    """
+    Parse the repository's ``config`` file (in the common directory, for a
+    linked worktree). ``include`` and ``includeIf`` directives are not
+    followed.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :returns: dict of (section, subsection or None, name) to the list of
+      that variable's values, in order. Section and variable names are
+      lower-cased; subsections are case-sensitive. Variables without a value
+      (boolean true) have the value None.
+    :rtype: dict
+    """
+    return read_config_file(os.path.join(common_dir(gitdir), 'config'))
+
+
+def read_config_file(path):
+    """
+    Parse a git config file, as :py:func:`~.read_config` does.
+
+    :param path: path to the file
+    :type path: str
+    :returns: dict of (section, subsection or None, name) to the list of
+      values; empty if the file cannot be read
+    :rtype: dict
+    """
+    res = {}
+    try:
+        with open(path, 'rb') as fh:
+            lines = fh.read().decode('utf-8', 'replace').splitlines()
+    except OSError:
+        return res
+    section = None
+    subsection = None
+    lines = iter(lines)
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            end = line.find(']')
+            if end == -1:
+                continue
+            header = line[1:end].strip()
+            if '"' in header:
+                name, _, sub = header.partition('"')
+                section = name.strip().lower()
+                subsection = sub.rsplit('"', 1)[0].replace(
+                    '\\"', '"').replace('\\\\', '\\')
+            elif '.' in header:
+                # deprecated [section.subsection] syntax
+                section, _, subsection = header.partition('.')
+                section = section.lower()
+                subsection = subsection.lower()
+            else:
+                section = header.lower()
+                subsection = None
+            line = line[end + 1:].strip()
+        if not line or line[0] in '#;' or section is None:
+            continue
+        name, eq, value = line.partition('=')
+        name = name.strip().lower()
+        if not _CONFIG_NAME_RE.match(name):
+            continue
+        if not eq:
+            res.setdefault((section, subsection, name), []).append(None)
+            continue
+        parts = []
+        value, more = _config_value(value)
+        parts.append(value)
+        while more:
+            value, more = _config_value(next(lines, ''))
+            parts.append(value)
+        res.setdefault((section, subsection, name), []).append(''.join(parts))
+    return res
+
+
+def _map_refspec(spec, ref):
+    """
+    Return the ref that a fetch refspec (i.e.
+    ``+refs/heads/*:refs/remotes/origin/*``) maps the remote ref ``ref`` to,
+    or None if it does not match.
+
+    :rtype: str
+    """
+    spec = spec.lstrip('+')
+    if spec.startswith('^'):
+        return None
+    src, _, dst = spec.partition(':')
+    if not dst:
+        return None
+    if '*' not in src:
+        return dst if src == ref else None
+    pre, _, post = src.partition('*')
+    if len(ref) < len(pre) + len(post) or not ref.startswith(pre) or \
+            not ref.endswith(post):
+        return None
+    return dst.replace('*', ref[len(pre):len(ref) - len(post)], 1)
+
+
+def upstream_ref(gitdir, branch, config=None):
+    """
+    Return the local ref that tracks the upstream of a branch: the
+    ``branch.<name>.merge`` ref of its ``branch.<name>.remote``, mapped
+    through that remote's fetch refspecs (i.e. ``refs/remotes/origin/main``),
+    or the local branch itself if the remote is ``.``.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param branch: branch name, without ``refs/heads/``
+    :type branch: str
+    :param config: result of :py:func:`~.read_config`; read if needed
+    :type config: dict
+    :returns: full ref name, or None if the branch has no upstream
+    :rtype: str
+    """
+    if config is None:
+        config = read_config(gitdir)
+    remote = config.get(('branch', branch, 'remote'), [None])[-1]
+    merge = config.get(('branch', branch, 'merge'), [None])[-1]
+    if not remote or not merge:
+        return None
+    if not merge.startswith('refs/'):
+        merge = 'refs/heads/' + merge
+    if remote == '.':
+        return merge
+    for spec in config.get(('remote', remote, 'fetch'), []):
+        if spec is None:
+            continue
+        ref = _map_refspec(spec, merge)
+        if ref is not None:
+            return ref
+    return None
@@ -0,0 +1,475 @@
+"""
+versionfinder/gitrepo.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import stat
+import atexit
+import subprocess
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+#: Maximum number of ``git.Repo`` objects kept open by
+#: :py:func:`~.pooled_repo`; each may hold open ``git cat-file`` processes
+#: and file handles.
+POOL_SIZE = 8
+
+# path -> _PoolEntry, least recently used first
+_pool = OrderedDict()
+_pool_lock = threading.Lock()
+
+# directories that installed distributions live in; the search for a git
+# clone never goes up into (or above) them, so that a package installed in a
+# virtualenv that happens to be inside a git clone is not reported as being
+# that clone
+_SITE_DIRS = frozenset(['site-packages', 'dist-packages'])
+
+# directory (absolute path) -> git directory found by find_git_dir(), or None
+_cache = {}
+
+
+def find_git_dir(path):
+    """
+    Find the git directory of the clone containing ``path``, looking for a
+    ``.git`` directory (or ``gitdir:`` file, as used by submodules and linked
+    worktrees) in ``path`` and then each of its parents, like ``git`` does.
+    The search stops, without a result, at the root of the filesystem, at a
+    mount point (a parent on a different device) and at ``site-packages``
+    or ``dist-packages``, which is itself not checked.
+
+    Results are cached for the life of the process for every directory on
+    the searched chain, positive and negative alike. A later call for any of
+    them returns the cached result without touching the filesystem; one for
+    a directory below them skips the ``.git`` probing and ``gitdir:``
+    parsing from the first cached directory up, but still stats each
+    directory it walks through, to detect mount points. Call
+    :py:func:`~.clear_cache` if clones may have been created or removed
+    since.
+
+    :param path: directory to start in
+    :type path: str
+    :returns: path to the git directory, or None if ``path`` is not in a git
+      clone
+    :rtype: str
+    """
+    p = os.path.abspath(path)
+    if p in _cache:
+        return _cache[p]
+    try:
+        dev = _device(p)
+    except OSError:
+        logger.debug('Cannot stat %s; not looking for a git clone', p)
+        return None
+    visited = []
+    result = None
+    while True:
+        if p in _cache:
+            result = _cache[p]
+            break
+        visited.append(p)
+        if os.path.basename(p) in _SITE_DIRS:
+            logger.debug('Stopping git clone search at %s', p)
+            break
+        result = _dotgit(os.path.join(p, '.git'))
+        if result is not None:
+            break
+        parent = os.path.dirname(p)
+        if parent == p:
+            break
+        try:
+            parent_dev = _device(parent)
+        except OSError:
+            break
+        if parent_dev != dev:
+            logger.debug('Stopping git clone search at mount point %s', p)
+            break
+        p = parent
+        dev = parent_dev
+    for d in visited:
+        _cache[d] = result
+    return result
+
+
+def clear_cache():
+    """
+    Clear the cache of :py:func:`~.find_git_dir` results.
+    """
+    _cache.clear()
+
+
+def repo_path(gitdir):
+    """
+    Return the path to open a ``git.Repo`` for the git directory ``gitdir``
+    with: ``gitdir`` itself, or the working tree if it is the git directory
+    of a linked worktree (which GitPython cannot open directly).
+
+    :param gitdir: git directory, as returned by :py:func:`~.find_git_dir`
+    :type gitdir: str
+    :rtype: str
+    """
+    if not os.path.isfile(os.path.join(gitdir, 'commondir')):
+        return gitdir
+    try:
+        with open(os.path.join(gitdir, 'gitdir')) as fh:
+            dotgit = fh.readline().strip()
+    except (OSError, UnicodeDecodeError):
+        return gitdir
+    if not dotgit:
+        return gitdir
+    return os.path.dirname(os.path.join(gitdir, dotgit))
+
+
+class _PoolEntry(object):
+    """
+    A pooled ``git.Repo``, opened on first use. The lock is held while the
+    Repo is in use, as a Repo (and its persistent ``git cat-file``
+    processes) cannot be used by more than one thread at a time.
+    """
+
+    def __init__(self):
+        self.repo = None
+        self.evicted = False
+        self.lock = threading.Lock()
+
+    def close(self):
+        """
+        Close the Repo, if it is open. The caller must hold the lock.
+        """
+        repo = self.repo
+        self.repo = None
+        if repo is None:
+            return
+        try:
+            repo.close()
+        except Exception:
+            logger.debug('Exception closing git.Repo', exc_info=True)
+
+
+@contextmanager
+def pooled_repo(path, factory):
+    """
+    Context manager returning a ``git.Repo`` for ``path`` from a
+    process-wide pool of up to :py:data:`~.POOL_SIZE` Repos, opening one
+    with ``factory(path)`` if there is none. Reusing a Repo reuses its
+    persistent ``git cat-file`` processes. The least recently used Repo is
+    closed when the pool is full, and all of them are closed at interpreter
+    exit (or by :py:func:`~.close_pool`).
+
+    The Repo is for the exclusive use of the calling thread until the
+    context manager exits; other threads wanting the same Repo wait. If an
+    exception propagates out of the ``with`` block, the Repo is closed and
+    removed from the pool, in case it is broken.
+
+    :param path: path to open the Repo for, i.e. from
+      :py:func:`~.repo_path`
+    :type path: str
+    :param factory: callable taking ``path`` and returning a new
+      ``git.Repo``
+    :type factory: callable
+    """
+    with _pool_lock:
+        entry = _pool.pop(path, None)
+        if entry is None:
+            entry = _PoolEntry()
+        _pool[path] = entry
+        evicted = []
+        while len(_pool) > POOL_SIZE:
+            evicted.append(_pool.popitem(last=False)[1])
+        for e in evicted:
+            e.evicted = True
+    for e in evicted:
+        # waits for any thread still using it
+        with e.lock:
+            e.close()
+    with entry.lock:
+        try:
+            if entry.repo is None:
+                logger.debug('opening %s as git.Repo', path)
+                entry.repo = factory(path)
+            yield entry.repo
+        except Exception:
+            with _pool_lock:
+                if _pool.get(path) is entry:
+                    del _pool[path]
+                entry.evicted = True
+            raise
+        finally:
+            # evicted while waiting for, or using, the Repo
+            if entry.evicted:
+                entry.close()
+
+
+def close_pool():
+    """
+    Close and remove every Repo in the :py:func:`~.pooled_repo` pool that is
+    not in use; those that are in use are closed when they are released.
+    Called at interpreter exit.
+    """
+    with _pool_lock:
+        entries = list(_pool.values())
+        _pool.clear()
+        for e in entries:
+            e.evicted = True
+    for e in entries:
+        if e.lock.acquire(False):
+            try:
+                e.close()
+            finally:
+                e.lock.release()
+
+
+atexit.register(close_pool)
+
+
+def git_cli_info(gitdir):
+    """
+    Find information about a git clone by running the ``git`` binary, for
+    use when GitPython is not available. The two commands needed (``git
+    status`` for the HEAD commit and dirty state, and ``git config`` for the
+    remote URLs) do not depend on each other, so they are started at once,
+    and the tags pointing at HEAD are found with
+    :py:func:`~versionfinder.gitobjects.tags_at` while they run. If that
+    fails, ``git for-each-ref`` is run to find them instead.
+
+    :param gitdir: git directory, as returned by :py:func:`~.find_git_dir`
+    :type gitdir: str
+    :returns: dict with keys ``commit`` (HEAD SHA, or None before the first
+      commit), ``dirty`` (whether there are uncommitted changes or untracked
+      files), ``remotes`` (dict of remote name to its first URL) and ``tag``
+      (the last, by name, of the tags pointing at HEAD, or None)
+    :rtype: dict
+    :raises: OSError if ``git`` cannot be run, or
+      :py:exc:`subprocess.CalledProcessError` if ``git status`` fails (i.e.
+      ``gitdir`` is not a git directory)
+    """
+    # imported here to keep the import of this module (and of versionfinder)
+    # fast; these are only needed when a git clone is inspected
+    from .gitobjects import resolve_ref, tags_at
+    work_tree = repo_path(gitdir)
+    if work_tree == gitdir:
+        # a submodule's git directory sets core.worktree, which overrides
+        # this; otherwise the clone is the directory containing .git
+        work_tree = os.path.dirname(gitdir)
+    env = dict(os.environ)
+    # do not let "git status" take the index lock to refresh the index
+    env['GIT_OPTIONAL_LOCKS'] = '0'
+    commands = [
+        ['status', '--porcelain=v2', '--branch', '--untracked-files=normal',
+         '-z'],
+        ['config', '-z', '--get-regexp', r'^remote\..*\.url$'],
+    ]
+    procs = [_start_git(gitdir, work_tree, env, args) for args in commands]
+    try:
+        head = resolve_ref(gitdir)
+        tags = [] if head is None else tags_at(gitdir, head)
+    except Exception:
+        logger.debug('Cannot find tags natively; running git for-each-ref',
+                     exc_info=True)
+        procs.append(_start_git(gitdir, work_tree, env, [
+            'for-each-ref', '--points-at=HEAD', '--format=%(refname)',
+            'refs/tags/'
+        ]))
+        tags = None
+    outputs = []
+    for p in procs:
+        out = p.communicate()[0]
+        outputs.append((p.returncode, out.decode('utf-8', 'replace')))
+    res = _parse_status(outputs[0][0], outputs[0][1])
+    if tags is None and outputs[2][0] == 0:
+        tags = sorted(
+            line[len('refs/tags/'):] for line in outputs[2][1].splitlines()
+            if line.startswith('refs/tags/')
+        )
+    res['tag'] = tags[-1] if tags else None
+    # "git config --get-regexp" exits 1 if there are no remotes
+    res['remotes'] = _parse_remotes(outputs[1][1])
+    return res
+
+
+def native_git_info(gitdir):
+    """
+    Find the same information about a git clone as :py:func:`~.git_cli_info`
+    without running git, for use when neither GitPython nor the ``git``
+    binary is available. The HEAD commit and its tags are found with
+    :py:mod:`versionfinder.gitobjects`, the remote URLs are read from the
+    repository's ``config`` file, and the dirty state is found with
+    :py:func:`~versionfinder.gitindex.is_dirty`. This reads every tracked
+    file's stat data from Python, so it is slower than ``git status`` on
+    large working trees.
+
+    :param gitdir: git directory, as returned by :py:func:`~.find_git_dir`
+    :type gitdir: str
+    :returns: dict with the same keys as :py:func:`~.git_cli_info`; ``dirty``
+      is None if it cannot be found without git
+    :rtype: dict
+    :raises: ValueError if ``gitdir`` is not a git directory
+    """
+    from .gitobjects import read_config, resolve_ref, tags_at
+    from .gitindex import is_dirty
+    head = resolve_ref(gitdir)
+    tags = [] if head is None else tags_at(gitdir, head)
+    remotes = {}
+    for (section, name, key), urls in read_config(gitdir).items():
+        if section == 'remote' and key == 'url' and name is not None and \
+                urls[0] is not None:
+            remotes[name] = urls[0]
+    return {
+        'commit': head,
+        'dirty': is_dirty(gitdir),
+        'tag': tags[-1] if tags else None,
+        'remotes': remotes
+    }
+
+
+def _start_git(gitdir, work_tree, env, args):
+    """
+    Start a ``git`` command for a repository, with its output piped.
+
+    :param gitdir: git directory
+    :type gitdir: str
+    :param work_tree: directory to run in
+    :type work_tree: str
+    :param env: environment variables
+    :type env: dict
+    :param args: git command and arguments
+    :type args: list
+    :rtype: subprocess.Popen
+    """
+    return subprocess.Popen(
+        ['git', '--git-dir', gitdir] + args, cwd=work_tree, env=env,
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def _parse_status(returncode, out):
+    """
+    Parse the output of ``git status --porcelain=v2 --branch -z``.
+
+    :param returncode: exit code of the command
+    :type returncode: int
+    :param out: decoded output
+    :type out: str
+    :returns: dict with ``commit`` and ``dirty`` keys
+    :rtype: dict
+    :raises: :py:exc:`subprocess.CalledProcessError` if the command failed
+    """
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, 'git status')
+    res = {'commit': None, 'dirty': False}
+    for entry in out.split('\0'):
+        if entry.startswith('# branch.oid '):
+            oid = entry[len('# branch.oid '):]
+            if oid != '(initial)':
+                res['commit'] = oid
+        elif entry and not entry.startswith('#'):
+            # a changed, unmerged or untracked path (or, for renames, the
+            # original path that follows one)
+            res['dirty'] = True
+    return res
+
+
+def _parse_remotes(out):
+    """
+    Parse the output of ``git config -z --get-regexp`` for remote URLs.
+
+    :param out: decoded output
+    :type out: str
+    :returns: dict of remote name to its first URL
+    :rtype: dict
+    """
+    remotes = {}
+    for entry in out.split('\0'):
+        key, _, url = entry.partition('\n')
+        if not key.startswith('remote.') or not key.endswith('.url'):
+            continue
+        name = key[len('remote.'):-len('.url')]
+        if name not in remotes:
+            remotes[name] = url
+    return remotes
+
+
+def _device(path):
+    """
+    Return the device number of the filesystem ``path`` is on.
+
+    :param path: path to stat
+    :type path: str
+    :rtype: int
+    :raises: OSError if ``path`` cannot be stat'ed
+    """
+    return os.stat(path).st_dev
+
+
+def _dotgit(path):
+    """
+    Return the git directory for a ``.git`` path: the path itself if it is a
+    directory, the target of a ``gitdir: <path>`` file if that exists, or
+    else None.
+
+    :param path: path to a possible ``.git`` directory or file
+    :type path: str
+    :rtype: str
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if stat.S_ISDIR(st.st_mode):
+        return path
+    try:
+        with open(path) as fh:
+            line = fh.readline()
+    except (OSError, UnicodeDecodeError):
+        logger.debug('Cannot read %s', path, exc_info=True)
+        return None
+    if not line.startswith('gitdir:'):
+        logger.debug('%s is not a gitdir file', path)
+        return None
+    target = os.path.normpath(os.path.join(
+        os.path.dirname(path), line[len('gitdir:'):].strip()
+    ))
+    if not os.path.isdir(target):
+        logger.debug('%s points to nonexistent git directory %s',
+                     path, target)
+        return None
+    return target
@@ -0,0 +1,148 @@
+"""
+versionfinder/logfilter.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import inspect
+import logging
+
+from .cached import CachedVersion
+
+#: default mapping of LogRecord attribute names to the
+#: :py:class:`~versionfinder.versioninfo.VersionInfo` attributes they are set
+#: from
+DEFAULT_ATTRIBUTES = {
+    'app_version': 'version',
+    'app_commit': 'git_commit',
+}
+
+
+class VersionFilter(logging.Filter):
+    """
+    :py:class:`logging.Filter` that adds version information for a package
+    to every :py:class:`logging.LogRecord` it sees, e.g. for use as
+    ``%(app_version)s`` and ``%(app_commit)s`` in a format string or as
+    fields of a structured log formatter. It never filters records out.
+
+    The version is found once via
+    :py:class:`~versionfinder.cached.CachedVersion`; the attribute values are
+    computed once per change in the version information, so adding them to
+    a record is a single dict update of a fixed number of keys. Until the
+    version has been found, the attributes are set to None.
+    """
+
+    def __init__(self, package_name, attributes=None, **kwargs):
+        """
+        :param package_name: name of the package to report the version of
+        :type package_name: str
+        :param attributes: mapping of LogRecord attribute name to
+          :py:class:`~versionfinder.versioninfo.VersionInfo` attribute name;
+          defaults to :py:data:`~.DEFAULT_ATTRIBUTES`
+        :type attributes: dict
+        :param kwargs: other keyword arguments for
+          :py:class:`~versionfinder.cached.CachedVersion`; if
+          ``package_file`` is not given, the file that constructed the filter
+          is used
+        """
+        super(VersionFilter, self).__init__()
+        if attributes is None:
+            attributes = DEFAULT_ATTRIBUTES
+        self._attributes = dict(attributes)
+        self.record_attrs = dict((k, None) for k in self._attributes)
+        if 'package_file' not in kwargs and 'caller_frame' not in kwargs:
+            kwargs['caller_frame'] = inspect.stack()[1][0]
+        self.version = CachedVersion(package_name, **kwargs)
+        self.version.add_callback(self._update)
+
+    def _update(self, info):
+        """
+        Recompute the record attributes for new version information. The
+        dict is replaced rather than updated, so records never see a mix of
+        old and new values.
+
+        :param info: version information
+        :type info: :py:class:`~versionfinder.versioninfo.VersionInfo`
+        """
+        self.record_attrs = dict(
+            (k, getattr(info, v)) for k, v in self._attributes.items()
+        )
+
+    def filter(self, record):
+        """
+        Add the version attributes to ``record``.
+
+        :param record: the log record
+        :type record: logging.LogRecord
+        :return: True
+        :rtype: bool
+        """
+        record.__dict__.update(self.record_attrs)
+        return True
+
+
+def install_record_factory(package_name, attributes=None, **kwargs):
+    """
+    Wrap the current :py:func:`logging.getLogRecordFactory` so that every
+    :py:class:`logging.LogRecord` created in the process, from any logger,
+    gets the version attributes of a :py:class:`~.VersionFilter`. Unlike
+    adding the filter to a handler or logger, this needs no per-handler
+    configuration.
+
+    :param package_name: name of the package to report the version of
+    :type package_name: str
+    :param attributes: mapping of LogRecord attribute name to
+      :py:class:`~versionfinder.versioninfo.VersionInfo` attribute name;
+      defaults to :py:data:`~.DEFAULT_ATTRIBUTES`
+    :type attributes: dict
+    :param kwargs: other keyword arguments for
+      :py:class:`~versionfinder.cached.CachedVersion`; if ``package_file``
+      is not given, the file that called this function is used
+    :return: the filter whose attributes are added to records
+    :rtype: :py:class:`~.VersionFilter`
+    """
+    if 'package_file' not in kwargs and 'caller_frame' not in kwargs:
+        kwargs['caller_frame'] = inspect.stack()[1][0]
+    vfilter = VersionFilter(package_name, attributes=attributes, **kwargs)
+    old_factory = logging.getLogRecordFactory()
+
+    def factory(*args, **kw):
+        record = old_factory(*args, **kw)
+        record.__dict__.update(vfilter.record_attrs)
+        return record
+
+    logging.setLogRecordFactory(factory)
+    return vfilter
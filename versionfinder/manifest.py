@@ -0,0 +1,276 @@
+"""
+versionfinder/manifest.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import json
+import mmap
+import struct
+import zlib
+import logging
+import threading
+
+from .versioninfo import VersionInfo
+from .environment import normalize_name
+
+logger = logging.getLogger(__name__)
+
+#: Magic bytes at the start of every manifest file.
+MANIFEST_MAGIC = b'VFMF'
+
+#: Manifest format version written by :py:func:`~.write_manifest`.
+MANIFEST_VERSION = 1
+
+# header: magic, format version, reserved, number of index slots, entry count
+_HEADER = struct.Struct('<4sHHII')
+
+# index slot: name hash, entry length, absolute entry offset. A slot with a
+# length of zero is empty.
+_SLOT = struct.Struct('<IIQ')
+
+# open Manifest objects, keyed by path; see :py:func:`~.find_manifest_version`
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def _name_hash(normalized):
+    """
+    Return the (process-independent) 32-bit hash of a normalized name, used
+    to place and find entries in the manifest index.
+
+    :param normalized: normalized distribution name
+    :type normalized: str
+    :rtype: int
+    """
+    return zlib.crc32(normalized.encode('utf-8')) & 0xffffffff
+
+
+def write_manifest(path, infos):
+    """
+    Write a manifest of version information for many distributions to
+    ``path``, for later lookup via :py:class:`~.Manifest` or
+    :py:func:`versionfinder.find_version`.
+
+    The file consists of a fixed-size header, an open-addressing hash index
+    of (name hash, length, offset) slots, and one compact JSON document per
+    distribution. Readers memory-map the file and decode only the entry they
+    are asked for, so lookup cost does not depend on the number of
+    distributions in the manifest. The file is written to a temporary path
+    and then renamed into place, so readers never see a partial manifest.
+
+    :param path: path to write the manifest to
+    :type path: str
+    :param infos: mapping of distribution name to
+      :py:class:`~versionfinder.versioninfo.VersionInfo`, or an iterable of
+      ``(name, VersionInfo)`` 2-tuples
+    :type infos: dict or iterable
+    :return: number of entries written
+    :rtype: int
+    :raises: ValueError if two entries have the same normalized name
+    """
+    if hasattr(infos, 'items'):
+        infos = infos.items()
+    entries = []
+    seen = set()
+    for name, info in infos:
+        norm = normalize_name(name)
+        if norm in seen:
+            raise ValueError('Duplicate distribution in manifest: %s' % name)
+        seen.add(norm)
+        body = json.dumps(
+            {'name': name, 'info': info.as_dict},
+            sort_keys=True, separators=(',', ':')
+        ).encode('utf-8')
+        entries.append((norm, body))
+    nslots = 1
+    while nslots < len(entries) * 2:
+        nslots <<= 1
+    slots = [None] * nslots
+    offset = _HEADER.size + (nslots * _SLOT.size)
+    for norm, body in entries:
+        h = _name_hash(norm)
+        i = h & (nslots - 1)
+        while slots[i] is not None:
+            i = (i + 1) & (nslots - 1)
+        slots[i] = (h, len(body), offset)
+        offset += len(body)
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as fh:
+        fh.write(_HEADER.pack(
+            MANIFEST_MAGIC, MANIFEST_VERSION, 0, nslots, len(entries)
+        ))
+        for slot in slots:
+            fh.write(_SLOT.pack(*slot) if slot is not None else
+                     _SLOT.pack(0, 0, 0))
+        for _, body in entries:
+            fh.write(body)
+    os.replace(tmp_path, path)
+    logger.debug('Wrote manifest of %d distributions to %s',
+                 len(entries), path)
+    return len(entries)
+
+
+class Manifest(object):
+    """
+    Read-only, memory-mapped view of a manifest written by
+    :py:func:`~.write_manifest`.
+    """
+
+    def __init__(self, path):
+        """
+        Open and memory-map a manifest file. Only the header is read here;
+        entries are decoded on demand by :py:meth:`~.find_version`.
+
+        :param path: path to the manifest file
+        :type path: str
+        :raises: ValueError if the file is not a manifest of a supported
+          format version
+        """
+        self.path = path
+        with open(path, 'rb') as fh:
+            st = os.fstat(fh.fileno())
+            self.signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, ver, _, nslots, count = _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = ver = None
+        if magic != MANIFEST_MAGIC:
+            self.close()
+            raise ValueError('%s is not a versionfinder manifest' % path)
+        if ver != MANIFEST_VERSION:
+            self.close()
+            raise ValueError(
+                'Unsupported manifest version %s in %s' % (ver, path)
+            )
+        self._nslots = nslots
+        self._count = count
+        self._decoded = {}
+
+    def __len__(self):
+        return self._count
+
+    def _entry(self, name):
+        """
+        Find and decode the raw entry for the named distribution.
+
+        :param name: distribution name
+        :type name: str
+        :return: decoded entry dict, or None if not in the manifest
+        :rtype: :py:obj:`dict` or :py:data:`None`
+        """
+        norm = normalize_name(name)
+        h = _name_hash(norm)
+        mask = self._nslots - 1
+        i = h & mask
+        for _ in range(self._nslots):
+            slot_hash, length, offset = _SLOT.unpack_from(
+                self._map, _HEADER.size + (i * _SLOT.size)
+            )
+            if length == 0:
+                return None
+            if slot_hash == h:
+                entry = json.loads(
+                    self._map[offset:offset + length].decode('utf-8')
+                )
+                if normalize_name(entry['name']) == norm:
+                    return entry
+            i = (i + 1) & mask
+        return None
+
+    def find_version(self, name):
+        """
+        Return the version information recorded for the named distribution.
+
+        :param name: distribution name; compared after PEP 503 normalization
+        :type name: str
+        :return: recorded version information, or None if the distribution
+          is not in the manifest
+        :rtype: :py:class:`~versionfinder.versioninfo.VersionInfo` or
+          :py:data:`None`
+        """
+        norm = normalize_name(name)
+        if norm not in self._decoded:
+            entry = self._entry(name)
+            self._decoded[norm] = (
+                None if entry is None else VersionInfo(**entry['info'])
+            )
+        return self._decoded[norm]
+
+    def close(self):
+        """
+        Unmap the manifest file.
+        """
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def find_manifest_version(path, name):
+    """
+    Look up the named distribution in the manifest at ``path``, reusing an
+    already-mapped :py:class:`~.Manifest` when the file has not changed since
+    it was opened. This never raises; a missing or invalid manifest is
+    logged and treated as not containing the distribution.
+
+    :param path: path to the manifest file
+    :type path: str
+    :param name: distribution name
+    :type name: str
+    :return: recorded version information, or None if not found
+    :rtype: :py:class:`~versionfinder.versioninfo.VersionInfo` or
+      :py:data:`None`
+    """
+    try:
+        st = os.stat(path)
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with _manifests_lock:
+            manifest = _manifests.get(path)
+            if manifest is None or manifest.signature != signature:
+                # the replaced Manifest is not closed here, as another
+                # thread may be reading from it; it's unmapped on collection
+                manifest = Manifest(path)
+                _manifests[path] = manifest
+        return manifest.find_version(name)
+    except Exception:
+        logger.debug('Unable to read manifest %s', path, exc_info=True)
+        return None
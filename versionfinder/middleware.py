@@ -0,0 +1,246 @@
+"""
+versionfinder/middleware.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import json
+import inspect
+
+from .cached import CachedVersion
+
+# response for the version endpoint before version information is available
+_NOT_READY_BODY = b'{"status":"resolving"}'
+
+
+def render_version_json(info):
+    """
+    Render version information as the JSON body served by the version
+    endpoint: the :py:attr:`~versionfinder.versioninfo.VersionInfo.as_dict`
+    fields plus ``version``, ``url`` and ``long_str``.
+
+    :param info: version information to render
+    :type info: :py:class:`~versionfinder.versioninfo.VersionInfo`
+    :return: UTF-8 encoded JSON
+    :rtype: bytes
+    """
+    d = info.as_dict
+    d['version'] = info.version
+    d['url'] = info.url
+    d['long_str'] = info.long_str
+    return json.dumps(d, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class _VersionEndpoint(object):
+    """
+    Shared implementation of :py:class:`~.VersionMiddleware` and
+    :py:class:`~.ASGIVersionMiddleware`: owns the
+    :py:class:`~versionfinder.cached.CachedVersion` and the pre-rendered
+    response parts, which are rebuilt only when the version information
+    changes.
+
+    Each subclass's ``_render`` method is called with new version
+    information and sets ``_rendered`` to a tuple of the response body, the
+    version path's response headers and the header added to other
+    responses (or None). The tuple is replaced with a single assignment,
+    and each request reads it once, so that a request served during a
+    refresh never mixes the parts of two versions.
+    """
+
+    def __init__(self, app, package_name, path, header, caller_frame,
+                 kwargs):
+        self.app = app
+        self.path = path
+        self.header = header
+        self._rendered = None
+        if 'package_file' not in kwargs and 'caller_frame' not in kwargs:
+            kwargs['caller_frame'] = caller_frame
+        self.version = CachedVersion(package_name, **kwargs)
+        self.version.add_callback(self._render)
+
+
+class VersionMiddleware(_VersionEndpoint):
+    """
+    WSGI middleware that serves version information for a package at a
+    fixed path (by default ``/version``) and adds it to every other response
+    as a header (by default ``X-App-Version``, with the value of
+    :py:attr:`~versionfinder.versioninfo.VersionInfo.long_str`).
+
+    The version is found once, in a background thread started when the
+    middleware is constructed; the response body and headers are rendered
+    once when it is found, so requests never call versionfinder. Until
+    then, the version path returns HTTP 503 and no header is added.
+    """
+
+    def __init__(self, app, package_name, path='/version',
+                 header='X-App-Version', **kwargs):
+        """
+        :param app: the WSGI application to wrap
+        :type app: callable
+        :param package_name: name of the package to report the version of
+        :type package_name: str
+        :param path: request path to serve version information at, or None
+          to only add the header
+        :type path: str
+        :param header: name of the response header to add, or None to not
+          add one
+        :type header: str
+        :param kwargs: other keyword arguments for
+          :py:class:`~versionfinder.cached.CachedVersion`; if
+          ``package_file`` is not given, the file that constructed the
+          middleware is used
+        """
+        super(VersionMiddleware, self).__init__(
+            app, package_name, path, header, inspect.stack()[1][0], kwargs
+        )
+
+    def _render(self, info):
+        body = render_version_json(info)
+        headers = (
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+        )
+        header = None
+        if self.header is not None:
+            header = (self.header, info.long_bytes.decode('ascii'))
+            headers += (header,)
+        self._rendered = (body, headers, header)
+
+    def __call__(self, environ, start_response):
+        rendered = self._rendered
+        if environ.get('PATH_INFO') == self.path:
+            if rendered is None:
+                start_response('503 Service Unavailable', [
+                    ('Content-Type', 'application/json'),
+                    ('Content-Length', str(len(_NOT_READY_BODY))),
+                    ('Retry-After', '1'),
+                ])
+                return [_NOT_READY_BODY]
+            start_response('200 OK', list(rendered[1]))
+            return [rendered[0]]
+        if rendered is None or rendered[2] is None:
+            return self.app(environ, start_response)
+        header = rendered[2]
+
+        def _start_response(status, headers, exc_info=None):
+            headers.append(header)
+            return start_response(status, headers, exc_info)
+
+        return self.app(environ, _start_response)
+
+
+class ASGIVersionMiddleware(_VersionEndpoint):
+    """
+    ASGI middleware equivalent of :py:class:`~.VersionMiddleware`: serves
+    version information at a fixed path and adds a version header to every
+    other HTTP response, from response parts pre-rendered once when the
+    version is found in the background.
+    """
+
+    def __init__(self, app, package_name, path='/version',
+                 header='X-App-Version', **kwargs):
+        """
+        :param app: the ASGI application to wrap
+        :type app: callable
+        :param package_name: name of the package to report the version of
+        :type package_name: str
+        :param path: request path to serve version information at, or None
+          to only add the header
+        :type path: str
+        :param header: name of the response header to add, or None to not
+          add one
+        :type header: str
+        :param kwargs: other keyword arguments for
+          :py:class:`~versionfinder.cached.CachedVersion`; if
+          ``package_file`` is not given, the file that constructed the
+          middleware is used
+        """
+        super(ASGIVersionMiddleware, self).__init__(
+            app, package_name, path, header, inspect.stack()[1][0], kwargs
+        )
+
+    def _render(self, info):
+        body = render_version_json(info)
+        headers = (
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('ascii')),
+        )
+        header = None
+        if self.header is not None:
+            header = (self.header.lower().encode('ascii'), info.long_bytes)
+            headers += (header,)
+        self._rendered = (body, headers, header)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        rendered = self._rendered
+        if scope['path'] == self.path:
+            if rendered is None:
+                await send({
+                    'type': 'http.response.start', 'status': 503,
+                    'headers': [
+                        (b'content-type', b'application/json'),
+                        (b'retry-after', b'1'),
+                    ]
+                })
+                await send({
+                    'type': 'http.response.body', 'body': _NOT_READY_BODY
+                })
+                return
+            # servers and outer middleware may change the messages (i.e.
+            # append to their headers), so each response gets new ones
+            await send({
+                'type': 'http.response.start', 'status': 200,
+                'headers': list(rendered[1])
+            })
+            await send({'type': 'http.response.body', 'body': rendered[0]})
+            return
+        if rendered is None or rendered[2] is None:
+            await self.app(scope, receive, send)
+            return
+        header = rendered[2]
+
+        async def _send(message):
+            if message['type'] == 'http.response.start':
+                message = dict(message)
+                message['headers'] = list(message.get('headers', ())) + [
+                    header
+                ]
+            await send(message)
+
+        await self.app(scope, receive, _send)
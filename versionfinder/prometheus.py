@@ -0,0 +1,229 @@
+"""
+versionfinder/prometheus.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import re
+import inspect
+import threading
+
+from .cached import CachedVersion
+
+#: Content-Type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+#: label names of the build_info metric, in exposition order
+LABEL_NAMES = ('version', 'commit', 'tag', 'dirty')
+
+#: default HELP text of the build_info metric
+DEFAULT_HELP = 'Build information, from versionfinder.'
+
+
+def metric_name(app_name):
+    """
+    Return the ``<app>_build_info`` metric name for an application or
+    package name, with characters that are not valid in a metric name
+    replaced by underscores.
+
+    :param app_name: application or package name
+    :type app_name: str
+    :rtype: str
+    """
+    name = re.sub(r'[^a-zA-Z0-9_]', '_', app_name)
+    if name[:1].isdigit():
+        name = '_' + name
+    return '%s_build_info' % name
+
+
+def build_info_labels(info):
+    """
+    Return the label values of the build_info metric for some version
+    information, in the order of :py:data:`~.LABEL_NAMES`. Missing values are
+    empty strings; ``dirty`` is ``true``, ``false`` or empty if unknown.
+
+    :param info: version information
+    :type info: :py:class:`~versionfinder.versioninfo.VersionInfo`
+    :rtype: tuple
+    """
+    if info.git_is_dirty is None:
+        dirty = ''
+    else:
+        dirty = 'true' if info.git_is_dirty else 'false'
+    return (
+        info.version or '',
+        info.git_commit or '',
+        info.git_tag or '',
+        dirty
+    )
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace(
+        '\n', '\\n').replace('"', '\\"')
+
+
+def render_build_info(name, info, help_text=None):
+    """
+    Render the build_info gauge for some version information in the
+    Prometheus text exposition format.
+
+    :param name: metric name, i.e. from :py:func:`~.metric_name`
+    :type name: str
+    :param info: version information
+    :type info: :py:class:`~versionfinder.versioninfo.VersionInfo`
+    :param help_text: HELP text for the metric
+    :type help_text: str
+    :return: UTF-8 encoded exposition text
+    :rtype: bytes
+    """
+    if help_text is None:
+        help_text = DEFAULT_HELP
+    labels = ','.join(
+        '%s="%s"' % (k, _escape(v))
+        for k, v in zip(LABEL_NAMES, build_info_labels(info))
+    )
+    return (
+        '# HELP %s %s\n# TYPE %s gauge\n%s{%s} 1\n' % (
+            name, help_text.replace('\\', '\\\\').replace('\n', '\\n'),
+            name, name, labels
+        )
+    ).encode('utf-8')
+
+
+class BuildInfoCollector(object):
+    """
+    Exports a ``<app>_build_info`` gauge, with ``version``, ``commit``,
+    ``tag`` and ``dirty`` labels, for a package.
+
+    The version is found once via
+    :py:class:`~versionfinder.cached.CachedVersion` and the metric is
+    rendered only when it changes, so scrapes never call versionfinder or
+    rebuild labels. The pre-rendered exposition text is available as
+    :py:attr:`~.exposition` (to append to an existing metrics response) and
+    is served by :py:meth:`~.wsgi_app`. Instances are also
+    `prometheus_client <https://github.com/prometheus/client_python>`_
+    custom collectors, i.e. they can be passed to ``REGISTRY.register()``;
+    ``prometheus_client`` is only imported when :py:meth:`~.collect` is
+    first called.
+    """
+
+    def __init__(self, package_name, app_name=None, help_text=None,
+                 **kwargs):
+        """
+        :param package_name: name of the package to report the version of
+        :type package_name: str
+        :param app_name: application name to prefix the metric name with;
+          defaults to ``package_name``
+        :type app_name: str
+        :param help_text: HELP text for the metric
+        :type help_text: str
+        :param kwargs: other keyword arguments for
+          :py:class:`~versionfinder.cached.CachedVersion`; if
+          ``package_file`` is not given, the file that constructed the
+          collector is used
+        """
+        if app_name is None:
+            app_name = package_name
+        if help_text is None:
+            help_text = DEFAULT_HELP
+        self.name = metric_name(app_name)
+        self.help_text = help_text
+        self.exposition = b''
+        # (version information, its metric families or None until built),
+        # replaced as a whole so that families are only ever cached with
+        # the information they were built from
+        self._rendered = None
+        self._lock = threading.Lock()
+        if 'package_file' not in kwargs and 'caller_frame' not in kwargs:
+            kwargs['caller_frame'] = inspect.stack()[1][0]
+        self.version = CachedVersion(package_name, **kwargs)
+        self.version.add_callback(self._render)
+
+    def _render(self, info):
+        """
+        Re-render the metric for new version information.
+
+        :param info: version information
+        :type info: :py:class:`~versionfinder.versioninfo.VersionInfo`
+        """
+        self.exposition = render_build_info(self.name, info, self.help_text)
+        with self._lock:
+            self._rendered = (info, None)
+
+    def collect(self):
+        """
+        ``prometheus_client`` collector interface; return the build_info
+        metric family (or nothing, if the version has not been found yet).
+        The family is built once per change in the version information.
+
+        :rtype: list
+        """
+        rendered = self._rendered
+        if rendered is None:
+            return []
+        info, families = rendered
+        if families is None:
+            from prometheus_client.core import GaugeMetricFamily
+            family = GaugeMetricFamily(
+                self.name,
+                self.help_text,
+                labels=LABEL_NAMES
+            )
+            family.add_metric(build_info_labels(info), 1)
+            families = [family]
+            with self._lock:
+                # unless the information changed while they were built
+                if self._rendered is rendered:
+                    self._rendered = (info, families)
+        return families
+
+    def wsgi_app(self, environ, start_response):
+        """
+        WSGI application serving the pre-rendered exposition text.
+
+        :param environ: WSGI environment
+        :type environ: dict
+        :param start_response: WSGI start_response callable
+        :type start_response: callable
+        :rtype: list
+        """
+        body = self.exposition
+        start_response('200 OK', [
+            ('Content-Type', CONTENT_TYPE),
+            ('Content-Length', str(len(body)))
+        ])
+        return [body]
@@ -34,3 +34,43 @@ AUTHORS:
 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ##################################################################################
 """
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+#: skip marker for tests that run the ``git`` binary
+needs_git = pytest.mark.skipif(shutil.which('git') is None,
+                               reason='requires git')
+
+# configuration for every git command run by the tests: a fixed identity, no
+# signing, and no commit-graph unless a test writes one
+GIT_CONFIG = (
+    'user.name=T', 'user.email=t@t', 'commit.gpgsign=false',
+    'tag.gpgsign=false', 'gc.writeCommitGraph=false'
+)
+
+
+def git(path, *args, **kwargs):
+    """
+    Run ``git`` in ``path`` and return its output, stripped.
+
+    :param path: directory to run git in
+    :type path: str
+    :param args: git command and arguments
+    :param kwargs: ``when``, a Unix time to use as the author and committer
+      date; ``config``, a sequence of extra ``name=value`` settings
+    :rtype: str
+    """
+    env = dict(os.environ)
+    if kwargs.get('when') is not None:
+        env['GIT_AUTHOR_DATE'] = env['GIT_COMMITTER_DATE'] = \
+            '%d +0000' % kwargs['when']
+    cmd = ['git', '-C', path]
+    for c in GIT_CONFIG + tuple(kwargs.get('config', ())):
+        cmd.extend(['-c', c])
+    return subprocess.check_output(
+        cmd + list(args), stderr=subprocess.DEVNULL, env=env
+    ).decode('utf-8').strip()
@@ -419,6 +419,24 @@ class AcceptanceHelpers(object):
                     k, dictdiff(d[k], expected))
         # AssertionError on any error conditions, but we want to show ALL
         assert err == '', err
+        # the nearest tag and the upstream branch depend on the test
+        # repository's history as of the test run; check that they are
+        # consistent with the rest of the result
+        res = expected.get('result')
+        if res is not None:
+            describe = res.pop('git_describe', None)
+            distance = res.pop('git_distance', None)
+            assert (describe is None) == (distance is None)
+            if res['git_commit'] is None:
+                assert describe is None
+            elif distance == 0:
+                assert describe == res['git_tag']
+            branch = res.pop('git_branch', None)
+            ahead = res.pop('git_ahead', None)
+            behind = res.pop('git_behind', None)
+            assert (ahead is None) == (behind is None)
+            if branch is None:
+                assert ahead is None
         # else return the indentical dict for all of them
         return expected
 
@@ -0,0 +1,119 @@
+"""
+versionfinder/tests/test_cached.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from unittest.mock import patch, call, Mock
+
+from versionfinder.cached import CachedVersion
+from versionfinder.versioninfo import VersionInfo
+
+pbm = 'versionfinder.cached'
+
+
+class TestCachedVersion(object):
+
+    def test_sync(self):
+        info = VersionInfo(pip_version='1.2.3')
+        with patch('%s.VersionFinder' % pbm) as mock_vf:
+            mock_vf.return_value.find_package_version.return_value = info
+            cls = CachedVersion('foo', background=False, package_file='/f')
+        assert mock_vf.mock_calls == [
+            call('foo', package_file='/f'),
+            call().find_package_version()
+        ]
+        assert cls.ready is True
+        assert cls.get() is info
+        assert cls._thread is None
+
+    def test_caller_frame(self):
+        with patch('%s.VersionFinder' % pbm) as mock_vf:
+            with patch('%s.inspect.stack' % pbm) as mock_stack:
+                mock_stack.return_value = [[1], ['frame']]
+                CachedVersion('foo', background=False)
+        assert mock_vf.mock_calls[0] == call('foo', caller_frame='frame')
+
+    def test_background(self):
+        info = VersionInfo(pip_version='1.2.3')
+        with patch('%s.VersionFinder' % pbm) as mock_vf:
+            mock_vf.return_value.find_package_version.return_value = info
+            cls = CachedVersion('foo', package_file='/f')
+            assert cls.get(timeout=5) is info
+            cls._thread.join(5)
+        assert cls._thread.daemon is True
+        assert cls._thread.name == 'versionfinder-foo'
+        assert cls.ready is True
+
+    def test_get_not_ready(self):
+        with patch('%s.threading.Thread' % pbm):
+            cls = CachedVersion('foo', package_file='/f')
+        assert cls.ready is False
+        assert cls.get(timeout=0) is None
+
+    def test_exception(self):
+        with patch('%s.VersionFinder' % pbm) as mock_vf:
+            mock_vf.return_value.find_package_version.side_effect = \
+                RuntimeError()
+            cls = CachedVersion('foo', background=False, package_file='/f')
+        assert cls.get() == VersionInfo()
+
+    def test_callbacks(self):
+        i1 = VersionInfo(pip_version='1.2.3')
+        i2 = VersionInfo(pip_version='1.2.4')
+        cb1 = Mock()
+        cb2 = Mock()
+        with patch('%s.VersionFinder' % pbm) as mock_vf:
+            mock_vf.return_value.find_package_version.side_effect = [
+                i1, VersionInfo(pip_version='1.2.3'), i2
+            ]
+            cls = CachedVersion('foo', background=False, package_file='/f')
+            cls.add_callback(cb1)
+            assert cb1.mock_calls == [call(i1)]
+            cls.add_callback(cb2)
+            # unchanged result; callbacks not called
+            cls.refresh()
+            cls.refresh()
+        assert cb1.mock_calls == [call(i1), call(i2)]
+        assert cb2.mock_calls == [call(i1), call(i2)]
+        assert cls.get() is i2
+
+    def test_callback_before_ready(self):
+        cb = Mock()
+        with patch('%s.threading.Thread' % pbm):
+            cls = CachedVersion('foo', package_file='/f')
+        cls.add_callback(cb)
+        assert cb.mock_calls == []
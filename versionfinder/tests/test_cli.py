@@ -0,0 +1,155 @@
+"""
+versionfinder/tests/test_cli.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import json
+import pytest
+from unittest.mock import patch, call, Mock
+
+from versionfinder.cli import parse_args, resolve, main
+from versionfinder.manifest import Manifest
+from versionfinder.versioninfo import VersionInfo
+
+pbm = 'versionfinder.cli'
+
+
+class TestParseArgs(object):
+
+    def test_names(self):
+        res = parse_args(['foo', 'bar'])
+        assert res.names == ['foo', 'bar']
+        assert res.all is False
+        assert res.verbose is False
+        assert res.write_manifest is None
+
+    def test_all(self):
+        res = parse_args(['-a', '-v', '-w', '/out.vfm'])
+        assert res.names == []
+        assert res.all is True
+        assert res.verbose is True
+        assert res.write_manifest == '/out.vfm'
+
+    def test_manifest_env(self):
+        with patch.dict('%s.os.environ' % pbm,
+                        {'VERSIONFINDER_MANIFEST': '/m.vfm'}):
+            assert parse_args(['foo']).manifest == '/m.vfm'
+        assert parse_args(['-m', '/x.vfm', 'foo']).manifest == '/x.vfm'
+
+    def test_nothing(self):
+        with pytest.raises(SystemExit):
+            parse_args([])
+
+
+class TestResolve(object):
+
+    def test_resolve(self):
+        m_env = Mock()
+        m_dist = Mock(metadata_file='/site/foo-1.dist-info/METADATA')
+        m_dist.name = 'Foo'
+        m_env.get_distribution.side_effect = [m_dist, None]
+        with patch('%s.VersionFinder' % pbm, autospec=True) as mock_vf:
+            mock_vf.return_value.find_package_version.return_value = 'vi'
+            res = list(resolve(['foo', 'bar'], m_env))
+        assert res == [('foo', 'vi'), ('bar', None)]
+        assert mock_vf.mock_calls == [
+            call('Foo', package_file='/site/foo-1.dist-info/METADATA',
+                 log=False, environment=m_env),
+            call().find_package_version()
+        ]
+        assert m_env.get_distribution.mock_calls == [call('foo'), call('bar')]
+
+    def test_manifest(self):
+        m_env = Mock()
+        m_env.get_distribution.return_value = None
+        with patch('%s.find_manifest_version' % pbm) as mock_fmv:
+            mock_fmv.side_effect = ['vi', None]
+            res = list(resolve(['foo', 'bar'], m_env, manifest='/m.vfm'))
+        assert res == [('foo', 'vi'), ('bar', None)]
+        assert mock_fmv.mock_calls == [
+            call('/m.vfm', 'foo'), call('/m.vfm', 'bar')
+        ]
+        assert m_env.get_distribution.mock_calls == [call('bar')]
+
+
+class TestMain(object):
+
+    def test_names(self, capsys):
+        vi = VersionInfo(pip_version='1.0')
+        with patch('%s.resolve' % pbm, autospec=True) as mock_resolve:
+            with patch('%s.Environment' % pbm, autospec=True) as mock_env:
+                mock_resolve.return_value = iter([('foo', vi)])
+                res = main(['foo'])
+        assert res == 0
+        out = capsys.readouterr().out
+        assert [json.loads(l) for l in out.splitlines()] == [
+            {'name': 'foo', 'info': vi.as_dict}
+        ]
+        assert mock_resolve.mock_calls == [
+            call(['foo'], mock_env.return_value, manifest=None, log=False)
+        ]
+
+    def test_all_missing_write(self, capsys, tmp_path):
+        path = str(tmp_path / 'out.vfm')
+        vi = VersionInfo(pip_version='1.0')
+        d1 = Mock()
+        d1.name = 'foo'
+        d2 = Mock()
+        d2.name = 'bar'
+        with patch('%s.resolve' % pbm, autospec=True) as mock_resolve:
+            with patch('%s.Environment' % pbm, autospec=True) as mock_env:
+                with patch('%s.logging.basicConfig' % pbm) as mock_bc:
+                    mock_env.return_value.iter_distributions.return_value = \
+                        iter([d1, d2])
+
+                    def se_resolve(names, *args, **kwargs):
+                        names = list(names)
+                        assert names == ['foo', 'bar']
+                        return iter([('foo', vi), ('bar', None)])
+
+                    mock_resolve.side_effect = se_resolve
+                    res = main(['--all', '-v', '-m', '/m', '-w', path])
+        assert res == 1
+        out = capsys.readouterr().out
+        assert [json.loads(l) for l in out.splitlines()] == [
+            {'name': 'foo', 'info': vi.as_dict},
+            {'name': 'bar', 'info': None},
+        ]
+        assert len(mock_bc.mock_calls) == 1
+        with Manifest(path) as m:
+            assert len(m) == 1
+            assert m.find_version('foo') == vi
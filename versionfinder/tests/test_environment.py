@@ -0,0 +1,485 @@
+"""
+versionfinder/tests/test_environment.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import json
+import threading
+from unittest.mock import patch, Mock, call
+
+import versionfinder.environment as env_module
+from versionfinder.environment import (
+    Environment, Distribution, normalize_name, _read_metadata_headers,
+    default_environment
+)
+
+pbm = 'versionfinder.environment'
+
+
+def write_file(path, content):
+    d = os.path.dirname(path)
+    if not os.path.exists(d):
+        os.makedirs(d)
+    with open(path, 'w') as fh:
+        fh.write(content)
+
+
+def metadata(name, version, home_page=None):
+    s = 'Metadata-Version: 2.1\nName: %s\nVersion: %s\n' % (name, version)
+    if home_page is not None:
+        s += 'Home-page: %s\n' % home_page
+    s += 'Classifier: A\nClassifier: B\n\nName: not-a-header\n'
+    return s
+
+
+def make_dist_info(site, name, version, home_page=None, direct_url=None):
+    di = os.path.join(site, '%s-%s.dist-info' % (
+        name.replace('-', '_'), version))
+    write_file(os.path.join(di, 'METADATA'),
+               metadata(name, version, home_page))
+    if direct_url is not None:
+        write_file(os.path.join(di, 'direct_url.json'),
+                   json.dumps(direct_url))
+    return di
+
+
+class TestNormalizeName(object):
+
+    def test_normalize(self):
+        assert normalize_name('Foo_Bar.baz--Quux') == 'foo-bar-baz-quux'
+
+
+class TestDefaultEnvironment(object):
+
+    def test_created_once(self):
+        with patch('%s._default' % pbm, None):
+            with patch('%s.Environment' % pbm) as mock_env:
+                a = default_environment()
+                b = default_environment()
+                assert env_module._default is a
+        assert a is b
+        assert mock_env.mock_calls == [call()]
+
+
+class TestReadMetadataHeaders(object):
+
+    def test_read(self, tmp_path):
+        p = str(tmp_path / 'METADATA')
+        write_file(p, metadata('Foo', '1.0', 'http://foo') +
+                   '  continued\n')
+        assert _read_metadata_headers(p) == {
+            'metadata-version': '2.1',
+            'name': 'Foo',
+            'version': '1.0',
+            'home-page': 'http://foo',
+            'classifier': 'A',
+        }
+
+
+class TestDistribution(object):
+
+    def test_metadata(self, tmp_path):
+        di = make_dist_info(str(tmp_path), 'Foo-Bar', '1.2.3', 'http://fb')
+        d = Distribution('foo-bar', str(tmp_path), di,
+                         os.path.join(di, 'METADATA'))
+        assert d.name == 'Foo-Bar'
+        assert d.version == '1.2.3'
+        assert d.home_page == 'http://fb'
+        assert d.package_dir == str(tmp_path)
+
+    def test_dir_version(self, tmp_path):
+        with patch('%s._read_metadata_headers' % pbm) as m_read:
+            for dirname, ver in [
+                ('foo_bar-1.2.3.dist-info', '1.2.3'),
+                ('foo_bar-1.0+local.1.dist-info', '1.0+local.1'),
+                ('foo-1.0-py3.8.egg-info', '1.0'),
+                ('foo-1.0.egg-info', '1.0'),
+            ]:
+                d = Distribution('foo', '/site', '/site/' + dirname,
+                                 '/site/%s/METADATA' % dirname)
+                assert d.dir_version == ver
+                assert d.version == ver
+        assert m_read.mock_calls == []
+
+    def test_no_dir_version(self, tmp_path):
+        for dirname in [
+            'foo.egg-info', 'EGG-INFO', 'foo.dist-info', 'a-b-c.dist-info'
+        ]:
+            d = Distribution('foo', '/site', '/site/' + dirname,
+                             '/site/%s/METADATA' % dirname)
+            assert d.dir_version is None
+            with patch('%s._read_metadata_headers' % pbm) as m_read:
+                m_read.return_value = {'version': '9.9'}
+                assert d.version == '9.9'
+
+    def test_missing_metadata(self, tmp_path):
+        d = Distribution('foo', str(tmp_path), str(tmp_path / 'x'),
+                         str(tmp_path / 'x' / 'METADATA'))
+        assert d.name == 'foo'
+        assert d.version is None
+        assert d.home_page is None
+
+    def test_headers_read_once(self, tmp_path):
+        di = make_dist_info(str(tmp_path), 'foo', '1.0')
+        d = Distribution('foo', str(tmp_path), di,
+                         os.path.join(di, 'METADATA'))
+        with patch('%s._read_metadata_headers' % pbm) as m_read:
+            m_read.return_value = {'version': '1.0'}
+            assert d.version == '1.0'
+            assert d.name == 'foo'
+        assert m_read.mock_calls == [call(os.path.join(di, 'METADATA'))]
+
+    def test_editable_direct_url(self, tmp_path):
+        src = str(tmp_path / 'src')
+        di = make_dist_info(
+            str(tmp_path), 'foo', '1.0',
+            direct_url={'url': 'file://' + src,
+                        'dir_info': {'editable': True}}
+        )
+        d = Distribution('foo', str(tmp_path), di,
+                         os.path.join(di, 'METADATA'))
+        assert d.package_dir == src
+        assert d.editable is True
+
+    def test_develop(self, tmp_path):
+        d = Distribution('foo', '/src', '/src/foo.egg-info',
+                         '/src/foo.egg-info/PKG-INFO', package_dir='/src')
+        assert d.editable is True
+
+    def test_not_editable_direct_url(self, tmp_path):
+        di = make_dist_info(
+            str(tmp_path), 'foo', '1.0',
+            direct_url={'url': 'file:///tmp/foo', 'dir_info': {}}
+        )
+        d = Distribution('foo', str(tmp_path), di,
+                         os.path.join(di, 'METADATA'))
+        assert d.package_dir == str(tmp_path)
+        assert d.commit is None
+        assert d.editable is False
+
+    def test_vcs_commit(self, tmp_path):
+        di = make_dist_info(
+            str(tmp_path), 'foo', '1.0',
+            direct_url={'url': 'https://github.com/x/foo.git',
+                        'vcs_info': {'vcs': 'git', 'commit_id': 'abcd'}}
+        )
+        d = Distribution('foo', str(tmp_path), di,
+                         os.path.join(di, 'METADATA'))
+        assert d.commit == 'abcd'
+        assert d.package_dir == str(tmp_path)
+
+    def test_files_record(self, tmp_path):
+        site = str(tmp_path)
+        di = make_dist_info(site, 'foo', '1.0')
+        write_file(os.path.join(di, 'RECORD'), '\n'.join([
+            'foo/__init__.py,sha256=abc,10',
+            'foo/__pycache__/__init__.cpython-38.pyc,,',
+            '"foo/a,b.py",sha256=def,5',
+            '../../bin/foo,,',
+            'foo-1.0.dist-info/RECORD,,',
+            ''
+        ]))
+        d = Distribution('foo', site, di, os.path.join(di, 'METADATA'))
+        assert d.files() == [
+            os.path.join(site, 'foo', '__init__.py'),
+            os.path.join(site, 'foo', 'a,b.py'),
+            os.path.normpath(os.path.join(site, '..', '..', 'bin', 'foo')),
+            os.path.join(di, 'RECORD'),
+        ]
+
+    def test_files_installed_files(self, tmp_path):
+        site = str(tmp_path)
+        ei = os.path.join(site, 'foo-1.0-py3.8.egg-info')
+        write_file(os.path.join(ei, 'PKG-INFO'), metadata('foo', '1.0'))
+        write_file(os.path.join(ei, 'installed-files.txt'),
+                   '../foo/__init__.py\n../foo/__init__.pyc\nPKG-INFO\n')
+        d = Distribution('foo', site, ei, os.path.join(ei, 'PKG-INFO'))
+        assert d.files() == [
+            os.path.join(site, 'foo', '__init__.py'),
+            os.path.join(ei, 'PKG-INFO'),
+        ]
+
+    def test_import_names(self, tmp_path):
+        site = str(tmp_path)
+        di = make_dist_info(site, 'google-cloud-storage', '1.0')
+        write_file(os.path.join(di, 'RECORD'), '\n'.join([
+            'google/cloud/storage/__init__.py,,',
+            'google/cloud/storage/blob.py,,',
+            'google/cloud/storage/__pycache__/blob.cpython-38.pyc,,',
+            'google/cloud/storage/_ext.cpython-38-x86_64-linux-gnu.so,,',
+            'google/cloud/storage/data.json,,',
+            'google_cloud_storage-1.0.dist-info/METADATA,,',
+            'google_cloud_storage-nspkg.pth,,',
+            '../../bin/gcs.py,,',
+            ''
+        ]))
+        write_file(os.path.join(di, 'top_level.txt'), 'google\n\n')
+        d = Distribution('google-cloud-storage', site, di,
+                         os.path.join(di, 'METADATA'))
+        assert d.top_level() == ['google']
+        assert d.import_names() == {
+            'google', 'google.cloud', 'google.cloud.storage',
+            'google.cloud.storage.blob', 'google.cloud.storage._ext'
+        }
+
+    def test_import_names_egg_info(self, tmp_path):
+        site = str(tmp_path)
+        ei = os.path.join(site, 'PyYAML-5.3-py3.8.egg-info')
+        write_file(os.path.join(ei, 'PKG-INFO'), metadata('PyYAML', '5.3'))
+        write_file(os.path.join(ei, 'installed-files.txt'),
+                   '../yaml/__init__.py\n../_yaml.pyd\nPKG-INFO\n')
+        d = Distribution('pyyaml', site, ei, os.path.join(ei, 'PKG-INFO'))
+        assert d.top_level() == []
+        assert d.import_names() == {'yaml', '_yaml'}
+
+    def test_import_names_top_level_only(self, tmp_path):
+        di = make_dist_info(str(tmp_path), 'foo', '1.0')
+        write_file(os.path.join(di, 'top_level.txt'), 'foo\nfoo/bar\n')
+        d = Distribution('foo', str(tmp_path), di,
+                         os.path.join(di, 'METADATA'))
+        assert d.import_names() == {'foo', 'foo.bar'}
+
+    def test_files_none(self, tmp_path):
+        di = make_dist_info(str(tmp_path), 'foo', '1.0')
+        d = Distribution('foo', str(tmp_path), di,
+                         os.path.join(di, 'METADATA'))
+        assert d.files() == []
+
+
+class TestEnvironment(object):
+
+    def setup_env(self, tmp_path):
+        site1 = str(tmp_path / 'site1')
+        site2 = str(tmp_path / 'site2')
+        make_dist_info(site1, 'foo-bar', '1.0', 'http://foo')
+        make_dist_info(site2, 'foo-bar', '0.9')
+        make_dist_info(site2, 'baz', '2.0')
+        write_file(os.path.join(site2, 'old-3.0-py3.8.egg-info'),
+                   metadata('old', '3.0'))
+        write_file(os.path.join(site2, 'dir_egg-4.0-py3.8.egg-info',
+                                'PKG-INFO'), metadata('dir_egg', '4.0'))
+        src = str(tmp_path / 'src' / 'devpkg')
+        write_file(os.path.join(src, 'devpkg.egg-info', 'PKG-INFO'),
+                   metadata('devpkg', '0.1.dev0'))
+        write_file(os.path.join(site2, 'devpkg.egg-link'), src + '\n.\n')
+        write_file(os.path.join(site2, 'broken.egg-link'),
+                   str(tmp_path / 'nonexistent') + '\n')
+        egg = str(tmp_path / 'eggy-5.0-py3.8.egg')
+        write_file(os.path.join(egg, 'EGG-INFO', 'PKG-INFO'),
+                   metadata('eggy', '5.0'))
+        write_file(os.path.join(site2, 'unrelated.py'), '')
+        return Environment(path=[
+            site1, site2, str(tmp_path / 'missing'), egg,
+            str(tmp_path / 'nothere.egg')
+        ]), site1, site2, src, egg
+
+    def test_iter(self, tmp_path):
+        env, site1, site2, src, egg = self.setup_env(tmp_path)
+        res = [(d.key, d.version, d.location) for d in
+               env.iter_distributions()]
+        assert res == [
+            ('foo-bar', '1.0', site1),
+            ('baz', '2.0', site2),
+            ('devpkg', '0.1.dev0', src),
+            ('dir-egg', '4.0', site2),
+            ('old', '3.0', site2),
+            ('eggy', '5.0', egg),
+        ]
+        assert env.get_distribution('devpkg').package_dir == src
+        assert env.get_distribution('eggy').package_dir == egg
+        # second iteration comes from the recorded scan
+        with patch('%s.os.scandir' % pbm) as m_scandir:
+            assert len(list(env.iter_distributions())) == 6
+        assert m_scandir.mock_calls == []
+
+    def test_get_distribution(self, tmp_path):
+        env = self.setup_env(tmp_path)[0]
+        assert env.get_distribution('Foo_Bar').version == '1.0'
+        assert env.get_distribution('Foo_Bar').home_page == 'http://foo'
+        assert env.get_distribution('nope') is None
+        with patch('%s.os.scandir' % pbm) as m_scandir:
+            assert env.get_distribution('nope2') is None
+        assert m_scandir.mock_calls == []
+
+    def test_get_distribution_stops_early(self, tmp_path):
+        env, site1, site2, src, egg = self.setup_env(tmp_path)
+        with patch('%s.os.scandir' % pbm, wraps=os.scandir) as m_scandir:
+            assert env.get_distribution('foo-bar').location == site1
+            assert m_scandir.mock_calls == [call(site1)]
+            assert env.get_distribution('baz').location == site2
+            assert env.get_distribution('foo-bar').location == site1
+            assert m_scandir.mock_calls == [call(site1), call(site2)]
+        assert env._scanned is False
+        assert [d.key for d in env.iter_distributions()] == [
+            'foo-bar', 'baz', 'devpkg', 'dir-egg', 'old', 'eggy'
+        ]
+        assert env._scanned is True
+
+    def test_partial_iteration(self, tmp_path):
+        env = self.setup_env(tmp_path)[0]
+        it = env.iter_distributions()
+        first = next(it)
+        assert env.get_distribution('eggy') is not None
+        assert first is env.get_distribution('foo-bar')
+        assert [d.key for d in it] == [
+            'baz', 'devpkg', 'dir-egg', 'old', 'eggy'
+        ]
+
+    def test_no_record(self, tmp_path):
+        env = self.setup_env(tmp_path)[0]
+        res = [d.key for d in env.iter_distributions(record=False)]
+        assert res == ['foo-bar', 'baz', 'devpkg', 'dir-egg', 'old', 'eggy']
+        assert env._dists == {}
+        assert env._scanned is False
+
+    def test_default_path(self):
+        with patch('%s.sys.path' % pbm, ['/a', '/b']):
+            assert Environment().path == ['/a', '/b']
+
+    def test_memoize(self):
+        env = Environment(path=[])
+        func = Mock(return_value=5)
+        assert env.memoize('foo', func) == 5
+        assert env.memoize('foo', func) == 5
+        assert func.mock_calls == [call()]
+
+    def test_memoize_concurrent(self):
+        env = Environment(path=[])
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return 'slow'
+
+        func = Mock(side_effect=slow)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(env.memoize('slow', func))
+            ) for _ in range(3)
+        ]
+        for t in threads:
+            t.start()
+        started.wait(5)
+        # another key is not blocked by the one being computed
+        assert env.memoize('fast', lambda: 'fast') == 'fast'
+        release.set()
+        for t in threads:
+            t.join(5)
+        assert results == ['slow'] * 3
+        assert func.mock_calls == [call()]
+        assert env._memo_locks == {}
+
+    def test_file_index(self, tmp_path):
+        env, site1, site2, src, egg = self.setup_env(tmp_path)
+        fb1 = os.path.join(site1, 'foo_bar-1.0.dist-info')
+        fb2 = os.path.join(site2, 'foo_bar-0.9.dist-info')
+        write_file(os.path.join(fb1, 'RECORD'), 'foo_bar/a.py,,\n')
+        write_file(os.path.join(fb2, 'RECORD'),
+                   'foo_bar/a.py,,\nfoo_bar/b.py,,\n')
+        write_file(os.path.join(site2, 'baz-2.0.dist-info', 'RECORD'),
+                   'baz.py,,\nfoo_bar/b.py,,\n')
+        fb = env.get_distribution('foo-bar')
+        baz = env.get_distribution('baz')
+        assert env.file_index() == {
+            os.path.join(site1, 'foo_bar', 'a.py'): fb,
+            os.path.join(site2, 'baz.py'): baz,
+            os.path.join(site2, 'foo_bar', 'b.py'): baz,
+        }
+        assert env.file_index() is env.file_index()
+
+    def test_distribution_for_file(self, tmp_path):
+        env, site1, site2, src, egg = self.setup_env(tmp_path)
+        write_file(os.path.join(site2, 'baz-2.0.dist-info', 'RECORD'),
+                   'baz.py,,\n')
+        write_file(os.path.join(site2, 'baz.py'), '')
+        link = str(tmp_path / 'link')
+        os.symlink(site2, link)
+        baz = env.get_distribution('baz')
+        assert env.distribution_for_file(
+            os.path.join(site2, 'baz.py')) is baz
+        assert env.distribution_for_file(
+            os.path.join(site2, 'x', '..', 'baz.py')) is baz
+        assert env.distribution_for_file(
+            os.path.join(link, 'baz.py')) is baz
+        assert env.distribution_for_file('/nonexistent.py') is None
+        # cached, including misses
+        with patch('%s.os.path.realpath' % pbm) as m_real:
+            assert env.distribution_for_file(
+                os.path.join(link, 'baz.py')) is baz
+            assert env.distribution_for_file('/nonexistent.py') is None
+        assert m_real.mock_calls == []
+
+    def test_distribution_for_file_editable(self, tmp_path):
+        env, site1, site2, src, egg = self.setup_env(tmp_path)
+        devpkg = env.get_distribution('devpkg')
+        eggy = env.get_distribution('eggy')
+        assert env.distribution_for_file(
+            os.path.join(src, 'devpkg', 'sub', 'mod.py')) is devpkg
+        assert env.distribution_for_file(
+            os.path.join(egg, 'eggy', '__init__.py')) is eggy
+        assert env.distribution_for_file(
+            os.path.join(site2, 'unrelated.py')) is None
+        assert env.distribution_for_file(src + 'x/foo.py') is None
+
+    def test_import_map(self, tmp_path):
+        env, site1, site2, src, egg = self.setup_env(tmp_path)
+        write_file(os.path.join(site1, 'foo_bar-1.0.dist-info', 'RECORD'),
+                   'google/a/__init__.py,,\nfoo_bar.py,,\n')
+        write_file(os.path.join(site2, 'baz-2.0.dist-info', 'RECORD'),
+                   'google/b/__init__.py,,\n')
+        write_file(os.path.join(src, 'devpkg.egg-info', 'top_level.txt'),
+                   'devpkg\n')
+        fb = env.get_distribution('foo-bar')
+        baz = env.get_distribution('baz')
+        dev = env.get_distribution('devpkg')
+        assert env.import_map() == {
+            'google': [fb, baz],
+            'google.a': [fb],
+            'google.b': [baz],
+            'foo_bar': [fb],
+            'devpkg': [dev],
+        }
+        assert env.import_map() is env.import_map()
+        assert env.distributions_for_import('google') == [fb, baz]
+        assert env.distributions_for_import('google.b.c.d') == [baz]
+        assert env.distributions_for_import('devpkg.mod') == [dev]
+        assert env.distributions_for_import('nope.google') == []
+        assert env.distributions_for_import('__main__') == []
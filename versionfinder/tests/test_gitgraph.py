@@ -0,0 +1,503 @@
+"""
+versionfinder/tests/test_gitgraph.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import shutil
+import subprocess
+import pytest
+
+from versionfinder.gitgraph import (
+    CommitGraph, CommitIndex, load_commit_graph, describe, _describe,
+    describe_string, ahead_behind, _ahead_behind, GENERATION_INFINITY
+)
+from versionfinder.tests import git, needs_git
+
+from unittest.mock import patch
+
+pbm = 'versionfinder.gitgraph'
+
+
+@pytest.fixture(scope='module')
+def history(tmp_path_factory):
+    """
+    A repository with branches, merges (including an octopus merge) and
+    lightweight and annotated tags.
+    """
+    if shutil.which('git') is None:
+        pytest.skip('requires git')
+    path = str(tmp_path_factory.mktemp('history'))
+    git(path, 'init', '-q')
+    when = [1500000000]
+
+    def commit(msg):
+        when[0] += 60
+        git(path, 'commit', '-q', '--allow-empty', '-m', msg, when=when[0])
+
+    def merge(*branches):
+        when[0] += 60
+        git(path, 'merge', '-q', '--no-edit', '-s', 'ours', *branches,
+            when=when[0])
+
+    commit('root')
+    git(path, 'branch', '-M', 'master')
+    for i in range(5):
+        commit('m%d' % i)
+    git(path, 'tag', 'v1')
+    for b in ('a', 'b', 'c'):
+        git(path, 'checkout', '-q', '-b', b, 'master')
+        for i in range(3):
+            commit('%s%d' % (b, i))
+    git(path, 'tag', '-a', '-m', 'on c', 'c-tag', 'c~1')
+    git(path, 'checkout', '-q', 'master')
+    commit('m5')
+    git(path, 'tag', '-a', '-m', 'two', 'v2')
+    commit('m6')
+    merge('a', 'b', 'c')
+    commit('m7')
+    git(path, 'checkout', '-q', '-b', 'd', 'master~3')
+    for i in range(4):
+        commit('d%d' % i)
+    git(path, 'tag', 'd-tag', 'HEAD~2')
+    git(path, 'checkout', '-q', 'master')
+    merge('d')
+    for i in range(3):
+        commit('m%d' % (8 + i))
+    git(path, 'tag', 'v3', 'HEAD~1')
+    return path
+
+
+def all_commits(path):
+    return git(path, 'rev-list', '--all').split()
+
+
+def git_describe(path, sha):
+    try:
+        return git(path, 'describe', '--tags', '--abbrev=7', sha)
+    except subprocess.CalledProcessError:
+        return None
+
+
+def check_ahead_behind(path):
+    gitdir = os.path.join(path, '.git')
+    commits = all_commits(path)
+    for a in commits[::3]:
+        for b in commits[::5]:
+            expected = tuple(int(x) for x in git(
+                path, 'rev-list', '--left-right', '--count', '%s...%s' % (a, b)
+            ).split())
+            assert ahead_behind(gitdir, a, b) == expected, (a, b)
+
+
+def check_all(path):
+    gitdir = os.path.join(path, '.git')
+    for sha in all_commits(path):
+        res = describe(gitdir, sha)
+        if res is not None:
+            res = describe_string(res[0], res[1], sha)
+        assert res == git_describe(path, sha), sha
+
+
+@needs_git
+class TestDescribe(object):
+
+    def copy(self, history, tmp_path):
+        path = str(tmp_path / 'repo')
+        shutil.copytree(history, path)
+        return path
+
+    def test_no_graph(self, history):
+        assert load_commit_graph(os.path.join(history, '.git')) is None
+        check_all(history)
+        check_ahead_behind(history)
+
+    def test_graph(self, history, tmp_path):
+        path = self.copy(history, tmp_path)
+        git(path, 'commit-graph', 'write', '--reachable')
+        graph = load_commit_graph(os.path.join(path, '.git'))
+        assert graph.count == len(all_commits(path))
+        graph.close()
+        check_all(path)
+        check_ahead_behind(path)
+
+    @pytest.mark.parametrize('graph', [False, True])
+    def test_ahead_behind_skewed(self, tmp_path, graph):
+        path = str(tmp_path)
+        git(path, 'init', '-q')
+        when = 1500000000
+        for i in range(5):
+            when += 60
+            git(path, 'commit', '-q', '--allow-empty', '-m', 'm%d' % i,
+                when=when)
+        git(path, 'branch', '-M', 'master')
+        git(path, 'checkout', '-q', '-b', 'topic')
+        # committed by clocks a day behind, and a day ahead
+        for i, skew in enumerate((-86400, -86400, 0, 86400, -86400)):
+            when += 60
+            git(path, 'commit', '-q', '--allow-empty', '-m', 't%d' % i,
+                when=when + skew)
+        git(path, 'checkout', '-q', 'master')
+        for i in range(3):
+            when += 60
+            git(path, 'commit', '-q', '--allow-empty', '-m', 'm%d' % (5 + i),
+                when=when)
+        git(path, 'merge', '-q', '--no-edit', 'topic~2', when=when + 60)
+        if graph:
+            git(path, 'commit-graph', 'write', '--reachable')
+        check_ahead_behind(path)
+
+    @pytest.mark.parametrize('graph', [False, True])
+    def test_describe_skewed(self, tmp_path, graph):
+        path = str(tmp_path)
+        git(path, 'init', '-q')
+        base = 1500000000
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'r', when=base + 300)
+        git(path, 'branch', '-M', 'master')
+        # committed by a clock running behind
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'q', when=base + 10)
+        git(path, 'commit', '-q', '--allow-empty', '-m', 't', when=base + 500)
+        git(path, 'tag', 'v1')
+        git(path, 'checkout', '-q', '-b', 'side', 'master~2')
+        git(path, 'commit', '-q', '--allow-empty', '-m', 's', when=base + 400)
+        git(path, 'checkout', '-q', 'master')
+        git(path, 'merge', '-q', '--no-edit', 'side', when=base + 1000)
+        if graph:
+            git(path, 'commit-graph', 'write', '--reachable')
+        head = git(path, 'rev-parse', 'HEAD')
+        # git describe reaches the root (an ancestor of v1) before the
+        # commit that links it to v1, and says v1-3; rev-list counts the
+        # merge and "s" only
+        assert git(path, 'rev-list', '--count', 'v1..HEAD') == '2'
+        assert describe(os.path.join(path, '.git'), head) == ('v1', 2)
+
+    def test_ahead_behind_missing(self, history):
+        head = git(history, 'rev-parse', 'HEAD')
+        with pytest.raises(KeyError):
+            ahead_behind(os.path.join(history, '.git'), head, '00' * 20)
+
+    def test_graph_chain_and_new_commits(self, history, tmp_path):
+        path = self.copy(history, tmp_path)
+        git(path, 'commit-graph', 'write', '--split', '--reachable')
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'in second layer')
+        git(path, 'tag', 'v4')
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'in second layer')
+        git(path, 'commit-graph', 'write', '--split=no-merge', '--reachable')
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'not in graph')
+        gitdir = os.path.join(path, '.git')
+        assert not os.path.exists(
+            os.path.join(gitdir, 'objects', 'info', 'commit-graph')
+        )
+        graph = load_commit_graph(gitdir)
+        assert len(graph._files) == 2
+        assert graph.count == len(all_commits(path)) - 1
+        graph.close()
+        check_all(path)
+
+    def test_octopus_parents(self, history, tmp_path):
+        path = self.copy(history, tmp_path)
+        git(path, 'commit-graph', 'write', '--reachable')
+        gitdir = os.path.join(path, '.git')
+        octopus = git(path, 'rev-list', '--min-parents=3', 'master')
+        parents = git(path, 'rev-parse', octopus + '^@').split()
+        assert len(parents) == 4
+        commits = CommitIndex(gitdir)
+        key = commits.key(octopus)
+        assert isinstance(key, int)
+        generation, when, pkeys = commits.commit(key)
+        assert [commits.hexsha(k) for k in pkeys] == parents
+        assert when == int(git(path, 'log', '-1', '--format=%ct', octopus))
+        assert generation == max(
+            commits.commit(k)[0] for k in pkeys
+        ) + 1
+        commits.close()
+
+    def test_loose_commits(self, history):
+        commits = CommitIndex(os.path.join(history, '.git'))
+        head = git(history, 'rev-parse', 'HEAD')
+        assert commits.key(head) == head
+        generation, when, parents = commits.commit(head)
+        assert generation == GENERATION_INFINITY
+        assert parents == [git(history, 'rev-parse', 'HEAD~1')]
+        blob = git(history, 'hash-object', '-w', '--stdin')
+        with pytest.raises(KeyError):
+            commits.commit(blob)
+        with pytest.raises(KeyError):
+            commits.commit('00' * 20)
+
+    def test_shallow(self, history, tmp_path):
+        path = str(tmp_path / 'shallow')
+        subprocess.check_call(
+            ['git', 'clone', '-q', '--depth=3', '--no-tags', '--no-local',
+             'file://' + history, path],
+            stderr=subprocess.DEVNULL
+        )
+        head = git(path, 'rev-parse', 'HEAD')
+        assert describe(os.path.join(path, '.git'), head) is None
+        git(path, 'fetch', '-q', '--depth=3', 'origin', 'tag', 'v3')
+        assert describe(os.path.join(path, '.git'), head) == ('v3', 1)
+
+    def test_no_tags(self, tmp_path):
+        path = str(tmp_path)
+        git(path, 'init', '-q')
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'one')
+        assert describe(os.path.join(path, '.git'),
+                        git(path, 'rev-parse', 'HEAD')) is None
+
+    def test_not_git(self, tmp_path):
+        with pytest.raises(ValueError):
+            describe(str(tmp_path), 'ab' * 20)
+
+    def test_bad_graph(self, history, tmp_path):
+        path = self.copy(history, tmp_path)
+        with open(os.path.join(path, '.git', 'objects', 'info',
+                               'commit-graph'), 'wb') as fh:
+            fh.write(b'CGPH\x02\x01\x03\x00')
+        assert load_commit_graph(os.path.join(path, '.git')) is None
+        check_all(path)
+
+
+class FakeCommits(object):
+    """
+    In-memory stand-in for CommitIndex: ``parents`` maps each commit to its
+    parents, and generations are computed from them.
+    """
+
+    def __init__(self, parents, tags, times=None):
+        self.parents = parents
+        self.tags = tags
+        # commit times; if given, generation numbers are unknown, as without
+        # a commit-graph
+        self.times = times
+        self.gitdir = '/repo/.git'
+        self.store = None
+        self.visited = []
+        self._gen = {}
+
+    def generation(self, key):
+        # parents have lower keys
+        for k in sorted(self.parents):
+            if k not in self._gen:
+                self._gen[k] = 1 + max(
+                    [self._gen[p] for p in self.parents[k]] or [0]
+                )
+        return self._gen[key]
+
+    def key(self, hexsha):
+        return hexsha
+
+    def commit(self, key):
+        self.visited.append(key)
+        if self.times is not None:
+            return GENERATION_INFINITY, self.times[key], self.parents[key]
+        return self.generation(key), 0, self.parents[key]
+
+
+class TestDescribeWalk(object):
+
+    def linear(self, n):
+        parents = {0: []}
+        for i in range(1, n):
+            parents[i] = [i - 1]
+        return parents
+
+    def run(self, commits, start, max_candidates=10):
+        with patch('%s.peeled_tags' % pbm) as mock_tags:
+            mock_tags.return_value = commits.tags
+            return _describe(commits, start, max_candidates)
+
+    def test_stops_early(self):
+        commits = FakeCommits(
+            self.linear(10000), {9990: ['near'], 5: ['far']}
+        )
+        assert self.run(commits, 9999) == ('near', 9)
+        # a tag found later could not be nearer
+        assert len(commits.visited) < 15
+
+    def test_tagged(self):
+        commits = FakeCommits(self.linear(10), {9: ['a', 'b']})
+        assert self.run(commits, 9) == ('b', 0)
+        assert commits.visited == []
+
+    def test_max_candidates(self):
+        commits = FakeCommits(
+            self.linear(100), dict((i, ['t%d' % i]) for i in range(50))
+        )
+        assert self.run(commits, 99, max_candidates=3) == ('t49', 50)
+
+    def test_nearest_by_count(self):
+        # 20 <- 21 (tag "side") ... and the main line 0..19, where 19 is
+        # tagged "main" and 30 merges 19 and 29
+        parents = self.linear(20)
+        parents[20] = [0]
+        for i in range(21, 30):
+            parents[i] = [i - 1]
+        parents[30] = [19, 29]
+        commits = FakeCommits(parents, {19: ['main'], 25: ['side']})
+        # side excludes only 0 and 20..25: 30, 26-29 and 1-19 remain
+        assert self.run(commits, 30) == ('main', 11)
+
+    def test_skewed_times(self):
+        # 4 merges 3 (tagged) and 2; 3 -> 1 -> 0 and 2 -> 0, where 1 is
+        # older than 0, so commit time order visits 0 before 1
+        parents = {0: [], 1: [0], 2: [0], 3: [1], 4: [3, 2]}
+        times = {0: 300, 1: 10, 2: 400, 3: 500, 4: 1000}
+        commits = FakeCommits(parents, {3: ['v1']}, times=times)
+        assert self.run(commits, 4) == ('v1', 2)
+        commits = FakeCommits(parents, {3: ['v1']})
+        assert self.run(commits, 4) == ('v1', 2)
+
+    def test_missing_start(self):
+        commits = FakeCommits({}, {1: ['x']})
+        commits.commit = lambda key: (_ for _ in ()).throw(KeyError(key))
+        assert self.run(commits, 2) is None
+
+
+class TestAheadBehindWalk(object):
+
+    def test_same(self):
+        commits = FakeCommits({0: []}, {})
+        assert _ahead_behind(commits, 0, 0) == (0, 0)
+        assert commits.visited == []
+
+    def test_diverged(self):
+        # 0-99 shared, then 100-104 local and 200-202 upstream
+        parents = dict((i, [i - 1] if i else []) for i in range(100))
+        parents[100] = [99]
+        for i in range(101, 105):
+            parents[i] = [i - 1]
+        parents[200] = [99]
+        for i in range(201, 203):
+            parents[i] = [i - 1]
+        commits = FakeCommits(parents, {})
+        assert _ahead_behind(commits, 104, 202) == (5, 3)
+        # the walk stops at the merge base
+        assert len(commits.visited) < 15
+
+    def test_merged_upstream(self):
+        # local merged the upstream (10), then added 12
+        parents = dict((i, [i - 1] if i else []) for i in range(10))
+        parents[10] = [9]
+        parents[11] = [9, 10]
+        parents[12] = [11]
+        commits = FakeCommits(parents, {})
+        assert _ahead_behind(commits, 12, 10) == (2, 0)
+        assert _ahead_behind(commits, 10, 12) == (0, 2)
+
+    def test_skewed_times(self):
+        # upstream is 0-10; local added 20 (committed with a clock far in
+        # the past) and 21 on top of it, so it is visited after 1-10
+        parents = dict((i, [i - 1] if i else []) for i in range(11))
+        parents[20] = [10]
+        parents[21] = [20]
+        times = dict((i, i * 10) for i in range(11))
+        times[20] = 5
+        times[21] = 210
+        commits = FakeCommits(parents, {}, times)
+        assert _ahead_behind(commits, 21, 10) == (2, 0)
+        assert _ahead_behind(commits, 10, 21) == (0, 2)
+
+    def test_skewed_times_slop(self):
+        # 0-9 shared; local 20-22, where 21 is dated before the merge base,
+        # and upstream 30-31
+        parents = dict((i, [i - 1] if i else []) for i in range(10))
+        parents[20] = [9]
+        parents[21] = [20]
+        parents[22] = [21]
+        parents[30] = [9]
+        parents[31] = [30]
+        times = dict((i, 100 + i) for i in range(10))
+        times.update({20: 200, 21: 50, 22: 220, 30: 300, 31: 310})
+        commits = FakeCommits(parents, {}, times)
+        assert _ahead_behind(commits, 22, 31) == (3, 2)
+        assert _ahead_behind(commits, 31, 22) == (2, 3)
+
+    def test_skewed_merge_base(self):
+        # the merge base (29) is dated before commits that are reachable
+        # from it only through others, which must be marked from it before
+        # the upstream side reaches them in date order
+        parents = {
+            0: [], 1: [0], 4: [1], 5: [4], 6: [4], 9: [5], 11: [1], 14: [9],
+            15: [14], 18: [9], 19: [18], 20: [11], 21: [20], 24: [15],
+            29: [24, 19], 33: [29], 39: [29], 42: [39, 6], 51: [42],
+            55: [51], 56: [55, 21]
+        }
+        times = {
+            0: 0, 1: -86340, 4: 86640, 5: 300, 6: -125640, 9: -85860,
+            11: 660, 14: 840, 15: 900, 18: -67320, 19: 1140, 20: -85200,
+            21: 1260, 24: 1440, 29: -153060, 33: 1980, 39: -12060,
+            42: 88920, 51: -104940, 55: -86700, 56: 3360
+        }
+        commits = FakeCommits(parents, {}, times)
+        assert _ahead_behind(commits, 33, 56) == (1, 9)
+        assert _ahead_behind(commits, 56, 33) == (9, 1)
+
+    def test_skewed_grandparent(self):
+        # local (12) merges upstream (8) and 11; 0, newer than all but 6, is
+        # the root. Upstream reaches 0 only through 2 and 1, and the walk
+        # ends at 2, so 0 must be marked from 2 (as git marks the parents
+        # of the parents of a merge base's descendants) to not be counted
+        parents = {
+            0: [], 1: [0], 2: [1], 3: [2], 4: [3], 5: [3], 6: [4], 7: [5, 6],
+            8: [7], 10: [0], 11: [10], 12: [8, 11]
+        }
+        times = {
+            0: 86460, 1: -85740, 2: -2880, 3: 1320, 4: 1380, 5: 1560,
+            6: 87840, 7: -84780, 8: -1860, 10: -3480, 11: 360, 12: 1800
+        }
+        commits = FakeCommits(parents, {}, times)
+        assert _ahead_behind(commits, 12, 8) == (3, 0)
+        assert _ahead_behind(commits, 8, 12) == (0, 3)
+
+    def test_missing(self):
+        commits = FakeCommits({0: []}, {})
+        with pytest.raises(KeyError):
+            _ahead_behind(commits, 0, 1)
+
+
+class TestDescribeString(object):
+
+    def test_string(self):
+        assert describe_string('v1', 0, 'abcdef0123') == 'v1'
+        assert describe_string('v1', 12, 'abcdef0123') == 'v1-12-gabcdef0'
+
+
+class TestCommitGraph(object):
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(OSError):
+            CommitGraph([str(tmp_path / 'nope')])
@@ -0,0 +1,608 @@
+"""
+versionfinder/tests/test_gitindex.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import time
+import shutil
+import struct
+import hashlib
+import subprocess
+import pytest
+
+from versionfinder import gitindex
+from versionfinder.gitindex import (
+    Index, IndexEntry, parse_index, read_index, parse_tree, parse_ignore,
+    is_dirty, _read_ewah, _merge_split, _glob_regex
+)
+from versionfinder.tests import git, needs_git
+
+from unittest.mock import patch
+
+pbm = 'versionfinder.gitindex'
+
+
+def write_file(path, content, mtime=None):
+    d = os.path.dirname(path)
+    if not os.path.exists(d):
+        os.makedirs(d)
+    with open(path, 'w') as fh:
+        fh.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def git_dirty(path):
+    """whether git status reports changes, without refreshing the index"""
+    env = dict(os.environ)
+    env['GIT_OPTIONAL_LOCKS'] = '0'
+    return subprocess.check_output(
+        ['git', '-C', path, 'status', '--porcelain', '--untracked-files'],
+        env=env
+    ).strip() != b''
+
+
+FILES = {
+    'a.txt': 'a\n',
+    'dir/b.txt': 'b\n',
+    'dir/sub/c.txt': 'c\n',
+    'dir/.gitignore': '*.tmp\n/anchored\n',
+    'exec.sh': '#!/bin/sh\n',
+    '.gitignore': '*.log\nbuild/\n!keep.log\n**/gen/\ndocs/**/*.html\n'
+                  '[Tt]emp[0-9]\n',
+}
+
+
+def make_repo(path, setup=()):
+    """
+    Create a repository with FILES committed, whose files are older than the
+    index (so that their stat data is trusted).
+    """
+    os.makedirs(path)
+    git(path, 'init', '-q')
+    old = time.time() - 10
+    for name, content in FILES.items():
+        write_file(os.path.join(path, name), content, old)
+    os.chmod(os.path.join(path, 'exec.sh'), 0o755)
+    os.symlink('a.txt', os.path.join(path, 'link'))
+    for args in setup:
+        git(path, *args)
+    git(path, 'add', '-A')
+    git(path, 'commit', '-q', '-m', 'one')
+    return path
+
+
+def modify_same_size(path):
+    write_file(os.path.join(path, 'a.txt'), 'x\n')
+
+
+def touch(path):
+    for name in FILES:
+        os.utime(os.path.join(path, name))
+
+
+def append(path):
+    with open(os.path.join(path, 'dir', 'sub', 'c.txt'), 'a') as fh:
+        fh.write('more\n')
+
+
+def chmod_x(path):
+    os.chmod(os.path.join(path, 'a.txt'), 0o755)
+
+
+def retarget_link(path):
+    os.unlink(os.path.join(path, 'link'))
+    os.symlink('exec.sh', os.path.join(path, 'link'))
+
+
+def file_to_dir(path):
+    os.unlink(os.path.join(path, 'a.txt'))
+    write_file(os.path.join(path, 'a.txt', 'x'), 'x\n')
+
+
+def staged_only(path):
+    write_file(os.path.join(path, 'a.txt'), 'staged\n')
+    git(path, 'add', 'a.txt')
+    write_file(os.path.join(path, 'a.txt'), 'a\n')
+
+
+def removed_cached(path):
+    git(path, 'rm', '-q', '--cached', 'dir/b.txt')
+    write_file(os.path.join(path, 'build', 'x'), 'x\n')
+
+
+def conflict(path):
+    git(path, 'checkout', '-q', '-b', 'other')
+    write_file(os.path.join(path, 'a.txt'), 'other\n')
+    git(path, 'commit', '-q', '-a', '-m', 'other')
+    git(path, 'checkout', '-q', '-')
+    write_file(os.path.join(path, 'a.txt'), 'mine\n')
+    git(path, 'commit', '-q', '-a', '-m', 'mine')
+    with pytest.raises(subprocess.CalledProcessError):
+        git(path, 'merge', '-q', 'other')
+
+
+def intent_to_add(path):
+    write_file(os.path.join(path, 'new.txt'), 'new\n')
+    git(path, 'add', '-N', 'new.txt')
+
+
+def assume_unchanged(path):
+    git(path, 'update-index', '--assume-unchanged', 'a.txt')
+    write_file(os.path.join(path, 'a.txt'), 'changed\n')
+
+
+def skip_worktree(path):
+    git(path, 'update-index', '--skip-worktree', 'a.txt')
+    os.unlink(os.path.join(path, 'a.txt'))
+
+
+def untracked(*names):
+    def func(path):
+        for name in names:
+            if name.endswith('/'):
+                os.makedirs(os.path.join(path, name))
+            else:
+                write_file(os.path.join(path, name), 'x\n')
+    return func
+
+
+def nested_repo(path):
+    git(path, 'init', '-q', 'dir/nested')
+
+
+def exclude(path):
+    write_file(os.path.join(path, '.git', 'info', 'exclude'), 'secret*\n')
+    write_file(os.path.join(path, 'secret.txt'), 'x\n')
+    write_file(os.path.join(path, 'dir', 'secret', 'x'), 'x\n')
+
+
+SCENARIOS = [
+    ('clean', lambda path: None, False),
+    ('modify_same_size', modify_same_size, True),
+    ('touch', touch, False),
+    ('append', append, True),
+    ('delete', lambda path: os.unlink(os.path.join(path, 'exec.sh')), True),
+    ('chmod_x', chmod_x, True),
+    ('chmod_minus_x',
+     lambda path: os.chmod(os.path.join(path, 'exec.sh'), 0o644), True),
+    ('retarget_link', retarget_link, True),
+    ('file_to_dir', file_to_dir, True),
+    ('staged_only', staged_only, True),
+    ('removed_cached', removed_cached, True),
+    ('conflict', conflict, True),
+    ('intent_to_add', intent_to_add, True),
+    ('assume_unchanged', assume_unchanged, False),
+    ('skip_worktree', skip_worktree, False),
+    ('untracked', untracked('new.txt'), True),
+    ('untracked_deep', untracked('dir/sub/new/deep/x'), True),
+    ('untracked_empty_dir', untracked('empty/', 'dir/empty/'), False),
+    ('ignored', untracked('x.log', 'dir/x.log', 'build/x', 'dir/build/y'),
+     False),
+    ('ignored_only_dir', untracked('logs/x.log', 'logs/deeper/y.log'),
+     False),
+    ('negated', untracked('keep.log'), True),
+    ('nested_gitignore', untracked('dir/x.tmp', 'dir/sub/y.tmp',
+                                   'dir/anchored'), False),
+    ('anchored_elsewhere', untracked('dir/sub/anchored'), True),
+    ('double_star', untracked('gen/x', 'dir/sub/gen/y', 'docs/a.html',
+                              'docs/x/y/b.html'), False),
+    ('double_star_miss', untracked('docs/x/y/b.htm'), True),
+    ('bracket', untracked('temp1', 'Temp2'), False),
+    ('bracket_miss', untracked('temp'), True),
+    ('nested_repo', nested_repo, True),
+    ('exclude', exclude, False),
+]
+
+
+@needs_git
+class TestIsDirty(object):
+
+    @pytest.mark.parametrize('setup', [
+        (), (('config', 'index.version', '4'),),
+        (('config', 'index.version', '3'),),
+        (('config', 'core.splitIndex', 'true'),
+         ('config', 'splitIndex.maxPercentChange', '100'))
+    ], ids=['v2', 'v4', 'v3', 'split'])
+    @pytest.mark.parametrize('name,func,expected', SCENARIOS,
+                             ids=[s[0] for s in SCENARIOS])
+    def test_scenario(self, tmp_path, setup, name, func, expected):
+        path = make_repo(str(tmp_path / 'repo'), setup)
+        func(path)
+        assert git_dirty(path) is expected
+        assert is_dirty(os.path.join(path, '.git')) is expected
+
+    def test_racy(self, tmp_path):
+        # files written in the same second as the index must be hashed
+        path = str(tmp_path / 'repo')
+        os.makedirs(path)
+        git(path, 'init', '-q')
+        write_file(os.path.join(path, 'a.txt'), 'a\n')
+        git(path, 'add', 'a.txt')
+        git(path, 'commit', '-q', '-m', 'one')
+        st = os.stat(os.path.join(path, 'a.txt'))
+        write_file(os.path.join(path, 'a.txt'), 'b\n')
+        os.utime(os.path.join(path, 'a.txt'),
+                 ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.utime(os.path.join(path, '.git', 'index'),
+                 ns=(st.st_atime_ns, st.st_mtime_ns))
+        with patch('%s._StatusCheck.compare' % pbm, autospec=True) as m:
+            m.return_value = gitindex._CLEAN
+            assert is_dirty(os.path.join(path, '.git')) is True
+
+    def test_many_suspects(self, tmp_path):
+        path = str(tmp_path / 'repo')
+        os.makedirs(path)
+        git(path, 'init', '-q')
+        old = time.time() - 10
+        for i in range(50):
+            write_file(os.path.join(path, 'f%d' % i), 'x' * i, old)
+        git(path, 'add', '-A')
+        git(path, 'commit', '-q', '-m', 'one')
+        for i in range(50):
+            os.utime(os.path.join(path, 'f%d' % i))
+        gitdir = os.path.join(path, '.git')
+        assert is_dirty(gitdir) is False
+        assert is_dirty(gitdir, max_workers=1) is False
+        write_file(os.path.join(path, 'f20'), 'y' * 20)
+        assert is_dirty(gitdir) is True
+        assert git_dirty(path) is True
+
+    def test_unborn(self, tmp_path):
+        path = str(tmp_path / 'repo')
+        os.makedirs(path)
+        git(path, 'init', '-q')
+        gitdir = os.path.join(path, '.git')
+        assert is_dirty(gitdir) is False
+        write_file(os.path.join(path, 'a.txt'), 'a\n')
+        assert is_dirty(gitdir) is True
+        git(path, 'add', 'a.txt')
+        assert is_dirty(gitdir) is True
+
+    def test_autocrlf(self, tmp_path):
+        path = make_repo(str(tmp_path / 'repo'))
+        git(path, 'config', 'core.autocrlf', 'true')
+        gitdir = os.path.join(path, '.git')
+        # the size changed, which git reports without converting the content
+        write_file(os.path.join(path, 'a.txt'), 'a\r\n')
+        assert is_dirty(gitdir) is git_dirty(path) is True
+        write_file(os.path.join(path, 'a.txt'), 'a\n')
+        assert is_dirty(gitdir) is False
+        # same size but different content, which may convert to the same
+        write_file(os.path.join(path, 'a.txt'), 'x\n')
+        assert is_dirty(gitdir) is None
+
+    def test_attributes(self, tmp_path):
+        path = make_repo(str(tmp_path / 'repo'))
+        write_file(os.path.join(path, '.gitattributes'), '*.txt text\n')
+        git(path, 'add', '.gitattributes')
+        git(path, 'commit', '-q', '-m', 'attributes')
+        gitdir = os.path.join(path, '.git')
+        assert is_dirty(gitdir) is False
+        write_file(os.path.join(path, 'a.txt'), 'x\n')
+        assert is_dirty(gitdir) is None
+        # changes that need no hashing are still found
+        write_file(os.path.join(path, 'a.txt'), 'longer\n')
+        assert is_dirty(gitdir) is True
+
+    def test_submodule(self, tmp_path):
+        sub = make_repo(str(tmp_path / 'sub'))
+        path = make_repo(str(tmp_path / 'repo'))
+        git(path, 'submodule', '-q', 'add', sub, 'mod',
+            config=['protocol.file.allow=always'])
+        git(path, 'commit', '-q', '-m', 'submodule')
+        gitdir = os.path.join(path, '.git')
+        assert is_dirty(gitdir) is git_dirty(path) is False
+        # not initialized in a clone
+        clone = str(tmp_path / 'clone')
+        git(str(tmp_path), 'clone', '-q', path, clone)
+        assert os.path.isdir(os.path.join(clone, 'mod'))
+        assert is_dirty(os.path.join(clone, '.git')) is \
+            git_dirty(clone) is False
+        write_file(os.path.join(path, 'mod', 'new.txt'), 'x\n')
+        assert is_dirty(gitdir) is git_dirty(path) is True
+        os.unlink(os.path.join(path, 'mod', 'new.txt'))
+        git(os.path.join(path, 'mod'), 'commit', '-q', '--allow-empty',
+            '-m', 'two')
+        assert is_dirty(gitdir) is git_dirty(path) is True
+        git(path, 'config', 'submodule.mod.ignore', 'all')
+        assert is_dirty(gitdir) is None
+
+    def test_linked_worktree(self, tmp_path):
+        path = make_repo(str(tmp_path / 'repo'))
+        wt = str(tmp_path / 'wt')
+        git(path, 'worktree', 'add', '-q', wt)
+        gitdir = os.path.join(path, '.git', 'worktrees', 'wt')
+        assert is_dirty(gitdir) is False
+        write_file(os.path.join(wt, 'new.txt'), 'x\n')
+        assert is_dirty(gitdir) is True
+        assert is_dirty(os.path.join(path, '.git')) is False
+
+    def test_core_worktree(self, tmp_path):
+        path = make_repo(str(tmp_path / 'repo'))
+        shutil.move(os.path.join(path, '.git'), str(tmp_path / 'gitdir'))
+        git(str(tmp_path / 'gitdir'), 'config', 'core.worktree', path)
+        assert is_dirty(str(tmp_path / 'gitdir')) is False
+
+    def test_bare(self, tmp_path):
+        path = str(tmp_path / 'bare.git')
+        git(str(tmp_path), 'init', '-q', '--bare', path)
+        assert is_dirty(path) is None
+
+    def test_not_git(self, tmp_path):
+        with pytest.raises(ValueError):
+            is_dirty(str(tmp_path))
+
+
+@needs_git
+class TestReadIndex(object):
+
+    def ls_files(self, path):
+        out = subprocess.check_output(
+            ['git', '-C', path, 'ls-files', '-s', '-z']
+        ).decode('utf-8')
+        res = []
+        for item in out.split('\0'):
+            if not item:
+                continue
+            info, name = item.split('\t', 1)
+            mode, sha, stage = info.split(' ')
+            res.append((name, int(mode, 8), sha, int(stage)))
+        return res
+
+    def entries(self, gitdir):
+        return [
+            (e.path.decode('utf-8'), e.mode, e.hexsha, e.stage)
+            for e in read_index(gitdir).entries
+        ]
+
+    @pytest.mark.parametrize('version', [2, 3, 4])
+    def test_versions(self, tmp_path, version):
+        path = make_repo(str(tmp_path / 'repo'))
+        # a path too long for the name length in the entry flags
+        sha = git(path, 'hash-object', '-w', 'a.txt')
+        git(path, 'update-index', '--add', '--cacheinfo',
+            '100644,%s,%s' % (sha, '/'.join(['d' * 200] * 25)))
+        git(path, 'update-index', '--index-version', str(version))
+        if version == 3:
+            git(path, 'update-index', '--skip-worktree', 'a.txt')
+        index = read_index(os.path.join(path, '.git'))
+        assert index.version == version
+        assert self.entries(os.path.join(path, '.git')) == \
+            self.ls_files(path)
+        e = [x for x in index.entries if x.path == b'dir/b.txt'][0]
+        st = os.lstat(os.path.join(path, 'dir', 'b.txt'))
+        assert e.stat[2:4] == divmod(st.st_mtime_ns, 1000000000)
+        assert e.stat[8] == st.st_size
+        if version == 3:
+            assert index.entries[1].path == b'a.txt'
+            assert index.entries[1].skip_worktree is True
+
+    def test_split(self, tmp_path):
+        path = make_repo(str(tmp_path / 'repo'))
+        gitdir = os.path.join(path, '.git')
+        git(path, 'update-index', '--split-index')
+        write_file(os.path.join(path, 'a.txt'), 'changed\n')
+        write_file(os.path.join(path, 'dir', 'new.txt'), 'new\n')
+        git(path, 'add', '-A')
+        git(path, 'rm', '-q', '--cached', 'exec.sh')
+        index = read_index(gitdir)
+        assert b'link' in index.extensions
+        assert len(parse_index(
+            open(os.path.join(gitdir, 'index'), 'rb').read()
+        ).entries) < len(index.entries)
+        assert self.entries(gitdir) == self.ls_files(path)
+
+    def test_cache_tree(self, tmp_path):
+        path = make_repo(str(tmp_path / 'repo'))
+        gitdir = os.path.join(path, '.git')
+        tree = read_index(gitdir).cache_tree()
+        assert tree[b''].hex() == git(path, 'rev-parse', 'HEAD^{tree}')
+        assert tree[b'dir/sub'].hex() == git(path, 'rev-parse',
+                                             'HEAD:dir/sub')
+        write_file(os.path.join(path, 'dir', 'sub', 'c.txt'), 'x\n')
+        git(path, 'add', 'dir/sub/c.txt')
+        tree = read_index(gitdir).cache_tree()
+        assert tree[b''] is None
+        assert tree[b'dir/sub'] is None
+        assert tree[b'dir'] is None
+        assert is_dirty(gitdir) is True
+
+    def test_parse_tree(self, tmp_path):
+        path = make_repo(str(tmp_path / 'repo'))
+        data = subprocess.check_output(
+            ['git', '-C', path, 'cat-file', 'tree', 'HEAD'])
+        res = [(m, n, s.hex()) for m, n, s in parse_tree(data)]
+        assert (0o120000, b'link',
+                git(path, 'rev-parse', 'HEAD:link')) in res
+        assert (0o40000, b'dir', git(path, 'rev-parse', 'HEAD:dir')) in res
+        assert (0o100755, b'exec.sh',
+                git(path, 'rev-parse', 'HEAD:exec.sh')) in res
+
+    def test_no_index(self, tmp_path):
+        path = str(tmp_path / 'repo')
+        os.makedirs(path)
+        git(path, 'init', '-q')
+        index = read_index(os.path.join(path, '.git'))
+        assert index.entries == []
+
+
+def index_data(entries, version=2, extensions=b''):
+    data = struct.pack('>4sII', b'DIRC', version, len(entries))
+    for path in entries:
+        entry = struct.pack('>10I20sH', *([0] * 6 + [0o100644, 0, 0, 0]),
+                            b'\x01' * 20, len(path)) + path
+        data += entry + b'\0' * (8 - len(entry) % 8)
+    data += extensions
+    return data + hashlib.sha1(data).digest()
+
+
+class TestParseIndex(object):
+
+    def test_parse(self):
+        index = parse_index(index_data([b'a', b'b/c']))
+        assert [e.path for e in index.entries] == [b'a', b'b/c']
+        assert index.entries[0].mode == 0o100644
+        assert index.entries[0].stage == 0
+        assert index.extensions == {}
+
+    def test_bad_magic(self):
+        data = b'XXXX' + index_data([b'a'])[4:]
+        with pytest.raises(ValueError):
+            parse_index(data)
+
+    def test_bad_version(self):
+        with pytest.raises(ValueError):
+            parse_index(index_data([b'a'], version=5))
+
+    def test_bad_checksum(self):
+        data = index_data([b'a'])
+        with pytest.raises(ValueError):
+            parse_index(data[:-1] + b'\0')
+
+    def test_skip_hash(self):
+        data = index_data([b'a'])
+        assert len(parse_index(data[:-20] + b'\0' * 20).entries) == 1
+
+    def test_truncated(self):
+        data = index_data([b'a', b'b'])[:-40]
+        with pytest.raises(ValueError):
+            parse_index(data + hashlib.sha1(data).digest())
+
+    def test_extensions(self):
+        ext = b'ABCD' + struct.pack('>I', 3) + b'xyz'
+        index = parse_index(index_data([b'a'], extensions=ext))
+        assert index.extensions == {b'ABCD': b'xyz'}
+
+    def test_required_extension(self):
+        ext = b'abcd' + struct.pack('>I', 0)
+        with pytest.raises(ValueError):
+            parse_index(index_data([b'a'], extensions=ext))
+
+    def test_cache_tree_corrupt(self):
+        index = Index(2, [], {b'TREE': b'\0x'})
+        with pytest.raises(ValueError):
+            index.cache_tree()
+
+
+def ewah(bit_size, words):
+    return struct.pack('>II', bit_size, len(words)) + \
+        struct.pack('>%dQ' % len(words), *words) + struct.pack('>I', 0)
+
+
+class TestEwah(object):
+
+    def test_literals(self):
+        # no run, two literal words
+        data = ewah(128, [2 << 33, 0b101, 1 << 63])
+        assert _read_ewah(data, 0) == ([0, 2, 127], len(data))
+
+    def test_runs(self):
+        # a run of one set word, then a literal word; a run of two clear
+        # words, then none
+        data = ewah(300, [(1 << 33) | (1 << 1) | 1, 0b10, 2 << 1])
+        assert _read_ewah(data, 0) == (list(range(64)) + [65], len(data))
+
+    def test_bit_size(self):
+        data = ewah(3, [(1 << 1) | 1])
+        assert _read_ewah(data, 0)[0] == [0, 1, 2]
+
+
+def entry(path, sha=b'\0' * 20, stage=0):
+    return IndexEntry(path, 0o100644, sha, stage << 12, 0, (0,) * 9)
+
+
+class TestMergeSplit(object):
+
+    def test_merge(self):
+        shared = [entry(b'a'), entry(b'b'), entry(b'c'), entry(b'd')]
+        front = [entry(b'', b'\1' * 20), entry(b'bb'), entry(b'e')]
+        res = _merge_split(shared, front, [2], [1])
+        assert [e.path for e in res] == [b'a', b'b', b'bb', b'd', b'e']
+        assert res[1].sha == b'\1' * 20
+
+    def test_corrupt(self):
+        with pytest.raises(ValueError):
+            _merge_split([entry(b'a')], [entry(b'x')], [], [0])
+        with pytest.raises(ValueError):
+            _merge_split([entry(b'a')], [], [], [0])
+
+
+class TestIgnore(object):
+
+    @pytest.mark.parametrize('pattern,path,match', [
+        (b'*.log', b'x.log', True),
+        (b'*.log', b'x.logs', False),
+        (b'a/*.c', b'a/b.c', True),
+        (b'a/*.c', b'a/b/c.c', False),
+        (b'**/foo', b'foo', True),
+        (b'**/foo', b'a/b/foo', True),
+        (b'a/**/b', b'a/b', True),
+        (b'a/**/b', b'a/x/y/b', True),
+        (b'a/**', b'a/x/y', True),
+        (b'a**b', b'axxb', True),
+        (b'a**b', b'ax/b', False),
+        (b'?.c', b'a.c', True),
+        (b'?.c', b'/.c', False),
+        (b'[a-c]x', b'bx', True),
+        (b'[!a-c]x', b'dx', True),
+        (b'[!a-c]x', b'bx', False),
+        (b'[[:digit:]]x', b'1x', True),
+        (b'[]]x', b']x', True),
+        (b'[x', b'[x', True),
+        (b'\\*x', b'*x', True),
+        (b'\\*x', b'ax', False),
+        (b'a+b(c)', b'a+b(c)', True),
+    ])
+    def test_glob(self, pattern, path, match):
+        assert bool(_glob_regex(pattern).match(path)) is match
+
+    def test_parse(self):
+        res = parse_ignore(
+            b'# comment\n\n!keep\n/top\ndir/\nsp\\ \ntrail  \n\\#hash\n'
+            b'[[:bogus:]]\n', b'sub/')
+        assert [(p.regex.pattern, p.negate, p.dir_only, p.anchored)
+                for p in res] == [
+            (b'keep\\Z', True, False, False),
+            (b'top\\Z', False, False, True),
+            (b'dir\\Z', False, True, False),
+            (b'sp\\ \\Z', False, False, False),
+            (b'trail\\Z', False, False, False),
+            (b'\\#hash\\Z', False, False, False),
+        ]
+        assert all(p.base == b'sub/' for p in res)
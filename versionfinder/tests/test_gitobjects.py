@@ -0,0 +1,529 @@
+"""
+versionfinder/tests/test_gitobjects.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import glob
+import shutil
+import struct
+import subprocess
+import pytest
+
+from versionfinder.gitobjects import (
+    ObjectStore, PackIndex, apply_delta, common_dir, parse_commit,
+    parse_tag, read_packed_refs, resolve_ref, symbolic_ref, iter_refs,
+    tags_at, peeled_tags, read_config, upstream_ref, _map_refspec
+)
+from versionfinder.tests import git, needs_git
+
+from unittest.mock import Mock, call
+
+
+def write_file(path, content):
+    d = os.path.dirname(path)
+    if not os.path.exists(d):
+        os.makedirs(d)
+    with open(path, 'w') as fh:
+        fh.write(content)
+
+
+@pytest.fixture(scope='module')
+def packed_repo(tmp_path_factory):
+    """
+    A repository whose history is packed (with deltas), plus a loose
+    annotated tag and a loose commit.
+    """
+    if shutil.which('git') is None:
+        pytest.skip('requires git')
+    path = str(tmp_path_factory.mktemp('packed'))
+    git(path, 'init', '-q')
+    for i in range(1, 31):
+        write_file(os.path.join(path, 'f.txt'),
+                   ''.join('%d\n' % n for n in range(i * 40)))
+        git(path, 'add', 'f.txt')
+        git(path, 'commit', '-q', '-m', 'commit %d' % i)
+        if i % 10 == 0:
+            git(path, 'tag', '-a', '-m', 'tag %d' % i, 'v%d' % i)
+        else:
+            git(path, 'tag', 'light%d' % i)
+    git(path, 'gc', '-q', '--aggressive')
+    git(path, 'tag', '-a', '-m', 'loose', 'loose-ann', 'HEAD~3')
+    write_file(os.path.join(path, 'f.txt'), 'last\n')
+    git(path, 'commit', '-q', '-a', '-m', 'loose commit')
+    return path
+
+
+@needs_git
+class TestObjectStore(object):
+
+    def all_objects(self, path):
+        out = git(path, 'cat-file', '--batch-all-objects', '--batch-check')
+        return [line.split()[:2] for line in out.splitlines()]
+
+    def test_read_all(self, packed_repo):
+        store = ObjectStore(os.path.join(packed_repo, '.git'))
+        objects = self.all_objects(packed_repo)
+        assert len(objects) > 90
+        for sha, typ in objects:
+            expected = subprocess.check_output(
+                ['git', '-C', packed_repo, 'cat-file', typ, sha]
+            )
+            assert store.read(sha) == (typ, expected)
+            assert store.read_type(sha) == typ
+        store.close()
+
+    def test_missing(self, packed_repo):
+        store = ObjectStore(os.path.join(packed_repo, '.git'))
+        with pytest.raises(KeyError):
+            store.read('00' * 20)
+        with pytest.raises(KeyError):
+            store.read_type('ff' * 20)
+
+    def test_peel(self, packed_repo):
+        store = ObjectStore(os.path.join(packed_repo, '.git'))
+        tag = git(packed_repo, 'rev-parse', 'v20')
+        commit = git(packed_repo, 'rev-parse', 'v20^{commit}')
+        assert tag != commit
+        assert store.peel(tag) == commit
+        assert store.peel(commit) == commit
+
+    def test_reload_closes_removed_packs(self, packed_repo, tmp_path):
+        path = str(tmp_path / 'repo')
+        shutil.copytree(packed_repo, path)
+        store = ObjectStore(os.path.join(path, '.git'))
+        old_commit = git(path, 'rev-parse', 'HEAD~2')
+        assert store.read(old_commit)[0] == 'commit'
+        old = [list(entry) for entry in store._packs]
+        assert old[0][1] is not None
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'new')
+        git(path, 'repack', '-q', '-a', '-d')
+        new_commit = git(path, 'rev-parse', 'HEAD')
+        # not in the old pack, so the packs are listed again
+        assert store.read(new_commit)[0] == 'commit'
+        for idx, pack in old:
+            assert idx.closed
+            assert pack is None or pack.closed
+        assert store.read(old_commit)[0] == 'commit'
+        assert store.read_type(old_commit) == 'commit'
+        store.close()
+
+    def test_read_retried_when_pack_closed(self, packed_repo, tmp_path):
+        path = str(tmp_path / 'repo')
+        shutil.copytree(packed_repo, path)
+        store = ObjectStore(os.path.join(path, '.git'))
+        commit = git(path, 'rev-parse', 'HEAD~2')
+        expected = store.read(commit)
+        store._cache.clear()
+        # a new object, so the new pack has a new name
+        git(path, 'commit', '-q', '--allow-empty', '-m', 'new')
+        git(path, 'repack', '-q', '-a', '-d')
+        read_packed = store._read_packed
+        calls = []
+
+        def reload_first(pack, offset):
+            # as if another thread reloaded the packs during this read
+            calls.append(pack)
+            if len(calls) == 1:
+                store._indexes(reload=True)
+            return read_packed(pack, offset)
+
+        store._read_packed = reload_first
+        assert store.read(commit) == expected
+        assert len(calls) == 2
+        assert calls[0].closed
+        assert not calls[1].closed
+        store.close()
+
+    def test_alternates(self, packed_repo, tmp_path):
+        path = str(tmp_path / 'alt')
+        git(str(tmp_path), 'init', '-q', 'alt')
+        write_file(
+            os.path.join(path, '.git', 'objects', 'info', 'alternates'),
+            '# comment\n%s\n' % os.path.join(packed_repo, '.git', 'objects')
+        )
+        store = ObjectStore(os.path.join(path, '.git'))
+        head = git(packed_repo, 'rev-parse', 'HEAD')
+        assert store.read_type(head) == 'commit'
+        assert len(store.object_dirs) == 2
+
+    def test_pack_index_v1(self, packed_repo, tmp_path):
+        idx_path = glob.glob(os.path.join(
+            packed_repo, '.git', 'objects', 'pack', '*.idx'))[0]
+        v2 = PackIndex(idx_path)
+        with open(idx_path, 'rb') as fh:
+            data = fh.read()
+        count = v2.count
+        names = [data[1032 + i * 20:1032 + (i + 1) * 20]
+                 for i in range(count)]
+        # write the same index in the version 1 format
+        v1_path = str(tmp_path / 'pack-v1.idx')
+        with open(v1_path, 'wb') as fh:
+            fh.write(data[8:8 + 1024])
+            for i, name in enumerate(names):
+                fh.write(struct.pack('>I', v2._offset(i)) + name)
+        v1 = PackIndex(v1_path)
+        assert v1.version == 1
+        assert v1.count == count
+        for name in names:
+            assert v1.find(name) == v2.find(name)
+        assert v1.find(b'\x00' * 20) is None
+        v1.close()
+        v2.close()
+
+    def test_pack_index_bad_version(self, tmp_path):
+        path = str(tmp_path / 'x.idx')
+        with open(path, 'wb') as fh:
+            fh.write(b'\xfftOc' + struct.pack('>I', 3) + b'\0' * 1024)
+        with pytest.raises(ValueError):
+            PackIndex(path)
+
+
+class TestApplyDelta(object):
+
+    def test_copy_and_insert(self):
+        base = b'0123456789abcdef'
+        delta = bytes([
+            16,  # source size
+            12,  # target size
+            0x91, 2, 4,  # copy 4 bytes from offset 2
+            3, ord('x'), ord('y'), ord('z'),  # insert 3 bytes
+            0x90, 5,  # copy 5 bytes from offset 0
+        ])
+        assert apply_delta(base, delta) == b'2345xyz01234'
+
+    def test_copy_64k(self):
+        base = b'a' * 0x10000
+        delta = b'\x80\x80\x04\x80\x80\x04\x80'
+        assert apply_delta(base, delta) == base
+
+    def test_bad_source_size(self):
+        with pytest.raises(ValueError):
+            apply_delta(b'abc', bytes([4, 1, 1, ord('x')]))
+
+    def test_bad_opcode(self):
+        with pytest.raises(ValueError):
+            apply_delta(b'abc', bytes([3, 1, 0]))
+
+    def test_bad_result_size(self):
+        with pytest.raises(ValueError):
+            apply_delta(b'abc', bytes([3, 2, 1, ord('x')]))
+
+
+class TestParse(object):
+
+    def test_commit(self):
+        data = (
+            b'tree 1111\nparent aaaa\nparent bbbb\n'
+            b'author A <a@a> 1500000000 +0000\n'
+            b'committer C <c@c> 1600000000 -0500\n'
+            b'gpgsig -----BEGIN PGP SIGNATURE-----\n \n abc\n'
+            b' -----END PGP SIGNATURE-----\n'
+            b'\nsubject\n\nbody\n'
+        )
+        assert parse_commit(data) == {
+            'tree': '1111',
+            'parents': ['aaaa', 'bbbb'],
+            'author': 'A <a@a> 1500000000 +0000',
+            'committer': 'C <c@c> 1600000000 -0500',
+            'commit_time': 1600000000,
+            'message': 'subject\n\nbody\n'
+        }
+
+    def test_commit_bad_time(self):
+        res = parse_commit(b'tree 1\ncommitter C <c@c>\n\nmsg')
+        assert res['commit_time'] is None
+        assert res['parents'] == []
+
+    def test_tag(self):
+        data = (b'object abcd\ntype commit\ntag v1.0\n'
+                b'tagger T <t@t> 1 +0000\n\nmessage\n')
+        assert parse_tag(data) == {
+            'object': 'abcd', 'type': 'commit', 'tag': 'v1.0',
+            'tagger': 'T <t@t> 1 +0000', 'message': 'message\n'
+        }
+
+
+class TestRefs(object):
+
+    def make_gitdir(self, tmp_path, packed=None):
+        gitdir = str(tmp_path / '.git')
+        os.makedirs(os.path.join(gitdir, 'refs', 'tags'))
+        os.makedirs(os.path.join(gitdir, 'refs', 'heads'))
+        if packed is not None:
+            write_file(os.path.join(gitdir, 'packed-refs'), packed)
+        return gitdir
+
+    def test_packed_refs_fully_peeled(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path, (
+            '# pack-refs with: peeled fully-peeled sorted \n'
+            '%s refs/heads/master\n'
+            '%s refs/tags/ann\n'
+            '^%s\n'
+            '%s refs/tags/light\n'
+            'garbage\n'
+        ) % ('a' * 40, 'b' * 40, 'c' * 40, 'd' * 40))
+        assert read_packed_refs(gitdir) == {
+            'refs/heads/master': ('a' * 40, 'a' * 40),
+            'refs/tags/ann': ('b' * 40, 'c' * 40),
+            'refs/tags/light': ('d' * 40, 'd' * 40),
+        }
+
+    def test_packed_refs_peeled(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path, (
+            '# pack-refs with: peeled \n'
+            '%s refs/heads/master\n'
+            '%s refs/tags/light\n'
+        ) % ('a' * 40, 'd' * 40))
+        assert read_packed_refs(gitdir) == {
+            'refs/heads/master': ('a' * 40, None),
+            'refs/tags/light': ('d' * 40, 'd' * 40),
+        }
+
+    def test_packed_refs_no_traits(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path, '%s refs/tags/x\n' % ('a' * 40))
+        assert read_packed_refs(gitdir) == {
+            'refs/tags/x': ('a' * 40, None)
+        }
+        assert read_packed_refs(str(tmp_path / 'nope')) == {}
+
+    def test_resolve_ref(self, tmp_path):
+        gitdir = self.make_gitdir(
+            tmp_path, '%s refs/heads/packed\n' % ('b' * 40)
+        )
+        write_file(os.path.join(gitdir, 'HEAD'), 'ref: refs/heads/master\n')
+        write_file(os.path.join(gitdir, 'refs', 'heads', 'master'),
+                   'a' * 40 + '\n')
+        assert resolve_ref(gitdir) == 'a' * 40
+        assert symbolic_ref(gitdir) == 'refs/heads/master'
+        assert resolve_ref(gitdir, 'refs/heads/packed') == 'b' * 40
+        assert resolve_ref(gitdir, 'refs/heads/nope') is None
+        write_file(os.path.join(gitdir, 'HEAD'), 'c' * 40 + '\n')
+        assert resolve_ref(gitdir) == 'c' * 40
+        assert symbolic_ref(gitdir) is None
+        assert symbolic_ref(str(tmp_path / 'nope')) is None
+
+    def test_resolve_ref_loop(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path)
+        write_file(os.path.join(gitdir, 'refs', 'heads', 'a'),
+                   'ref: refs/heads/b\n')
+        write_file(os.path.join(gitdir, 'refs', 'heads', 'b'),
+                   'ref: refs/heads/a\n')
+        with pytest.raises(ValueError):
+            resolve_ref(gitdir, 'refs/heads/a')
+
+    def test_worktree(self, tmp_path):
+        main = self.make_gitdir(tmp_path)
+        write_file(os.path.join(main, 'refs', 'heads', 'feature'),
+                   'a' * 40 + '\n')
+        wt = os.path.join(main, 'worktrees', 'wt')
+        write_file(os.path.join(wt, 'commondir'), '../..\n')
+        write_file(os.path.join(wt, 'HEAD'), 'ref: refs/heads/feature\n')
+        assert common_dir(wt) == main
+        assert common_dir(main) == main
+        assert resolve_ref(wt) == 'a' * 40
+
+    def test_iter_refs(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path, (
+            '%s refs/tags/a\n%s refs/tags/b\n%s refs/heads/x\n'
+        ) % ('1' * 40, '2' * 40, '3' * 40))
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'b'), '4' * 40)
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'dir', 'c'), '5' * 40)
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'sym'),
+                   'ref: refs/tags/a')
+        assert iter_refs(gitdir) == {
+            'refs/tags/a': ('1' * 40, None),
+            'refs/tags/b': ('4' * 40, None),
+            'refs/tags/dir/c': ('5' * 40, None),
+        }
+
+    def test_tags_at(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path, (
+            '# pack-refs with: peeled fully-peeled sorted \n'
+            '%s refs/tags/packed-ann\n^%s\n'
+            '%s refs/tags/packed-light\n'
+            '%s refs/tags/other\n'
+        ) % ('b' * 40, 'c' * 40, 'c' * 40, 'd' * 40))
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'loose-light'),
+                   'c' * 40)
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'loose-ann'),
+                   'e' * 40)
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'loose-other'),
+                   'f' * 40)
+        store = Mock()
+        store.peel.side_effect = lambda sha: 'c' * 40 if sha == 'e' * 40 \
+            else sha
+        assert tags_at(gitdir, 'c' * 40, store=store) == [
+            'loose-ann', 'loose-light', 'packed-ann', 'packed-light'
+        ]
+        assert sorted(store.peel.mock_calls) == [
+            call('e' * 40), call('f' * 40)
+        ]
+
+    def test_peeled_tags(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path, (
+            '# pack-refs with: peeled fully-peeled sorted \n'
+            '%s refs/tags/packed-ann\n^%s\n'
+            '%s refs/tags/packed-light\n'
+        ) % ('b' * 40, 'c' * 40, 'c' * 40))
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'loose-ann'),
+                   'e' * 40)
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'loose-light'),
+                   'f' * 40)
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'broken'), '1' * 40)
+        store = Mock()
+        peeled = {'e' * 40: 'c' * 40, 'f' * 40: 'f' * 40}
+        store.peel.side_effect = lambda sha: peeled[sha]
+        assert peeled_tags(gitdir, store=store) == {
+            'c' * 40: ['loose-ann', 'packed-ann', 'packed-light'],
+            'f' * 40: ['loose-light']
+        }
+        with pytest.raises(ValueError):
+            peeled_tags(str(tmp_path / 'nope'))
+
+    def test_tags_at_peel_error(self, tmp_path):
+        gitdir = self.make_gitdir(tmp_path)
+        write_file(os.path.join(gitdir, 'refs', 'tags', 'x'), 'e' * 40)
+        store = Mock()
+        store.peel.side_effect = KeyError('e' * 40)
+        assert tags_at(gitdir, 'c' * 40, store=store) == []
+
+    def test_tags_at_not_git(self, tmp_path):
+        with pytest.raises(ValueError):
+            tags_at(str(tmp_path), 'c' * 40)
+
+    @needs_git
+    def test_tags_at_real(self, packed_repo):
+        gitdir = os.path.join(packed_repo, '.git')
+        assert tags_at(gitdir, git(packed_repo, 'rev-parse', 'HEAD~4')) == [
+            'light27', 'loose-ann'
+        ]
+        assert tags_at(gitdir, git(packed_repo, 'rev-parse', 'v30^{}')) == [
+            'v30'
+        ]
+        assert tags_at(gitdir, git(packed_repo, 'rev-parse', 'HEAD')) == []
+
+
+class TestConfig(object):
+
+    def write(self, tmp_path, content):
+        gitdir = str(tmp_path / '.git')
+        write_file(os.path.join(gitdir, 'config'), content)
+        return gitdir
+
+    def test_read_config(self, tmp_path):
+        gitdir = self.write(tmp_path, (
+            '# comment\n'
+            '[core]\n'
+            '\tbare = false\n'
+            '\tFileMode\n'
+            '[remote "origin"]\n'
+            '\turl = https://example.com/foo.git ; trailing comment\n'
+            '\tfetch = +refs/heads/*:refs/remotes/origin/*\n'
+            '\tfetch = +refs/tags/*:refs/tags/*\n'
+            '[branch "Feature/X"] merge = refs/heads/feature/x\n'
+            '[Branch.Legacy]\n'
+            '\tremote = "quoted # not a comment"\n'
+            '\tdesc = a\\tb \\"c\\" \\\n'
+            '\t\tcontinued\n'
+            'ignored line\n'
+        ))
+        assert read_config(gitdir) == {
+            ('core', None, 'bare'): ['false'],
+            ('core', None, 'filemode'): [None],
+            ('remote', 'origin', 'url'): ['https://example.com/foo.git'],
+            ('remote', 'origin', 'fetch'): [
+                '+refs/heads/*:refs/remotes/origin/*',
+                '+refs/tags/*:refs/tags/*'
+            ],
+            ('branch', 'Feature/X', 'merge'): ['refs/heads/feature/x'],
+            ('branch', 'legacy', 'remote'): ['quoted # not a comment'],
+            ('branch', 'legacy', 'desc'): ['a\tb "c"continued'],
+        }
+
+    def test_read_config_missing(self, tmp_path):
+        assert read_config(str(tmp_path)) == {}
+
+    def test_map_refspec(self):
+        spec = '+refs/heads/*:refs/remotes/origin/*'
+        assert _map_refspec(spec, 'refs/heads/a/b') == 'refs/remotes/origin/a/b'
+        assert _map_refspec(spec, 'refs/tags/a') is None
+        assert _map_refspec('refs/heads/main:refs/remotes/o/main',
+                            'refs/heads/main') == 'refs/remotes/o/main'
+        assert _map_refspec('refs/heads/main:refs/remotes/o/main',
+                            'refs/heads/other') is None
+        assert _map_refspec('refs/heads/main', 'refs/heads/main') is None
+        assert _map_refspec('^refs/heads/*', 'refs/heads/main') is None
+        assert _map_refspec('refs/heads/*-x:refs/x/*', 'refs/heads/-') is None
+
+    def test_upstream_ref(self, tmp_path):
+        gitdir = self.write(tmp_path, (
+            '[remote "origin"]\n'
+            '\tfetch = +refs/heads/*:refs/remotes/origin/*\n'
+            '[remote "narrow"]\n'
+            '\tfetch = +refs/heads/main:refs/remotes/narrow/main\n'
+            '[branch "main"]\n'
+            '\tremote = origin\n'
+            '\tmerge = refs/heads/main\n'
+            '[branch "short"]\n'
+            '\tremote = origin\n'
+            '\tmerge = dev\n'
+            '[branch "local"]\n'
+            '\tremote = .\n'
+            '\tmerge = refs/heads/main\n'
+            '[branch "unmapped"]\n'
+            '\tremote = narrow\n'
+            '\tmerge = refs/heads/other\n'
+            '[branch "noremote"]\n'
+            '\tmerge = refs/heads/main\n'
+        ))
+        assert upstream_ref(gitdir, 'main') == 'refs/remotes/origin/main'
+        assert upstream_ref(gitdir, 'short') == 'refs/remotes/origin/dev'
+        assert upstream_ref(gitdir, 'local') == 'refs/heads/main'
+        assert upstream_ref(gitdir, 'unmapped') is None
+        assert upstream_ref(gitdir, 'noremote') is None
+        assert upstream_ref(gitdir, 'nope') is None
+        assert upstream_ref(gitdir, 'main', config={}) is None
+
+    @needs_git
+    def test_upstream_ref_real(self, packed_repo, tmp_path):
+        path = str(tmp_path / 'clone')
+        subprocess.check_call(['git', 'clone', '-q', packed_repo, path],
+                              stderr=subprocess.DEVNULL)
+        branch = git(path, 'symbolic-ref', '--short', 'HEAD')
+        assert upstream_ref(os.path.join(path, '.git'), branch) == \
+            git(path, 'rev-parse', '--symbolic-full-name', '@{upstream}')
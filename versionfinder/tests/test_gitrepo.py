@@ -0,0 +1,400 @@
+"""
+versionfinder/tests/test_gitrepo.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import shutil
+import threading
+import subprocess
+import pytest
+
+from versionfinder import gitrepo
+from versionfinder.gitrepo import (
+    find_git_dir, repo_path, clear_cache, pooled_repo, close_pool,
+    git_cli_info, native_git_info, _parse_status, _parse_remotes
+)
+from versionfinder.tests import git, needs_git
+
+from unittest.mock import patch, Mock, call
+
+pbm = 'versionfinder.gitrepo'
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    close_pool()
+    yield
+    clear_cache()
+    close_pool()
+
+
+class TestFindGitDir(object):
+
+    def test_in_dir(self, tmp_path):
+        os.makedirs(str(tmp_path / 'repo' / '.git'))
+        assert find_git_dir(str(tmp_path / 'repo')) == str(
+            tmp_path / 'repo' / '.git'
+        )
+
+    def test_parent(self, tmp_path):
+        pkg = tmp_path / 'repo' / 'libs' / 'foo' / 'foo'
+        os.makedirs(str(pkg))
+        os.makedirs(str(tmp_path / 'repo' / '.git'))
+        expected = str(tmp_path / 'repo' / '.git')
+        assert find_git_dir(str(pkg)) == expected
+        for d in [pkg, pkg.parent, pkg.parent.parent, tmp_path / 'repo']:
+            assert gitrepo._cache[str(d)] == expected
+
+    def test_not_found(self, tmp_path):
+        pkg = tmp_path / 'a' / 'b'
+        os.makedirs(str(pkg))
+        with patch('%s._dotgit' % pbm) as mock_dotgit:
+            with patch('%s._device' % pbm) as mock_device:
+                mock_dotgit.return_value = None
+                mock_device.return_value = 1
+                assert find_git_dir(str(pkg)) is None
+        assert gitrepo._cache[str(pkg)] is None
+        assert gitrepo._cache[str(tmp_path)] is None
+        assert gitrepo._cache['/'] is None
+
+    def test_cached(self, tmp_path):
+        pkg = tmp_path / 'repo' / 'foo'
+        os.makedirs(str(pkg))
+        os.makedirs(str(tmp_path / 'repo' / '.git'))
+        find_git_dir(str(pkg))
+        with patch('%s._dotgit' % pbm) as mock_dotgit:
+            with patch('%s._device' % pbm) as mock_device:
+                mock_device.return_value = 1
+                assert find_git_dir(str(pkg)) == str(
+                    tmp_path / 'repo' / '.git'
+                )
+                assert mock_device.mock_calls == []
+                # a new directory below a cached one only checks itself,
+                # and stats itself and its parent for mount points
+                os.makedirs(str(pkg / 'sub'))
+                mock_dotgit.return_value = None
+                assert find_git_dir(str(pkg / 'sub')) == str(
+                    tmp_path / 'repo' / '.git'
+                )
+        assert mock_dotgit.call_count == 1
+        assert mock_device.mock_calls == [
+            call(str(pkg / 'sub')), call(str(pkg))
+        ]
+
+    def test_cached_negative(self, tmp_path):
+        pkg = tmp_path / 'foo'
+        os.makedirs(str(pkg))
+        with patch('%s._dotgit' % pbm) as mock_dotgit:
+            mock_dotgit.return_value = None
+            assert find_git_dir(str(pkg)) is None
+            count = mock_dotgit.call_count
+            assert find_git_dir(str(pkg)) is None
+            assert find_git_dir(str(tmp_path)) is None
+        assert mock_dotgit.call_count == count
+        clear_cache()
+        assert gitrepo._cache == {}
+
+    def test_site_packages(self, tmp_path):
+        site = tmp_path / 'venv' / 'lib' / 'site-packages'
+        os.makedirs(str(site / 'foo'))
+        os.makedirs(str(tmp_path / 'venv' / '.git'))
+        os.makedirs(str(site / '.git'))
+        assert find_git_dir(str(site / 'foo')) is None
+        assert find_git_dir(str(site)) is None
+
+    def test_mount_boundary(self, tmp_path):
+        pkg = tmp_path / 'mnt' / 'foo'
+        os.makedirs(str(pkg))
+        os.makedirs(str(tmp_path / '.git'))
+
+        def se_device(path):
+            return 2 if path.startswith(str(tmp_path / 'mnt')) else 1
+
+        with patch('%s._device' % pbm) as mock_device:
+            mock_device.side_effect = se_device
+            assert find_git_dir(str(pkg)) is None
+
+    def test_nonexistent(self, tmp_path):
+        assert find_git_dir(str(tmp_path / 'nope')) is None
+        assert gitrepo._cache == {}
+
+    def test_gitdir_file(self, tmp_path):
+        real = tmp_path / 'super' / '.git' / 'modules' / 'sub'
+        os.makedirs(str(real))
+        os.makedirs(str(tmp_path / 'super' / 'sub' / 'pkg'))
+        (tmp_path / 'super' / 'sub' / '.git').write_text(
+            'gitdir: ../.git/modules/sub\n'
+        )
+        assert find_git_dir(str(tmp_path / 'super' / 'sub' / 'pkg')) == \
+            str(real)
+
+    def test_gitdir_file_absolute(self, tmp_path):
+        os.makedirs(str(tmp_path / 'gitdirs' / 'wt'))
+        os.makedirs(str(tmp_path / 'wt'))
+        (tmp_path / 'wt' / '.git').write_text(
+            'gitdir: %s\n' % (tmp_path / 'gitdirs' / 'wt')
+        )
+        assert find_git_dir(str(tmp_path / 'wt')) == str(
+            tmp_path / 'gitdirs' / 'wt'
+        )
+
+    def test_gitdir_file_invalid(self, tmp_path):
+        os.makedirs(str(tmp_path / 'a' / 'b'))
+        (tmp_path / 'a' / 'b' / '.git').write_text('gitdir: ../missing\n')
+        (tmp_path / 'a' / '.git').write_text('not a gitdir file\n')
+        with patch('%s._device' % pbm) as mock_device:
+            # stop the search at tmp_path
+            mock_device.side_effect = lambda p: (
+                1 if p.startswith(str(tmp_path)) else 2
+            )
+            assert find_git_dir(str(tmp_path / 'a' / 'b')) is None
+
+
+class TestRepoPath(object):
+
+    def test_plain(self, tmp_path):
+        os.makedirs(str(tmp_path / '.git'))
+        assert repo_path(str(tmp_path / '.git')) == str(tmp_path / '.git')
+
+    def test_linked_worktree(self, tmp_path):
+        gitdir = tmp_path / 'main' / '.git' / 'worktrees' / 'wt'
+        os.makedirs(str(gitdir))
+        (gitdir / 'commondir').write_text('../..\n')
+        (gitdir / 'gitdir').write_text('%s\n' % (tmp_path / 'wt' / '.git'))
+        assert repo_path(str(gitdir)) == str(tmp_path / 'wt')
+
+    def test_linked_worktree_no_gitdir(self, tmp_path):
+        gitdir = tmp_path / 'wt'
+        os.makedirs(str(gitdir))
+        (gitdir / 'commondir').write_text('../..\n')
+        assert repo_path(str(gitdir)) == str(gitdir)
+        (gitdir / 'gitdir').write_text('\n')
+        assert repo_path(str(gitdir)) == str(gitdir)
+
+
+class TestPooledRepo(object):
+
+    def test_reused(self):
+        factory = Mock()
+        with pooled_repo('/a', factory) as repo:
+            assert repo is factory.return_value
+        with pooled_repo('/a', factory) as repo2:
+            assert repo2 is repo
+        assert factory.mock_calls == [call('/a')]
+
+    def test_lru_eviction(self):
+        repos = {}
+
+        def factory(path):
+            repos[path] = Mock(name=path)
+            return repos[path]
+
+        with patch('%s.POOL_SIZE' % pbm, 2):
+            for path in ['/a', '/b', '/a', '/c']:
+                with pooled_repo(path, factory):
+                    pass
+        assert list(gitrepo._pool.keys()) == ['/a', '/c']
+        assert repos['/b'].close.mock_calls == [call()]
+        assert repos['/a'].close.mock_calls == []
+        assert repos['/c'].close.mock_calls == []
+
+    def test_evicted_while_in_use(self):
+        factory = Mock()
+        with patch('%s.POOL_SIZE' % pbm, 1):
+            with pooled_repo('/a', factory) as repo:
+                t = threading.Thread(
+                    target=lambda: pooled_repo('/b', Mock()).__enter__()
+                )
+                t.start()
+                t.join(0.2)
+                # the evicting thread waits until the Repo is released
+                assert t.is_alive()
+                assert repo.close.mock_calls == []
+            t.join(5)
+        assert repo.close.mock_calls == [call()]
+        assert list(gitrepo._pool.keys()) == ['/b']
+
+    def test_exception_discards(self):
+        factory = Mock()
+        with pytest.raises(RuntimeError):
+            with pooled_repo('/a', factory) as repo:
+                raise RuntimeError()
+        assert repo.close.mock_calls == [call()]
+        assert gitrepo._pool == {}
+
+    def test_factory_exception(self):
+        factory = Mock(side_effect=RuntimeError())
+        with pytest.raises(RuntimeError):
+            with pooled_repo('/a', factory):
+                pass
+        assert gitrepo._pool == {}
+
+    def test_close_pool(self):
+        with pooled_repo('/a', Mock()) as repo:
+            pass
+        with pooled_repo('/b', Mock()) as in_use:
+            close_pool()
+            assert repo.close.mock_calls == [call()]
+            assert in_use.close.mock_calls == []
+            assert gitrepo._pool == {}
+        assert in_use.close.mock_calls == [call()]
+
+    def test_close_exception(self):
+        factory = Mock()
+        with pooled_repo('/a', factory) as repo:
+            repo.close.side_effect = RuntimeError()
+        close_pool()
+        assert repo.close.mock_calls == [call()]
+
+
+@needs_git
+class TestGitCliInfo(object):
+
+    def make_repo(self, tmp_path):
+        path = str(tmp_path / 'repo')
+        os.makedirs(path)
+        git(path, 'init', '-q')
+        with open(os.path.join(path, 'a.txt'), 'w') as fh:
+            fh.write('a\n')
+        git(path, 'add', 'a.txt')
+        git(path, 'commit', '-q', '-m', 'one')
+        return path
+
+    def head(self, path):
+        return subprocess.check_output(
+            ['git', '-C', path, 'rev-parse', 'HEAD']
+        ).decode().strip()
+
+    def test_clean(self, tmp_path):
+        path = self.make_repo(tmp_path)
+        git(path, 'remote', 'add', 'upstream', 'https://u/x.git')
+        git(path, 'remote', 'add', 'origin', 'https://o/x.git')
+        git(path, 'remote', 'set-url', '--add', 'origin', 'https://o2/x.git')
+        git(path, 'tag', 'v1')
+        git(path, 'tag', '-a', '-m', 'msg', 'v2')
+        assert git_cli_info(os.path.join(path, '.git')) == {
+            'commit': self.head(path),
+            'dirty': False,
+            'tag': 'v2',
+            'remotes': {
+                'upstream': 'https://u/x.git',
+                'origin': 'https://o/x.git'
+            }
+        }
+
+    def test_dirty(self, tmp_path):
+        path = self.make_repo(tmp_path)
+        git(path, 'tag', 'v1')
+        with open(os.path.join(path, 'a.txt'), 'w') as fh:
+            fh.write('b\n')
+        git(path, 'commit', '-q', '-a', '-m', 'two')
+        with open(os.path.join(path, 'b.txt'), 'w') as fh:
+            fh.write('b\n')
+        assert git_cli_info(os.path.join(path, '.git')) == {
+            'commit': self.head(path),
+            'dirty': True,
+            'tag': None,
+            'remotes': {}
+        }
+
+    def test_tags_fallback(self, tmp_path):
+        path = self.make_repo(tmp_path)
+        git(path, 'tag', 'v1')
+        with patch('versionfinder.gitobjects.tags_at') as mock_tags:
+            mock_tags.side_effect = ValueError('foo')
+            res = git_cli_info(os.path.join(path, '.git'))
+        assert res['tag'] == 'v1'
+        assert len(mock_tags.mock_calls) == 1
+
+    def test_submodule_style_gitdir(self, tmp_path):
+        path = self.make_repo(tmp_path)
+        sub = str(tmp_path / 'sub')
+        os.makedirs(sub)
+        shutil.move(os.path.join(path, '.git'), str(tmp_path / 'gitdir'))
+        git(str(tmp_path / 'gitdir'), 'config', 'core.worktree', path)
+        res = git_cli_info(str(tmp_path / 'gitdir'))
+        assert res['commit'] is not None
+        assert res['dirty'] is False
+
+    def test_not_git(self, tmp_path):
+        os.makedirs(str(tmp_path / 'x' / '.git'))
+        with pytest.raises(subprocess.CalledProcessError):
+            git_cli_info(str(tmp_path / 'x' / '.git'))
+
+    @pytest.mark.parametrize('dirty', [False, True])
+    def test_native(self, tmp_path, dirty):
+        path = self.make_repo(tmp_path)
+        git(path, 'remote', 'add', 'upstream', 'https://u/x.git')
+        git(path, 'remote', 'add', 'origin', 'https://o/x.git')
+        git(path, 'remote', 'set-url', '--add', 'origin', 'https://o2/x.git')
+        git(path, 'tag', 'v1')
+        git(path, 'tag', '-a', '-m', 'msg', 'v2')
+        if dirty:
+            with open(os.path.join(path, 'b.txt'), 'w') as fh:
+                fh.write('b\n')
+        gitdir = os.path.join(path, '.git')
+        assert native_git_info(gitdir) == git_cli_info(gitdir)
+
+    def test_native_not_git(self, tmp_path):
+        os.makedirs(str(tmp_path / 'x' / '.git'))
+        with pytest.raises(ValueError):
+            native_git_info(str(tmp_path / 'x' / '.git'))
+
+
+class TestParse(object):
+
+    def test_status_initial(self):
+        assert _parse_status(0, '# branch.oid (initial)\0'
+                                '# branch.head master\0') == {
+            'commit': None, 'dirty': False
+        }
+
+    def test_status_changes(self):
+        out = '# branch.oid abcd\0# branch.head master\0? new.txt\0'
+        assert _parse_status(0, out) == {'commit': 'abcd', 'dirty': True}
+
+    def test_status_failed(self):
+        with pytest.raises(subprocess.CalledProcessError):
+            _parse_status(128, '')
+
+    def test_remotes(self):
+        out = ('remote.a.b.url\nhttps://ab\0remote.a.b.url\nhttps://ab2\0'
+               'remote.origin.pushurl\nhttps://p\0')
+        assert _parse_remotes(out) == {'a.b': 'https://ab'}
+        assert _parse_remotes('') == {}
@@ -37,8 +37,11 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
-from versionfinder import find_version
-from unittest.mock import patch, call, Mock
+import os
+import pytest
+from versionfinder import find_version, iter_versions
+from versionfinder.versioninfo import VersionInfo
+from unittest.mock import patch, call, Mock, DEFAULT
 
 
 class TestFindVersion(object):
@@ -73,3 +76,178 @@ class TestFindVersion(object):
         ]
         assert mock_stack.mock_calls == [call()]
         assert res == m_result
+
+    def test_manifest_hit(self):
+        m_result = Mock()
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            with patch('versionfinder.find_manifest_version') as mock_fmv:
+                mock_fmv.return_value = m_result
+                res = find_version('pname', manifest='/m.vfm')
+        assert mock_vf.mock_calls == []
+        assert mock_fmv.mock_calls == [call('/m.vfm', 'pname')]
+        assert res == m_result
+
+    def test_manifest_hit_fields(self):
+        info = VersionInfo(
+            pip_version='1.2.3', pip_url='http://foo',
+            pkg_resources_version='1.2.3', git_commit='abcd',
+            git_is_dirty=False
+        )
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            with patch('versionfinder.find_manifest_version') as mock_fmv:
+                mock_fmv.return_value = info
+                res = find_version(
+                    'pname', manifest='/m.vfm', fields=['version'],
+                    lazy_git=True
+                )
+        assert mock_vf.mock_calls == []
+        assert res == VersionInfo(pkg_resources_version='1.2.3')
+
+    def test_manifest_hit_unknown_field(self):
+        with patch('versionfinder.VersionFinder', autospec=True):
+            with patch('versionfinder.find_manifest_version') as mock_fmv:
+                mock_fmv.return_value = VersionInfo(pip_version='1.2.3')
+                with pytest.raises(ValueError) as excinfo:
+                    find_version('pname', manifest='/m.vfm', fields=['foo'])
+        assert 'foo' in str(excinfo.value)
+
+    def test_manifest_env_miss(self):
+        m_frame = Mock()
+        m_result = Mock()
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            with patch('versionfinder.find_manifest_version') as mock_fmv:
+                with patch.dict(
+                    'versionfinder.os.environ',
+                    {'VERSIONFINDER_MANIFEST': '/env.vfm'}
+                ):
+                    mock_fmv.return_value = None
+                    mock_vf.return_value.find_package_version.\
+                        return_value = m_result
+                    res = find_version(package_name='pname',
+                                       caller_frame=m_frame)
+        assert mock_fmv.mock_calls == [call('/env.vfm', 'pname')]
+        assert mock_vf.mock_calls == [
+            call(package_name='pname', caller_frame=m_frame),
+            call().find_package_version()
+        ]
+        assert res == m_result
+
+    def test_fields(self):
+        m_frame = Mock()
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            find_version('pname', caller_frame=m_frame, fields={'version'})
+        assert mock_vf.mock_calls == [
+            call('pname', caller_frame=m_frame),
+            call().find_package_version(fields={'version'})
+        ]
+
+    def test_lazy_git(self):
+        m_frame = Mock()
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            find_version('pname', caller_frame=m_frame, lazy_git=True)
+        assert mock_vf.mock_calls == [
+            call('pname', caller_frame=m_frame),
+            call().find_package_version(lazy_git=True)
+        ]
+
+    def test_concurrent(self):
+        m_frame = Mock()
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            find_version('pname', caller_frame=m_frame, concurrent=True)
+        assert mock_vf.mock_calls == [
+            call('pname', caller_frame=m_frame),
+            call().find_package_version(concurrent=True)
+        ]
+
+    def test_timeout(self):
+        m_frame = Mock()
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            find_version('pname', caller_frame=m_frame, timeout=2.5)
+        assert mock_vf.mock_calls == [
+            call('pname', caller_frame=m_frame),
+            call().find_package_version(timeout=2.5)
+        ]
+
+    def test_no_name_skips_manifest(self):
+        m_frame = Mock()
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            with patch('versionfinder.find_manifest_version') as mock_fmv:
+                find_version(manifest='/m.vfm', caller_frame=m_frame)
+        assert mock_fmv.mock_calls == []
+        assert mock_vf.mock_calls == [
+            call(caller_frame=m_frame),
+            call().find_package_version()
+        ]
+
+
+class TestIterVersions(object):
+
+    def make_site(self, tmp_path):
+        site = tmp_path / 'site'
+        for name, ver in [('foo_bar', '1.0'), ('baz', '2.0')]:
+            di = site / ('%s-%s.dist-info' % (name, ver))
+            di.mkdir(parents=True)
+            (di / 'METADATA').write_text(
+                'Name: %s\nVersion: %s\nHome-page: http://%s\n\n' % (
+                    name, ver, name)
+            )
+        return str(site)
+
+    def test_iter(self, tmp_path):
+        site = self.make_site(tmp_path)
+        with patch('versionfinder.VersionFinder', autospec=True) as mock_vf:
+            it = iter_versions(path=[site])
+            assert next(it) == ('baz', VersionInfo(
+                pkg_resources_version='2.0',
+                pkg_resources_url='http://baz'
+            ))
+            assert list(it) == [('foo_bar', VersionInfo(
+                pkg_resources_version='1.0',
+                pkg_resources_url='http://foo_bar'
+            ))]
+        assert mock_vf.mock_calls == []
+
+    def test_iter_git(self, tmp_path):
+        site = self.make_site(tmp_path)
+        with patch.multiple(
+            'versionfinder.VersionFinder',
+            autospec=True,
+            __init__=DEFAULT,
+            _git_version_info=DEFAULT
+        ) as mocks:
+            mocks['__init__'].return_value = None
+            mocks['_git_version_info'].side_effect = [
+                {}, {'git_commit': 'abcd', 'git_is_dirty': False}
+            ]
+            res = list(iter_versions(path=[site], git=True, log=True))
+        assert res == [
+            ('baz', VersionInfo(
+                pkg_resources_version='2.0',
+                pkg_resources_url='http://baz'
+            )),
+            ('foo_bar', VersionInfo(
+                pkg_resources_version='1.0',
+                pkg_resources_url='http://foo_bar',
+                git_commit='abcd',
+                git_is_dirty=False
+            )),
+        ]
+        init_calls = mocks['__init__'].mock_calls
+        assert len(init_calls) == 2
+        assert init_calls[1][1][1] == 'foo_bar'
+        assert init_calls[1][2]['package_file'] == os.path.join(
+            site, 'foo_bar-1.0.dist-info', 'METADATA')
+        assert init_calls[1][2]['log'] is True
+        assert init_calls[1][2]['distribution'].key == 'foo-bar'
+        assert init_calls[1][2]['environment'] is \
+            init_calls[0][2]['environment']
+
+    def test_iter_no_metadata(self, tmp_path):
+        site = self.make_site(tmp_path)
+        with patch('versionfinder.environment._read_metadata_headers') as m:
+            res = list(iter_versions(path=[site], metadata=False))
+        assert res == [
+            ('baz', VersionInfo(pkg_resources_version='2.0')),
+            ('foo-bar', VersionInfo(pkg_resources_version='1.0')),
+        ]
+        assert m.mock_calls == []
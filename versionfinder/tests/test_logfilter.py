@@ -0,0 +1,142 @@
+"""
+versionfinder/tests/test_logfilter.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import logging
+from unittest.mock import patch, call
+
+from versionfinder.logfilter import VersionFilter, install_record_factory
+from versionfinder.versioninfo import VersionInfo
+
+pbm = 'versionfinder.logfilter'
+
+INFO = VersionInfo(
+    pip_version='1.2.3', pip_requirement='mypkg==1.2.3',
+    git_commit='12345678'
+)
+
+
+def _record():
+    return logging.LogRecord('foo', logging.INFO, '/f.py', 1, 'msg', (), None)
+
+
+class TestVersionFilter(object):
+
+    def _filter(self, info, **kwargs):
+        with patch('%s.CachedVersion' % pbm) as mock_cv:
+            if info is not None:
+                mock_cv.return_value.add_callback.side_effect = \
+                    lambda f: f(info)
+            cls = VersionFilter('mypkg', **kwargs)
+        return cls, mock_cv
+
+    def test_init(self):
+        with patch('%s.inspect.stack' % pbm) as mock_stack:
+            mock_stack.return_value = [[1], ['frame']]
+            cls, mock_cv = self._filter(None)
+        assert mock_cv.mock_calls[0] == call('mypkg', caller_frame='frame')
+        assert cls.record_attrs == {'app_version': None, 'app_commit': None}
+        rec = _record()
+        assert cls.filter(rec) is True
+        assert rec.app_version is None
+        assert rec.app_commit is None
+
+    def test_filter(self):
+        cls, mock_cv = self._filter(INFO, package_file='/f')
+        assert mock_cv.mock_calls[0] == call('mypkg', package_file='/f')
+        rec = _record()
+        assert cls.filter(rec) is True
+        assert rec.app_version == '1.2.3'
+        assert rec.app_commit == '12345678'
+        assert rec.msg == 'msg'
+
+    def test_attributes(self):
+        cls, _ = self._filter(INFO, package_file='/f', attributes={
+            'ver': 'short_str'
+        })
+        rec = _record()
+        cls.filter(rec)
+        assert rec.ver == INFO.short_str
+        assert not hasattr(rec, 'app_version')
+
+    def test_update_replaces(self):
+        cls, _ = self._filter(INFO, package_file='/f')
+        before = cls.record_attrs
+        cls._update(INFO.replace(git_commit='abcd'))
+        assert before == {'app_version': '1.2.3', 'app_commit': '12345678'}
+        assert cls.record_attrs == {'app_version': '1.2.3',
+                                    'app_commit': 'abcd'}
+
+    def test_logging(self):
+        cls, _ = self._filter(INFO, package_file='/f')
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        handler.addFilter(cls)
+        logger = logging.getLogger('versionfinder_test_logfilter')
+        logger.addHandler(handler)
+        logger.propagate = False
+        try:
+            logger.warning('foo')
+        finally:
+            logger.removeHandler(handler)
+        assert records[0].app_commit == '12345678'
+
+
+class TestInstallRecordFactory(object):
+
+    def test_install(self):
+        old = logging.getLogRecordFactory()
+        try:
+            with patch('%s.CachedVersion' % pbm) as mock_cv:
+                mock_cv.return_value.add_callback.side_effect = \
+                    lambda f: f(INFO)
+                with patch('%s.inspect.stack' % pbm) as mock_stack:
+                    mock_stack.return_value = [[1], ['frame']]
+                    res = install_record_factory('mypkg')
+            assert mock_cv.mock_calls[0] == call(
+                'mypkg', caller_frame='frame'
+            )
+            assert isinstance(res, VersionFilter)
+            factory = logging.getLogRecordFactory()
+            rec = factory('foo', logging.INFO, '/f.py', 1, 'msg', (), None)
+            assert rec.app_version == '1.2.3'
+            assert rec.app_commit == '12345678'
+            assert isinstance(rec, logging.LogRecord)
+        finally:
+            logging.setLogRecordFactory(old)
@@ -0,0 +1,165 @@
+"""
+versionfinder/tests/test_manifest.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import pytest
+from unittest.mock import patch
+
+from versionfinder.manifest import (
+    write_manifest, Manifest, find_manifest_version, normalize_name,
+    _HEADER, _manifests
+)
+from versionfinder.versioninfo import VersionInfo
+
+pbm = 'versionfinder.manifest'
+
+
+def vinfo(ver, commit=None):
+    return VersionInfo(
+        pip_version=ver,
+        pip_url='https://example.com/%s' % ver,
+        git_commit=commit,
+        git_remotes={'origin': 'https://git/foo'} if commit else None,
+        git_is_dirty=False if commit else None
+    )
+
+
+class TestNormalizeName(object):
+
+    def test_normalize(self):
+        assert normalize_name('Foo_Bar.baz--Quux') == 'foo-bar-baz-quux'
+
+
+class TestWriteRead(object):
+
+    def test_round_trip(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        infos = {
+            'foo_bar': vinfo('1.2.3', commit='abcd'),
+            'Baz': vinfo('4.5.6'),
+        }
+        for i in range(50):
+            infos['pkg%d' % i] = vinfo('0.%d' % i)
+        assert write_manifest(path, infos) == 52
+        with Manifest(path) as m:
+            assert len(m) == 52
+            assert m.find_version('foo-bar') == infos['foo_bar']
+            assert m.find_version('FOO_BAR') == infos['foo_bar']
+            assert m.find_version('baz') == infos['Baz']
+            assert m.find_version('pkg37') == infos['pkg37']
+            assert m.find_version('missing') is None
+        assert not os.path.exists(path + '.%d.tmp' % os.getpid())
+
+    def test_iterable_of_tuples(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        write_manifest(path, [('a', vinfo('1')), ('b', vinfo('2'))])
+        with Manifest(path) as m:
+            assert m.find_version('b') == vinfo('2')
+
+    def test_empty(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        assert write_manifest(path, {}) == 0
+        with Manifest(path) as m:
+            assert len(m) == 0
+            assert m.find_version('foo') is None
+
+    def test_hash_collisions(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        infos = {'a': vinfo('1'), 'b': vinfo('2'), 'c': vinfo('3')}
+        with patch('%s._name_hash' % pbm) as m_hash:
+            m_hash.return_value = 7
+            write_manifest(path, infos)
+            with Manifest(path) as m:
+                assert m.find_version('c') == infos['c']
+                assert m.find_version('a') == infos['a']
+                assert m.find_version('d') is None
+
+    def test_duplicate(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        with pytest.raises(ValueError):
+            write_manifest(path, [('foo_bar', vinfo('1')),
+                                  ('Foo-Bar', vinfo('2'))])
+
+    def test_decoded_once(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        write_manifest(path, {'foo': vinfo('1')})
+        with Manifest(path) as m:
+            with patch('%s.json.loads' % pbm, wraps=__import__('json').loads
+                       ) as m_loads:
+                m.find_version('foo')
+                m.find_version('Foo')
+        assert len(m_loads.mock_calls) == 1
+
+    def test_bad_magic(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        with open(path, 'wb') as fh:
+            fh.write(b'not a manifest file at all')
+        with pytest.raises(ValueError):
+            Manifest(path)
+
+    def test_bad_version(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        with open(path, 'wb') as fh:
+            fh.write(_HEADER.pack(b'VFMF', 99, 0, 1, 0))
+        with pytest.raises(ValueError):
+            Manifest(path)
+
+
+class TestFindManifestVersion(object):
+
+    def setup_method(self, _):
+        _manifests.clear()
+
+    def test_cached(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        write_manifest(path, {'foo': vinfo('1')})
+        assert find_manifest_version(path, 'foo') == vinfo('1')
+        m = _manifests[path]
+        assert find_manifest_version(path, 'bar') is None
+        assert _manifests[path] is m
+
+    def test_reopen_on_change(self, tmp_path):
+        path = str(tmp_path / 'manifest.vfm')
+        write_manifest(path, {'foo': vinfo('1')})
+        assert find_manifest_version(path, 'foo') == vinfo('1')
+        write_manifest(path, {'foo': vinfo('2'), 'bar': vinfo('3')})
+        assert find_manifest_version(path, 'foo') == vinfo('2')
+
+    def test_missing_file(self, tmp_path):
+        assert find_manifest_version(str(tmp_path / 'nope'), 'foo') is None
@@ -0,0 +1,299 @@
+"""
+versionfinder/tests/test_middleware.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import asyncio
+import json
+from unittest.mock import patch, Mock
+
+from versionfinder.middleware import (
+    render_version_json, VersionMiddleware, ASGIVersionMiddleware
+)
+from versionfinder.versioninfo import VersionInfo
+
+pbm = 'versionfinder.middleware'
+
+INFO = VersionInfo(
+    pip_version='1.2.3', pip_url='http://my.package.url/pip',
+    pip_requirement='mypkg==1.2.3'
+)
+
+INFO2 = VersionInfo(
+    pip_version='1.2.40', pip_url='http://my.package.url/pip',
+    pip_requirement='mypkg==1.2.40'
+)
+
+
+def _run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestRenderVersionJson(object):
+
+    def test_render(self):
+        res = json.loads(render_version_json(INFO).decode('utf-8'))
+        expected = INFO.as_dict
+        expected['version'] = '1.2.3'
+        expected['url'] = 'http://my.package.url/pip'
+        expected['long_str'] = INFO.long_str
+        assert res == expected
+
+
+class TestVersionMiddleware(object):
+
+    def setup_method(self):
+        self.app = Mock(return_value=[b'app'])
+
+    def _mw(self, info, **kwargs):
+        with patch('%s.CachedVersion' % pbm) as mock_cv:
+            if info is not None:
+                mock_cv.return_value.add_callback.side_effect = \
+                    lambda f: f(info)
+            mw = VersionMiddleware(self.app, 'mypkg', **kwargs)
+        return mw, mock_cv
+
+    def test_init(self):
+        with patch('%s.inspect.stack' % pbm) as mock_stack:
+            mock_stack.return_value = [[1], ['frame']]
+            mw, mock_cv = self._mw(None, timeout=3)
+        mock_cv.assert_called_once_with(
+            'mypkg', caller_frame='frame', timeout=3
+        )
+        assert mw.version == mock_cv.return_value
+
+    def test_init_package_file(self):
+        mw, mock_cv = self._mw(None, package_file='/f')
+        mock_cv.assert_called_once_with('mypkg', package_file='/f')
+
+    def test_init_caller_frame(self):
+        m_frame = Mock()
+        mw, mock_cv = self._mw(None, caller_frame=m_frame)
+        mock_cv.assert_called_once_with('mypkg', caller_frame=m_frame)
+
+    def test_version_path(self):
+        mw, _ = self._mw(INFO)
+        sr = Mock()
+        res = mw({'PATH_INFO': '/version'}, sr)
+        body = render_version_json(INFO)
+        assert res == [body]
+        sr.assert_called_once_with('200 OK', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('X-App-Version', INFO.long_str)
+        ])
+        assert self.app.mock_calls == []
+
+    def test_version_path_headers_not_shared(self):
+        mw, _ = self._mw(INFO)
+
+        def sr(status, headers):
+            headers.append(('X-Outer', 'x'))
+
+        mw({'PATH_INFO': '/version'}, sr)
+        sr2 = Mock()
+        mw({'PATH_INFO': '/version'}, sr2)
+        assert ('X-Outer', 'x') not in sr2.call_args[0][1]
+
+    def test_refresh(self):
+        mw, _ = self._mw(INFO)
+        mw._render(INFO2)
+        sr = Mock()
+        res = mw({'PATH_INFO': '/version'}, sr)
+        body = render_version_json(INFO2)
+        assert res == [body]
+        sr.assert_called_once_with('200 OK', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('X-App-Version', INFO2.long_str)
+        ])
+
+    def test_version_path_not_ready(self):
+        mw, _ = self._mw(None)
+        sr = Mock()
+        res = mw({'PATH_INFO': '/version'}, sr)
+        assert res == [b'{"status":"resolving"}']
+        assert sr.call_args[0][0] == '503 Service Unavailable'
+
+    def test_header(self):
+        mw, _ = self._mw(INFO, header='X-Ver')
+        sr = Mock()
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'app']
+
+        mw.app = app
+        assert mw({'PATH_INFO': '/foo'}, sr) == [b'app']
+        sr.assert_called_once_with('200 OK', [
+            ('Content-Type', 'text/plain'), ('X-Ver', INFO.long_str)
+        ], None)
+
+    def test_not_ready_passthrough(self):
+        mw, _ = self._mw(None)
+        sr = Mock()
+        environ = {'PATH_INFO': '/foo'}
+        assert mw(environ, sr) == [b'app']
+        self.app.assert_called_once_with(environ, sr)
+
+    def test_no_header(self):
+        mw, _ = self._mw(INFO, header=None, path=None)
+        sr = Mock()
+        environ = {'PATH_INFO': '/version'}
+        assert mw(environ, sr) == [b'app']
+        self.app.assert_called_once_with(environ, sr)
+
+
+class TestASGIVersionMiddleware(object):
+
+    def setup_method(self):
+        self.sent = []
+        self.app_calls = []
+
+    async def _send(self, message):
+        self.sent.append(message)
+
+    async def _app(self, scope, receive, send):
+        self.app_calls.append(scope)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b'app'})
+
+    def _mw(self, info, **kwargs):
+        with patch('%s.CachedVersion' % pbm) as mock_cv:
+            if info is not None:
+                mock_cv.return_value.add_callback.side_effect = \
+                    lambda f: f(info)
+            mw = ASGIVersionMiddleware(self._app, 'mypkg', **kwargs)
+        return mw
+
+    def test_init_caller_frame(self):
+        m_frame = Mock()
+        with patch('%s.CachedVersion' % pbm) as mock_cv:
+            ASGIVersionMiddleware(self._app, 'mypkg', caller_frame=m_frame)
+        mock_cv.assert_called_once_with('mypkg', caller_frame=m_frame)
+
+    def test_version_path(self):
+        mw = self._mw(INFO)
+        _run(mw({'type': 'http', 'path': '/version'}, None, self._send))
+        body = render_version_json(INFO)
+        assert self.sent == [
+            {
+                'type': 'http.response.start', 'status': 200,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('ascii')),
+                    (b'x-app-version', INFO.long_bytes)
+                ]
+            },
+            {'type': 'http.response.body', 'body': body}
+        ]
+        assert self.app_calls == []
+
+    def test_version_path_messages_not_shared(self):
+        mw = self._mw(INFO)
+
+        async def send(message):
+            # as servers and outer middleware may do
+            if message['type'] == 'http.response.start':
+                message['headers'].append((b'x-outer', b'x'))
+            self.sent.append(message)
+
+        _run(mw({'type': 'http', 'path': '/version'}, None, send))
+        _run(mw({'type': 'http', 'path': '/version'}, None, send))
+        assert self.sent[0] is not self.sent[2]
+        assert self.sent[1] is not self.sent[3]
+        assert self.sent[2]['headers'] == [
+            (b'content-type', b'application/json'),
+            (b'content-length',
+             str(len(render_version_json(INFO))).encode('ascii')),
+            (b'x-app-version', INFO.long_bytes),
+            (b'x-outer', b'x')
+        ]
+
+    def test_refresh(self):
+        mw = self._mw(INFO)
+        mw._render(INFO2)
+        _run(mw({'type': 'http', 'path': '/version'}, None, self._send))
+        body = render_version_json(INFO2)
+        assert self.sent == [
+            {
+                'type': 'http.response.start', 'status': 200,
+                'headers': [
+                    (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode('ascii')),
+                    (b'x-app-version', INFO2.long_bytes)
+                ]
+            },
+            {'type': 'http.response.body', 'body': body}
+        ]
+
+    def test_version_path_not_ready(self):
+        mw = self._mw(None)
+        _run(mw({'type': 'http', 'path': '/version'}, None, self._send))
+        assert self.sent[0]['status'] == 503
+        assert self.sent[1]['body'] == b'{"status":"resolving"}'
+
+    def test_header(self):
+        mw = self._mw(INFO)
+        _run(mw({'type': 'http', 'path': '/foo'}, None, self._send))
+        assert self.sent == [
+            {
+                'type': 'http.response.start', 'status': 200,
+                'headers': [
+                    (b'content-type', b'text/plain'),
+                    (b'x-app-version', INFO.long_bytes)
+                ]
+            },
+            {'type': 'http.response.body', 'body': b'app'}
+        ]
+
+    def test_not_ready_passthrough(self):
+        mw = self._mw(None)
+        _run(mw({'type': 'http', 'path': '/foo'}, None, self._send))
+        assert self.sent[0]['headers'] == [(b'content-type', b'text/plain')]
+
+    def test_not_http(self):
+        mw = self._mw(INFO)
+        scope = {'type': 'lifespan'}
+        _run(mw(scope, None, self._send))
+        assert self.app_calls == [scope]
+        assert self.sent[0]['headers'] == [(b'content-type', b'text/plain')]
@@ -0,0 +1,179 @@
+"""
+versionfinder/tests/test_prometheus.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from unittest.mock import patch, call, Mock
+
+from versionfinder.prometheus import (
+    metric_name, build_info_labels, render_build_info, BuildInfoCollector,
+    CONTENT_TYPE
+)
+from versionfinder.versioninfo import VersionInfo
+
+pbm = 'versionfinder.prometheus'
+
+INFO = VersionInfo(
+    pip_version='1.2.3', pip_url='http://my.package.url/pip',
+    pip_requirement='mypkg==1.2.3', git_commit='12345678',
+    git_tag='v1.2.3', git_is_dirty=True
+)
+
+
+class TestHelpers(object):
+
+    def test_metric_name(self):
+        assert metric_name('my-app.web') == 'my_app_web_build_info'
+        assert metric_name('3scale') == '_3scale_build_info'
+
+    def test_labels(self):
+        assert build_info_labels(INFO) == (
+            '1.2.3', '12345678', 'v1.2.3', 'true'
+        )
+        assert build_info_labels(
+            INFO.replace(git_is_dirty=False)) == (
+            '1.2.3', '12345678', 'v1.2.3', 'false'
+        )
+        assert build_info_labels(VersionInfo()) == ('', '', '', '')
+
+    def test_render(self):
+        res = render_build_info('foo_build_info', INFO)
+        assert res == (
+            b'# HELP foo_build_info Build information, from versionfinder.\n'
+            b'# TYPE foo_build_info gauge\n'
+            b'foo_build_info{version="1.2.3",commit="12345678",'
+            b'tag="v1.2.3",dirty="true"} 1\n'
+        )
+
+    def test_render_escape(self):
+        res = render_build_info(
+            'foo_build_info', VersionInfo(git_tag='a"b\\c\nd'), 'x\ny'
+        )
+        assert res == (
+            b'# HELP foo_build_info x\\ny\n'
+            b'# TYPE foo_build_info gauge\n'
+            b'foo_build_info{version="",commit="",'
+            b'tag="a\\"b\\\\c\\nd",dirty=""} 1\n'
+        )
+
+
+class TestBuildInfoCollector(object):
+
+    def _collector(self, info, **kwargs):
+        with patch('%s.CachedVersion' % pbm) as mock_cv:
+            if info is not None:
+                mock_cv.return_value.add_callback.side_effect = \
+                    lambda f: f(info)
+            cls = BuildInfoCollector('my-pkg', **kwargs)
+        return cls, mock_cv
+
+    def test_init(self):
+        with patch('%s.inspect.stack' % pbm) as mock_stack:
+            mock_stack.return_value = [[1], ['frame']]
+            cls, mock_cv = self._collector(None, app_name='app')
+        assert mock_cv.mock_calls[0] == call('my-pkg', caller_frame='frame')
+        assert cls.name == 'app_build_info'
+        assert cls.exposition == b''
+        assert cls.collect() == []
+
+    def test_render(self):
+        cls, mock_cv = self._collector(INFO, package_file='/f')
+        assert mock_cv.mock_calls[0] == call('my-pkg', package_file='/f')
+        assert cls.name == 'my_pkg_build_info'
+        assert cls.exposition == render_build_info('my_pkg_build_info', INFO)
+        cls._render(VersionInfo(pip_version='2.0.0'))
+        assert b'version="2.0.0"' in cls.exposition
+
+    def test_collect(self):
+        cls, _ = self._collector(INFO, package_file='/f')
+        mock_pc = Mock()
+        with patch.dict(sys.modules, {
+            'prometheus_client': mock_pc,
+            'prometheus_client.core': mock_pc.core
+        }):
+            res = cls.collect()
+            assert cls.collect() is res
+            cls._render(INFO.replace(git_tag=None))
+            res2 = cls.collect()
+        fam = mock_pc.core.GaugeMetricFamily
+        assert fam.mock_calls == [
+            call(
+                'my_pkg_build_info', 'Build information, from versionfinder.',
+                labels=('version', 'commit', 'tag', 'dirty')
+            ),
+            call().add_metric(('1.2.3', '12345678', 'v1.2.3', 'true'), 1),
+            call(
+                'my_pkg_build_info', 'Build information, from versionfinder.',
+                labels=('version', 'commit', 'tag', 'dirty')
+            ),
+            call().add_metric(('1.2.3', '12345678', '', 'true'), 1),
+        ]
+        assert res == [fam.return_value]
+        assert res2 is not res
+
+    def test_collect_refreshed_while_building(self):
+        cls, _ = self._collector(INFO, package_file='/f')
+        new = INFO.replace(git_tag=None)
+        mock_pc = Mock()
+
+        def add_metric(labels, value):
+            # a refresh while the first scrape builds the family
+            if labels[2] == 'v1.2.3':
+                cls._render(new)
+
+        mock_pc.core.GaugeMetricFamily.return_value.add_metric.side_effect \
+            = add_metric
+        with patch.dict(sys.modules, {
+            'prometheus_client': mock_pc,
+            'prometheus_client.core': mock_pc.core
+        }):
+            cls.collect()
+            assert cls._rendered == (new, None)
+            res = cls.collect()
+        assert cls._rendered == (new, res)
+        assert mock_pc.core.GaugeMetricFamily.return_value.mock_calls[-1] \
+            == call.add_metric(('1.2.3', '12345678', '', 'true'), 1)
+
+    def test_wsgi_app(self):
+        cls, _ = self._collector(INFO, package_file='/f')
+        sr = Mock()
+        assert cls.wsgi_app({}, sr) == [cls.exposition]
+        sr.assert_called_once_with('200 OK', [
+            ('Content-Type', CONTENT_TYPE),
+            ('Content-Length', str(len(cls.exposition)))
+        ])
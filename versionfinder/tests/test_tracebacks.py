@@ -0,0 +1,150 @@
+"""
+versionfinder/tests/test_tracebacks.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+import logging
+from unittest.mock import patch, Mock, call
+
+from versionfinder.tracebacks import (
+    TracebackAnnotator, VersionTracebackFormatter, format_exception
+)
+
+pbm = 'versionfinder.tracebacks'
+
+
+def _raise():
+    raise ValueError('foo')
+
+
+def _exc_info():
+    try:
+        _raise()
+    except ValueError:
+        return sys.exc_info()
+
+
+class TestTracebackAnnotator(object):
+
+    def setup_method(self):
+        self.env = Mock()
+        self.dist = Mock(version='1.2.3', commit=None)
+        self.dist.name = 'mypkg'
+        self.env.distribution_for_file.side_effect = \
+            lambda f: self.dist if f == __file__ else None
+        self.cls = TracebackAnnotator(self.env)
+
+    def test_default_environment(self):
+        with patch('%s.default_environment' % pbm) as m_def:
+            cls = TracebackAnnotator()
+        assert cls.environment == m_def.return_value
+
+    def test_label(self):
+        assert self.cls.label(__file__) == ' [mypkg 1.2.3]'
+        assert self.cls.label('/other.py') == ''
+        assert self.cls.label(__file__) == ' [mypkg 1.2.3]'
+        assert self.env.distribution_for_file.mock_calls == [
+            call(__file__), call('/other.py')
+        ]
+
+    def test_label_commit_no_version(self):
+        self.dist.version = None
+        self.dist.commit = '0123456789abcdef'
+        assert self.cls.label(__file__) == ' [mypkg unknown 0123456789ab]'
+
+    def test_annotate(self):
+        lines = [
+            'Traceback (most recent call last):\n',
+            '  File "%s", line 4, in foo\n    bar()\n' % __file__,
+            '  File "/other.py", line 5, in bar\n    baz()\n',
+            '  File "%s", line 6, in baz' % __file__,
+            'ValueError: foo\n',
+        ]
+        assert list(self.cls.annotate(lines)) == [
+            'Traceback (most recent call last):\n',
+            '  File "%s", line 4, in foo [mypkg 1.2.3]\n    bar()\n' %
+            __file__,
+            '  File "/other.py", line 5, in bar\n    baz()\n',
+            '  File "%s", line 6, in baz [mypkg 1.2.3]' % __file__,
+            'ValueError: foo\n',
+        ]
+
+    def test_format_exception(self):
+        res = self.cls.format_exception(*_exc_info())
+        assert res[0] == 'Traceback (most recent call last):\n'
+        assert ', in _exc_info [mypkg 1.2.3]\n' in res[1]
+        assert ', in _raise [mypkg 1.2.3]\n' in res[2]
+        assert res[-1] == 'ValueError: foo\n'
+
+    def test_format_exc(self):
+        try:
+            _raise()
+        except ValueError:
+            res = self.cls.format_exc()
+        assert ', in _raise [mypkg 1.2.3]\n' in res
+        assert res.endswith('ValueError: foo\n')
+
+
+class TestVersionTracebackFormatter(object):
+
+    def test_format(self):
+        env = Mock()
+        env.distribution_for_file.return_value = None
+        fmt = VersionTracebackFormatter('%(message)s', environment=env)
+        assert fmt.annotator.environment == env
+        rec = logging.LogRecord('foo', logging.ERROR, '/f.py', 1, 'msg',
+                                (), _exc_info())
+        res = fmt.format(rec)
+        assert res.startswith('msg\nTraceback (most recent call last):\n')
+        assert res.endswith('ValueError: foo')
+        assert env.distribution_for_file.mock_calls == [
+            call(__file__)
+        ]
+
+
+class TestFormatException(object):
+
+    def test_format_exception(self):
+        ei = _exc_info()
+        with patch('%s.TracebackAnnotator' % pbm) as mock_ta:
+            res = format_exception(*ei)
+        assert mock_ta.mock_calls == [
+            call(),
+            call().format_exception(*ei, limit=None, chain=True)
+        ]
+        assert res == mock_ta.return_value.format_exception.return_value
@@ -37,12 +37,23 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
+import os
+import sys
+import subprocess
+import threading
 import pytest
 from pip._vendor.packaging.version import Version
 from git import Repo
 
-from versionfinder.versionfinder import (VersionFinder, chdir)
-from versionfinder.versioninfo import VersionInfo
+from versionfinder import versionfinder as vf_module
+from versionfinder.versionfinder import (
+    VersionFinder, chdir, _stages_for_fields, FIELDS, _StageThread
+)
+from versionfinder.versioninfo import (
+    VersionInfo, LazyVersionInfo, STAGE_COMPLETE, STAGE_FAILED, STAGE_TIMEOUT
+)
+from versionfinder.environment import Environment
+from versionfinder.gitrepo import close_pool
 
 from unittest.mock import (
     patch, call, DEFAULT, Mock, PropertyMock, MagicMock
@@ -53,6 +64,9 @@ logger = logging.getLogger(__name__)
 
 pbm = 'versionfinder.versionfinder'
 pb = '%s.VersionFinder' % pbm
+pbr = 'versionfinder.gitrepo'
+pbo = 'versionfinder.gitobjects'
+pbg = 'versionfinder.gitgraph'
 
 
 def mockrepo(commit=None, dirty=False, remotes={}, tag=None):
@@ -86,8 +100,18 @@ def mockrepo(commit=None, dirty=False, remotes={}, tag=None):
 class BaseTest(object):
 
     def setup_method(self, _):
+        close_pool()
         self.cls = VersionFinder('foo', package_file='/foo/bar/baz.py')
 
+    def mock_lookup_env(self, import_dists=None):
+        """
+        Patch the Environment used for import-name and file lookups, so
+        tests do not depend on what is installed.
+        """
+        m_env = Mock()
+        m_env.distributions_for_import.return_value = import_dists or []
+        return patch('%s._lookup_environment' % pb, return_value=m_env)
+
 
 class TestInit(object):
 
@@ -504,32 +528,506 @@ class TestFindPackageVersion(BaseTest):
         assert mock_is_git.mock_calls == [call()]
 
 
+class TestStagesForFields(object):
+
+    def test_none(self):
+        assert _stages_for_fields(None) == {'pip', 'pkg_resources', 'git'}
+
+    def test_fields(self):
+        assert _stages_for_fields({'version'}) == {'pkg_resources'}
+        assert _stages_for_fields(['git_commit']) == {'git'}
+        assert _stages_for_fields(['git_commit', 'url']) == {
+            'git', 'pkg_resources'
+        }
+        assert _stages_for_fields(['pip_requirement']) == {'pip'}
+        assert _stages_for_fields(['long_str']) == {
+            'pip', 'pkg_resources', 'git'
+        }
+        assert _stages_for_fields([]) == set()
+
+    def test_all_attributes(self):
+        for name in FIELDS:
+            assert hasattr(VersionInfo(), name)
+
+    def test_unknown(self):
+        with pytest.raises(ValueError) as excinfo:
+            _stages_for_fields(['version', 'foo', 'bar'])
+        assert str(excinfo.value) == 'Unknown VersionInfo field(s): bar, foo'
+
+
+class TestFindPackageVersionFields(BaseTest):
+
+    def _run(self, fields, env_info=None):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _find_env_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            mocks['_find_pip_info'].return_value = {
+                'version': '1.2.3', 'requirement': 'foo==1.2.3'
+            }
+            mocks['_find_pkg_info'].return_value = {
+                'version': '1.2.3', 'url': 'http://pkg'
+            }
+            mocks['_find_env_info'].return_value = env_info
+            mocks['_git_version_info'].return_value = {'git_commit': 'abcd'}
+            res = self.cls.find_package_version(fields=fields)
+        return res, mocks
+
+    def test_version(self):
+        res, mocks = self._run({'version'}, {'version': '1.2.4'})
+        assert res == VersionInfo(pkg_resources_version='1.2.4')
+        assert mocks['_find_env_info'].mock_calls == [call(self.cls, False)]
+        assert mocks['_find_pip_info'].mock_calls == []
+        assert mocks['_find_pkg_info'].mock_calls == []
+        assert mocks['_git_version_info'].mock_calls == []
+
+    def test_url(self):
+        res, mocks = self._run(['short_str'], {'version': '1', 'url': 'u'})
+        assert res == VersionInfo(pkg_resources_version='1',
+                                  pkg_resources_url='u')
+        assert mocks['_find_env_info'].mock_calls == [call(self.cls, True)]
+
+    def test_env_not_found(self):
+        res, mocks = self._run({'version'}, None)
+        assert res == VersionInfo(pkg_resources_version='1.2.3',
+                                  pkg_resources_url='http://pkg')
+        assert mocks['_find_pkg_info'].mock_calls == [call(self.cls)]
+
+    def test_env_exception(self):
+        with patch('%s._find_env_info' % pb) as mock_env:
+            with patch('%s._find_pkg_info' % pb) as mock_pkg:
+                mock_env.side_effect = RuntimeError()
+                mock_pkg.return_value = {'version': '1'}
+                res = self.cls.find_package_version(fields={'version'})
+        assert res == VersionInfo(pkg_resources_version='1')
+
+    def test_git_commit(self):
+        res, mocks = self._run({'git_commit'})
+        assert res == VersionInfo(git_commit='abcd')
+        assert mocks['_find_pip_info'].mock_calls == []
+        assert mocks['_find_pkg_info'].mock_calls == []
+        assert mocks['_find_env_info'].mock_calls == []
+        assert mocks['_git_version_info'].mock_calls == [call(self.cls)]
+
+    def test_pip(self):
+        res, mocks = self._run(['pip_requirement'])
+        assert res == VersionInfo(pip_version='1.2.3',
+                                  pip_requirement='foo==1.2.3')
+        assert mocks['_find_env_info'].mock_calls == []
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            self.cls.find_package_version(fields=['nope'])
+
+
+class TestFindPackageVersionLazyGit(BaseTest):
+
+    def test_lazy_git(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            mocks['_find_pip_info'].return_value = {'version': '1.2.3'}
+            mocks['_find_pkg_info'].return_value = {'version': '1.2.3'}
+            mocks['_git_version_info'].return_value = {'git_commit': 'abcd'}
+            res = self.cls.find_package_version(lazy_git=True)
+            assert isinstance(res, LazyVersionInfo)
+            assert res.version == '1.2.3'
+            assert mocks['_git_version_info'].mock_calls == []
+            assert res.git_commit == 'abcd'
+            assert mocks['_git_version_info'].mock_calls == [call(self.cls)]
+        assert res == VersionInfo(
+            pip_version='1.2.3', pkg_resources_version='1.2.3',
+            git_commit='abcd'
+        )
+
+    def test_lazy_git_not_requested(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_env_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            mocks['_find_env_info'].return_value = {'version': '1.2.3'}
+            res = self.cls.find_package_version(
+                fields={'version'}, lazy_git=True
+            )
+        assert type(res) is VersionInfo
+        assert mocks['_git_version_info'].mock_calls == []
+
+
+class TestFindPackageVersionConcurrent(BaseTest):
+
+    def test_git_found_early(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            with patch('%s._package_top_dir' % pb,
+                       new_callable=PropertyMock) as mock_top_dir:
+                mock_top_dir.side_effect = [['/foo/bar'], ['/foo/bar', '/s']]
+                mocks['_find_pip_info'].return_value = {
+                    'version': '1.2.3', 'url': None
+                }
+                mocks['_find_pkg_info'].return_value = {'version': '1.2.4'}
+                mocks['_git_version_info'].return_value = {
+                    'git_commit': 'abcd'
+                }
+                res = self.cls.find_package_version(concurrent=True)
+        assert res == VersionInfo(
+            pip_version='1.2.3', pkg_resources_version='1.2.4',
+            git_commit='abcd'
+        )
+        assert mocks['_git_version_info'].mock_calls == [
+            call(self.cls, ['/foo/bar'])
+        ]
+        assert mock_top_dir.mock_calls == [call()]
+
+    def test_git_found_late(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            with patch('%s._package_top_dir' % pb,
+                       new_callable=PropertyMock) as mock_top_dir:
+                mock_top_dir.side_effect = [['/foo/bar'], ['/foo/bar', '/s']]
+                mocks['_find_pip_info'].return_value = {}
+                mocks['_find_pkg_info'].return_value = {'version': '1.2.4'}
+                mocks['_git_version_info'].side_effect = [
+                    {}, {'git_commit': 'abcd'}
+                ]
+                res = self.cls.find_package_version(concurrent=True)
+        assert res == VersionInfo(
+            pkg_resources_version='1.2.4', git_commit='abcd'
+        )
+        assert mocks['_git_version_info'].mock_calls == [
+            call(self.cls, ['/foo/bar']),
+            call(self.cls, ['/s'])
+        ]
+
+    def test_no_new_locations(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            with patch('%s._package_top_dir' % pb,
+                       new_callable=PropertyMock) as mock_top_dir:
+                mock_top_dir.return_value = ['/foo/bar']
+                mocks['_find_pip_info'].side_effect = RuntimeError()
+                mocks['_find_pkg_info'].side_effect = RuntimeError()
+                mocks['_git_version_info'].return_value = {}
+                res = self.cls.find_package_version(concurrent=True)
+        assert res == VersionInfo()
+        assert res.stage_status == {
+            'pip': STAGE_FAILED, 'pkg_resources': STAGE_FAILED,
+            'git': STAGE_COMPLETE
+        }
+        assert mocks['_git_version_info'].mock_calls == [
+            call(self.cls, ['/foo/bar'])
+        ]
+
+    def test_single_stage_runs_inline(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_env_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            with patch('%s._StageThread' % pbm) as mock_thread:
+                mocks['_find_env_info'].return_value = {'version': '1.2.3'}
+                res = self.cls.find_package_version(
+                    fields={'version'}, concurrent=True
+                )
+        assert res.pkg_resources_version == '1.2.3'
+        assert mock_thread.mock_calls == []
+        assert mocks['_find_pip_info'].mock_calls == []
+        assert mocks['_git_version_info'].mock_calls == []
+
+    def test_lazy_git(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            mocks['_find_pip_info'].return_value = {'version': '1.2.3'}
+            mocks['_find_pkg_info'].return_value = {'version': '1.2.3'}
+            mocks['_git_version_info'].return_value = {'git_commit': 'abcd'}
+            res = self.cls.find_package_version(
+                lazy_git=True, concurrent=True
+            )
+            assert isinstance(res, LazyVersionInfo)
+            assert mocks['_git_version_info'].mock_calls == []
+            assert res.git_commit == 'abcd'
+        assert res.version == '1.2.3'
+
+
+class TestFindPackageVersionTimeout(BaseTest):
+
+    def test_partial(self):
+        release = threading.Event()
+
+        def se_pkg(self):
+            release.wait(5)
+            return {'version': '1.2.4'}
+
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            mocks['_find_pip_info'].return_value = {'version': '1.2.3'}
+            mocks['_find_pkg_info'].side_effect = se_pkg
+            mocks['_git_version_info'].return_value = {'git_commit': 'abcd'}
+            try:
+                res = self.cls.find_package_version(timeout=0.1)
+            finally:
+                release.set()
+        assert res == VersionInfo(pip_version='1.2.3', git_commit='abcd')
+        assert res.stage_status == {
+            'pip': STAGE_COMPLETE, 'pkg_resources': STAGE_TIMEOUT,
+            'git': STAGE_COMPLETE
+        }
+        assert res.complete is False
+        assert res.field_status('pkg_resources_version') == STAGE_TIMEOUT
+        assert res.field_status('pip_version') == STAGE_COMPLETE
+
+    def test_all_finish(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_env_info=DEFAULT,
+        ) as mocks:
+            mocks['_find_env_info'].return_value = {'version': '1.2.3'}
+            res = self.cls.find_package_version(
+                fields={'version'}, timeout=5
+            )
+        assert res == VersionInfo(pkg_resources_version='1.2.3')
+        assert res.stage_status == {'pkg_resources': STAGE_COMPLETE}
+        assert res.complete is True
+        assert mocks['_find_pip_info'].mock_calls == []
+
+    def test_failed(self):
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _find_pip_info=DEFAULT,
+            _find_pkg_info=DEFAULT,
+            _git_version_info=DEFAULT,
+        ) as mocks:
+            mocks['_find_pip_info'].return_value = {'version': '1.2.3'}
+            mocks['_find_pkg_info'].return_value = {'version': '1.2.3'}
+            mocks['_git_version_info'].side_effect = ImportError()
+            res = self.cls.find_package_version(timeout=5)
+        assert res.version == '1.2.3'
+        assert res.stage_status == {
+            'pip': STAGE_COMPLETE, 'pkg_resources': STAGE_COMPLETE,
+            'git': STAGE_FAILED
+        }
+
+    def test_thread(self):
+        m_finder = Mock()
+        m_finder._run_stage.return_value = STAGE_COMPLETE
+        t = _StageThread(m_finder, 'pip', 'func', ('a', ))
+        assert t.daemon is True
+        assert t.name == 'versionfinder-pip'
+        assert t.result is None
+        t.run()
+        assert t.result == (STAGE_COMPLETE, {})
+        assert m_finder._run_stage.mock_calls == [
+            call('pip', 'func', ('a', ), {})
+        ]
+
+
+class TestRunStage(BaseTest):
+
+    def test_complete(self):
+        res = {'a': 1}
+        func = Mock(return_value={'b': 2})
+        assert self.cls._run_stage('pip', func, (1, 2), res) == \
+            STAGE_COMPLETE
+        assert res == {'a': 1, 'b': 2}
+        assert func.mock_calls == [call(1, 2)]
+
+    def test_failed(self):
+        res = {'a': 1}
+        func = Mock(side_effect=RuntimeError())
+        assert self.cls._run_stage('pip', func, (), res) == STAGE_FAILED
+        assert res == {'a': 1}
+
+
+class TestFindEnvInfo(BaseTest):
+
+    def test_found(self):
+        dist = Mock(version='1.2.3', home_page='http://foo', location='/s')
+        m_env = Mock()
+        m_env.get_distribution.side_effect = [None, dist]
+        with patch('%s._lookup_environment' % pb) as m_le:
+            with patch('%s._candidate_names' % pb) as m_cn:
+                m_le.return_value = m_env
+                m_cn.return_value = iter(['foo', 'foo-dist', 'other'])
+                assert self.cls._find_env_info() == {
+                    'version': '1.2.3', 'url': 'http://foo'
+                }
+        assert m_env.get_distribution.mock_calls == [
+            call('foo'), call('foo-dist')
+        ]
+        assert self.cls._pkg_resources_locations == ['/s']
+
+    def test_no_url(self):
+        dist = Mock(version='1.2.3', location='/s')
+        type(dist).home_page = PropertyMock()
+        m_env = Mock()
+        m_env.get_distribution.return_value = dist
+        with patch('%s._lookup_environment' % pb) as m_le:
+            m_le.return_value = m_env
+            assert self.cls._find_env_info(url=False) == {'version': '1.2.3'}
+        assert type(dist).home_page.mock_calls == []
+
+    def test_not_found(self):
+        m_env = Mock()
+        m_env.get_distribution.return_value = None
+        with patch('%s._lookup_environment' % pb) as m_le:
+            with patch('%s._candidate_names' % pb) as m_cn:
+                m_le.return_value = m_env
+                m_cn.return_value = iter(['foo'])
+                assert self.cls._find_env_info() is None
+
+    def test_integration(self, tmp_path):
+        site = str(tmp_path)
+        os.makedirs(os.path.join(site, 'foo-1.2.3.dist-info'))
+        self.cls._environment = Environment(path=[site])
+        res = self.cls.find_package_version(fields={'version'})
+        assert res.version == '1.2.3'
+
+
+class TestGitVersionInfo(BaseTest):
+
+    def test_git(self):
+        with patch('%s._find_git_info' % pb, autospec=True) as mock_fgi:
+            with patch('%s._git_repo_path' % pb,
+                       new_callable=PropertyMock) as mock_is_git:
+                mock_is_git.return_value = '/git/repo/.git'
+                mock_fgi.return_value = {
+                    'remotes': {'origin': 'git+https://foo'},
+                    'tag': 'mytag',
+                    'commit': '12345678',
+                    'dirty': True,
+                    'foo': 'bar'
+                }
+                res = self.cls._git_version_info()
+        assert res == {
+            'git_remotes': {'origin': 'git+https://foo'},
+            'git_tag': 'mytag',
+            'git_commit': '12345678',
+            'git_is_dirty': True
+        }
+        assert mock_fgi.mock_calls == [call(self.cls, '/git/repo/.git')]
+
+    def test_no_git(self):
+        with patch('%s._find_git_info' % pb, autospec=True) as mock_fgi:
+            with patch('%s._git_repo_path' % pb,
+                       new_callable=PropertyMock) as mock_is_git:
+                mock_is_git.return_value = None
+                res = self.cls._git_version_info()
+        assert res == {}
+        assert mock_fgi.mock_calls == []
+
+    def test_dirs(self):
+        with patch('%s._find_git_info' % pb, autospec=True) as mock_fgi:
+            with patch('%s._find_git_dir' % pb, autospec=True) as mock_fgd:
+                with patch('%s._git_repo_path' % pb,
+                           new_callable=PropertyMock) as mock_is_git:
+                    mock_fgd.return_value = None
+                    res = self.cls._git_version_info(['/a', '/b'])
+        assert res == {}
+        assert mock_fgd.mock_calls == [call(self.cls, ['/a', '/b'])]
+        assert mock_is_git.mock_calls == []
+        assert mock_fgi.mock_calls == []
+
+
+class TestSharedGitInfo(BaseTest):
+
+    def test_no_environment(self):
+        with patch('%s._find_git_info' % pb, autospec=True) as mock_fgi:
+            mock_fgi.return_value = {'commit': 'abcd'}
+            assert self.cls._shared_git_info('/repo/.git') == {
+                'commit': 'abcd'
+            }
+            assert self.cls._shared_git_info('/repo/.git') == {
+                'commit': 'abcd'
+            }
+        assert len(mock_fgi.mock_calls) == 2
+
+    def test_shared(self, tmp_path):
+        env = Environment(path=[])
+        gitdir = str(tmp_path / '.git')
+        os.makedirs(gitdir)
+        finders = [
+            VersionFinder(name, package_file=str(tmp_path / name / 'x.py'),
+                          environment=env)
+            for name in ['foo', 'bar']
+        ]
+        with patch('%s._find_git_info' % pb, autospec=True) as mock_fgi:
+            mock_fgi.return_value = {'commit': 'abcd'}
+            res = [f._shared_git_info(gitdir) for f in finders]
+            res.append(finders[1]._shared_git_info(
+                os.path.join(str(tmp_path), 'foo', '..', '.git')
+            ))
+        assert res == [{'commit': 'abcd'}] * 3
+        assert mock_fgi.mock_calls == [call(finders[0], gitdir)]
+        res[0]['commit'] = 'changed'
+        assert res[1]['commit'] == 'abcd'
+
+
 class TestGitRepoPath(BaseTest):
 
     def test_true(self):
-        with patch('%s.os.path.exists' % pbm) as mock_exists:
+        with patch('%s.find_git_dir' % pbr) as mock_fgd:
             with patch('%s._package_top_dir' % pb,
                        new_callable=PropertyMock) as mock_top_dir:
                 mock_top_dir.return_value = ['/foo/bar', '/foo/bar/baz']
-                mock_exists.side_effect = [False, True]
+                mock_fgd.side_effect = [None, '/foo/.git']
                 res = self.cls._git_repo_path
-        assert res == '/foo/bar/baz/.git'
-        assert mock_exists.mock_calls == [
-            call('/foo/bar/.git'),
-            call('/foo/bar/baz/.git')
+        assert res == '/foo/.git'
+        assert mock_fgd.mock_calls == [
+            call('/foo/bar'),
+            call('/foo/bar/baz')
         ]
 
     def test_false(self):
-        with patch('%s.os.path.exists' % pbm) as mock_exists:
+        with patch('%s.find_git_dir' % pbr) as mock_fgd:
             with patch('%s._package_top_dir' % pb,
                        new_callable=PropertyMock) as mock_top_dir:
                 mock_top_dir.return_value = ['/foo/bar', '/foo/bar/baz']
-                mock_exists.return_value = False
+                mock_fgd.return_value = None
                 res = self.cls._git_repo_path
         assert res is None
-        assert mock_exists.mock_calls == [
-            call('/foo/bar/.git'),
-            call('/foo/bar/baz/.git')
+        assert mock_fgd.mock_calls == [
+            call('/foo/bar'),
+            call('/foo/bar/baz')
         ]
 
     @pytest.mark.skip
@@ -543,7 +1041,7 @@ class TestGitRepoPath(BaseTest):
 class TestFindGitInfo(BaseTest):
 
     def test_find(self):
-        with patch('%s.Repo' % pbm, autospec=True) as mock_repo:
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
             mock_repo.return_value = mockrepo(
                 commit='12345678',
                 dirty=False,
@@ -562,19 +1060,133 @@ class TestFindGitInfo(BaseTest):
             'remotes': {
                 'origin': 'http://my.git/url',
                 'upstream': 'git@github.com:/foo/bar'
-            }
+            },
+            'describe': None,
+            'distance': None,
+            'branch': None,
+            'ahead': None,
+            'behind': None
         }
         assert mock_repo.mock_calls == [
             call(path='/git/repo/.git', search_parent_directories=False),
             call().is_dirty(untracked_files=True)
         ]
 
+    def test_native_tags(self):
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
+            with patch('%s.tags_at' % pbo) as mock_tags:
+                mock_repo.return_value = mockrepo(
+                    commit='12345678', tag='slowtag'
+                )
+                mock_tags.return_value = ['a', 'b']
+                res = self.cls._find_git_info('/git/repo/.git')
+        assert res['tag'] == 'b'
+        assert mock_tags.mock_calls == [call('/git/repo/.git', '12345678')]
+
+    def test_repo_reused(self):
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
+            mock_repo.return_value = mockrepo(commit='12345678')
+            res1 = self.cls._find_git_info('/git/repo/.git')
+            res2 = self.cls._find_git_info('/git/repo/.git')
+        assert res1 == res2
+        assert res1['commit'] == '12345678'
+        assert mock_repo.mock_calls[0] == call(
+            path='/git/repo/.git', search_parent_directories=False
+        )
+        assert mock_repo.call_count == 1
+
+    def test_cli_backend(self):
+        with patch('%s.git_cli_info' % pbr) as mock_gci:
+            with patch('%s.Repo' % pbm, None):
+                with patch('%s._import_git' % pbm):
+                    mock_gci.return_value = {
+                        'commit': 'abcd', 'dirty': False, 'tag': None,
+                        'remotes': {}
+                    }
+                    res = self.cls._find_git_info('/git/repo/.git')
+        assert res == {
+            'commit': 'abcd', 'dirty': False, 'tag': None, 'remotes': {},
+            'describe': None, 'distance': None, 'branch': None,
+            'ahead': None, 'behind': None
+        }
+        assert mock_gci.mock_calls == [call('/git/repo/.git')]
+
+    def test_cli_backend_env(self):
+        with patch('%s.git_cli_info' % pbr) as mock_gci:
+            with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
+                with patch.dict(
+                    'os.environ', {'VERSIONFINDER_GIT_BACKEND': 'cli'}
+                ):
+                    mock_gci.side_effect = OSError()
+                    res = self.cls._find_git_info('/git/repo/.git')
+        assert res == {
+            'commit': None, 'dirty': None, 'tag': None, 'remotes': None,
+            'describe': None, 'distance': None, 'branch': None,
+            'ahead': None, 'behind': None
+        }
+        assert mock_gci.mock_calls == [call('/git/repo/.git')]
+        assert mock_repo.mock_calls == []
+
+    def test_native_fallback(self):
+        with patch('%s.git_cli_info' % pbr) as mock_gci:
+            with patch('%s.native_git_info' % pbr) as mock_ngi:
+                with patch('%s.Repo' % pbm, None):
+                    with patch('%s._import_git' % pbm):
+                        mock_gci.side_effect = OSError()
+                        mock_ngi.return_value = {
+                            'commit': 'abcd', 'dirty': True, 'tag': 'v1',
+                            'remotes': {}
+                        }
+                        res = self.cls._find_git_info('/git/repo/.git')
+        assert res == {
+            'commit': 'abcd', 'dirty': True, 'tag': 'v1', 'remotes': {},
+            'describe': None, 'distance': None, 'branch': None,
+            'ahead': None, 'behind': None
+        }
+        assert mock_ngi.mock_calls == [call('/git/repo/.git')]
+
+    def test_native_fallback_not_on_git_error(self):
+        with patch('%s.git_cli_info' % pbr) as mock_gci:
+            with patch('%s.native_git_info' % pbr) as mock_ngi:
+                with patch('%s.Repo' % pbm, None):
+                    with patch('%s._import_git' % pbm):
+                        mock_gci.side_effect = subprocess.CalledProcessError(
+                            128, ['git', 'status']
+                        )
+                        res = self.cls._find_git_info('/git/repo/.git')
+        assert res['commit'] is None
+        assert mock_ngi.mock_calls == []
+
+    def test_native_fallback_fails(self):
+        with patch('%s.git_cli_info' % pbr) as mock_gci:
+            with patch('%s.native_git_info' % pbr) as mock_ngi:
+                with patch('%s.Repo' % pbm, None):
+                    with patch('%s._import_git' % pbm):
+                        mock_gci.side_effect = OSError()
+                        mock_ngi.side_effect = ValueError('foo')
+                        res = self.cls._find_git_info('/git/repo/.git')
+        assert res['commit'] is None
+        assert res['dirty'] is None
+        assert mock_ngi.mock_calls == [call('/git/repo/.git')]
+
+    def test_linked_worktree(self):
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
+            with patch('%s.repo_path' % pbr) as mock_rp:
+                mock_rp.return_value = '/wt'
+                mock_repo.return_value = mockrepo(commit='12345678')
+                res = self.cls._find_git_info('/git/repo/.git/worktrees/wt')
+        assert res['commit'] == '12345678'
+        assert mock_rp.mock_calls == [call('/git/repo/.git/worktrees/wt')]
+        assert mock_repo.mock_calls[0] == call(
+            path='/wt', search_parent_directories=False
+        )
+
     def test_no_git(self):
 
         def se_exc():
             raise Exception("foo")
 
-        with patch('%s.Repo' % pbm, autospec=True) as mock_repo:
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
             mock_repo.side_effect = se_exc
             res = self.cls._find_git_info('/git/repo/.git')
         assert res == {
@@ -582,11 +1194,132 @@ class TestFindGitInfo(BaseTest):
             'tag': None,
             'remotes': None,
             'dirty': None,
+            'describe': None,
+            'distance': None,
+            'branch': None,
+            'ahead': None,
+            'behind': None
         }
         assert mock_repo.mock_calls == [
             call(path='/git/repo/.git', search_parent_directories=False)
         ]
 
+    def test_describe(self):
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
+            with patch('%s.describe' % pbg) as mock_desc:
+                mock_repo.return_value = mockrepo(commit='1234567890')
+                mock_desc.return_value = ('v1.0', 3)
+                res = self.cls._find_git_info('/git/repo/.git')
+        assert res['describe'] == 'v1.0-3-g1234567'
+        assert res['distance'] == 3
+        assert mock_desc.mock_calls == [call('/git/repo/.git', '1234567890')]
+
+    def test_describe_tagged(self):
+        with patch('%s.git_cli_info' % pbr) as mock_gci:
+            with patch('%s.Repo' % pbm, None):
+                with patch('%s._import_git' % pbm):
+                    with patch('%s.describe' % pbg) as mock_desc:
+                        mock_gci.return_value = {
+                            'commit': 'abcd', 'dirty': False, 'tag': 'v2',
+                            'remotes': {}
+                        }
+                        mock_desc.return_value = ('v2', 0)
+                        res = self.cls._find_git_info('/git/repo/.git')
+        assert res['describe'] == 'v2'
+        assert res['distance'] == 0
+
+    def test_describe_no_tag(self):
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
+            with patch('%s.describe' % pbg) as mock_desc:
+                mock_repo.return_value = mockrepo(commit='1234567890')
+                mock_desc.return_value = None
+                res = self.cls._find_git_info('/git/repo/.git')
+        assert res['describe'] is None
+        assert res['distance'] is None
+
+    def test_describe_exception(self):
+        with patch('%s.Repo' % pbm, autospec=Repo) as mock_repo:
+            with patch('%s.describe' % pbg) as mock_desc:
+                mock_repo.return_value = mockrepo(commit='1234567890')
+                mock_desc.side_effect = KeyError('foo')
+                res = self.cls._find_git_info('/git/repo/.git')
+        assert res['commit'] == '1234567890'
+        assert res['describe'] is None
+        assert res['distance'] is None
+
+    def tracking(self, commit='1234567890', ref='refs/heads/main',
+                 upstream='refs/remotes/origin/main', upstream_commit='abcd'):
+        with patch.multiple(
+            pbo,
+            symbolic_ref=DEFAULT,
+            upstream_ref=DEFAULT,
+            resolve_ref=DEFAULT,
+        ) as mocks, patch('%s.ahead_behind' % pbg) as mock_ab:
+            mocks['ahead_behind'] = mock_ab
+            mocks['symbolic_ref'].return_value = ref
+            mocks['upstream_ref'].return_value = upstream
+            mocks['resolve_ref'].return_value = upstream_commit
+            mock_ab.return_value = (2, 5)
+            res = {'commit': commit, 'branch': None, 'ahead': None,
+                   'behind': None}
+            self.cls._tracking('/git/repo/.git', res)
+        return res, mocks
+
+    def test_tracking(self):
+        res, mocks = self.tracking()
+        assert res == {
+            'commit': '1234567890', 'branch': 'main', 'ahead': 2, 'behind': 5
+        }
+        assert mocks['symbolic_ref'].mock_calls == [call('/git/repo/.git')]
+        assert mocks['upstream_ref'].mock_calls == [
+            call('/git/repo/.git', 'main')
+        ]
+        assert mocks['resolve_ref'].mock_calls == [
+            call('/git/repo/.git', 'refs/remotes/origin/main')
+        ]
+        assert mocks['ahead_behind'].mock_calls == [
+            call('/git/repo/.git', '1234567890', 'abcd')
+        ]
+
+    def test_tracking_detached(self):
+        res, mocks = self.tracking(ref=None)
+        assert res['branch'] is None
+        assert res['ahead'] is None
+        assert mocks['upstream_ref'].mock_calls == []
+
+    def test_tracking_no_upstream(self):
+        res, mocks = self.tracking(upstream=None)
+        assert res['branch'] == 'main'
+        assert res['ahead'] is None
+        assert res['behind'] is None
+        assert mocks['ahead_behind'].mock_calls == []
+
+    def test_tracking_upstream_missing(self):
+        res, mocks = self.tracking(upstream_commit=None)
+        assert res['branch'] == 'main'
+        assert res['behind'] is None
+        assert mocks['ahead_behind'].mock_calls == []
+
+    def test_tracking_unborn(self):
+        res, mocks = self.tracking(commit=None)
+        assert res['branch'] == 'main'
+        assert mocks['upstream_ref'].mock_calls == []
+
+    def test_tracking_exception(self):
+        with patch('%s.symbolic_ref' % pbo) as mock_sr:
+            with patch('%s.ahead_behind' % pbg) as mock_ab:
+                mock_sr.return_value = 'refs/heads/main'
+                mock_ab.side_effect = KeyError('abcd')
+                with patch('%s.upstream_ref' % pbo) as mock_ur:
+                    with patch('%s.resolve_ref' % pbo):
+                        mock_ur.return_value = 'refs/remotes/origin/main'
+                        res = {'commit': 'ab', 'branch': None, 'ahead': None,
+                               'behind': None}
+                        self.cls._tracking('/git/repo/.git', res)
+        assert res == {
+            'commit': 'ab', 'branch': 'main', 'ahead': None, 'behind': None
+        }
+
 
 class TestGetDistVersionUrl(BaseTest):
 
@@ -712,8 +1445,9 @@ class TestFindPipInfo(BaseTest):
 
         with patch('%s.get_installed_distributions' % pbm
                    ) as mock_pgid:
-            with patch('%s.FrozenRequirement.from_dist' % pbm
-                       ) as mock_from_dist:
+            with patch('%s.FrozenRequirement' % pbm
+                       ) as mock_frozen_cls:
+                mock_from_dist = mock_frozen_cls.from_dist
                 with patch('%s._dist_version_url' % pb) as mock_dist_vu:
                     mock_pgid.return_value = installed_dists
                     mock_from_dist.return_value = mock_frozen
@@ -733,11 +1467,13 @@ class TestFindPipInfo(BaseTest):
             autospec=True,
             req='awslimitchecker==0.1.0'
         )
+        self.cls._file_dist = (None, )
 
         with patch('%s.get_installed_distributions' % pbm
-                   ) as mock_pgid:
-            with patch('%s.FrozenRequirement.from_dist' % pbm
-                       ) as mock_from_dist:
+                   ) as mock_pgid, self.mock_lookup_env():
+            with patch('%s.FrozenRequirement' % pbm
+                       ) as mock_frozen_cls:
+                mock_from_dist = mock_frozen_cls.from_dist
                 with patch('%s._dist_version_url' % pb) as mock_dist_vu:
                     mock_pgid.return_value = installed_dists
                     mock_from_dist.return_value = mock_frozen
@@ -762,8 +1498,9 @@ class TestFindPipInfo(BaseTest):
 
         with patch('%s.get_installed_distributions' % pbm
                    ) as mock_pgid:
-            with patch('%s.FrozenRequirement.from_dist' % pbm
-                       ) as mock_from_dist:
+            with patch('%s.FrozenRequirement' % pbm
+                       ) as mock_frozen_cls:
+                mock_from_dist = mock_frozen_cls.from_dist
                 with patch('%s._dist_version_url' % pb) as mock_dist_vu:
                     mock_pgid.return_value = installed_dists
                     mock_from_dist.return_value = mock_frozen
@@ -789,8 +1526,9 @@ class TestFindPipInfo(BaseTest):
 
         with patch('%s.get_installed_distributions' % pbm
                    ) as mock_pgid:
-            with patch('%s.FrozenRequirement.from_dist' % pbm
-                       ) as mock_from_dist:
+            with patch('%s.FrozenRequirement' % pbm
+                       ) as mock_frozen_cls:
+                mock_from_dist = mock_frozen_cls.from_dist
                 with patch('%s._dist_version_url' % pb) as mock_dist_vu:
                     mock_pgid.return_value = installed_dists
                     mock_from_dist.return_value = mock_frozen
@@ -802,17 +1540,193 @@ class TestFindPipInfo(BaseTest):
         assert mock_from_dist.mock_calls == [call(mock_distB, [])]
         assert mock_dist_vu.mock_calls == [call(mock_distB)]
 
+    def test_file_distribution_fallback(self):
+        mock_distA = Mock(autospec=True, project_name='PyYAML')
+        mock_frozen = Mock(autospec=True, req='PyYAML==5.3')
+        file_dist = Mock()
+        file_dist.name = 'PyYAML'
+        self.cls.package_name = 'yaml'
+
+        with patch('%s.get_installed_distributions' % pbm) as mock_pgid:
+            with patch('%s.FrozenRequirement' % pbm) as mock_frozen_cls:
+                mock_from_dist = mock_frozen_cls.from_dist
+                with patch('%s._dist_version_url' % pb) as mock_dist_vu:
+                    with patch('%s._file_distribution' % pb) as mock_fd, \
+                            self.mock_lookup_env():
+                        mock_fd.return_value = file_dist
+                        mock_pgid.return_value = [mock_distA]
+                        mock_from_dist.return_value = mock_frozen
+                        mock_dist_vu.return_value = ('5.3', 'http://y')
+                        res = self.cls._find_pip_info()
+        assert res == {'version': '5.3', 'url': 'http://y',
+                       'requirement': 'PyYAML==5.3'}
+        assert mock_pgid.mock_calls == [call(), call()]
+        assert mock_from_dist.mock_calls == [call(mock_distA, [])]
+
 
 class TestFindPkgInfo(BaseTest):
 
     def test_find_pkg_info(self):
         mock_distA = Mock(autospec=True, project_name='awslimitchecker')
-        with patch('%s.pkg_resources.require' % pbm) as mock_require:
+        with patch('%s.pkg_resources' % pbm) as mock_pkg_res:
+            mock_require = mock_pkg_res.require
             with patch('%s._dist_version_url' % pb) as mock_dvu:
                 mock_require.return_value = [mock_distA]
                 mock_dvu.return_value = ('7.8.9', 'http://foobar')
                 res = self.cls._find_pkg_info()
         assert res == {'version': '7.8.9', 'url': 'http://foobar'}
+        assert mock_require.mock_calls == [call('foo')]
+
+    def test_file_distribution_fallback(self):
+        mock_distA = Mock(autospec=True, location='/site')
+        file_dist = Mock()
+        file_dist.name = 'PyYAML'
+        self.cls.package_name = 'yaml'
+        with patch('%s.pkg_resources' % pbm) as mock_pkg_res:
+            mock_require = mock_pkg_res.require
+            with patch('%s._dist_version_url' % pb) as mock_dvu:
+                with patch('%s._file_distribution' % pb) as mock_fd, \
+                        self.mock_lookup_env():
+                    mock_fd.return_value = file_dist
+                    mock_require.side_effect = [
+                        RuntimeError('not found'), [mock_distA]
+                    ]
+                    mock_dvu.return_value = ('5.3', 'http://y')
+                    res = self.cls._find_pkg_info()
+        assert res == {'version': '5.3', 'url': 'http://y'}
+        assert mock_require.mock_calls == [call('yaml'), call('PyYAML')]
+        assert self.cls._pkg_resources_locations == ['/site']
+
+    def test_not_found(self):
+        self.cls._file_dist = (None, )
+        with patch('%s.pkg_resources' % pbm) as mock_pkg_res, \
+                self.mock_lookup_env():
+            mock_pkg_res.require.side_effect = RuntimeError('not found')
+            with pytest.raises(RuntimeError):
+                self.cls._find_pkg_info()
+
+    def test_no_name(self):
+        self.cls.package_name = None
+        self.cls._file_dist = (None, )
+        with patch('%s.pkg_resources' % pbm) as mock_pkg_res:
+            assert self.cls._find_pkg_info() == {}
+        assert mock_pkg_res.mock_calls == []
+
+
+class TestFileDistribution(BaseTest):
+
+    def test_distribution_given(self):
+        m_env = Mock()
+        self.cls._environment = m_env
+        self.cls.distribution = Mock()
+        assert self.cls._file_distribution() == self.cls.distribution
+        assert m_env.mock_calls == []
+
+    def test_environment(self):
+        m_env = Mock()
+        self.cls._environment = m_env
+        assert self.cls._file_distribution() == \
+            m_env.distribution_for_file.return_value
+        assert self.cls._file_distribution() == \
+            m_env.distribution_for_file.return_value
+        assert m_env.mock_calls == [
+            call.distribution_for_file('/foo/bar/baz.py')
+        ]
+
+    def test_default_environment(self):
+        with patch('%s.default_environment' % pbm) as m_def:
+            m_def.return_value.distribution_for_file.return_value = None
+            assert self.cls._file_distribution() is None
+            assert self.cls._file_distribution() is None
+        assert m_def.mock_calls == [
+            call(), call().distribution_for_file('/foo/bar/baz.py')
+        ]
+
+
+class TestCandidateNames(BaseTest):
+
+    def _dist(self, name):
+        d = Mock()
+        d.name = name
+        return d
+
+    def test_lazy(self):
+        with patch('%s._file_distribution' % pb) as mock_fd:
+            with self.mock_lookup_env([self._dist('foo-dist')]) as m_le:
+                mock_fd.return_value = self._dist('bar')
+                names = self.cls._candidate_names()
+                assert next(names) == 'foo'
+                assert m_le.mock_calls == []
+                assert next(names) == 'foo-dist'
+                assert mock_fd.mock_calls == []
+                assert list(names) == ['bar']
+        assert m_le.mock_calls == [call()]
+        assert m_le.return_value.distributions_for_import.mock_calls == [
+            call('foo')
+        ]
+
+    def test_same_name(self):
+        with patch('%s._file_distribution' % pb) as mock_fd:
+            with self.mock_lookup_env([self._dist('FOO')]):
+                mock_fd.return_value = self._dist('Foo')
+                assert list(self.cls._candidate_names()) == ['foo']
+
+    def test_import_same_as_file(self):
+        with patch('%s._file_distribution' % pb) as mock_fd:
+            with self.mock_lookup_env([self._dist('bar')]):
+                mock_fd.return_value = self._dist('bar')
+                assert list(self.cls._candidate_names()) == ['foo', 'bar']
+
+    def test_import_ambiguous(self):
+        with patch('%s._file_distribution' % pb) as mock_fd:
+            with self.mock_lookup_env([self._dist('a'), self._dist('b')]):
+                mock_fd.return_value = self._dist('b')
+                assert list(self.cls._candidate_names()) == ['foo', 'b']
+
+    def test_no_file_dist(self):
+        with patch('%s._file_distribution' % pb) as mock_fd:
+            with self.mock_lookup_env():
+                mock_fd.return_value = None
+                assert list(self.cls._candidate_names()) == ['foo']
+
+    def test_no_name(self):
+        self.cls.package_name = None
+        with patch('%s._file_distribution' % pb) as mock_fd:
+            with self.mock_lookup_env() as m_le:
+                mock_fd.return_value = self._dist('bar')
+                assert list(self.cls._candidate_names()) == ['bar']
+        assert m_le.mock_calls == []
+
+    def test_integration(self, tmp_path):
+        site = str(tmp_path)
+        di = os.path.join(site, 'PyYAML-5.3.dist-info')
+        os.makedirs(di)
+        with open(os.path.join(di, 'METADATA'), 'w') as fh:
+            fh.write('Name: PyYAML\nVersion: 5.3\n\n')
+        with open(os.path.join(di, 'RECORD'), 'w') as fh:
+            fh.write('yaml/__init__.py,,\n')
+        cls = VersionFinder(
+            package_file=os.path.join(site, 'yaml', '__init__.py'),
+            environment=Environment(path=[site])
+        )
+        assert cls.package_name is None
+        assert list(cls._candidate_names()) == ['PyYAML']
+        cls = VersionFinder(
+            'yaml.constructor', package_file='/other.py',
+            environment=Environment(path=[site])
+        )
+        assert list(cls._candidate_names()) == ['yaml.constructor', 'PyYAML']
+
+
+class TestLookupEnvironment(BaseTest):
+
+    def test_given(self):
+        self.cls._environment = Mock()
+        assert self.cls._lookup_environment() == self.cls._environment
+
+    def test_default(self):
+        with patch('%s.default_environment' % pbm) as m_def:
+            assert self.cls._lookup_environment() == m_def.return_value
 
 
 class TestPackageTopDir(BaseTest):
@@ -854,3 +1768,93 @@ class TestChdir(object):
             call('/new/dir'),
             call('/old/cwd')
         ]
+
+
+class TestInstalledDistributions(BaseTest):
+
+    def test_no_environment(self):
+        with patch('%s.get_installed_distributions' % pbm) as mock_pgid:
+            mock_pgid.return_value = ['a', 'b']
+            assert self.cls._installed_distributions() == ['a', 'b']
+            assert self.cls._installed_distributions() == ['a', 'b']
+        assert mock_pgid.mock_calls == [call(), call()]
+
+    def test_environment(self):
+        env = Environment(path=[])
+        cls2 = VersionFinder('bar', package_file='/foo/bar.py',
+                             environment=env)
+        self.cls._environment = env
+        with patch('%s.get_installed_distributions' % pbm) as mock_pgid:
+            mock_pgid.return_value = iter(['a', 'b'])
+            assert self.cls._installed_distributions() == ['a', 'b']
+            assert cls2._installed_distributions() == ['a', 'b']
+        assert mock_pgid.mock_calls == [call()]
+
+
+class TestPackageTopDirEnvironment(BaseTest):
+
+    def test_environment(self):
+        m_env = Mock()
+        m_env.get_distribution.return_value.package_dir = '/src/foo'
+        self.cls._environment = m_env
+        self.cls.package_dir = '/foo'
+        assert self.cls._package_top_dir == ['/foo', '/src/foo']
+        assert m_env.get_distribution.mock_calls == [call('foo')]
+
+    def test_environment_not_found(self):
+        m_env = Mock()
+        m_env.get_distribution.return_value = None
+        self.cls._environment = m_env
+        self.cls.package_dir = '/foo'
+        assert self.cls._package_top_dir == ['/foo']
+
+    def test_distribution(self):
+        m_env = Mock()
+        self.cls._environment = m_env
+        self.cls.distribution = Mock(package_dir='/src/bar')
+        self.cls.package_dir = '/foo'
+        assert self.cls._package_top_dir == ['/foo', '/src/bar']
+        assert m_env.mock_calls == []
+
+    def test_file_distribution(self):
+        self.cls._file_dist = (Mock(package_dir='/src/baz'), )
+        self.cls.package_dir = '/foo'
+        assert self.cls._package_top_dir == ['/foo', '/src/baz']
+
+    def test_no_name(self):
+        m_env = Mock()
+        self.cls._environment = m_env
+        self.cls.package_name = None
+        self.cls.package_dir = '/foo'
+        assert self.cls._package_top_dir == ['/foo']
+        assert m_env.mock_calls == []
+
+
+class TestLazyImports(object):
+
+    def test_not_imported_until_used(self):
+        code = 'import sys, versionfinder; ' \
+               'print(sorted(m for m in ("pip", "pkg_resources", "git") ' \
+               'if m in sys.modules))'
+        out = subprocess.check_output(
+            [sys.executable, '-c', code],
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(
+                os.path.abspath(__file__))))
+        )
+        assert out.decode().strip() == '[]'
+
+    def test_import_git(self):
+        with patch('%s.Repo' % pbm, None):
+            vf_module._import_git()
+            assert vf_module.Repo is Repo
+
+    def test_import_pkg_resources(self):
+        with patch('%s.pkg_resources' % pbm, None):
+            vf_module._import_pkg_resources()
+            assert vf_module.pkg_resources is not None
+
+    def test_import_pip_already_set(self):
+        m_frozen = Mock()
+        with patch('%s.FrozenRequirement' % pbm, m_frozen):
+            vf_module._import_pip()
+            assert vf_module.FrozenRequirement is m_frozen
@@ -37,8 +37,16 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
-from versionfinder.versioninfo import VersionInfo
-from unittest.mock import patch, PropertyMock
+import sys
+import copy
+import json
+import pickle
+import threading
+import pytest
+from versionfinder.versioninfo import (
+    VersionInfo, LazyVersionInfo, STAGE_COMPLETE, STAGE_TIMEOUT
+)
+from unittest.mock import patch, PropertyMock, call, Mock
 
 pb = 'versionfinder.versioninfo.VersionInfo'
 
@@ -98,7 +106,12 @@ class TestAsDict(object):
             'git_remotes': {
                 'origin': 'ourl'
             },
-            'git_is_dirty': True
+            'git_is_dirty': True,
+            'git_describe': 'tag-2-gabcdef0',
+            'git_distance': 2,
+            'git_branch': 'main',
+            'git_ahead': 1,
+            'git_behind': 0
         }
         v = VersionInfo(**d)
         assert v.as_dict == d
@@ -125,14 +138,14 @@ class TestProperties(object):
         assert self.cls.version == 'pipver'
 
     def test_version_no_pip(self):
-        self.cls._pip_version = None
+        self.cls = self.cls.replace(pip_version=None)
         assert self.cls.version == 'prver'
 
     def test_url(self):
         assert self.cls.url == 'pipurl'
 
     def test_url_no_pip(self):
-        self.cls._pip_url = None
+        self.cls = self.cls.replace(pip_url=None)
         assert self.cls.url == 'prurl'
 
     def test_pip_version(self):
@@ -165,51 +178,74 @@ class TestProperties(object):
         assert self.cls.git_remote == 'ourl'
 
     def test_git_remote_none(self):
-        self.cls._git_remotes = None
+        self.cls = self.cls.replace(git_remotes=None)
         assert self.cls.git_remote is None
 
     def test_git_remote_no_origin(self):
-        self.cls._git_remotes = {
+        self.cls = self.cls.replace(git_remotes={
             'a': 'rmta',
             'k': 'rmtk',
             'z': 'rmtz'
-        }
+        })
         assert self.cls.git_remote == 'rmta'
 
     def test_git_is_dirty(self):
         assert self.cls.git_is_dirty is True
 
+    def test_git_describe(self):
+        assert self.cls.git_describe is None
+        v = self.cls.replace(git_describe='tag-3-gabcdef0', git_distance=3)
+        assert v.git_describe == 'tag-3-gabcdef0'
+        assert v.git_distance == 3
+        assert v != self.cls
+        assert v != v.replace(git_distance=4)
+        assert hash(v) == hash(v.replace())
+
+    def test_git_branch(self):
+        assert self.cls.git_branch is None
+        assert self.cls.git_ahead is None
+        assert self.cls.git_behind is None
+        v = self.cls.replace(git_branch='main', git_ahead=2, git_behind=0)
+        assert v.git_branch == 'main'
+        assert v.git_ahead == 2
+        assert v.git_behind == 0
+        assert v != self.cls
+        assert v != v.replace(git_behind=1)
+        assert v != v.replace(git_branch='other')
+
     def test_git_str(self):
         assert self.cls.git_str == 'ourl@tag*'
 
     def test_git_str_no_git(self):
-        self.cls._git_commit = None
-        self.cls._git_remotes = None
+        self.cls = self.cls.replace(git_commit=None, git_remotes=None)
         assert self.cls.git_str == ''
 
     def test_git_str_no_tag(self):
-        self.cls._git_tag = None
+        self.cls = self.cls.replace(git_tag=None)
         assert self.cls.git_str == 'ourl@commit*'
 
     def test_git_str_not_dirty(self):
-        self.cls._git_is_dirty = False
+        self.cls = self.cls.replace(git_is_dirty=False)
         assert self.cls.git_str == 'ourl@tag'
 
     def test_git_str_pip_req_not_dirty(self):
-        self.cls._git_is_dirty = False
-        self.cls._pip_requirement = 'git+https://foo'
+        self.cls = self.cls.replace(git_is_dirty=False,
+                                    pip_requirement='git+https://foo')
         assert self.cls.git_str == 'git+https://foo'
 
+    def test_git_str_no_pip_req(self):
+        self.cls = self.cls.replace(pip_requirement=None)
+        assert self.cls.git_str == 'ourl@tag*'
+
     def test_git_str_pip_req_dirty(self):
-        self.cls._pip_requirement = 'git+https://foo'
+        self.cls = self.cls.replace(pip_requirement='git+https://foo')
         assert self.cls.git_str == 'git+https://foo*'
 
     def test_short_str_pip(self):
         assert self.cls.short_str == 'pipver <pipurl>'
 
     def test_short_str_pkg_resources(self):
-        self.cls._pip_version = None
-        self.cls._pip_url = None
+        self.cls = self.cls.replace(pip_version=None, pip_url=None)
         assert self.cls.short_str == 'prver <prurl>'
 
     def test_short_str_none(self):
@@ -220,7 +256,7 @@ class TestProperties(object):
                 assert self.cls.short_str == ''
 
     def test_long_str_git(self):
-        self.cls._git_is_dirty = False
+        self.cls = self.cls.replace(git_is_dirty=False)
         with patch('%s.git_str' % pb, new_callable=PropertyMock) as m_git_str:
             with patch('%s.short_str' % pb,
                        new_callable=PropertyMock) as m_short:
@@ -254,7 +290,12 @@ class TestRepr(object):
             git_is_dirty=True
         )
         s = 'VersionInfo('
+        s += 'git_ahead=None, '
+        s += 'git_behind=None, '
+        s += 'git_branch=None, '
         s += 'git_commit=commit, '
+        s += 'git_describe=None, '
+        s += 'git_distance=None, '
         s += 'git_is_dirty=True, '
         s += "git_remotes={'origin': 'ourl'}, "
         s += 'git_tag=tag, '
@@ -340,3 +381,376 @@ class TestEq(object):
         )
         assert v1 != v2
         assert v1 != v3
+
+
+class TestValueType(object):
+
+    def setup_method(self, _):
+        self.kwargs = {
+            'pip_version': 'pipver',
+            'pip_url': 'pipurl',
+            'pip_requirement': 'preq',
+            'pkg_resources_version': 'prver',
+            'pkg_resources_url': 'prurl',
+            'git_tag': 'tag',
+            'git_commit': 'commit',
+            'git_remotes': {
+                'origin': 'ourl',
+                'upstream': 'uurl'
+            },
+            'git_is_dirty': True
+        }
+
+    def test_slots(self):
+        v = VersionInfo(**self.kwargs)
+        assert not hasattr(v, '__dict__')
+
+    def test_immutable(self):
+        v = VersionInfo(**self.kwargs)
+        with pytest.raises(AttributeError):
+            v._pip_version = 'foo'
+        with pytest.raises(AttributeError):
+            v.foo = 'bar'
+        with pytest.raises(AttributeError):
+            del v._git_tag
+        assert v.pip_version == 'pipver'
+
+    def test_remotes_copied(self):
+        v = VersionInfo(**self.kwargs)
+        v.git_remotes['origin'] = 'changed'
+        self.kwargs['git_remotes']['origin'] = 'changed2'
+        assert v.git_remotes == {'origin': 'ourl', 'upstream': 'uurl'}
+
+    def test_hash(self):
+        v1 = VersionInfo(**self.kwargs)
+        self.kwargs['git_remotes'] = {'upstream': 'uurl', 'origin': 'ourl'}
+        v2 = VersionInfo(**self.kwargs)
+        v3 = v1.replace(git_is_dirty=False)
+        assert hash(v1) == hash(v2)
+        assert hash(v1) == hash(v1)
+        assert len({v1, v2, v3}) == 2
+        assert {v1: 'a'}[v2] == 'a'
+        assert hash(VersionInfo()) == hash(VersionInfo())
+
+    def test_eq_other_type(self):
+        v = VersionInfo(**self.kwargs)
+        assert v == v
+        assert (v == self.kwargs) is False
+        assert v != 'foo'
+
+    def test_replace(self):
+        v1 = VersionInfo(**self.kwargs)
+        v2 = v1.replace(git_tag=None, pip_version='2')
+        assert v1.git_tag == 'tag'
+        assert v2.git_tag is None
+        assert v2.pip_version == '2'
+        assert v2.git_remotes == v1.git_remotes
+
+    def test_interned(self):
+        url = ''.join(['https://', 'example.com/foo'])
+        v1 = VersionInfo(pip_url=url, git_remotes={
+            ''.join(['ori', 'gin']): ''.join(['git@', 'host:foo'])
+        })
+        v2 = VersionInfo(pip_url=''.join(['https://', 'example.com/foo']))
+        assert v1.pip_url is v2.pip_url
+        assert v1.pip_url is sys.intern('https://example.com/foo')
+        name, remote = list(v1._git_remotes.items())[0]
+        assert name is sys.intern('origin')
+        assert remote is sys.intern('git@host:foo')
+
+    def test_pickle_copy(self):
+        v = VersionInfo(**self.kwargs)
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            assert pickle.loads(pickle.dumps(v, protocol=proto)) == v
+        assert copy.copy(v) == v
+        assert copy.deepcopy(v) == v
+
+
+class TestStageStatus(object):
+
+    def setup_method(self):
+        self.status = {'pip': STAGE_COMPLETE, 'git': STAGE_TIMEOUT}
+        self.cls = VersionInfo(pip_version='1.2.3', stage_status=self.status)
+
+    def test_stage_status(self):
+        assert self.cls.stage_status == self.status
+        self.status['pip'] = STAGE_TIMEOUT
+        assert self.cls.stage_status['pip'] == STAGE_COMPLETE
+        self.cls.stage_status['pip'] = STAGE_TIMEOUT
+        assert self.cls.stage_status['pip'] == STAGE_COMPLETE
+        assert self.cls.complete is False
+
+    def test_field_status(self):
+        assert self.cls.field_status('pip_url') == STAGE_COMPLETE
+        assert self.cls.field_status('git_is_dirty') == STAGE_TIMEOUT
+        assert self.cls.field_status('pkg_resources_version') is None
+        with pytest.raises(ValueError):
+            self.cls.field_status('version')
+
+    def test_not_from_lookup(self):
+        cls = VersionInfo(pip_version='1.2.3')
+        assert cls.stage_status is None
+        assert cls.complete is True
+        assert cls.field_status('pip_version') is None
+
+    def test_complete(self):
+        cls = VersionInfo(stage_status={'pip': STAGE_COMPLETE})
+        assert cls.complete is True
+
+    def test_not_part_of_value(self):
+        other = VersionInfo(pip_version='1.2.3')
+        assert self.cls == other
+        assert hash(self.cls) == hash(other)
+        assert 'stage_status' not in self.cls.as_dict
+        assert pickle.loads(pickle.dumps(self.cls)).stage_status is None
+        assert VersionInfo.from_json(self.cls.to_json()) == other
+
+    def test_lazy(self):
+        cls = LazyVersionInfo(Mock(return_value={}),
+                              stage_status={'pip': STAGE_COMPLETE})
+        assert cls.stage_status == {'pip': STAGE_COMPLETE}
+
+
+class TestMemoized(object):
+
+    def setup_method(self, _):
+        self.cls = VersionInfo(
+            pip_version='pipver',
+            pip_url='pipurl',
+            pip_requirement='preq',
+            git_commit='commit',
+            git_remotes={'upstream': 'uurl', 'fork': 'furl'},
+            git_is_dirty=False
+        )
+
+    def test_computed_once(self):
+        with patch('%s._make_git_str' % pb, autospec=True) as m_git_str:
+            with patch('%s._make_git_remote' % pb,
+                       autospec=True) as m_git_remote:
+                m_git_str.return_value = 'gitstr'
+                m_git_remote.return_value = 'furl'
+                for _ in range(3):
+                    assert self.cls.git_str == 'gitstr'
+                    assert self.cls.git_remote == 'furl'
+                    assert self.cls.long_str == 'pipver <pipurl> (gitstr)'
+        assert m_git_str.mock_calls == [call(self.cls)]
+        assert m_git_remote.mock_calls == [call(self.cls)]
+
+    def test_cached_values(self):
+        assert self.cls.long_str == 'pipver <pipurl> (furl@commit)'
+        assert self.cls._long_str == 'pipver <pipurl> (furl@commit)'
+        assert self.cls._short_str == 'pipver <pipurl>'
+        assert self.cls._git_str == 'furl@commit'
+        assert self.cls._git_remote == 'furl'
+        assert self.cls.long_str is self.cls.long_str
+
+    def test_cached_none(self):
+        v = VersionInfo(pip_version='1')
+        with patch('%s._make_git_remote' % pb, autospec=True) as m_remote:
+            m_remote.return_value = None
+            assert v.git_remote is None
+            assert v.git_remote is None
+        assert m_remote.mock_calls == [call(v)]
+
+    def test_not_pickled(self):
+        assert self.cls.long_str is not None
+        v = pickle.loads(pickle.dumps(self.cls))
+        assert v._long_str is not self.cls._long_str
+        assert v.long_str == self.cls.long_str
+
+    def test_long_bytes(self):
+        v = VersionInfo(pip_version='1.0', pip_url='http://f\u00f6o\r\nX: y')
+        assert v.long_bytes == b'1.0 <http://f\\xf6oX: y>'
+        assert v.long_bytes is v.long_bytes
+
+    def test_long_bytes_git(self):
+        assert self.cls.long_bytes == b'pipver <pipurl> (furl@commit)'
+
+
+class TestSerialization(object):
+
+    def setup_method(self, _):
+        self.full = VersionInfo(
+            pip_version='pipver',
+            pip_url='pipurl',
+            pip_requirement='git+https://h/\u00fcber.git@abc#egg=foo',
+            pkg_resources_version='prver',
+            pkg_resources_url='prurl',
+            git_tag='tag',
+            git_commit='commit',
+            git_remotes={
+                'origin': 'ourl',
+                'upstream': 'uurl'
+            },
+            git_is_dirty=True,
+            git_describe='v1-12-gabcdef0',
+            git_distance=12,
+            git_branch='main',
+            git_ahead=0,
+            git_behind=3
+        )
+        self.objs = [
+            self.full,
+            VersionInfo(),
+            VersionInfo(pkg_resources_version='1.0', git_is_dirty=False),
+            VersionInfo(git_commit='abcd', git_remotes={}),
+            VersionInfo(git_commit='abcd', git_describe='v1', git_distance=0),
+            VersionInfo(git_commit='abcd', git_branch='b', git_behind=70000),
+            VersionInfo(pip_url=''),
+        ]
+
+    def test_from_dict(self):
+        for v in self.objs:
+            assert VersionInfo.from_dict(v.as_dict) == v
+
+    def test_json(self):
+        assert self.full.to_json() == json.dumps(
+            self.full.as_dict, sort_keys=True, separators=(',', ':'))
+        for v in self.objs:
+            res = VersionInfo.from_json(v.to_json())
+            assert res == v
+            assert res.as_dict == v.as_dict
+
+    def test_bytes(self):
+        for v in self.objs:
+            b = v.to_bytes()
+            assert isinstance(b, bytes)
+            res = VersionInfo.from_bytes(b)
+            assert res == v
+            assert res.as_dict == v.as_dict
+        assert VersionInfo().to_bytes() == b'\x02\x00\x00\x00'
+        assert VersionInfo(git_is_dirty=True, git_tag='t').to_bytes() == \
+            b'\x02\x20\x00\x02\x01\x00t'
+        assert VersionInfo(git_distance=258).to_bytes() == \
+            b'\x02\x00\x02\x00\x02\x01\x00\x00'
+        assert VersionInfo(git_behind=1).to_bytes() == \
+            b'\x02\x00\x08\x00\x01\x00\x00\x00'
+        assert len(self.full.to_bytes()) < len(self.full.to_json())
+
+    def test_bytes_remote_order(self):
+        v1 = VersionInfo(git_remotes={'b': '2', 'a': '1'})
+        v2 = VersionInfo(git_remotes={'a': '1', 'b': '2'})
+        assert v1.to_bytes() == v2.to_bytes()
+
+    def test_bytes_bad_version(self):
+        with pytest.raises(ValueError):
+            VersionInfo.from_bytes(b'\x09\x00\x00\x00')
+
+    def test_bytes_truncated(self):
+        b = self.full.to_bytes()
+        for n in (0, 2, 5, len(b) - 1):
+            with pytest.raises(ValueError):
+                VersionInfo.from_bytes(b[:n])
+
+    def test_bytes_too_long(self):
+        with pytest.raises(ValueError):
+            VersionInfo(pip_url='x' * 70000).to_bytes()
+
+    def test_bytes_int_range(self):
+        for v in (-1, 2 ** 32):
+            with pytest.raises(ValueError):
+                VersionInfo(git_distance=v).to_bytes()
+
+    def test_reduce(self):
+        assert self.full.__reduce__() == (VersionInfo, (
+            'pipver', 'pipurl', 'git+https://h/\u00fcber.git@abc#egg=foo',
+            'prver', 'prurl', 'tag', 'commit',
+            {'origin': 'ourl', 'upstream': 'uurl'}, True, 'v1-12-gabcdef0', 12,
+            'main', 0, 3
+        ))
+        assert self.full.long_str
+        p = pickle.dumps(self.full, protocol=pickle.HIGHEST_PROTOCOL)
+        assert b'_long_str' not in p
+        assert b'pip_version' not in p
+        for v in self.objs:
+            assert pickle.loads(pickle.dumps(v)) == v
+
+
+class TestLazyVersionInfo(object):
+
+    def setup_method(self):
+        self.loader = Mock(return_value={
+            'git_commit': '12345678',
+            'git_remotes': {'origin': 'https://github.com/foo/bar.git'},
+            'git_is_dirty': True
+        })
+        self.cls = LazyVersionInfo(
+            self.loader, pip_version='1.2.3', pip_url='http://foo'
+        )
+        self.expected = VersionInfo(
+            pip_version='1.2.3', pip_url='http://foo', git_commit='12345678',
+            git_remotes={'origin': 'https://github.com/foo/bar.git'},
+            git_is_dirty=True
+        )
+
+    def test_non_git_fields(self):
+        assert self.cls.version == '1.2.3'
+        assert self.cls.short_str == '1.2.3 <http://foo>'
+        assert self.cls.pkg_resources_version is None
+        assert self.cls.git_loaded is False
+        assert self.loader.mock_calls == []
+
+    def test_git_fields(self):
+        assert self.cls.git_commit == '12345678'
+        assert self.cls.git_loaded is True
+        assert self.cls.git_is_dirty is True
+        assert self.cls.git_tag is None
+        assert self.cls.git_remote == 'https://github.com/foo/bar.git'
+        assert self.cls.long_str == self.expected.long_str
+        assert self.loader.mock_calls == [call()]
+
+    def test_value_type(self):
+        assert self.cls == self.expected
+        assert self.expected == self.cls
+        assert hash(self.cls) == hash(self.expected)
+        assert self.cls.as_dict == self.expected.as_dict
+        assert self.loader.mock_calls == [call()]
+        with pytest.raises(AttributeError):
+            self.cls.git_commit = 'foo'
+        with pytest.raises(AttributeError):
+            self.cls.nonexistent
+
+    def test_serialization(self):
+        res = pickle.loads(pickle.dumps(self.cls))
+        assert type(res) is VersionInfo
+        assert res == self.expected
+        assert VersionInfo.from_bytes(self.cls.to_bytes()) == self.expected
+        assert VersionInfo.from_json(self.cls.to_json()) == self.expected
+
+    def test_replace(self):
+        res = self.cls.replace(git_tag='v1')
+        assert type(res) is VersionInfo
+        assert res == self.expected.replace(git_tag='v1')
+
+    def test_loader_exception(self):
+        self.loader.side_effect = RuntimeError('foo')
+        assert self.cls.git_commit is None
+        assert self.cls.git_str == ''
+        assert self.cls.git_loaded is True
+        assert self.cls == VersionInfo(pip_version='1.2.3',
+                                       pip_url='http://foo')
+
+    def test_threads(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def loader():
+            started.set()
+            release.wait(5)
+            return {'git_commit': 'abcd'}
+
+        m_loader = Mock(side_effect=loader)
+        cls = LazyVersionInfo(m_loader)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cls.git_commit))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        started.wait(5)
+        release.set()
+        for t in threads:
+            t.join(5)
+        assert results == ['abcd'] * 4
+        assert m_loader.mock_calls == [call()]
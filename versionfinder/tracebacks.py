@@ -0,0 +1,180 @@
+"""
+versionfinder/tracebacks.py
+
+The latest version of this package is available at:
+<https://github.com/jantman/versionfinder>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of versionfinder.
+
+    versionfinder is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    versionfinder is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Lesser General Public License for more details.
+
+    You should have received a copy of the GNU Lesser General Public License
+    along with versionfinder.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the GPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/versionfinder> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import re
+import sys
+import logging
+import traceback
+
+from .environment import default_environment
+
+# matches the first line of a formatted traceback frame
+_FRAME_RE = re.compile(r'  File "(.*)", line \d+')
+
+
+class TracebackAnnotator(object):
+    """
+    Formats tracebacks with each frame labeled with the distribution that
+    owns the frame's file, i.e.::
+
+        File "/venv/.../requests/api.py", line 61, in get [requests 2.24.0]
+
+    Files are mapped to distributions through
+    :py:meth:`~versionfinder.environment.Environment.file_index`, built
+    from the distributions' ``RECORD`` files on first use. After that,
+    annotating a frame is a regular expression match and a dict lookup.
+    Frames that do not belong to an installed distribution (the standard
+    library, or your own uninstalled code) are left as they are.
+    """
+
+    def __init__(self, environment=None):
+        """
+        :param environment: environment to look up files in; defaults to a
+          process-wide shared Environment
+        :type environment: :py:class:`~versionfinder.environment.Environment`
+        """
+        if environment is None:
+            environment = default_environment()
+        self.environment = environment
+        self._labels = {}
+
+    def label(self, filename):
+        """
+        Return the label for a frame's file: `` [name version]``, or
+        `` [name version commit]`` if the distribution was installed from a
+        VCS, or an empty string if no installed distribution owns the file.
+
+        :param filename: path to the file
+        :type filename: str
+        :rtype: str
+        """
+        try:
+            return self._labels[filename]
+        except KeyError:
+            pass
+        dist = self.environment.distribution_for_file(filename)
+        if dist is None:
+            label = ''
+        else:
+            parts = [dist.name, dist.version or 'unknown']
+            if dist.commit is not None:
+                parts.append(dist.commit[:12])
+            label = ' [%s]' % ' '.join(parts)
+        self._labels[filename] = label
+        return label
+
+    def annotate(self, lines):
+        """
+        Annotate the frame lines of a formatted traceback.
+
+        :param lines: formatted traceback, as returned by
+          :py:func:`traceback.format_exception`
+        :type lines: list
+        :return: generator of annotated lines
+        :rtype: generator
+        """
+        for line in lines:
+            m = _FRAME_RE.match(line)
+            if m is not None:
+                label = self.label(m.group(1))
+                if label:
+                    idx = line.find('\n')
+                    if idx == -1:
+                        line += label
+                    else:
+                        line = line[:idx] + label + line[idx:]
+            yield line
+
+    def format_exception(self, etype, value, tb, limit=None, chain=True):
+        """
+        Same as :py:func:`traceback.format_exception`, with annotated frames.
+
+        :rtype: list
+        """
+        return list(self.annotate(
+            traceback.format_exception(etype, value, tb, limit=limit,
+                                       chain=chain)
+        ))
+
+    def format_exc(self, limit=None, chain=True):
+        """
+        Same as :py:func:`traceback.format_exc`, with annotated frames.
+
+        :rtype: str
+        """
+        return ''.join(self.format_exception(*sys.exc_info(), limit=limit,
+                                             chain=chain))
+
+
+class VersionTracebackFormatter(logging.Formatter):
+    """
+    :py:class:`logging.Formatter` that formats exception tracebacks with
+    frames labeled by :py:class:`~.TracebackAnnotator`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Takes the same arguments as :py:class:`logging.Formatter`, plus:
+
+        :param environment: environment to look up files in; defaults to a
+          process-wide shared Environment
+        :type environment: :py:class:`~versionfinder.environment.Environment`
+        """
+        environment = kwargs.pop('environment', None)
+        super(VersionTracebackFormatter, self).__init__(*args, **kwargs)
+        self.annotator = TracebackAnnotator(environment)
+
+    def formatException(self, ei):
+        s = ''.join(self.annotator.format_exception(*ei))
+        if s[-1:] == '\n':
+            s = s[:-1]
+        return s
+
+
+def format_exception(etype, value, tb, limit=None, chain=True):
+    """
+    Same as :py:func:`traceback.format_exception`, with frames labeled by a
+    :py:class:`~.TracebackAnnotator` using the process-wide shared
+    Environment.
+
+    :rtype: list
+    """
+    return TracebackAnnotator().format_exception(
+        etype, value, tb, limit=limit, chain=chain
+    )
@@ -39,78 +39,222 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import sys
 import os
+import time
 import logging
 import inspect
+import threading
 from contextlib import contextmanager
 import warnings
 
-from .versioninfo import VersionInfo
-
-# Note: we catch all exceptions here because of
-# https://github.com/jantman/versionfinder/issues/7 - some pip versions
-# throw an import-time AttributeError when running in Lambda, or other
-# environments where sys.stdin is None. Per that issue, the right thing to
-# do is never fail if pip can't be imported.
-# This was fixed in https://github.com/pypa/pip/pull/7118 / pip 19.3
-try:
-    from pip._internal.operations.freeze import FrozenRequirement
-except Exception:  # nocoverage
-    try:
-        from pip._internal import FrozenRequirement
-    except Exception:
+from .versioninfo import (
+    VersionInfo, LazyVersionInfo, STAGE_COMPLETE, STAGE_FAILED, STAGE_TIMEOUT
+)
+from .environment import default_environment, normalize_name
+
+# pip, pkg_resources and GitPython are comparatively slow to import (pip alone
+# can take a quarter of a second), so they are imported on first use by the
+# _import_* functions below rather than at module import time. This keeps
+# ``import versionfinder`` and the command line interface fast when those
+# backends are not needed.
+# For the same reason, the native git modules (gitrepo, gitobjects, gitgraph
+# and gitindex) are imported within the methods that use them.
+FrozenRequirement = None
+get_installed_distributions = None
+pkg_resources = None
+Repo = None
+
+logger = logging.getLogger(__name__)
+
+warnings.filterwarnings(
+    action="always", category=DeprecationWarning, module=__name__
+)
+
+
+def _import_pip():
+    """
+    Import the pip internals used by :py:meth:`~.VersionFinder._find_pip_info`
+    if they have not already been imported. Import failures are ignored; the
+    names are left as None, and are only used within try blocks.
+    """
+    global FrozenRequirement, get_installed_distributions
+    # Note: we catch all exceptions here because of
+    # https://github.com/jantman/versionfinder/issues/7 - some pip versions
+    # throw an import-time AttributeError when running in Lambda, or other
+    # environments where sys.stdin is None. Per that issue, the right thing to
+    # do is never fail if pip can't be imported.
+    # This was fixed in https://github.com/pypa/pip/pull/7118 / pip 19.3
+    if FrozenRequirement is None:
         try:
-            from pip import FrozenRequirement
-        except Exception:
+            from pip._internal.operations.freeze import FrozenRequirement
+        except Exception:  # nocoverage
+            try:
+                from pip._internal import FrozenRequirement
+            except Exception:
+                try:
+                    from pip import FrozenRequirement
+                except Exception:
+                    # this is used within try blocks; NBD if they fail
+                    pass
+    if get_installed_distributions is None:
+        try:
+            from pip._internal.utils.misc import get_installed_distributions
+        except Exception:  # nocoverage
+            try:
+                from pip._internal import get_installed_distributions
+            except Exception:
+                try:
+                    from pip import get_installed_distributions
+                except Exception:
+                    # this is used within try blocks; NBD if they fail
+                    pass
+
+
+def _import_pkg_resources():
+    """
+    Import ``pkg_resources`` if it has not already been imported. Import
+    failures are ignored; the name is left as None.
+    """
+    global pkg_resources
+    if pkg_resources is None:
+        try:
+            import pkg_resources
+        except ImportError:
             # this is used within try blocks; NBD if they fail
             pass
 
-try:
-    from pip._internal.utils.misc import get_installed_distributions
-except Exception:  # nocoverage
-    try:
-        from pip._internal import get_installed_distributions
-    except Exception:
+
+def _import_git():
+    """
+    Import GitPython's ``Repo`` class if it has not already been imported.
+    Import failures are ignored; the name is left as None.
+    """
+    global Repo
+    if Repo is None:
         try:
-            from pip import get_installed_distributions
-        except Exception:
+            from git import Repo
+        except Exception:  # nocoverage
             # this is used within try blocks; NBD if they fail
             pass
 
-try:
-    import pkg_resources
-except ImportError:
-    # this is used within try blocks; NBD if they fail
-    pass
 
-try:
-    from git import Repo
-except Exception:  # nocoverage
-    # this is used within try blocks; NBD if they fail
-    pass
+def _open_repo(path):
+    """
+    Open a GitPython ``Repo`` for ``path``, which must be the working tree or
+    git directory itself (parent directories are not searched).
 
-logger = logging.getLogger(__name__)
+    :param path: path to open
+    :type path: str
+    :rtype: git.Repo
+    """
+    return Repo(path=path, search_parent_directories=False)
 
-warnings.filterwarnings(
-    action="always", category=DeprecationWarning, module=__name__
-)
+
+#: For each stage of :py:meth:`VersionFinder.find_package_version`, the
+#: :py:class:`~versionfinder.versioninfo.VersionInfo` attributes (including
+#: derived properties) that the stage can contribute to.
+STAGE_FIELDS = {
+    'pip': frozenset([
+        'pip_version', 'pip_url', 'pip_requirement', 'git_str', 'long_str',
+        'long_bytes'
+    ]),
+    'pkg_resources': frozenset([
+        'pkg_resources_version', 'pkg_resources_url', 'version', 'url',
+        'short_str', 'long_str', 'long_bytes'
+    ]),
+    'git': frozenset([
+        'git_tag', 'git_commit', 'git_remotes', 'git_remote', 'git_is_dirty',
+        'git_describe', 'git_distance', 'git_branch', 'git_ahead',
+        'git_behind', 'git_str', 'long_str', 'long_bytes'
+    ]),
+}
+
+#: every field name accepted by the ``fields`` argument of
+#: :py:meth:`VersionFinder.find_package_version`
+FIELDS = frozenset().union(*STAGE_FIELDS.values())
+
+# fields that need the distribution's Home-page URL
+_URL_FIELDS = frozenset([
+    'pkg_resources_url', 'url', 'short_str', 'long_str', 'long_bytes'
+])
+
+
+def _stages_for_fields(fields):
+    """
+    Return the set of stages of :py:meth:`VersionFinder.find_package_version`
+    that can contribute to any of the requested fields.
+
+    :param fields: requested field names, or None for all fields
+    :type fields: iterable
+    :rtype: set
+    :raises: ValueError if any field name is not in :py:data:`~.FIELDS`
+    """
+    if fields is None:
+        return set(STAGE_FIELDS.keys())
+    fields = set(fields)
+    unknown = fields - FIELDS
+    if unknown:
+        raise ValueError(
+            'Unknown VersionInfo field(s): %s' % ', '.join(sorted(unknown))
+        )
+    return set(k for k, v in STAGE_FIELDS.items() if v & fields)
+
+
+# prefix of the VersionInfo constructor arguments set by each stage
+_STAGE_PREFIXES = {
+    'pip': 'pip_',
+    'pkg_resources': 'pkg_resources_',
+    'git': 'git_',
+}
+
+
+def _select_fields(info, fields):
+    """
+    Return ``info`` with the values of the stages that cannot contribute to
+    ``fields`` set to None, i.e. the shape
+    :py:meth:`VersionFinder.find_package_version` would return for them.
+
+    :param info: version information found elsewhere (i.e. in a manifest)
+    :type info: :py:class:`~versionfinder.versioninfo.VersionInfo`
+    :param fields: requested field names, or None for all fields
+    :type fields: iterable
+    :rtype: :py:class:`~versionfinder.versioninfo.VersionInfo`
+    :raises: ValueError if any field name is not in :py:data:`~.FIELDS`
+    """
+    if fields is None:
+        return info
+    prefixes = tuple(_STAGE_PREFIXES[s] for s in _stages_for_fields(fields))
+    return info.replace(**dict(
+        (k, None) for k in info.as_dict if not k.startswith(prefixes)
+    ))
 
 
 class VersionFinder(object):
 
-    def __init__(self, package_name, package_file=None, log=False,
-                 caller_frame=None):
+    def __init__(self, package_name=None, package_file=None, log=False,
+                 caller_frame=None, environment=None, distribution=None):
         """
         Initialize a VersionFinder to find version information of the named
         package, which includes a given file. ``package_file`` must be a Python
         file in the package; if not specified, the file calling this class
         will be used.
 
+        ``package_name`` may also be an import name, such as ``__name__``;
+        if no distribution is installed under that name, the distribution
+        providing it is found with
+        :py:meth:`~versionfinder.environment.Environment.distributions_for_import`.
+        If ``package_name`` is not specified, or that also fails, the
+        distribution is identified by the file instead, using the
+        :py:meth:`~versionfinder.environment.Environment.distribution_for_file`
+        index of the installed distributions' ``RECORD`` files and editable
+        source directories.
+
         VersionFinder logs rather verbosely to ``logging.debug()`` if ``log``
         is True. To simplify use as a library, unless you set ``log`` to True,
         versionfinder's logger will be set to a level of ``logging.CRITICAL``,
         suppressing all log messages. This will also silence the ``pip`` logger.
 
-        :param package_name: name of the package to find information about
+        :param package_name: name of the package to find information about;
+          if not specified, the distribution that owns ``package_file`` is used
         :type package_name: str
         :param package_file: absolute path to a Python source file in the
           package to find information about; if not specified, the file calling
@@ -127,6 +271,19 @@ class VersionFinder(object):
           Not used if ``package_file`` is specified. See
           :py:func:`versionfinder.find_version` for an example.
         :type caller_frame: frame
+        :param environment: Optional shared scan of the installed
+          distributions. If specified, pip's list of installed distributions
+          is computed once per Environment rather than once per
+          VersionFinder, and the directory of the distribution found in the
+          scan is also checked for a git clone, and each git clone is
+          inspected once per Environment. Used when finding the versions of
+          many packages at once.
+        :type environment: :py:class:`~versionfinder.environment.Environment`
+        :param distribution: Optional already-located distribution for the
+          package; its directory is also checked for a git clone, and it is
+          used instead of looking up the distribution that owns
+          ``package_file``.
+        :type distribution: :py:class:`~versionfinder.environment.Distribution`
         """
         if not log:
             logger.setLevel(logging.CRITICAL)
@@ -148,6 +305,9 @@ class VersionFinder(object):
             logger.debug("Found package_file as: %s", self.package_file)
         self.package_dir = os.path.dirname(self.package_file)
         logger.debug('package_dir: %s' % self.package_dir)
+        self._environment = environment
+        self.distribution = distribution
+        self._file_dist = None
         self._pip_locations = []
         self._pkg_resources_locations = []
         if (
@@ -162,7 +322,8 @@ class VersionFinder(object):
                 DeprecationWarning
             )
 
-    def find_package_version(self):
+    def find_package_version(self, fields=None, lazy_git=False,
+                             concurrent=False, timeout=None):
         """
         Find the installed version of the specified package, and as much
         information about it as possible (source URL, git ref or tag, etc.)
@@ -178,14 +339,48 @@ class VersionFinder(object):
         process _iff_ a modified version is installed from an editable git URL
         _and_ all changes are pushed up to the publicly-visible origin.
 
+        If ``fields`` is specified, only the stages (pip, pkg_resources, git)
+        that can contribute to those :py:class:`~.VersionInfo` attributes are
+        run, and the other attributes of the result are None. In that case,
+        the pkg_resources information is read directly from the
+        distribution's metadata directory (with the version taken from its
+        name, per
+        :py:attr:`~versionfinder.environment.Distribution.version`) instead
+        of importing pkg_resources, so ``fields={'version'}`` usually needs
+        only a directory listing.
+
         Returns a dict with keys 'version', 'tag', 'commit', and 'url'.
         Values are strings or None.
 
-        :param package_name: name of the package to find information for
-        :type package_name: str
+        :param fields: names of the VersionInfo attributes the caller needs,
+          from :py:data:`~.FIELDS` (i.e. ``{'version'}`` or
+          ``{'git_commit'}``); None (the default) for all of them
+        :type fields: iterable
+        :param lazy_git: if True, do not inspect the git clone (if any) now;
+          instead return a :py:class:`~.LazyVersionInfo` that does so the
+          first time one of its git fields is accessed
+        :type lazy_git: bool
+        :param concurrent: if True, run the pip, pkg_resources and git stages
+          concurrently in worker threads, so the call takes roughly as long
+          as the slowest stage rather than the sum of them. Git inspection
+          starts on the package's own directory straight away; the
+          additional locations discovered by pip and pkg_resources are only
+          checked afterwards, and only if no git clone was found there.
+        :type concurrent: bool
+        :param timeout: if not None, the maximum number of seconds to wait
+          for the stages, which are then run concurrently (as with
+          ``concurrent``) in daemon threads. When the time is up, the result
+          has the fields of the stages that have finished; stages that have
+          not are left running in the background (a thread blocked on a
+          hung filesystem cannot be interrupted) and their results are
+          discarded. See :py:attr:`~.VersionInfo.stage_status`.
+        :type timeout: float
         :returns: information about the installed version of the package
         :rtype: :py:class:`~versionfinder.versioninfo.VersionInfo`
+        :raises: ValueError if ``fields`` contains an unknown name
         """
+        stages = _stages_for_fields(fields)
+        logger.debug('Running stages: %s', sorted(stages))
         res = {
             'pip_version': None,
             'pip_url': None,
@@ -195,46 +390,259 @@ class VersionFinder(object):
             'git_tag': None,
             'git_commit': None,
             'git_remotes': None,
-            'git_is_dirty': None
+            'git_is_dirty': None,
+            'git_describe': None,
+            'git_distance': None,
+            'git_branch': None,
+            'git_ahead': None,
+            'git_behind': None
         }
+        if 'git' in stages and lazy_git:
+            stages.discard('git')
+            for k in list(res.keys()):
+                if k.startswith('git_'):
+                    del res[k]
+        else:
+            lazy_git = False
+        if timeout is not None or (concurrent and len(stages) > 1):
+            status = self._run_concurrently(stages, fields, res, timeout)
+        else:
+            status = {}
+            for name, func, args in self._stage_calls(stages, fields):
+                status[name] = self._run_stage(name, func, args, res)
+        if lazy_git:
+            logger.debug("Final package info (git deferred): %s", res)
+            return LazyVersionInfo(
+                self._git_version_info, stage_status=status, **res
+            )
+        logger.debug("Final package info: %s (stages: %s)", res, status)
+        return VersionInfo(stage_status=status, **res)
+
+    def _stage_calls(self, stages, fields):
+        """
+        Return the stage functions to call for the given stages.
+
+        :param stages: names of the stages to run
+        :type stages: set
+        :param fields: requested fields, as passed to
+          :py:meth:`~.find_package_version`
+        :type fields: iterable
+        :returns: list of (stage name, function, args) 3-tuples, in the
+          order the stages run in sequentially
+        :rtype: list
+        """
+        calls = []
+        if 'pip' in stages:
+            calls.append(('pip', self._pip_stage, ()))
+        if 'pkg_resources' in stages:
+            calls.append(('pkg_resources', self._pkg_stage, (fields, )))
+        if 'git' in stages:
+            calls.append(('git', self._git_version_info, ()))
+        return calls
+
+    def _run_stage(self, name, func, args, res):
+        """
+        Call one stage's function, never raising, and update ``res`` with its
+        results.
+
+        :param name: stage name
+        :type name: str
+        :param func: stage function, returning ``VersionInfo`` constructor
+          arguments
+        :type func: callable
+        :param args: positional arguments for ``func``
+        :type args: tuple
+        :param res: dict to update with the stage's results
+        :type res: dict
+        :returns: the stage status, :py:data:`~.STAGE_COMPLETE` or
+          :py:data:`~.STAGE_FAILED`
+        :rtype: str
+        """
         try:
-            pip_info = self._find_pip_info()
+            stage_res = func(*args)
         except Exception:
             # we NEVER want this to crash the program
-            logger.debug(
-                'Caught exception running _find_pip_info()',
-                exc_info=True
-            )
-            pip_info = {}
+            logger.debug('Caught exception running %s stage', name,
+                         exc_info=True)
+            return STAGE_FAILED
+        res.update(stage_res)
+        return STAGE_COMPLETE
+
+    def _run_concurrently(self, stages, fields, res, timeout=None):
+        """
+        Run the given stages in daemon threads and update ``res`` with the
+        results of those that finish within ``timeout`` seconds. Git
+        inspection starts on the directories known before the metadata
+        lookups (the package's own directory and any already-located
+        distribution); once the other stages have finished, any additional
+        locations they discovered are checked for a git clone only if none
+        was found.
+
+        :param stages: names of the stages to run
+        :type stages: set
+        :param fields: requested fields, as passed to
+          :py:meth:`~.find_package_version`
+        :type fields: iterable
+        :param res: dict to update with ``VersionInfo`` constructor arguments
+        :type res: dict
+        :param timeout: seconds to wait for the stages, or None to wait for
+          them to finish
+        :type timeout: float
+        :returns: dict of stage name to stage status
+        :rtype: dict
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        threads = []
+        for name, func, args in self._stage_calls(stages, fields):
+            if name == 'git':
+                func = self._git_stage
+                args = (list(threads), )
+            t = _StageThread(self, name, func, args)
+            t.start()
+            threads.append(t)
+        status = {}
+        for t in threads:
+            if deadline is None:
+                t.join()
+            else:
+                t.join(max(0, deadline - time.monotonic()))
+            # read once; the thread may finish after join() returns
+            result = t.result
+            if result is None:
+                logger.debug('%s stage did not finish within %s seconds',
+                             t.stage, timeout)
+                status[t.stage] = STAGE_TIMEOUT
+                continue
+            status[t.stage], stage_res = result
+            res.update(stage_res)
+        return status
+
+    def _git_stage(self, metadata_threads):
+        """
+        Git stage of :py:meth:`~._run_concurrently`: inspect the directories
+        known now, and if no git clone is found there, wait for the metadata
+        stages and check any additional locations they discovered.
+
+        :param metadata_threads: the pip and pkg_resources stage threads
+        :type metadata_threads: list
+        :returns: ``git_*`` VersionInfo constructor arguments
+        :rtype: dict
+        """
+        early_dirs = self._package_top_dir
+        res = self._git_version_info(early_dirs)
+        if res:
+            return res
+        for t in metadata_threads:
+            t.join()
+        late_dirs = [d for d in self._package_top_dir if d not in early_dirs]
+        if late_dirs:
+            logger.debug('Checking additional locations for a git clone: %s',
+                         late_dirs)
+            res = self._git_version_info(late_dirs)
+        return res
+
+    def _pip_stage(self):
+        """
+        Run :py:meth:`~._find_pip_info`.
+
+        :returns: ``pip_*`` VersionInfo constructor arguments
+        :rtype: dict
+        """
+        pip_info = self._find_pip_info()
         logger.debug("pip info: %s", pip_info)
+        res = {}
         for k, v in pip_info.items():
             if v is not None:
                 res['pip_' + k] = v
-        try:
+        return res
+
+    def _pkg_stage(self, fields=None):
+        """
+        Find the pkg_resources information: from the metadata directory via
+        :py:meth:`~._find_env_info` if only some ``fields`` are wanted, or
+        else (or if that fails) via :py:meth:`~._find_pkg_info`.
+
+        :param fields: requested fields, as passed to
+          :py:meth:`~.find_package_version`
+        :type fields: iterable
+        :returns: ``pkg_resources_*`` VersionInfo constructor arguments
+        :rtype: dict
+        """
+        pkg_info = None
+        if fields is not None:
+            try:
+                pkg_info = self._find_env_info(
+                    bool(_URL_FIELDS & set(fields))
+                )
+            except Exception:
+                logger.debug('Caught exception running _find_env_info()',
+                             exc_info=True)
+        if pkg_info is None:
             pkg_info = self._find_pkg_info()
-        except Exception:
-            logger.debug('Caught exception running _find_pkg_info()')
-            pkg_info = {}
         logger.debug("pkg_resources info: %s", pkg_info)
+        res = {}
         for k, v in pkg_info.items():
             res['pkg_resources_' + k] = v
-        gitdir = self._git_repo_path
-        if gitdir is not None:
-            git_info = self._find_git_info(gitdir)
-            logger.debug("Git info: %s", git_info)
-            for k, v in git_info.items():
-                if k == 'dirty':
-                    res['git_is_dirty'] = v
-                elif k == 'commit':
-                    res['git_commit'] = v
-                elif k == 'remotes':
-                    res['git_remotes'] = v
-                elif k == 'tag':
-                    res['git_tag'] = v
+        return res
+
+    def _git_version_info(self, dirs=None):
+        """
+        If the package is in a git clone, find information about it and
+        return it as :py:class:`~versionfinder.versioninfo.VersionInfo`
+        constructor arguments.
+
+        :param dirs: directories to look for the git clone in; defaults to
+          :py:attr:`~._package_top_dir`
+        :type dirs: list
+        :returns: ``git_*`` VersionInfo constructor arguments; empty if the
+          package is not in a git clone
+        :rtype: dict
+        """
+        res = {}
+        if dirs is None:
+            gitdir = self._git_repo_path
         else:
+            gitdir = self._find_git_dir(dirs)
+        if gitdir is None:
             logger.debug("Install does not appear to be a git clone")
-        logger.debug("Final package info: %s", res)
-        return VersionInfo(**res)
+            return res
+        git_info = self._shared_git_info(gitdir)
+        logger.debug("Git info: %s", git_info)
+        for k, v in git_info.items():
+            if k == 'dirty':
+                res['git_is_dirty'] = v
+            elif k == 'commit':
+                res['git_commit'] = v
+            elif k == 'remotes':
+                res['git_remotes'] = v
+            elif k == 'tag':
+                res['git_tag'] = v
+            elif k == 'describe':
+                res['git_describe'] = v
+            elif k in ('distance', 'branch', 'ahead', 'behind'):
+                res['git_' + k] = v
+        return res
+
+    def _shared_git_info(self, gitdir):
+        """
+        Return :py:meth:`~._find_git_info` for ``gitdir``. When this
+        VersionFinder shares an
+        :py:class:`~versionfinder.environment.Environment`, each git
+        repository (by the real path of its git directory) is inspected once
+        for the Environment, and the result is shared by every package in
+        it.
+
+        :param gitdir: path to the git repo's .git directory
+        :type gitdir: str
+        :returns: information about the git clone
+        :rtype: dict
+        """
+        if self._environment is None:
+            return self._find_git_info(gitdir)
+        return dict(self._environment.memoize(
+            'git_info:%s' % os.path.realpath(gitdir),
+            lambda: self._find_git_info(gitdir)
+        ))
 
     @property
     def _git_repo_path(self):
@@ -245,10 +653,24 @@ class VersionFinder(object):
         :rtype: str
         :returns: path to git repo, or None
         """
-        logger.debug('Checking for git directory in: %s', self._package_top_dir)
-        for p in self._package_top_dir:
-            gitdir = os.path.join(p, '.git')
-            if os.path.exists(gitdir):
+        return self._find_git_dir(self._package_top_dir)
+
+    def _find_git_dir(self, dirs):
+        """
+        Return the path to the git directory of the clone containing the
+        first of ``dirs`` that is in one, or None. See
+        :py:func:`~versionfinder.gitrepo.find_git_dir`.
+
+        :param dirs: directories to check
+        :type dirs: list
+        :rtype: str
+        :returns: path to git repo, or None
+        """
+        from .gitrepo import find_git_dir
+        logger.debug('Checking for git directory in: %s', dirs)
+        for p in dirs:
+            gitdir = find_git_dir(p)
+            if gitdir is not None:
                 logger.debug('_is_git_clone() true based on %s' % gitdir)
                 return gitdir
         logger.debug('_is_git_clone() false')
@@ -261,11 +683,52 @@ class VersionFinder(object):
         :returns: information from pkg_resources about ``self.package_name``
         :rtype: dict
         """
-        dist = pkg_resources.require(self.package_name)[0]
+        _import_pkg_resources()
+        exc = None
+        for name in self._candidate_names():
+            try:
+                dist = pkg_resources.require(name)[0]
+                break
+            except Exception as ex:
+                exc = ex
+        else:
+            if exc is not None:
+                raise exc
+            logger.debug('no distribution name to look up')
+            return {}
         self._pkg_resources_locations = [dist.location]
         ver, url = self._dist_version_url(dist)
         return {'version': ver, 'url': url}
 
+    def _find_env_info(self, url=True):
+        """
+        Find the version (and optionally Home-page URL) of the installed
+        package directly from its metadata directory, via the
+        :py:class:`~versionfinder.environment.Environment`, without importing
+        pkg_resources. This returns the same information as
+        :py:meth:`~._find_pkg_info`.
+
+        :param url: whether to also find the URL, which requires reading the
+          distribution's metadata file
+        :type url: bool
+        :returns: version information, or None if the distribution was not
+          found
+        :rtype: dict
+        """
+        env = self._lookup_environment()
+        for name in self._candidate_names():
+            dist = env.get_distribution(name)
+            if dist is not None:
+                break
+        else:
+            logger.debug('no distribution found in environment')
+            return None
+        self._pkg_resources_locations = [dist.location]
+        res = {'version': dist.version}
+        if url:
+            res['url'] = dist.home_page
+        return res
+
     def _find_pip_info(self):
         """
         Try to find information about the installed package from pip.
@@ -274,13 +737,17 @@ class VersionFinder(object):
         :returns: information from pip about ``self.package_name``.
         :rtype: dict
         """
+        _import_pip()
         res = {}
         dist = None
-        dist_name = self.package_name.replace('_', '-')
-        logger.debug('Checking for pip distribution named: %s', dist_name)
-        for d in get_installed_distributions():
-            if d.project_name == dist_name:
-                dist = d
+        for name in self._candidate_names():
+            dist_name = name.replace('_', '-')
+            logger.debug('Checking for pip distribution named: %s', dist_name)
+            for d in self._installed_distributions():
+                if d.project_name == dist_name:
+                    dist = d
+            if dist is not None:
+                break
         if dist is None:
             logger.debug('could not find dist matching package_name')
             return res
@@ -298,6 +765,88 @@ class VersionFinder(object):
         res['requirement'] = str(req.req)
         return res
 
+    def _file_distribution(self):
+        """
+        Return the distribution that owns ``self.package_file`` (or the
+        ``distribution`` passed to the constructor), or None. The lookup uses
+        the Environment passed to the constructor, or else the process-wide
+        :py:func:`~versionfinder.environment.default_environment`, and is
+        only done once.
+
+        :rtype: :py:class:`~versionfinder.environment.Distribution` or
+          :py:data:`None`
+        """
+        if self.distribution is not None:
+            return self.distribution
+        if self._file_dist is None:
+            dist = self._lookup_environment().distribution_for_file(
+                self.package_file
+            )
+            logger.debug('Distribution owning %s: %s', self.package_file, dist)
+            self._file_dist = (dist, )
+        return self._file_dist[0]
+
+    def _lookup_environment(self):
+        """
+        Return the Environment to look up files and import names in: the one
+        passed to the constructor, or else the process-wide
+        :py:func:`~versionfinder.environment.default_environment`.
+
+        :rtype: :py:class:`~versionfinder.environment.Environment`
+        """
+        if self._environment is not None:
+            return self._environment
+        return default_environment()
+
+    def _candidate_names(self):
+        """
+        Generate the distribution names to look the package up by, in order,
+        each only computed if the caller continues (i.e. because no
+        distribution by the previous name was found):
+
+        * ``self.package_name``
+        * the distribution providing ``self.package_name`` as an import name
+          (i.e. ``PyYAML`` for ``yaml``, or ``google-cloud-storage`` for
+          ``google.cloud.storage``), if exactly one does
+        * the distribution that owns ``self.package_file``
+
+        Names already generated are skipped.
+
+        :return: generator of distribution names
+        :rtype: generator
+        """
+        seen = set()
+        if self.package_name is not None:
+            seen.add(normalize_name(self.package_name))
+            yield self.package_name
+            dists = self._lookup_environment().distributions_for_import(
+                self.package_name
+            )
+            if len(dists) == 1 and normalize_name(dists[0].name) not in seen:
+                logger.debug('Distribution providing import name %s: %s',
+                             self.package_name, dists[0])
+                seen.add(normalize_name(dists[0].name))
+                yield dists[0].name
+        dist = self._file_distribution()
+        if dist is not None and normalize_name(dist.name) not in seen:
+            yield dist.name
+
+    def _installed_distributions(self):
+        """
+        Return pip's list of installed distributions. When this VersionFinder
+        shares an :py:class:`~versionfinder.environment.Environment`, the
+        list is computed once for the Environment.
+
+        :returns: installed distributions
+        :rtype: list
+        """
+        if self._environment is None:
+            return get_installed_distributions()
+        return self._environment.memoize(
+            'pip_distributions',
+            lambda: list(get_installed_distributions())
+        )
+
     def _dist_version_url(self, dist):
         """
         Get version and homepage for a pkg_resources.Distribution
@@ -321,31 +870,130 @@ class VersionFinder(object):
         """
         Find information about the git repository, if this file is in a clone.
 
+        This uses GitPython if it is installed, or else (or if the
+        ``VERSIONFINDER_GIT_BACKEND`` environment variable is set to ``cli``)
+        runs the ``git`` binary via
+        :py:func:`~versionfinder.gitrepo.git_cli_info`. If the ``git``
+        binary cannot be run either, the clone is read without git by
+        :py:func:`~versionfinder.gitrepo.native_git_info`.
+
         :param gitdir: path to the git repo's .git directory
         :type gitdir: str
         :returns: information about the git clone
         :rtype: dict
         """
-        res = {'remotes': None, 'tag': None, 'commit': None, 'dirty': None}
+        res = {
+            'remotes': None, 'tag': None, 'commit': None, 'dirty': None,
+            'describe': None, 'distance': None, 'branch': None, 'ahead': None,
+            'behind': None
+        }
+        from .gitrepo import (
+            repo_path, pooled_repo, git_cli_info, native_git_info
+        )
+        from .gitobjects import tags_at
+        _import_git()
+        if Repo is None or os.environ.get('VERSIONFINDER_GIT_BACKEND') == 'cli':
+            try:
+                res.update(git_cli_info(gitdir))
+            except OSError:
+                logger.debug('Cannot run git; reading the clone natively',
+                             exc_info=True)
+                try:
+                    res.update(native_git_info(gitdir))
+                except Exception:
+                    logger.debug('Exception reading git clone natively',
+                                 exc_info=True)
+            except Exception:
+                logger.debug('Exception running git', exc_info=True)
+            self._describe(gitdir, res)
+            self._tracking(gitdir, res)
+            return res
         try:
-            logger.debug('opening %s as git.Repo', gitdir)
-            repo = Repo(path=gitdir, search_parent_directories=False)
-            res['commit'] = repo.head.commit.hexsha
-            res['dirty'] = repo.is_dirty(untracked_files=True)
-            res['remotes'] = {}
-            for rmt in repo.remotes:
-                # each is a git.Remote
-                urls = [u for u in rmt.urls]  # generator
-                if len(urls) > 0:
-                    res['remotes'][rmt.name] = urls[0]
-            for tag in repo.tags:
-                # each is a git.Tag object
-                if tag.commit.hexsha == res['commit']:
-                    res['tag'] = tag.name
+            with pooled_repo(repo_path(gitdir), _open_repo) as repo:
+                res['commit'] = repo.head.commit.hexsha
+                res['dirty'] = repo.is_dirty(untracked_files=True)
+                res['remotes'] = {}
+                for rmt in repo.remotes:
+                    # each is a git.Remote
+                    urls = [u for u in rmt.urls]  # generator
+                    if len(urls) > 0:
+                        res['remotes'][rmt.name] = urls[0]
+                try:
+                    # much faster than peeling every tag through GitPython
+                    tags = tags_at(gitdir, res['commit'])
+                    res['tag'] = tags[-1] if tags else None
+                except Exception:
+                    logger.debug('Cannot find tags natively', exc_info=True)
+                    for tag in repo.tags:
+                        # each is a git.Tag object
+                        if tag.commit.hexsha == res['commit']:
+                            res['tag'] = tag.name
         except Exception:
             logger.debug('Exception getting git information', exc_info=True)
+        self._describe(gitdir, res)
+        self._tracking(gitdir, res)
         return res
 
+    def _describe(self, gitdir, res):
+        """
+        Set the ``describe`` and ``distance`` items of a
+        :py:meth:`~._find_git_info` result from the nearest tag reachable
+        from its ``commit``, found with
+        :py:func:`~versionfinder.gitgraph.describe`.
+
+        :param gitdir: path to the git repo's .git directory
+        :type gitdir: str
+        :param res: :py:meth:`~._find_git_info` result to update
+        :type res: dict
+        """
+        from .gitgraph import describe, describe_string
+        if res['commit'] is None:
+            return
+        try:
+            found = describe(gitdir, res['commit'])
+        except Exception:
+            logger.debug('Exception describing git commit', exc_info=True)
+            return
+        if found is not None:
+            res['describe'] = describe_string(found[0], found[1],
+                                              res['commit'])
+            res['distance'] = found[1]
+
+    def _tracking(self, gitdir, res):
+        """
+        Set the ``branch``, ``ahead`` and ``behind`` items of a
+        :py:meth:`~._find_git_info` result: the checked out branch, and how
+        many commits its ``commit`` is ahead of and behind the branch's
+        upstream, found from the local refs (without any network access)
+        with :py:func:`~versionfinder.gitgraph.ahead_behind`.
+
+        :param gitdir: path to the git repo's .git directory
+        :type gitdir: str
+        :param res: :py:meth:`~._find_git_info` result to update
+        :type res: dict
+        """
+        from .gitobjects import symbolic_ref, resolve_ref, upstream_ref
+        from .gitgraph import ahead_behind
+        try:
+            ref = symbolic_ref(gitdir)
+            if ref is None or not ref.startswith('refs/heads/'):
+                return
+            res['branch'] = ref[len('refs/heads/'):]
+            if res['commit'] is None:
+                return
+            upstream = upstream_ref(gitdir, res['branch'])
+            if upstream is None:
+                return
+            upstream_commit = resolve_ref(gitdir, upstream)
+            if upstream_commit is None:
+                return
+            res['ahead'], res['behind'] = ahead_behind(
+                gitdir, res['commit'], upstream_commit
+            )
+        except Exception:
+            logger.debug('Exception comparing git branch with its upstream',
+                         exc_info=True)
+
     @property
     def _package_top_dir(self):
         """
@@ -362,9 +1010,57 @@ class VersionFinder(object):
         for l in self._pkg_resources_locations:
             if l is not None:
                 r.append(l)
+        dist = self.distribution
+        if (
+            dist is None and self._environment is not None and
+            self.package_name is not None
+        ):
+            dist = self._environment.get_distribution(self.package_name)
+        if dist is not None:
+            r.append(dist.package_dir)
+        if self._file_dist is not None and self._file_dist[0] is not None:
+            r.append(self._file_dist[0].package_dir)
         return sorted(list(set(r)))
 
 
+class _StageThread(threading.Thread):
+    """
+    Daemon thread running one stage of
+    :py:meth:`~.VersionFinder.find_package_version` via
+    :py:meth:`~.VersionFinder._run_stage`. It is a daemon so that a stage
+    blocked on a hung filesystem does not keep the process from exiting.
+    """
+
+    def __init__(self, finder, stage, func, args):
+        """
+        :param finder: the VersionFinder running the stage
+        :type finder: :py:class:`~.VersionFinder`
+        :param stage: stage name
+        :type stage: str
+        :param func: stage function
+        :type func: callable
+        :param args: positional arguments for ``func``
+        :type args: tuple
+        """
+        super(_StageThread, self).__init__(
+            name='versionfinder-%s' % stage
+        )
+        self.daemon = True
+        self.stage = stage
+        self._finder = finder
+        self._func = func
+        self._args = args
+        #: (status, results) 2-tuple once the stage has finished
+        self.result = None
+
+    def run(self):
+        res = {}
+        status = self._finder._run_stage(
+            self.stage, self._func, self._args, res
+        )
+        self.result = (status, res)
+
+
 @contextmanager
 def chdir(path):
     old_dir = os.getcwd()
@@ -37,17 +37,104 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
+import sys
+import json
+import struct
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# marker for memoized values that have not been computed yet
+_UNSET = object()
+
+# str.translate() table that removes ASCII control characters
+_CONTROL_CHARS = dict.fromkeys(list(range(32)) + [127])
+
+#: :py:attr:`~.VersionInfo.stage_status` value for a stage that ran to
+#: completion.
+STAGE_COMPLETE = 'complete'
+
+#: :py:attr:`~.VersionInfo.stage_status` value for a stage that raised an
+#: exception.
+STAGE_FAILED = 'failed'
+
+#: :py:attr:`~.VersionInfo.stage_status` value for a stage that had not
+#: finished when the ``timeout`` expired.
+STAGE_TIMEOUT = 'timeout'
+
+# VersionInfo field name prefix to the name of the stage that finds it
+_FIELD_STAGES = (
+    ('pip_', 'pip'), ('pkg_resources_', 'pkg_resources'), ('git_', 'git')
+)
+
+#: Version of the :py:meth:`~.VersionInfo.to_bytes` encoding.
+BINARY_VERSION = 2
+
+# str fields, in the positional order used by the binary encoding
+_STR_FIELDS = (
+    'pip_version', 'pip_url', 'pip_requirement', 'pkg_resources_version',
+    'pkg_resources_url', 'git_tag', 'git_commit', 'git_describe', 'git_branch'
+)
+
+# int fields, in the order used by the binary encoding
+_INT_FIELDS = ('git_distance', 'git_ahead', 'git_behind')
+
+# all constructor fields
+_FIELD_NAMES = frozenset(
+    _STR_FIELDS + _INT_FIELDS + ('git_remotes', 'git_is_dirty')
+)
+
+# binary encoding: header of format version, presence flags, dirty state
+_BIN_HEADER = struct.Struct('<BHB')
+_BIN_LEN = struct.Struct('<H')
+_BIN_INT = struct.Struct('<I')
+# presence flag for git_remotes; bits 0-8 are the _STR_FIELDS, followed by
+# the _INT_FIELDS
+_BIN_REMOTES = 1 << 15
+# git_is_dirty None/False/True <-> byte value
+_BIN_DIRTY = {None: 0, False: 1, True: 2}
+_BIN_DIRTY_VALUES = (None, False, True)
+
+
+def _intern(s):
+    """
+    Return the interned copy of ``s`` if it is a str, otherwise ``s``. Many
+    VersionInfo objects in one process share the same URLs, remote names and
+    versions; interning stores each distinct string once.
+    """
+    if type(s) is str:
+        return sys.intern(s)
+    return s
+
 
 class VersionInfo(object):
     """
     Class describing :py:class:`~.VersionFinder` result; the discovered
     information about the version and source of an installed package.
+
+    VersionInfo objects are immutable and hashable value objects; use
+    :py:meth:`~.replace` to get a copy with some fields changed. The derived
+    strings (:py:attr:`~.git_remote`, :py:attr:`~.git_str`,
+    :py:attr:`~.short_str`, :py:attr:`~.long_str` and
+    :py:attr:`~.long_bytes`) are computed on first access and cached.
     """
 
+    __slots__ = (
+        '_pip_version', '_pip_url', '_pip_requirement',
+        '_pkg_resources_version', '_pkg_resources_url', '_git_tag',
+        '_git_commit', '_git_remotes', '_git_is_dirty', '_git_describe',
+        '_git_distance', '_git_branch', '_git_ahead', '_git_behind', '_hash',
+        '_git_remote', '_git_str', '_short_str', '_long_str', '_long_bytes',
+        '_stage_status'
+    )
+
     def __init__(self, pip_version=None, pip_url=None, pip_requirement=None,
                  pkg_resources_version=None, pkg_resources_url=None,
                  git_tag=None, git_commit=None, git_remotes=None,
-                 git_is_dirty=None):
+                 git_is_dirty=None, git_describe=None, git_distance=None,
+                 git_branch=None, git_ahead=None, git_behind=None,
+                 stage_status=None):
         """
         Construct a new VersionInfo object containing the specified version
         information.
@@ -74,19 +161,66 @@ class VersionInfo(object):
           a dict of name to URL pairs for each git remote
         :type git_remotes: dict
         :param git_is_dirty: if the package source has a git repository on disk,
-          whether or not that repository has uncommitted changes or is behind
-          origin.
+          whether or not that repository has uncommitted changes or untracked
+          files
         :type git_is_dirty: bool
-        """
-        self._pip_version = pip_version
-        self._pip_url = pip_url
-        self._pip_requirement = pip_requirement
-        self._pkg_resources_version = pkg_resources_version
-        self._pkg_resources_url = pkg_resources_url
-        self._git_tag = git_tag
-        self._git_commit = git_commit
-        self._git_remotes = git_remotes
-        self._git_is_dirty = git_is_dirty
+        :param git_describe: if the package source has a git repository on
+          disk and a tag is reachable from its current commit, the
+          ``git describe --tags`` style description of the commit
+        :type git_describe: str
+        :param git_distance: if the package source has a git repository on
+          disk and a tag is reachable from its current commit, the number of
+          commits since the nearest tag, as ``git rev-list --count`` counts
+          them
+        :type git_distance: int
+        :param git_branch: if the package source has a git repository on disk
+          with a branch checked out, the name of the branch
+        :type git_branch: str
+        :param git_ahead: if the checked out branch has an upstream, the
+          number of commits on the branch that are not on the upstream
+        :type git_ahead: int
+        :param git_behind: if the checked out branch has an upstream, the
+          number of commits on the upstream that are not on the branch
+        :type git_behind: int
+        :param stage_status: how each stage of the lookup that produced this
+          object ended; see :py:attr:`~.stage_status`
+        :type stage_status: dict
+        """
+        if git_remotes is not None:
+            git_remotes = {
+                _intern(k): _intern(v) for k, v in git_remotes.items()
+            }
+        setattr_ = object.__setattr__
+        setattr_(self, '_pip_version', _intern(pip_version))
+        setattr_(self, '_pip_url', _intern(pip_url))
+        setattr_(self, '_pip_requirement', _intern(pip_requirement))
+        setattr_(self, '_pkg_resources_version',
+                 _intern(pkg_resources_version))
+        setattr_(self, '_pkg_resources_url', _intern(pkg_resources_url))
+        setattr_(self, '_git_tag', _intern(git_tag))
+        setattr_(self, '_git_commit', _intern(git_commit))
+        setattr_(self, '_git_remotes', git_remotes)
+        setattr_(self, '_git_is_dirty', git_is_dirty)
+        setattr_(self, '_git_describe', _intern(git_describe))
+        setattr_(self, '_git_distance', git_distance)
+        setattr_(self, '_git_branch', _intern(git_branch))
+        setattr_(self, '_git_ahead', git_ahead)
+        setattr_(self, '_git_behind', git_behind)
+        setattr_(self, '_hash', None)
+        setattr_(self, '_git_remote', _UNSET)
+        setattr_(self, '_git_str', _UNSET)
+        setattr_(self, '_short_str', _UNSET)
+        setattr_(self, '_long_str', _UNSET)
+        setattr_(self, '_long_bytes', _UNSET)
+        if stage_status is not None:
+            stage_status = dict(stage_status)
+        setattr_(self, '_stage_status', stage_status)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('VersionInfo objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('VersionInfo objects are immutable')
 
     @property
     def version(self):
@@ -202,7 +336,9 @@ class VersionInfo(object):
         :return: dict of git remotes, name (str) to first URL (str)
         :rtype: :py:obj:`dict` or :py:data:`None`
         """
-        return self._git_remotes
+        if self._git_remotes is None:
+            return None
+        return dict(self._git_remotes)
 
     @property
     def git_remote(self):
@@ -212,6 +348,18 @@ class VersionInfo(object):
         URL of the lexicographically-first remote, or else None.
 
         :return: origin or first remote URL
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        v = self._git_remote
+        if v is _UNSET:
+            v = self._make_git_remote()
+            object.__setattr__(self, '_git_remote', v)
+        return v
+
+    def _make_git_remote(self):
+        """
+        Compute the value of :py:attr:`~.git_remote`.
+
         :rtype: :py:obj:`str` or :py:data:`None`
         """
         if self._git_remotes is None or len(self._git_remotes) < 1:
@@ -236,6 +384,74 @@ class VersionInfo(object):
         """
         return self._git_is_dirty
 
+    @property
+    def git_describe(self):
+        """
+        If the distribution is installed via git and a tag is reachable from
+        the current commit, return a description of the commit in the form
+        of ``git describe --tags``: the tag name if the commit is tagged, or
+        else ``tag-N-gSHA``, where N is :py:attr:`~.git_distance` and SHA
+        is the abbreviated commit. Otherwise, return None.
+
+        :return: description of the git commit relative to the nearest tag
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        return self._git_describe
+
+    @property
+    def git_distance(self):
+        """
+        If the distribution is installed via git and a tag is reachable from
+        the current commit, return the number of commits since the nearest
+        tag (0 if the commit is tagged), as ``git rev-list --count`` counts
+        them; where committers' clocks were skewed, ``git describe`` can
+        report a different number. Otherwise, return None.
+
+        :return: number of commits since the nearest tag
+        :rtype: :py:obj:`int` or :py:data:`None`
+        """
+        return self._git_distance
+
+    @property
+    def git_branch(self):
+        """
+        If the distribution is installed via git and a branch is checked out,
+        return the branch name; return None if not installed via git, or if
+        the repository has a detached HEAD.
+
+        :return: git branch name
+        :rtype: :py:obj:`str` or :py:data:`None`
+        """
+        return self._git_branch
+
+    @property
+    def git_ahead(self):
+        """
+        If the distribution is installed via git and the checked out branch
+        has an upstream (i.e. ``origin/master``), return the number of
+        commits on the branch that are not on the upstream; otherwise,
+        return None. This is found from the repository's local refs, so it
+        is relative to the upstream as of the last fetch.
+
+        :return: number of commits ahead of the upstream branch
+        :rtype: :py:obj:`int` or :py:data:`None`
+        """
+        return self._git_ahead
+
+    @property
+    def git_behind(self):
+        """
+        If the distribution is installed via git and the checked out branch
+        has an upstream (i.e. ``origin/master``), return the number of
+        commits on the upstream that are not on the branch; otherwise,
+        return None. This is found from the repository's local refs, so it
+        is relative to the upstream as of the last fetch.
+
+        :return: number of commits behind the upstream branch
+        :rtype: :py:obj:`int` or :py:data:`None`
+        """
+        return self._git_behind
+
     @property
     def git_str(self):
         """
@@ -254,10 +470,23 @@ class VersionInfo(object):
         is appended if :py:meth:`~.git_is_dirty` is True.
 
         :return: description of the git repo remote and state
+        :rtype: str
+        """
+        v = self._git_str
+        if v is _UNSET:
+            v = self._make_git_str()
+            object.__setattr__(self, '_git_str', v)
+        return v
+
+    def _make_git_str(self):
+        """
+        Compute the value of :py:attr:`~.git_str`.
+
         :rtype: str
         """
         dirty = '*' if self._git_is_dirty else ''
-        if 'git' in self._pip_requirement:
+        if self._pip_requirement is not None and \
+                'git' in self._pip_requirement:
             return self._pip_requirement + dirty
         if self._git_commit is None and self._git_remotes is None:
             return ''
@@ -274,9 +503,14 @@ class VersionInfo(object):
         :return: version and URL
         :rtype: str
         """
-        if self.version is None and self.url is None:
-            return ''
-        return '%s <%s>' % (self.version, self.url)
+        v = self._short_str
+        if v is _UNSET:
+            if self.version is None and self.url is None:
+                v = ''
+            else:
+                v = '%s <%s>' % (self.version, self.url)
+            object.__setattr__(self, '_short_str', v)
+        return v
 
     @property
     def long_str(self):
@@ -297,10 +531,91 @@ class VersionInfo(object):
         :return: long version/installation specifier string
         :rtype: str
         """
-        gs = self.git_str
-        if gs == '':
-            return self.short_str
-        return self.short_str + ' (' + gs + ')'
+        v = self._long_str
+        if v is _UNSET:
+            gs = self.git_str
+            if gs == '':
+                v = self.short_str
+            else:
+                v = self.short_str + ' (' + gs + ')'
+            object.__setattr__(self, '_long_str', v)
+        return v
+
+    @property
+    def long_bytes(self):
+        """
+        Return :py:meth:`~.long_str` encoded as bytes that are safe to use as
+        an HTTP header value: ASCII, with any other characters
+        backslash-escaped and control characters (including CR and LF)
+        removed.
+
+        :return: header-safe encoded long version string
+        :rtype: bytes
+        """
+        v = self._long_bytes
+        if v is _UNSET:
+            v = self.long_str.translate(_CONTROL_CHARS).encode(
+                'ascii', 'backslashreplace'
+            )
+            object.__setattr__(self, '_long_bytes', v)
+        return v
+
+    @property
+    def stage_status(self):
+        """
+        Return how each stage (``pip``, ``pkg_resources`` and ``git``) of the
+        :py:meth:`~.VersionFinder.find_package_version` call that produced
+        this object ended: a dict of stage name to :py:data:`~.STAGE_COMPLETE`,
+        :py:data:`~.STAGE_FAILED` or :py:data:`~.STAGE_TIMEOUT`. Stages that
+        were not run (because of ``fields`` or ``lazy_git``) are omitted.
+        None if the object was not produced by a lookup (i.e. constructed
+        directly or deserialized).
+
+        The stage status describes the lookup, not the version; it is not
+        included in :py:attr:`~.as_dict`, serialization, equality or hashing.
+
+        :return: dict of stage name to status
+        :rtype: :py:obj:`dict` or :py:data:`None`
+        """
+        if self._stage_status is None:
+            return None
+        return dict(self._stage_status)
+
+    @property
+    def complete(self):
+        """
+        Whether every stage of the lookup that produced this object ran to
+        completion (True if :py:attr:`~.stage_status` is None).
+
+        :rtype: bool
+        """
+        if self._stage_status is None:
+            return True
+        for v in self._stage_status.values():
+            if v != STAGE_COMPLETE:
+                return False
+        return True
+
+    def field_status(self, name):
+        """
+        Return the :py:attr:`~.stage_status` of the stage that finds the
+        given constructor field (i.e. ``git_commit``), or None if that stage
+        was not run or the status is not known. A None field value whose
+        stage status is :py:data:`~.STAGE_COMPLETE` was looked for and not
+        found; otherwise its value is unknown.
+
+        :param name: constructor argument name
+        :type name: str
+        :rtype: :py:obj:`str` or :py:data:`None`
+        :raises: ValueError if ``name`` is not a constructor field
+        """
+        if name not in _FIELD_NAMES:
+            raise ValueError('Unknown VersionInfo field: %s' % name)
+        if self._stage_status is None:
+            return None
+        for prefix, stage in _FIELD_STAGES:
+            if name.startswith(prefix):
+                return self._stage_status.get(stage)
 
     @property
     def as_dict(self):
@@ -319,10 +634,44 @@ class VersionInfo(object):
             'pkg_resources_url': self._pkg_resources_url,
             'git_tag': self._git_tag,
             'git_commit': self._git_commit,
-            'git_remotes': self._git_remotes,
+            'git_remotes': self.git_remotes,
             'git_is_dirty': self._git_is_dirty,
+            'git_describe': self._git_describe,
+            'git_distance': self._git_distance,
+            'git_branch': self._git_branch,
+            'git_ahead': self._git_ahead,
+            'git_behind': self._git_behind,
         }
 
+    def replace(self, **kwargs):
+        """
+        Return a new VersionInfo with the same values as this one, except
+        for those specified as keyword arguments.
+
+        :param kwargs: constructor arguments to change
+        :return: new VersionInfo
+        :rtype: :py:class:`~.VersionInfo`
+        """
+        d = self.as_dict
+        d.update(kwargs)
+        return VersionInfo(**d)
+
+    def _key(self):
+        """
+        Return a hashable tuple of all of the object's values.
+
+        :rtype: tuple
+        """
+        remotes = self._git_remotes
+        return (
+            self._pip_version, self._pip_url, self._pip_requirement,
+            self._pkg_resources_version, self._pkg_resources_url,
+            self._git_tag, self._git_commit,
+            None if remotes is None else frozenset(remotes.items()),
+            self._git_is_dirty, self._git_describe, self._git_distance,
+            self._git_branch, self._git_ahead, self._git_behind
+        )
+
     def __repr__(self):
         """
         Return a string representation of the object.
@@ -339,7 +688,293 @@ class VersionInfo(object):
 
         :param other: class to compare
         :type other: VersionInfo
-        :return: whether or not the class' as_dict properties are equal
+        :return: whether or not all of the two objects' values are equal
         :rtype: bool
         """
-        return self.as_dict == other.as_dict
+        if self is other:
+            return True
+        if not isinstance(other, VersionInfo):
+            return NotImplemented
+        return (
+            self._pip_version == other._pip_version and
+            self._pip_url == other._pip_url and
+            self._pip_requirement == other._pip_requirement and
+            self._pkg_resources_version == other._pkg_resources_version and
+            self._pkg_resources_url == other._pkg_resources_url and
+            self._git_tag == other._git_tag and
+            self._git_commit == other._git_commit and
+            self._git_remotes == other._git_remotes and
+            self._git_is_dirty == other._git_is_dirty and
+            self._git_describe == other._git_describe and
+            self._git_distance == other._git_distance and
+            self._git_branch == other._git_branch and
+            self._git_ahead == other._git_ahead and
+            self._git_behind == other._git_behind
+        )
+
+    def __hash__(self):
+        """
+        Return the hash of the object's values; computed once and cached.
+
+        :rtype: int
+        """
+        h = self._hash
+        if h is None:
+            h = hash(self._key())
+            object.__setattr__(self, '_hash', h)
+        return h
+
+    def __reduce__(self):
+        """
+        Pickle as a call to the constructor with positional arguments,
+        without the slot names or any cached values.
+        """
+        return (VersionInfo, (
+            self._pip_version, self._pip_url, self._pip_requirement,
+            self._pkg_resources_version, self._pkg_resources_url,
+            self._git_tag, self._git_commit, self._git_remotes,
+            self._git_is_dirty, self._git_describe, self._git_distance,
+            self._git_branch, self._git_ahead, self._git_behind
+        ))
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        Construct a VersionInfo from a dict of constructor arguments, such as
+        one returned by :py:attr:`~.as_dict`.
+
+        :param d: constructor arguments
+        :type d: dict
+        :rtype: :py:class:`~.VersionInfo`
+        """
+        return cls(**d)
+
+    def to_json(self):
+        """
+        Return the object serialized as compact JSON of :py:attr:`~.as_dict`.
+
+        :rtype: str
+        """
+        return json.dumps(self.as_dict, sort_keys=True, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, s):
+        """
+        Construct a VersionInfo from JSON produced by :py:meth:`~.to_json`.
+
+        :param s: JSON document
+        :type s: str
+        :rtype: :py:class:`~.VersionInfo`
+        """
+        return cls.from_dict(json.loads(s))
+
+    def to_bytes(self):
+        """
+        Return a compact binary encoding of the object. The encoding is
+        positional: a four-byte header (format version, a 16-bit mask of
+        which fields are set, and the dirty state), followed by each set
+        string as a 16-bit length and UTF-8 bytes, each set integer as 32
+        bits, then the git remotes as a count and name/URL pairs. Fields that
+        are None take no space.
+
+        :return: encoded object
+        :rtype: bytes
+        :raises: ValueError if any string is longer than 65535 bytes, or any
+          integer is negative or does not fit in 32 bits
+        """
+        flags = 0
+        parts = [None]
+        bit = 1
+        for v in (
+            self._pip_version, self._pip_url, self._pip_requirement,
+            self._pkg_resources_version, self._pkg_resources_url,
+            self._git_tag, self._git_commit, self._git_describe,
+            self._git_branch
+        ):
+            if v is not None:
+                flags |= bit
+                _pack_str(parts, v)
+            bit <<= 1
+        for v in (self._git_distance, self._git_ahead, self._git_behind):
+            if v is not None:
+                flags |= bit
+                try:
+                    parts.append(_BIN_INT.pack(v))
+                except struct.error:
+                    raise ValueError('Integer out of range for VersionInfo '
+                                     'encoding: %r' % v)
+            bit <<= 1
+        if self._git_remotes is not None:
+            flags |= _BIN_REMOTES
+            parts.append(_BIN_LEN.pack(len(self._git_remotes)))
+            for name, url in sorted(self._git_remotes.items()):
+                _pack_str(parts, name)
+                _pack_str(parts, url)
+        parts[0] = _BIN_HEADER.pack(
+            BINARY_VERSION, flags, _BIN_DIRTY[self._git_is_dirty]
+        )
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, b):
+        """
+        Construct a VersionInfo from the encoding produced by
+        :py:meth:`~.to_bytes`.
+
+        :param b: encoded object
+        :type b: bytes
+        :rtype: :py:class:`~.VersionInfo`
+        :raises: ValueError if the encoding is truncated or of an unsupported
+          version
+        """
+        try:
+            return cls._from_bytes(b)
+        except struct.error:
+            raise ValueError('Truncated VersionInfo encoding')
+
+    @classmethod
+    def _from_bytes(cls, b):
+        """
+        Decode :py:meth:`~.to_bytes` output; see :py:meth:`~.from_bytes`.
+        """
+        ver, flags, dirty = _BIN_HEADER.unpack_from(b, 0)
+        if ver != BINARY_VERSION:
+            raise ValueError('Unsupported VersionInfo encoding version: %d'
+                             % ver)
+        kwargs = {}
+        pos = _BIN_HEADER.size
+        bit = 1
+        for name in _STR_FIELDS:
+            if flags & bit:
+                kwargs[name], pos = _unpack_str(b, pos)
+            bit <<= 1
+        for name in _INT_FIELDS:
+            if flags & bit:
+                kwargs[name] = _BIN_INT.unpack_from(b, pos)[0]
+                pos += _BIN_INT.size
+            bit <<= 1
+        if flags & _BIN_REMOTES:
+            remotes = {}
+            count = _BIN_LEN.unpack_from(b, pos)[0]
+            pos += _BIN_LEN.size
+            for _ in range(count):
+                name, pos = _unpack_str(b, pos)
+                remotes[name], pos = _unpack_str(b, pos)
+            kwargs['git_remotes'] = remotes
+        kwargs['git_is_dirty'] = _BIN_DIRTY_VALUES[dirty]
+        return cls(**kwargs)
+
+
+class LazyVersionInfo(VersionInfo):
+    """
+    A :py:class:`~.VersionInfo` whose git fields (all of the ``git_*``
+    constructor arguments) are found on first access rather than when it is
+    constructed. Everything else about it is the same as VersionInfo;
+    anything that needs the git fields (including the derived strings,
+    equality, hashing and serialization) triggers the lookup, which runs at
+    most once even if several threads access the fields at the same time.
+    After that, the fields are ordinary attributes.
+
+    Returned by :py:func:`~versionfinder.find_version` and
+    :py:meth:`~.VersionFinder.find_package_version` when called with
+    ``lazy_git=True``.
+    """
+
+    __slots__ = ('_git_loader', '_git_lock')
+
+    _GIT_SLOTS = frozenset([
+        '_git_tag', '_git_commit', '_git_remotes', '_git_is_dirty',
+        '_git_describe', '_git_distance', '_git_branch', '_git_ahead',
+        '_git_behind'
+    ])
+
+    def __init__(self, git_loader, **kwargs):
+        """
+        :param git_loader: zero-argument callable returning a dict of the
+          ``git_*`` constructor arguments (any of which may be omitted). If it
+          raises an exception, the git fields are all None.
+        :type git_loader: callable
+        :param kwargs: the other (non-git) constructor arguments of
+          :py:class:`~.VersionInfo`
+        """
+        super(LazyVersionInfo, self).__init__(**kwargs)
+        # leave the git slots unset, so that accessing them calls __getattr__
+        for name in self._GIT_SLOTS:
+            object.__delattr__(self, name)
+        object.__setattr__(self, '_git_loader', git_loader)
+        object.__setattr__(self, '_git_lock', threading.Lock())
+
+    def __getattr__(self, name):
+        # only called for attributes that are not found normally, i.e. the
+        # git slots before they are loaded
+        if name not in LazyVersionInfo._GIT_SLOTS:
+            raise AttributeError(name)
+        self._load_git()
+        return object.__getattribute__(self, name)
+
+    @property
+    def git_loaded(self):
+        """
+        Whether the git fields have been found yet.
+
+        :rtype: bool
+        """
+        return self._git_loader is None
+
+    def _load_git(self):
+        """
+        Call the git loader and set the git fields from its result, unless
+        another thread already has.
+        """
+        with self._git_lock:
+            loader = self._git_loader
+            if loader is None:
+                return
+            try:
+                kwargs = loader()
+            except Exception:
+                logger.debug('Exception loading git information',
+                             exc_info=True)
+                kwargs = {}
+            # let the constructor do the usual interning and copying
+            tmp = VersionInfo(**kwargs)
+            for name in self._GIT_SLOTS:
+                object.__setattr__(
+                    self, name, object.__getattribute__(tmp, name)
+                )
+            object.__setattr__(self, '_git_loader', None)
+
+
+def _pack_str(parts, s):
+    """
+    Append the length-prefixed UTF-8 encoding of ``s`` to ``parts``.
+
+    :param parts: list of bytes to append to
+    :type parts: list
+    :param s: string to encode
+    :type s: str
+    """
+    e = s.encode('utf-8')
+    if len(e) > 0xffff:
+        raise ValueError('String too long for VersionInfo encoding: %s...'
+                         % s[:40])
+    parts.append(_BIN_LEN.pack(len(e)))
+    parts.append(e)
+
+
+def _unpack_str(b, pos):
+    """
+    Decode a length-prefixed UTF-8 string from ``b`` at offset ``pos``.
+
+    :param b: encoded data
+    :type b: bytes
+    :param pos: offset of the length prefix
+    :type pos: int
+    :return: 2-tuple of the string and the offset following it
+    :rtype: tuple
+    """
+    n = _BIN_LEN.unpack_from(b, pos)[0]
+    pos += _BIN_LEN.size
+    if pos + n > len(b):
+        raise ValueError('Truncated VersionInfo encoding')
+    return b[pos:pos + n].decode('utf-8'), pos + n